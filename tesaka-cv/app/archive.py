@@ -0,0 +1,322 @@
+"""
+Archivo histórico: bases SQLite por período para datos viejos ya cerrados
+
+tesaka.db guarda solo el conjunto de trabajo. archive_old_data() mueve lo que
+ya no va a cambiar y es más viejo que N meses (TESAKA_ARCHIVE_MONTHS, default
+12) a un archivo por mes de creación: <archive_dir>/tesaka-archive-YYYY-MM.db.
+
+Qué se archiva (ARCHIVE_GROUPS), siempre junto con sus filas dependientes:
+- de_documents en estado final (approved/rejected), con sus de_events y los
+  XML de xml_blobs que referencian
+- sifen_lotes ya resueltos (status distinto de pending/processing)
+- invoices con al menos un envío ok a Tesaka, con invoice_items y submissions
+
+Los archivos quedan compactados (VACUUM, los XML ya van comprimidos en
+xml_blobs) y de solo lectura (permisos 0444, se abren con mode=ro). Volver a
+correr el job sobre un período ya archivado agrega las filas nuevas al mismo
+archivo. Los ids son AUTOINCREMENT, así que nunca se reutilizan en la base viva.
+
+Las búsquedas puntuales (por id, CDC o número de lote) que no encuentran la
+fila en la base viva siguen en los archivos con find_archived() /
+find_all_archived(), del período más nuevo al más viejo.
+"""
+import logging
+import os
+import sqlite3
+import stat
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = "tesaka-archive-"
+DEFAULT_MONTHS = int(os.getenv("TESAKA_ARCHIVE_MONTHS", "12"))
+
+
+class ArchiveGroup(NamedTuple):
+    """Tabla raíz que se archiva, con sus dependientes y columnas de blobs."""
+    table: str
+    where: str                                   # condición de "cerrado" sobre la tabla raíz
+    children: Tuple[Tuple[str, str, str], ...]   # (tabla, columna, columna de la raíz)
+    blob_columns: Tuple[str, ...] = ()
+    indexes: Tuple[Tuple[str, str], ...] = ()    # (tabla, columnas) a indexar en el archivo
+
+
+ARCHIVE_GROUPS = (
+    ArchiveGroup(
+        table="de_documents",
+        where="last_status IN ('approved', 'rejected')",
+        children=(("de_events", "cdc", "cdc"),),
+        blob_columns=("de_xml_sha", "signed_xml_sha", "sirecepde_xml_sha"),
+        indexes=(("de_documents", "cdc"), ("de_events", "cdc, ts")),
+    ),
+    ArchiveGroup(
+        table="sifen_lotes",
+        where="status NOT IN ('pending', 'processing')",
+        children=(),
+        blob_columns=("last_response_sha",),
+        indexes=(("sifen_lotes", "env, d_prot_cons_lote"), ("sifen_lotes", "de_document_id")),
+    ),
+    ArchiveGroup(
+        table="invoices",
+        where="EXISTS (SELECT 1 FROM main.submissions s WHERE s.invoice_id = invoices.id AND s.ok = 1)",
+        children=(("invoice_items", "invoice_id", "id"), ("submissions", "invoice_id", "id")),
+        indexes=(("invoice_items", "invoice_id"), ("submissions", "invoice_id")),
+    ),
+)
+
+# Tablas que referencian xml_blobs en la base viva (para liberar los que quedan huérfanos)
+_BLOB_REFERENCES = tuple((g.table, col) for g in ARCHIVE_GROUPS for col in g.blob_columns)
+
+
+def archive_dir_for(db_path: Union[str, Path]) -> Path:
+    """Directorio de archivos de una base: TESAKA_ARCHIVE_DIR o <dir de la base>/archive."""
+    return Path(os.getenv("TESAKA_ARCHIVE_DIR") or Path(db_path).parent / "archive")
+
+
+def archive_path(archive_dir: Path, period: str) -> Path:
+    return Path(archive_dir) / f"{ARCHIVE_PREFIX}{period}.db"
+
+
+def archive_files(archive_dir: Path) -> List[Path]:
+    """Archivos de un directorio, del período más nuevo al más viejo."""
+    archive_dir = Path(archive_dir)
+    if not archive_dir.is_dir():
+        return []
+    return sorted(archive_dir.glob(f"{ARCHIVE_PREFIX}*.db"), reverse=True)
+
+
+def connect_archive(path: Path) -> sqlite3.Connection:
+    """Conexión de solo lectura a un archivo."""
+    conn = sqlite3.connect(f"file:{Path(path).resolve()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def cutoff_for(months: int, now: Optional[datetime] = None) -> str:
+    """Primer día del mes de hace `months` meses: se archivan meses completos."""
+    now = now or datetime.utcnow()
+    total = now.year * 12 + (now.month - 1) - months
+    return f"{total // 12:04d}-{total % 12 + 1:02d}-01 00:00:00"
+
+
+def _table_exists(conn: sqlite3.Connection, table: str, schema: str = "main") -> bool:
+    return conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def _columns(conn: sqlite3.Connection, table: str, schema: str = "main") -> List[Tuple[str, str]]:
+    return [(row[1], row[2]) for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _ensure_archive_table(conn: sqlite3.Connection, table: str) -> List[str]:
+    """
+    Crea (o completa con las columnas nuevas) la tabla en el archivo adjunto
+    como `arch`. Sin constraints: el archivo solo se lee. Devuelve las columnas
+    de la base viva, en orden.
+    """
+    live_columns = _columns(conn, table)
+    if not _table_exists(conn, table, "arch"):
+        cols = ", ".join(
+            f"{name} {col_type} PRIMARY KEY" if name == "id" else f"{name} {col_type}".strip()
+            for name, col_type in live_columns
+        )
+        conn.execute(f"CREATE TABLE arch.{table} ({cols})")
+    else:
+        existing = {name for name, _ in _columns(conn, table, "arch")}
+        for name, col_type in live_columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE arch.{table} ADD COLUMN {name} {col_type}")
+    return [name for name, _ in live_columns]
+
+
+def _copy_rows(conn: sqlite3.Connection, table: str, where: str) -> int:
+    columns = ", ".join(_ensure_archive_table(conn, table))
+    return conn.execute(
+        f"INSERT OR REPLACE INTO arch.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE {where}"
+    ).rowcount
+
+
+def _plan(conn: sqlite3.Connection, cutoff: str) -> Dict[str, Dict[str, List[int]]]:
+    """período -> tabla raíz -> ids a archivar."""
+    plan: Dict[str, Dict[str, List[int]]] = {}
+    for group in ARCHIVE_GROUPS:
+        if not _table_exists(conn, group.table):
+            continue
+        try:
+            rows = conn.execute(
+                f"SELECT id, strftime('%Y-%m', created_at) AS period FROM main.{group.table} "
+                f"WHERE created_at < ? AND {group.where} ORDER BY id",
+                (cutoff,),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            # Base sin alguna tabla de la condición (p. ej. submissions): nada que archivar
+            logger.debug(f"Se omite {group.table}: {e}")
+            continue
+        for row_id, period in rows:
+            if period:
+                plan.setdefault(period, {}).setdefault(group.table, []).append(row_id)
+    return plan
+
+
+def _set_read_only(path: Path, read_only: bool):
+    mode = path.stat().st_mode
+    if read_only:
+        path.chmod(mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+    else:
+        path.chmod(mode | stat.S_IWUSR)
+
+
+def _archive_period(conn: sqlite3.Connection, path: Path, ids_by_table: Dict[str, List[int]]) -> Dict[str, int]:
+    """Mueve las filas de un período al archivo `path` en una sola transacción."""
+    counts: Dict[str, int] = {}
+    conn.execute("ATTACH DATABASE ? AS arch", (str(path),))
+    try:
+        conn.execute("BEGIN")
+        if _table_exists(conn, "xml_blobs") and not _table_exists(conn, "xml_blobs", "arch"):
+            conn.execute("CREATE TABLE arch.xml_blobs AS SELECT * FROM main.xml_blobs WHERE 0")
+            conn.execute("CREATE UNIQUE INDEX arch.idx_xml_blobs_sha256 ON xml_blobs(sha256)")
+        freed_blobs = set()
+        for group in ARCHIVE_GROUPS:
+            ids = ids_by_table.get(group.table)
+            if not ids:
+                continue
+            conn.execute("DELETE FROM temp.archive_ids")
+            conn.executemany("INSERT INTO temp.archive_ids (id) VALUES (?)", [(i,) for i in ids])
+            roots = "id IN (SELECT id FROM temp.archive_ids)"
+            live_columns = {name for name, _ in _columns(conn, group.table)}
+
+            for child, column, root_column in group.children:
+                if not _table_exists(conn, child):
+                    continue
+                where = f"{column} IN (SELECT {root_column} FROM main.{group.table} WHERE {roots})"
+                counts[child] = counts.get(child, 0) + _copy_rows(conn, child, where)
+                conn.execute(f"DELETE FROM main.{child} WHERE {where}")
+
+            for column in group.blob_columns:
+                if column not in live_columns:
+                    continue
+                shas = f"SELECT {column} FROM main.{group.table} WHERE {roots} AND {column} IS NOT NULL"
+                conn.execute(
+                    f"INSERT OR IGNORE INTO arch.xml_blobs SELECT * FROM main.xml_blobs WHERE sha256 IN ({shas})"
+                )
+                freed_blobs.update(row[0] for row in conn.execute(shas))
+
+            counts[group.table] = _copy_rows(conn, group.table, roots)
+            conn.execute(f"DELETE FROM main.{group.table} WHERE {roots}")
+
+        for table, columns in {i for g in ARCHIVE_GROUPS for i in g.indexes}:
+            if _table_exists(conn, table, "arch"):
+                name = f"idx_{table}_{columns.replace(', ', '_')}"
+                conn.execute(f"CREATE INDEX IF NOT EXISTS arch.{name} ON {table}({columns})")
+
+        # Blobs que ya no referencia ninguna fila viva (el mismo XML puede seguir en uso)
+        if freed_blobs:
+            still_used = " OR ".join(
+                f"EXISTS (SELECT 1 FROM main.{table} WHERE {column} = xml_blobs.sha256)"
+                for table, column in _BLOB_REFERENCES
+                if _table_exists(conn, table) and column in {c for c, _ in _columns(conn, table)}
+            ) or "0"
+            conn.executemany(
+                f"DELETE FROM main.xml_blobs WHERE sha256 = ? AND NOT ({still_used})",
+                [(sha,) for sha in freed_blobs],
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("DETACH DATABASE arch")
+    return counts
+
+
+def archive_old_data(
+    db_path: Union[str, Path],
+    archive_dir: Optional[Path] = None,
+    months: int = DEFAULT_MONTHS,
+    now: Optional[datetime] = None,
+    dry_run: bool = False,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Mueve a los archivos por período los datos cerrados más viejos que
+    `months` meses.
+
+    Returns:
+        {período: {tabla: filas archivadas}} (con dry_run, lo que se archivaría
+        de cada tabla raíz, sin escribir nada)
+    """
+    archive_dir = Path(archive_dir or archive_dir_for(db_path))
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        plan = _plan(conn, cutoff_for(months, now))
+        if dry_run:
+            return {period: {t: len(ids) for t, ids in tables.items()} for period, tables in sorted(plan.items())}
+
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_ids (id INTEGER PRIMARY KEY)")
+        summary: Dict[str, Dict[str, int]] = {}
+        for period, ids_by_table in sorted(plan.items()):
+            path = archive_path(archive_dir, period)
+            if path.exists():
+                _set_read_only(path, False)
+            try:
+                summary[period] = _archive_period(conn, path, ids_by_table)
+                archive = sqlite3.connect(str(path))
+                try:
+                    archive.execute("VACUUM")
+                finally:
+                    archive.close()
+            finally:
+                if path.exists():
+                    _set_read_only(path, True)
+            logger.info(f"Archivado {period} en {path}: {summary[period]}")
+        return summary
+    finally:
+        conn.close()
+
+
+def find_all_archived(
+    archive_dir: Path,
+    table: str,
+    where: str,
+    params: Sequence[Any] = (),
+    columns: str = "*",
+    first_only: bool = False,
+) -> List[Tuple[sqlite3.Row, Path]]:
+    """
+    Filas de `table` que cumplen `where` en los archivos, del período más
+    nuevo al más viejo, con el archivo de cada una. Los archivos sin la tabla
+    se saltean.
+    """
+    found: List[Tuple[sqlite3.Row, Path]] = []
+    for path in archive_files(archive_dir):
+        try:
+            conn = connect_archive(path)
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo abrir el archivo {path}: {e}")
+            continue
+        try:
+            if not _table_exists(conn, table):
+                continue
+            rows = conn.execute(f"SELECT {columns} FROM {table} WHERE {where}", list(params)).fetchall()
+        finally:
+            conn.close()
+        found.extend((row, path) for row in rows)
+        if first_only and found:
+            break
+    return found
+
+
+def find_archived(
+    archive_dir: Path,
+    table: str,
+    where: str,
+    params: Sequence[Any] = (),
+    columns: str = "*",
+) -> Optional[Tuple[sqlite3.Row, Path]]:
+    """Primera fila de `table` que cumple `where` en los archivos (None si no hay)."""
+    found = find_all_archived(archive_dir, table, where, params, columns, first_only=True)
+    return found[0] if found else None
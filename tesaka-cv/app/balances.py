@@ -0,0 +1,292 @@
+"""
+Saldos de contratos y órdenes de compra mantenidos de forma incremental
+
+Dos tablas de saldo se actualizan con triggers en la misma transacción que
+cada escritura de items (contract_items, purchase_order_items,
+delivery_note_items), así que consultar el saldo de un contrato o de una OC
+es una sola lectura por clave en lugar de SUMs sobre todos sus movimientos:
+
+- contract_item_balances: cantidad_total del contrato y cantidad_usada en OCs
+- po_item_balances: cantidad de la OC y cantidad_entregada en notas de entrega
+
+check_balances() compara los saldos contra los movimientos y
+rebuild_balances() los recalcula desde cero (tools/check_balances.py).
+"""
+import sqlite3
+from typing import Any, Dict, Iterable, List
+
+# Tolerancia de la verificación (los saldos se acumulan como REAL)
+BALANCE_TOLERANCE = 1e-6
+
+_TRIGGERS = {
+    # --- contract_items -> contract_item_balances ---
+    "trg_balances_contract_items_ai": """
+        AFTER INSERT ON contract_items BEGIN
+            INSERT OR REPLACE INTO contract_item_balances
+                (contract_item_id, contract_id, cantidad_total, cantidad_usada)
+            VALUES (
+                new.id, new.contract_id, new.cantidad_total,
+                (SELECT COALESCE(SUM(cantidad), 0) FROM purchase_order_items WHERE contract_item_id = new.id)
+            );
+        END
+    """,
+    "trg_balances_contract_items_au": """
+        AFTER UPDATE OF contract_id, cantidad_total ON contract_items BEGIN
+            UPDATE contract_item_balances
+            SET contract_id = new.contract_id, cantidad_total = new.cantidad_total
+            WHERE contract_item_id = new.id;
+        END
+    """,
+    "trg_balances_contract_items_ad": """
+        AFTER DELETE ON contract_items BEGIN
+            DELETE FROM contract_item_balances WHERE contract_item_id = old.id;
+        END
+    """,
+    # --- purchase_order_items -> contract_item_balances + po_item_balances ---
+    "trg_balances_po_items_ai": """
+        AFTER INSERT ON purchase_order_items BEGIN
+            UPDATE contract_item_balances SET cantidad_usada = cantidad_usada + new.cantidad
+            WHERE contract_item_id = new.contract_item_id;
+            INSERT OR REPLACE INTO po_item_balances
+                (po_item_id, purchase_order_id, cantidad, cantidad_entregada)
+            VALUES (
+                new.id, new.purchase_order_id, new.cantidad,
+                (SELECT COALESCE(SUM(cantidad), 0) FROM delivery_note_items WHERE source_po_item_id = new.id)
+            );
+        END
+    """,
+    "trg_balances_po_items_au": """
+        AFTER UPDATE OF purchase_order_id, contract_item_id, cantidad ON purchase_order_items BEGIN
+            UPDATE contract_item_balances SET cantidad_usada = cantidad_usada - old.cantidad
+            WHERE contract_item_id = old.contract_item_id;
+            UPDATE contract_item_balances SET cantidad_usada = cantidad_usada + new.cantidad
+            WHERE contract_item_id = new.contract_item_id;
+            UPDATE po_item_balances
+            SET purchase_order_id = new.purchase_order_id, cantidad = new.cantidad
+            WHERE po_item_id = new.id;
+        END
+    """,
+    "trg_balances_po_items_ad": """
+        AFTER DELETE ON purchase_order_items BEGIN
+            UPDATE contract_item_balances SET cantidad_usada = cantidad_usada - old.cantidad
+            WHERE contract_item_id = old.contract_item_id;
+            DELETE FROM po_item_balances WHERE po_item_id = old.id;
+        END
+    """,
+    # --- delivery_note_items -> po_item_balances ---
+    "trg_balances_dn_items_ai": """
+        AFTER INSERT ON delivery_note_items BEGIN
+            UPDATE po_item_balances SET cantidad_entregada = cantidad_entregada + new.cantidad
+            WHERE po_item_id = new.source_po_item_id;
+        END
+    """,
+    "trg_balances_dn_items_au": """
+        AFTER UPDATE OF source_po_item_id, cantidad ON delivery_note_items BEGIN
+            UPDATE po_item_balances SET cantidad_entregada = cantidad_entregada - old.cantidad
+            WHERE po_item_id = old.source_po_item_id;
+            UPDATE po_item_balances SET cantidad_entregada = cantidad_entregada + new.cantidad
+            WHERE po_item_id = new.source_po_item_id;
+        END
+    """,
+    "trg_balances_dn_items_ad": """
+        AFTER DELETE ON delivery_note_items BEGIN
+            UPDATE po_item_balances SET cantidad_entregada = cantidad_entregada - old.cantidad
+            WHERE po_item_id = old.source_po_item_id;
+        END
+    """,
+}
+
+
+def init_balances(conn: sqlite3.Connection):
+    """
+    Crea las tablas de saldos, índices y triggers (idempotente)
+
+    Si las tablas se crean por primera vez sobre una base con datos, se
+    cargan con rebuild_balances().
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+        "AND name IN ('contract_item_balances', 'po_item_balances')"
+    )
+    needs_rebuild = cursor.fetchone()[0] < 2
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS contract_item_balances (
+            contract_item_id INTEGER PRIMARY KEY,
+            contract_id INTEGER NOT NULL,
+            cantidad_total REAL NOT NULL,
+            cantidad_usada REAL NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_contract_item_balances_contract
+        ON contract_item_balances(contract_id)
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS po_item_balances (
+            po_item_id INTEGER PRIMARY KEY,
+            purchase_order_id INTEGER NOT NULL,
+            cantidad REAL NOT NULL,
+            cantidad_entregada REAL NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_po_item_balances_po
+        ON po_item_balances(purchase_order_id)
+    """)
+    # Índices de los movimientos (usados por los triggers y el verificador)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_purchase_order_items_contract_item
+        ON purchase_order_items(contract_item_id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_delivery_note_items_source_po_item
+        ON delivery_note_items(source_po_item_id)
+    """)
+    for name, body in _TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    if needs_rebuild:
+        rebuild_balances(conn)
+    conn.commit()
+
+
+def rebuild_balances(conn: sqlite3.Connection):
+    """Recalcula ambas tablas de saldos desde los movimientos"""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM contract_item_balances")
+    cursor.execute("""
+        INSERT INTO contract_item_balances (contract_item_id, contract_id, cantidad_total, cantidad_usada)
+        SELECT ci.id, ci.contract_id, ci.cantidad_total, COALESCE(u.usada, 0)
+        FROM contract_items ci
+        LEFT JOIN (
+            SELECT contract_item_id, SUM(cantidad) AS usada
+            FROM purchase_order_items
+            WHERE contract_item_id IS NOT NULL
+            GROUP BY contract_item_id
+        ) u ON u.contract_item_id = ci.id
+    """)
+    cursor.execute("DELETE FROM po_item_balances")
+    cursor.execute("""
+        INSERT INTO po_item_balances (po_item_id, purchase_order_id, cantidad, cantidad_entregada)
+        SELECT poi.id, poi.purchase_order_id, poi.cantidad, COALESCE(d.entregada, 0)
+        FROM purchase_order_items poi
+        LEFT JOIN (
+            SELECT source_po_item_id, SUM(cantidad) AS entregada
+            FROM delivery_note_items
+            WHERE source_po_item_id IS NOT NULL
+            GROUP BY source_po_item_id
+        ) d ON d.source_po_item_id = poi.id
+    """)
+    conn.commit()
+
+
+def get_contract_balances(conn: sqlite3.Connection, contract_id: int) -> Dict[int, float]:
+    """
+    Saldo disponible de todos los items de un contrato en una consulta
+
+    Returns:
+        Dict {contract_item_id: saldo_disponible}
+    """
+    rows = conn.execute("""
+        SELECT contract_item_id, MAX(0.0, cantidad_total - cantidad_usada) AS saldo
+        FROM contract_item_balances
+        WHERE contract_id = ?
+    """, (contract_id,))
+    return {row[0]: row[1] for row in rows}
+
+
+def get_po_balances(conn: sqlite3.Connection, po_id: int) -> Dict[int, float]:
+    """
+    Saldo pendiente de entrega de todos los items de una OC en una consulta
+
+    Returns:
+        Dict {po_item_id: saldo_disponible}
+    """
+    rows = conn.execute("""
+        SELECT po_item_id, MAX(0.0, cantidad - cantidad_entregada) AS saldo
+        FROM po_item_balances
+        WHERE purchase_order_id = ?
+    """, (po_id,))
+    return {row[0]: row[1] for row in rows}
+
+
+def get_po_item_balances(conn: sqlite3.Connection, po_item_ids: Iterable[int]) -> Dict[int, float]:
+    """
+    Saldo pendiente de entrega de items de OC sueltos (de cualquier OC)
+
+    Returns:
+        Dict {po_item_id: saldo_disponible}; los ids inexistentes no aparecen
+    """
+    ids = sorted(set(po_item_ids))
+    if not ids:
+        return {}
+    placeholders = ",".join("?" * len(ids))
+    rows = conn.execute(f"""
+        SELECT po_item_id, MAX(0.0, cantidad - cantidad_entregada) AS saldo
+        FROM po_item_balances
+        WHERE po_item_id IN ({placeholders})
+    """, ids)
+    return {row[0]: row[1] for row in rows}
+
+
+def check_balances(conn: sqlite3.Connection, tolerance: float = BALANCE_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Verifica los saldos incrementales contra los movimientos
+
+    Returns:
+        Lista de diferencias {tabla, item_id, campo, saldo, esperado}; vacía si todo cuadra
+    """
+    problems: List[Dict[str, Any]] = []
+
+    def _compare(table, rows, fields):
+        for row in rows:
+            for field in fields:
+                actual, expected = row[field], row[f"esperado_{field}"]
+                if actual is None or expected is None or abs(actual - expected) > tolerance:
+                    problems.append({
+                        "tabla": table,
+                        "item_id": row["item_id"],
+                        "campo": field,
+                        "saldo": actual,
+                        "esperado": expected,
+                    })
+
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    _compare("contract_item_balances", cursor.execute("""
+        SELECT ci.id AS item_id,
+               b.cantidad_total, ci.cantidad_total AS esperado_cantidad_total,
+               b.cantidad_usada, COALESCE(u.usada, 0) AS esperado_cantidad_usada
+        FROM contract_items ci
+        LEFT JOIN contract_item_balances b ON b.contract_item_id = ci.id
+        LEFT JOIN (
+            SELECT contract_item_id, SUM(cantidad) AS usada
+            FROM purchase_order_items
+            WHERE contract_item_id IS NOT NULL
+            GROUP BY contract_item_id
+        ) u ON u.contract_item_id = ci.id
+        UNION ALL
+        SELECT b.contract_item_id, b.cantidad_total, NULL, b.cantidad_usada, NULL
+        FROM contract_item_balances b
+        WHERE b.contract_item_id NOT IN (SELECT id FROM contract_items)
+    """), ("cantidad_total", "cantidad_usada"))
+    _compare("po_item_balances", cursor.execute("""
+        SELECT poi.id AS item_id,
+               b.cantidad, poi.cantidad AS esperado_cantidad,
+               b.cantidad_entregada, COALESCE(d.entregada, 0) AS esperado_cantidad_entregada
+        FROM purchase_order_items poi
+        LEFT JOIN po_item_balances b ON b.po_item_id = poi.id
+        LEFT JOIN (
+            SELECT source_po_item_id, SUM(cantidad) AS entregada
+            FROM delivery_note_items
+            WHERE source_po_item_id IS NOT NULL
+            GROUP BY source_po_item_id
+        ) d ON d.source_po_item_id = poi.id
+        UNION ALL
+        SELECT b.po_item_id, b.cantidad, NULL, b.cantidad_entregada, NULL
+        FROM po_item_balances b
+        WHERE b.po_item_id NOT IN (SELECT id FROM purchase_order_items)
+    """), ("cantidad", "cantidad_entregada"))
+    return problems
@@ -1,12 +1,23 @@
 """
 Configuración de base de datos SQLite
 """
+import os
 import sqlite3
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
-# Ruta de la base de datos
-DB_PATH = Path(__file__).parent.parent / "tesaka.db"
+try:
+    from .archive import archive_dir_for, find_all_archived
+    from .balances import init_balances
+    from .search import init_search
+except ImportError:  # scripts que agregan app/ al path e importan "db" suelto
+    from archive import archive_dir_for, find_all_archived
+    from balances import init_balances
+    from search import init_search
+
+# Ruta de la base de datos (TESAKA_DB_PATH permite apuntar a una base de prueba,
+# p. ej. tools/load_test_web.py)
+DB_PATH = Path(os.getenv("TESAKA_DB_PATH") or Path(__file__).parent.parent / "tesaka.db")
 
 
 def get_db() -> sqlite3.Connection:
@@ -16,6 +27,21 @@ def get_db() -> sqlite3.Connection:
     return conn
 
 
+def get_archived_rows(table: str, where: str, params=(), columns: str = "*") -> List[sqlite3.Row]:
+    """
+    Filas que ya no están en la base viva porque se movieron a los archivos
+    históricos (ver archive.py). Para búsquedas puntuales que no encontraron
+    nada en la base viva.
+    """
+    return [row for row, _ in find_all_archived(archive_dir_for(DB_PATH), table, where, params, columns)]
+
+
+def get_archived_row(table: str, where: str, params=(), columns: str = "*") -> Optional[sqlite3.Row]:
+    """Primera fila de get_archived_rows() (None si no hay)."""
+    rows = get_archived_rows(table, where, params, columns)
+    return rows[0] if rows else None
+
+
 def init_db():
     """Inicializa la base de datos creando las tablas necesarias"""
     conn = get_db()
@@ -263,7 +289,143 @@ def init_db():
     cursor.execute("""
         CREATE INDEX IF NOT EXISTS idx_submissions_invoice_id ON submissions(invoice_id)
     """)
-    
+
     conn.commit()
+
+    migrate_invoice_lines(conn)
+    init_search(conn)
+    init_balances(conn)
+
     conn.close()
 
+
+# Columnas tipadas de cabecera de invoices, extraídas de data_json
+INVOICE_HEADER_COLUMNS = {
+    "buyer_ruc": "TEXT",
+    "numero_comprobante": "TEXT",
+    "numero_timbrado": "TEXT",
+    "tipo_comprobante": "INTEGER",
+    "condicion_compra": "TEXT",
+    "moneda": "TEXT",
+    "items_count": "INTEGER",
+    "total": "REAL",
+}
+
+# SET de la cabecera; total e items_count salen de invoice_items (ya cargados)
+_INVOICE_HEADER_SET = """
+    buyer_ruc = json_extract(data_json, '$.buyer.ruc'),
+    numero_comprobante = json_extract(data_json, '$.transaction.numeroComprobanteVenta'),
+    numero_timbrado = json_extract(data_json, '$.transaction.numeroTimbrado'),
+    tipo_comprobante = CAST(json_extract(data_json, '$.transaction.tipoComprobante') AS INTEGER),
+    condicion_compra = json_extract(data_json, '$.transaction.condicionCompra'),
+    moneda = json_extract(data_json, '$.retention.moneda'),
+    items_count = (SELECT COUNT(*) FROM invoice_items WHERE invoice_id = invoices.id),
+    total = (SELECT COALESCE(SUM(subtotal), 0) FROM invoice_items WHERE invoice_id = invoices.id)
+"""
+
+_INVOICE_ITEMS_SELECT = """
+    SELECT
+        {invoice_id},
+        CAST(j.key AS INTEGER) + 1,
+        json_extract(j.value, '$.descripcion'),
+        CAST(COALESCE(json_extract(j.value, '$.cantidad'), 0) AS REAL),
+        CAST(json_extract(j.value, '$.tasaAplica') AS INTEGER),
+        CAST(COALESCE(json_extract(j.value, '$.precioUnitario'), 0) AS REAL),
+        CAST(COALESCE(json_extract(j.value, '$.cantidad'), 0) AS REAL)
+            * CAST(COALESCE(json_extract(j.value, '$.precioUnitario'), 0) AS REAL)
+"""
+
+
+def migrate_invoice_lines(conn: sqlite3.Connection):
+    """
+    Normaliza las facturas: columnas tipadas de cabecera + tabla invoice_items
+
+    data_json sigue siendo la fuente de verdad (la conversión a Tesaka necesita
+    el documento completo); las columnas y los items se mantienen sincronizados
+    con triggers (cualquier INSERT/UPDATE de data_json, venga de la app, de
+    scripts o de tests) para que totales y filtros se resuelvan en SQL sin
+    decodificar cada JSON.
+
+    La migración es idempotente: agrega las columnas que falten, crea tabla,
+    índices y triggers, y hace el backfill (con JSON1) solo de las filas que
+    todavía no fueron normalizadas (total IS NULL). Las filas con JSON
+    inválido quedan sin normalizar, igual que antes se ignoraban al sumar.
+    """
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(invoices)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+    for column, column_type in INVOICE_HEADER_COLUMNS.items():
+        if column not in existing_columns:
+            cursor.execute(f"ALTER TABLE invoices ADD COLUMN {column} {column_type}")
+
+    # Tabla invoice_items (una fila por item de data_json.items)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS invoice_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER NOT NULL,
+            line_no INTEGER NOT NULL,
+            descripcion TEXT,
+            cantidad REAL NOT NULL,
+            tasa_aplica INTEGER,
+            precio_unitario REAL NOT NULL,
+            subtotal REAL NOT NULL,
+            FOREIGN KEY (invoice_id) REFERENCES invoices(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice_id ON invoice_items(invoice_id)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_issue_date ON invoices(issue_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_created_at ON invoices(created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_buyer_ruc ON invoices(buyer_ruc)")
+
+    # Triggers: mantienen cabecera e items sincronizados con data_json
+    new_items = _INVOICE_ITEMS_SELECT.format(invoice_id="NEW.id") + """
+        FROM json_each(CASE WHEN json_valid(NEW.data_json) THEN NEW.data_json ELSE '{}' END, '$.items') AS j;
+    """
+    for event in ("INSERT", "UPDATE OF data_json"):
+        trigger = "trg_invoices_lines_" + event.split()[0].lower()
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {trigger}
+            AFTER {event} ON invoices
+            BEGIN
+                DELETE FROM invoice_items WHERE invoice_id = NEW.id;
+                INSERT INTO invoice_items
+                    (invoice_id, line_no, descripcion, cantidad, tasa_aplica, precio_unitario, subtotal)
+                {new_items}
+                UPDATE invoices SET {_INVOICE_HEADER_SET}
+                WHERE id = NEW.id AND json_valid(NEW.data_json);
+            END
+        """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_invoices_lines_delete
+        AFTER DELETE ON invoices
+        BEGIN
+            DELETE FROM invoice_items WHERE invoice_id = OLD.id;
+        END
+    """)
+
+    # Backfill de las facturas existentes (una sola vez: después quedan con total)
+    cursor.execute("""
+        DELETE FROM invoice_items WHERE invoice_id IN (SELECT id FROM invoices WHERE total IS NULL)
+    """)
+    cursor.execute(
+        """
+        INSERT INTO invoice_items
+            (invoice_id, line_no, descripcion, cantidad, tasa_aplica, precio_unitario, subtotal)
+        """
+        + _INVOICE_ITEMS_SELECT.format(invoice_id="i.id")
+        + """
+        FROM invoices AS i,
+             json_each(CASE WHEN json_valid(i.data_json) THEN i.data_json ELSE '{}' END, '$.items') AS j
+        WHERE i.total IS NULL
+        """
+    )
+    cursor.execute(f"""
+        UPDATE invoices SET {_INVOICE_HEADER_SET}
+        WHERE total IS NULL AND json_valid(data_json)
+    """)
+
+    conn.commit()
+
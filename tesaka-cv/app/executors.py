@@ -0,0 +1,213 @@
+"""
+Modelo de ejecución de los handlers FastAPI y monitor de lag del event loop
+
+Clasificación de rutas (app/main.py, app/routes_*.py, web/main.py):
+- I/O (SQLite, templates, HTTP a SIFEN/Tesaka, firma de un DE): handler `def`.
+  FastAPI lo corre en su threadpool y el event loop sigue atendiendo.
+- CPU (reportlab, openpyxl: PDFs y Excel): handler `async def` que hace
+  `await run_cpu(fn, ...)`. Corre en un pool de procesos, así no compite por
+  el GIL con el resto de los requests.
+- Un handler `async def` que necesita algo blocking (ej. leer el form y
+  después guardar en la base) lo delega con `await run_io(fn, ...)`.
+- Un handler `def` que reparte trabajo CPU entre muchos items (ej. convertir
+  facturas antes de enviarlas) usa `map_cpu(fn, items)` sobre el mismo pool.
+
+Ningún handler `async def` debe llamar código blocking directamente (lo
+verifica tests/test_executors.py).
+
+LoopLagMonitor mide cuánto tarda el loop en despertar un sleep: si un
+handler bloquea, el lag sube. Se activa con install_loop_lag_monitor(app) y
+reporta por log y en GET /_internal/loop-lag.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Procesos para trabajo CPU-bound (PDF_WORKERS se mantiene por compatibilidad)
+CPU_WORKERS = int(os.getenv("CPU_POOL_WORKERS") or os.getenv("PDF_WORKERS") or 0) or min(4, os.cpu_count() or 1)
+
+_cpu_executor: Optional[ProcessPoolExecutor] = None
+_cpu_executor_lock = threading.Lock()
+
+
+def _get_cpu_executor() -> ProcessPoolExecutor:
+    global _cpu_executor
+    with _cpu_executor_lock:
+        if _cpu_executor is None:
+            _cpu_executor = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+        return _cpu_executor
+
+
+def shutdown_cpu_executor() -> None:
+    """Cierra el pool de procesos (al apagar la app)"""
+    global _cpu_executor
+    with _cpu_executor_lock:
+        if _cpu_executor is not None:
+            _cpu_executor.shutdown(wait=False, cancel_futures=True)
+            _cpu_executor = None
+
+
+async def run_cpu(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Ejecuta fn (picklable, a nivel de módulo) en el pool de procesos.
+
+    Si el pool se rompió (un worker murió), se recrea una vez y se reintenta.
+    """
+    global _cpu_executor
+    loop = asyncio.get_running_loop()
+    call = partial(fn, *args, **kwargs)
+    try:
+        return await loop.run_in_executor(_get_cpu_executor(), call)
+    except BrokenProcessPool:
+        with _cpu_executor_lock:
+            _cpu_executor = None
+        return await loop.run_in_executor(_get_cpu_executor(), call)
+
+
+def map_cpu(fn: Callable[..., Any], items: Iterable[Any], chunksize: int = 1) -> List[Any]:
+    """
+    Aplica fn (picklable) a items en el pool de procesos compartido, desde código sincrónico.
+
+    Para handlers `def` (threadpool): no crea un pool por request. Si el pool
+    se rompió, se recrea una vez y se reintenta, como run_cpu.
+    """
+    global _cpu_executor
+    items = list(items)
+    try:
+        return list(_get_cpu_executor().map(fn, items, chunksize=chunksize))
+    except BrokenProcessPool:
+        with _cpu_executor_lock:
+            _cpu_executor = None
+        return list(_get_cpu_executor().map(fn, items, chunksize=chunksize))
+
+
+async def run_io(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Ejecuta fn blocking (SQLite, HTTP, archivos) en el threadpool de FastAPI"""
+    return await run_in_threadpool(fn, *args, **kwargs)
+
+
+class LoopLagMonitor:
+    """
+    Mide el lag del event loop: duerme interval segundos y registra cuánto
+    tarde despertó. Guarda las últimas `window` muestras.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        warn_threshold: float = 0.1,
+        report_every: float = 60.0,
+        window: int = 3000,
+    ):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.report_every = report_every
+        self.samples: deque = deque(maxlen=window)
+        self.max_lag = 0.0
+        self.warnings = 0
+        self.total_samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, lag: float) -> None:
+        """Agrega una muestra (segundos)"""
+        self.samples.append(lag)
+        self.total_samples += 1
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if lag >= self.warn_threshold:
+            self.warnings += 1
+            logger.warning(f"Event loop bloqueado {lag * 1000:.0f} ms")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_report = loop.time()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            self.record(max(0.0, now - start - self.interval))
+            if self.report_every and now - last_report >= self.report_every:
+                last_report = now
+                stats = self.stats()
+                logger.info(
+                    f"Event loop lag: p50={stats['p50_ms']} ms, p99={stats['p99_ms']} ms, "
+                    f"max={stats['max_ms']} ms ({stats['samples']} muestras)"
+                )
+
+    def start(self) -> None:
+        """Arranca la medición en el loop actual"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Resumen de las muestras en ventana (en ms)"""
+        samples = sorted(self.samples)
+
+        def pct(p: float) -> float:
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 2)
+
+        return {
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": len(samples),
+            "total_samples": self.total_samples,
+            "last_ms": round(self.samples[-1] * 1000, 2) if self.samples else 0.0,
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 2) if samples else 0.0,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "max_ms": round(self.max_lag * 1000, 2),
+            "warnings": self.warnings,
+            "warn_threshold_ms": round(self.warn_threshold * 1000, 2),
+        }
+
+
+def install_loop_lag_monitor(app, path: str = "/_internal/loop-lag") -> Optional[LoopLagMonitor]:
+    """
+    Registra el monitor de lag en la app (startup/shutdown) y la ruta JSON con
+    sus estadísticas. Se configura con LOOP_LAG_MONITOR (0 = desactivado),
+    LOOP_LAG_INTERVAL_MS, LOOP_LAG_WARN_MS y LOOP_LAG_REPORT_S.
+    """
+    if os.getenv("LOOP_LAG_MONITOR", "1") == "0":
+        return None
+
+    monitor = LoopLagMonitor(
+        interval=float(os.getenv("LOOP_LAG_INTERVAL_MS", "100")) / 1000,
+        warn_threshold=float(os.getenv("LOOP_LAG_WARN_MS", "100")) / 1000,
+        report_every=float(os.getenv("LOOP_LAG_REPORT_S", "60")),
+    )
+
+    async def start_monitor():
+        monitor.start()
+
+    async def stop_monitor():
+        await monitor.stop()
+
+    # async: responde desde el loop aunque el threadpool esté saturado
+    async def loop_lag_stats():
+        return monitor.stats()
+
+    app.router.add_event_handler("startup", start_monitor)
+    app.router.add_event_handler("shutdown", stop_monitor)
+    app.add_api_route(path, loop_lag_stats, methods=["GET"], include_in_schema=False)
+    app.state.loop_lag_monitor = monitor
+    return monitor
@@ -0,0 +1,696 @@
+"""
+Generador de KuDE (representación gráfica impresa del DE) a partir del XML firmado
+
+Pensado para imprimir cientos de KuDEs de una vez:
+- Un solo parseo del XML extrae los campos del KuDE, los items, DigestValue y dCarQR.
+- El QR se codifica con tablas Reed-Solomon precalculadas y máscara fija, y se
+  dibuja como rectángulos vectoriales (sin imagen PIL).
+- El layout estático (bordes, rótulos, encabezados de tabla, leyenda) se dibuja
+  una sola vez por PDF como Form XObject y cada página lo reutiliza.
+- El modo lote reparte el parseo y la codificación del QR (o el PDF completo,
+  en modo ZIP) en un pool de procesos.
+"""
+import io
+import itertools
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache, partial
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from lxml import etree
+from reportlab import rl_config
+from reportlab.graphics.barcode import qrencoder
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas as pdf_canvas
+
+from .sifen_client.qr_generator import QRGenerator
+
+# Lotes más chicos que esto se renderizan en el proceso actual (arrancar el pool cuesta más)
+MIN_PARALLEL_BATCH = 16
+
+# URL de consulta pública impresa en el KuDE
+CONSULTA_URL = "https://ekuatia.set.gov.py/consultas/"
+
+LEYENDA_KUDE = "ESTE DOCUMENTO ES UNA REPRESENTACIÓN GRÁFICA DE UN DOCUMENTO ELECTRÓNICO (XML)"
+LEYENDA_72H = (
+    "Si su documento electrónico presenta algún error, podrá solicitar la modificación "
+    "dentro de las 72 horas siguientes de la emisión de este comprobante."
+)
+
+# Campos del DE que usa el KuDE (nombre local del tag -> clave)
+_DOC_FIELDS = {
+    "dFeEmiDE": "fecha_emision",
+    "dDesTiDE": "tipo_documento",
+    "dNumTim": "timbrado",
+    "dEst": "establecimiento",
+    "dPunExp": "punto_expedicion",
+    "dNumDoc": "numero",
+    "dFeIniT": "inicio_vigencia",
+    "dRucEm": "ruc_emisor",
+    "dDVEmi": "dv_emisor",
+    "dNomEmi": "nombre_emisor",
+    "dDirEmi": "direccion_emisor",
+    "dTelEmi": "telefono_emisor",
+    "dEmailE": "email_emisor",
+    "dRucRec": "ruc_receptor",
+    "dDVRec": "dv_receptor",
+    "dNumIDRec": "id_receptor",
+    "dNomRec": "nombre_receptor",
+    "dDirRec": "direccion_receptor",
+    "dDCondOpe": "condicion",
+    "cMoneOpe": "moneda",
+    "dSubExe": "sub_exentas",
+    "dSub5": "sub_5",
+    "dSub10": "sub_10",
+    "dTotGralOpe": "total",
+    "dIVA5": "iva_5",
+    "dIVA10": "iva_10",
+    "dTotIVA": "total_iva",
+    "DigestValue": "digest_value",
+    "dCarQR": "qr",
+}
+
+_ITEM_FIELDS = {
+    "dCodInt": "codigo",
+    "dDesProSer": "descripcion",
+    "dCantProSer": "cantidad",
+    "dPUniProSer": "precio",
+    "dTotOpeItem": "total",
+    "dTasaIVA": "tasa_iva",
+}
+
+
+class KudeError(Exception):
+    """Error al generar un KuDE"""
+    pass
+
+
+# ---------------------------------------------------------------------------
+# Extracción de datos
+# ---------------------------------------------------------------------------
+
+def extract_kude_data(xml: Union[str, bytes]) -> Dict[str, Any]:
+    """
+    Extrae en una sola pasada los datos del KuDE de un DE (o rDE) firmado.
+
+    Returns:
+        Dict con cdc, los campos de _DOC_FIELDS presentes e items (lista de
+        dicts con los campos de _ITEM_FIELDS)
+    """
+    if isinstance(xml, str):
+        xml = xml.encode("utf-8")
+    try:
+        root = etree.fromstring(xml)
+    except etree.XMLSyntaxError as e:
+        raise KudeError(f"XML inválido: {e}") from e
+
+    data: Dict[str, Any] = {"cdc": None, "items": []}
+    item: Optional[Dict[str, str]] = None
+    for el in root.iter(etree.Element):
+        tag = el.tag.rpartition("}")[2]
+        if tag == "DE":
+            data["cdc"] = el.get("Id")
+        elif tag == "gCamItem":
+            item = {}
+            data["items"].append(item)
+        elif item is not None and tag in _ITEM_FIELDS:
+            item[_ITEM_FIELDS[tag]] = (el.text or "").strip()
+        elif tag in _DOC_FIELDS and _DOC_FIELDS[tag] not in data:
+            data[_DOC_FIELDS[tag]] = (el.text or "").strip()
+
+    if not data["cdc"]:
+        raise KudeError("El XML no contiene un elemento DE con atributo Id (CDC)")
+    return data
+
+
+def build_qr_url(
+    data: Dict[str, Any],
+    csc: Optional[str] = None,
+    csc_id: Optional[str] = None,
+    env: Optional[str] = None,
+) -> str:
+    """
+    Devuelve la URL del QR del KuDE.
+
+    Si el DE firmado trae dCarQR con una URL se usa tal cual (es la que está
+    firmada). Si no, se arma según el Manual Técnico v150:
+    nVersion, Id, dFeEmiDE (hex), dRucRec/dNumIDRec, dTotGralOpe, dTotIVA,
+    cItems, DigestValue (hex), IdCSC y cHashQR (QRGenerator.hash_qr).
+    Sin CSC la URL se arma sin cHashQR.
+    """
+    qr = data.get("qr") or ""
+    if qr.startswith("http"):
+        return qr
+
+    csc = csc or os.getenv("SIFEN_CSC")
+    csc_id = csc_id or os.getenv("SIFEN_CSC_ID", "0001")
+    env = (env or os.getenv("SIFEN_ENV", "test")).upper()
+    if env not in QRGenerator.QR_URL_BASE:
+        env = "TEST"
+
+    if data.get("ruc_receptor"):
+        receptor = f"dRucRec={data['ruc_receptor']}"
+    else:
+        receptor = f"dNumIDRec={data.get('id_receptor') or '0'}"
+    params = (
+        f"nVersion=150&Id={data['cdc']}"
+        f"&dFeEmiDE={(data.get('fecha_emision') or '').encode('utf-8').hex()}"
+        f"&{receptor}"
+        f"&dTotGralOpe={data.get('total') or '0'}"
+        f"&dTotIVA={data.get('total_iva') or '0'}"
+        f"&cItems={len(data.get('items') or ())}"
+        f"&DigestValue={(data.get('digest_value') or '').encode('utf-8').hex()}"
+        f"&IdCSC={csc_id}"
+    )
+    if not csc:
+        return QRGenerator.QR_URL_BASE[env] + params
+    # Mismo cHashQR que el QR del DE (QRGenerator)
+    return QRGenerator(csc=csc, csc_id=csc_id, environment=env).build_url(params)["url"]
+
+
+# ---------------------------------------------------------------------------
+# QR
+# ---------------------------------------------------------------------------
+
+_QR_LEVEL = qrencoder.QRErrorCorrectLevel.M
+# Máscara fija: cualquier patrón es válido para los lectores y evita evaluar las 8
+_QR_MASK = qrencoder.QRMaskPattern.PATTERN010
+
+_GF_EXP = [0] * 512
+_GF_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    _GF_EXP[_i] = _x
+    _GF_LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11D
+for _i in range(255, 512):
+    _GF_EXP[_i] = _GF_EXP[_i - 255]
+del _x, _i
+
+
+@lru_cache(maxsize=None)
+def _rs_generator(ec_count: int) -> Tuple[int, ...]:
+    """Polinomio generador Reed-Solomon (logaritmos de los coeficientes, sin el principal)"""
+    poly = [1]
+    for i in range(ec_count):
+        nxt = [0] * (len(poly) + 1)
+        for j, coef in enumerate(poly):
+            nxt[j] ^= coef
+            if coef:
+                nxt[j + 1] ^= _GF_EXP[_GF_LOG[coef] + i]
+        poly = nxt
+    return tuple(_GF_LOG[c] for c in poly[1:])
+
+
+def _rs_remainder(data: Sequence[int], ec_count: int) -> List[int]:
+    """Codewords de corrección de errores de un bloque"""
+    gen = _rs_generator(ec_count)
+    rem = [0] * ec_count
+    for byte in data:
+        factor = byte ^ rem[0]
+        del rem[0]
+        rem.append(0)
+        if factor:
+            lf = _GF_LOG[factor]
+            for j, g in enumerate(gen):
+                rem[j] ^= _GF_EXP[lf + g]
+    return rem
+
+
+@lru_cache(maxsize=None)
+def _qr_blocks(version: int) -> Tuple[Tuple[int, int], ...]:
+    """(data_count, ec_count) de cada bloque RS de la versión"""
+    return tuple(
+        (b.dataCount, b.totalCount - b.dataCount)
+        for b in qrencoder.QRRSBlock.getRSBlocks(version, _QR_LEVEL)
+    )
+
+
+@lru_cache(maxsize=None)
+def _qr_template(version: int) -> Tuple[Tuple[Tuple[bool, ...], ...], Tuple[Tuple[int, int], ...]]:
+    """
+    Matriz con los patrones de función y todos los bits de datos en 0 (ya
+    enmascarados), más las posiciones (col, fila) de los módulos de datos en
+    orden de colocación.
+    """
+    code = qrencoder.QRCode(version, _QR_LEVEL)
+    code.dataCache = [0] * sum(d + e for d, e in _qr_blocks(version))
+    code.makeImpl(False, _QR_MASK)
+    return tuple(tuple(row) for row in code.modules), tuple(code.dataPosIterator())
+
+
+def qr_matrix(text: str) -> List[List[bool]]:
+    """
+    Codifica text como QR (modo byte, nivel M) y devuelve la matriz de módulos.
+
+    Produce la misma matriz que reportlab.graphics.barcode.qrencoder con la
+    misma versión y máscara, en una fracción del tiempo.
+    """
+    payload = text.encode("utf-8")
+    for version in range(1, 41):
+        capacity = sum(d for d, _ in _qr_blocks(version))
+        header_bits = 4 + (8 if version < 10 else 16)
+        if header_bits + 8 * len(payload) <= capacity * 8:
+            break
+    else:
+        raise KudeError(f"Texto demasiado largo para un QR ({len(payload)} bytes)")
+
+    # Modo byte + longitud + datos + terminador, completado a bytes y con padding
+    nbits = header_bits + 8 * len(payload)
+    value = (0x4 << (header_bits - 4)) | len(payload)
+    value = (value << (8 * len(payload))) | int.from_bytes(payload, "big")
+    terminator = min(4, capacity * 8 - nbits)
+    nbits += terminator
+    pad = -nbits % 8
+    value <<= terminator + pad
+    nbits += pad
+    codewords = list(value.to_bytes(nbits // 8, "big"))
+    codewords.extend(itertools.islice(itertools.cycle((0xEC, 0x11)), capacity - len(codewords)))
+
+    # Bloques RS e intercalado
+    data_blocks, ec_blocks = [], []
+    offset = 0
+    for data_count, ec_count in _qr_blocks(version):
+        block = codewords[offset:offset + data_count]
+        offset += data_count
+        data_blocks.append(block)
+        ec_blocks.append(_rs_remainder(block, ec_count))
+    final = [
+        cw
+        for column in itertools.chain(itertools.zip_longest(*data_blocks), itertools.zip_longest(*ec_blocks))
+        for cw in column
+        if cw is not None
+    ]
+
+    template, positions = _qr_template(version)
+    modules = [list(row) for row in template]
+    bits = format(int.from_bytes(bytes(final), "big"), f"0{len(final) * 8}b")
+    for i, bit in enumerate(bits):
+        if bit == "1":
+            col, row = positions[i]
+            modules[row][col] = not modules[row][col]
+    return modules
+
+
+def qr_runs(text: str) -> Tuple[int, List[Tuple[int, int, int]]]:
+    """
+    QR como tramos horizontales de módulos oscuros.
+
+    Returns:
+        (tamaño en módulos, [(fila, columna inicial, largo), ...])
+    """
+    modules = qr_matrix(text)
+    runs = []
+    for r, row in enumerate(modules):
+        start = None
+        for c, dark in enumerate(row):
+            if dark and start is None:
+                start = c
+            elif not dark and start is not None:
+                runs.append((r, start, c - start))
+                start = None
+        if start is not None:
+            runs.append((r, start, len(row) - start))
+    return len(modules), runs
+
+
+# ---------------------------------------------------------------------------
+# Layout
+# ---------------------------------------------------------------------------
+
+PAGE_W, PAGE_H = A4
+MARGIN = 28
+LEFT, RIGHT = MARGIN, PAGE_W - MARGIN
+FONT, FONT_BOLD = "Helvetica", "Helvetica-Bold"
+
+HEADER_TOP = PAGE_H - MARGIN
+HEADER_BOTTOM = HEADER_TOP - 100
+HEADER_SPLIT = 360
+OPER_BOTTOM = HEADER_BOTTOM - 64
+TABLE_HEAD_BOTTOM = OPER_BOTTOM - 16
+TOTALS_TOP = 250
+TOTALS_BOTTOM = 190
+QR_BOTTOM = 60
+ROW_H = 12
+ROWS_PER_PAGE = int((TABLE_HEAD_BOTTOM - TOTALS_TOP - 4) // ROW_H)
+QR_SIZE = 112
+
+# Bordes de columna de la tabla de items
+COLS = (LEFT, 78, 300, 345, 415, 465, 516, RIGHT)
+COL_TITLES = ("Cód.", "Descripción", "Cant.", "Precio unitario", "Exentas", "5%", "10%")
+# Columna del valor de venta según la tasa de IVA
+TASA_COL = {"0": 4, "5": 5, "10": 6}
+
+_STATIC_FORM = "kude_static"
+
+
+def _static_ops() -> List[Tuple]:
+    """Operaciones del layout fijo, calculadas una vez al importar el módulo"""
+    ops: List[Tuple] = [
+        ("rect", LEFT, QR_BOTTOM, RIGHT - LEFT, HEADER_TOP - QR_BOTTOM),
+        ("line", LEFT, HEADER_BOTTOM, RIGHT, HEADER_BOTTOM),
+        ("line", HEADER_SPLIT, HEADER_TOP, HEADER_SPLIT, HEADER_BOTTOM),
+        ("line", LEFT, OPER_BOTTOM, RIGHT, OPER_BOTTOM),
+        ("line", LEFT, TABLE_HEAD_BOTTOM, RIGHT, TABLE_HEAD_BOTTOM),
+        ("line", LEFT, TOTALS_TOP, RIGHT, TOTALS_TOP),
+        ("line", LEFT, TOTALS_BOTTOM, RIGHT, TOTALS_BOTTOM),
+    ]
+    for x in COLS[1:-1]:
+        ops.append(("line", x, OPER_BOTTOM, x, TOTALS_TOP))
+    for i, title in enumerate(COL_TITLES):
+        ops.append(("center", FONT_BOLD, 7, (COLS[i] + COLS[i + 1]) / 2, TABLE_HEAD_BOTTOM + 5, title))
+
+    y = HEADER_TOP - 14
+    for label in ("RUC:", "Timbrado N°:", "Inicio de vigencia:"):
+        ops.append(("text", FONT_BOLD, 8, HEADER_SPLIT + 8, y, label))
+        y -= 12
+
+    y = HEADER_BOTTOM - 12
+    for label, x in (
+        ("Fecha y hora de emisión:", LEFT + 6),
+        ("RUC / Documento de identidad N°:", 300),
+        ("Condición de venta:", LEFT + 6),
+        ("Nombre o razón social:", 300),
+        ("Moneda:", LEFT + 6),
+        ("Dirección:", 300),
+    ):
+        ops.append(("text", FONT_BOLD, 7, x, y, label))
+        if x != LEFT + 6:
+            y -= 16
+
+    ops.extend([
+        ("text", FONT_BOLD, 7, LEFT + 6, TOTALS_TOP - 14, "SUBTOTAL:"),
+        ("text", FONT_BOLD, 8, LEFT + 6, TOTALS_TOP - 32, "TOTAL DE LA OPERACIÓN:"),
+        ("text", FONT_BOLD, 7, LEFT + 6, TOTALS_TOP - 50, "LIQUIDACIÓN IVA:"),
+        ("text", FONT, 7, 160, TOTALS_TOP - 50, "(5%)"),
+        ("text", FONT, 7, 290, TOTALS_TOP - 50, "(10%)"),
+        ("text", FONT, 7, 420, TOTALS_TOP - 50, "Total IVA:"),
+        ("text", FONT, 7, LEFT + QR_SIZE + 20, TOTALS_BOTTOM - 18,
+         "Consulte la validez de este documento electrónico con el número de CDC impreso abajo en:"),
+        ("text", FONT_BOLD, 7, LEFT + QR_SIZE + 20, TOTALS_BOTTOM - 30, CONSULTA_URL),
+        ("text", FONT_BOLD, 8, LEFT + QR_SIZE + 20, TOTALS_BOTTOM - 50, "CDC:"),
+        ("text", FONT_BOLD, 7, LEFT + QR_SIZE + 20, TOTALS_BOTTOM - 78, LEYENDA_KUDE),
+        ("text", FONT, 6, LEFT + QR_SIZE + 20, TOTALS_BOTTOM - 92, LEYENDA_72H),
+    ])
+    return ops
+
+
+_STATIC_OPS = _static_ops()
+
+
+def _ensure_static_form(c: pdf_canvas.Canvas) -> None:
+    """Define el layout fijo como Form XObject la primera vez que se usa el canvas"""
+    if getattr(c, "_kude_static_form", False):
+        return
+    c.beginForm(_STATIC_FORM)
+    c.setLineWidth(0.6)
+    for op in _STATIC_OPS:
+        kind = op[0]
+        if kind == "rect":
+            c.rect(*op[1:], stroke=1, fill=0)
+        elif kind == "line":
+            c.line(*op[1:])
+        else:
+            _, font, size, x, y, text = op
+            c.setFont(font, size)
+            if kind == "center":
+                c.drawCentredString(x, y, text)
+            else:
+                c.drawString(x, y, text)
+    c.endForm()
+    c._kude_static_form = True
+
+
+@lru_cache(maxsize=4096)
+def _fit(text: str, width: float, font: str = FONT, size: float = 7) -> str:
+    """Recorta text para que entre en width puntos"""
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + "…", font, size) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+def _fmt_num(value: Optional[str]) -> str:
+    """Formatea un número con separador de miles '.' y decimales con ','"""
+    if not value:
+        return ""
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        return value
+    if number == number.to_integral_value():
+        return f"{int(number):,}".replace(",", ".")
+    text = f"{number.normalize():,f}"
+    return text.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _fmt_fecha(value: Optional[str]) -> str:
+    """2026-01-15T10:30:00 -> 15/01/2026 10:30:00"""
+    if not value or len(value) < 10:
+        return value or ""
+    fecha = f"{value[8:10]}/{value[5:7]}/{value[0:4]}"
+    return f"{fecha} {value[11:19]}" if len(value) >= 19 else fecha
+
+
+def _group_cdc(cdc: str) -> str:
+    return " ".join(cdc[i:i + 4] for i in range(0, len(cdc), 4))
+
+
+def prepare_kude(
+    xml: Union[str, bytes],
+    csc: Optional[str] = None,
+    csc_id: Optional[str] = None,
+    env: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Parsea el DE y calcula el QR: todo el trabajo previo al dibujo.
+
+    El resultado es serializable (se devuelve desde los procesos del pool).
+    """
+    data = extract_kude_data(xml)
+    data["qr_url"] = build_qr_url(data, csc=csc, csc_id=csc_id, env=env)
+    data["qr_size"], data["qr_runs"] = qr_runs(data["qr_url"])
+    return data
+
+
+def _draw_qr(c: pdf_canvas.Canvas, data: Dict[str, Any], x: float, y_top: float, size: float) -> None:
+    # Coordenadas en módulos (enteros) bajo una transformación: evita formatear
+    # miles de floats con reportlab (fp_str) en cada QR
+    module = size / data["qr_size"]
+    c.saveState()
+    c.transform(module, 0, 0, -module, x, y_top)
+    c.addLiteral("\n".join(f"{col} {r} {n} 1 re" for r, col, n in data["qr_runs"]) + "\nf")
+    c.restoreState()
+
+
+def _draw_header(c: pdf_canvas.Canvas, d: Dict[str, Any], page: int, pages: int) -> None:
+    c.doForm(_STATIC_FORM)
+
+    # Emisor
+    y = HEADER_TOP - 18
+    c.setFont(FONT_BOLD, 10)
+    c.drawString(LEFT + 8, y, _fit(d.get("nombre_emisor") or "", HEADER_SPLIT - LEFT - 16, FONT_BOLD, 10))
+    c.setFont(FONT, 7)
+    for text in (
+        d.get("direccion_emisor"),
+        f"Tel.: {d['telefono_emisor']}" if d.get("telefono_emisor") else None,
+        d.get("email_emisor"),
+    ):
+        if text:
+            y -= 11
+            c.drawString(LEFT + 8, y, _fit(text, HEADER_SPLIT - LEFT - 16))
+
+    # Timbrado y número
+    x = HEADER_SPLIT + 90
+    y = HEADER_TOP - 14
+    c.setFont(FONT, 8)
+    c.drawString(x, y, f"{d.get('ruc_emisor') or ''}-{d.get('dv_emisor') or ''}")
+    c.drawString(x, y - 12, d.get("timbrado") or "")
+    c.drawString(x, y - 24, _fmt_fecha(d.get("inicio_vigencia")))
+    c.setFont(FONT_BOLD, 10)
+    center = (HEADER_SPLIT + RIGHT) / 2
+    c.drawCentredString(center, y - 48, (d.get("tipo_documento") or "Documento electrónico").upper())
+    c.drawCentredString(
+        center, y - 62,
+        f"N° {d.get('establecimiento') or ''}-{d.get('punto_expedicion') or ''}-{d.get('numero') or ''}",
+    )
+
+    # Operación y receptor
+    y = HEADER_BOTTOM - 12
+    if d.get("ruc_receptor"):
+        receptor = f"{d['ruc_receptor']}-{d.get('dv_receptor') or ''}"
+    else:
+        receptor = d.get("id_receptor") or ""
+    c.setFont(FONT, 7)
+    c.drawString(LEFT + 100, y, _fmt_fecha(d.get("fecha_emision")))
+    c.drawString(430, y, receptor)
+    c.drawString(LEFT + 100, y - 16, d.get("condicion") or "")
+    c.drawString(390, y - 16, _fit(d.get("nombre_receptor") or "", RIGHT - 394))
+    c.drawString(LEFT + 100, y - 32, d.get("moneda") or "PYG")
+    c.drawString(340, y - 32, _fit(d.get("direccion_receptor") or "", RIGHT - 344))
+
+    c.setFont(FONT, 6)
+    c.drawRightString(RIGHT, QR_BOTTOM - 12, f"Página {page} de {pages}")
+    c.setFont(FONT_BOLD, 9)
+    c.drawString(LEFT + QR_SIZE + 44, TOTALS_BOTTOM - 50, _group_cdc(d["cdc"]))
+
+
+def _draw_items(c: pdf_canvas.Canvas, items: Sequence[Dict[str, str]]) -> None:
+    c.setFont(FONT, 7)
+    y = TABLE_HEAD_BOTTOM - ROW_H + 2
+    for item in items:
+        c.drawString(COLS[0] + 3, y, _fit(item.get("codigo") or "", COLS[1] - COLS[0] - 6))
+        c.drawString(COLS[1] + 3, y, _fit(item.get("descripcion") or "", COLS[2] - COLS[1] - 6))
+        c.drawRightString(COLS[3] - 3, y, _fmt_num(item.get("cantidad")))
+        c.drawRightString(COLS[4] - 3, y, _fmt_num(item.get("precio")))
+        col = TASA_COL.get(item.get("tasa_iva") or "0", 4)
+        c.drawRightString(COLS[col + 1] - 3, y, _fmt_num(item.get("total")))
+        y -= ROW_H
+
+
+def _draw_totals(c: pdf_canvas.Canvas, d: Dict[str, Any]) -> None:
+    y = TOTALS_TOP - 14
+    c.setFont(FONT, 7)
+    c.drawRightString(COLS[5] - 3, y, _fmt_num(d.get("sub_exentas") or "0"))
+    c.drawRightString(COLS[6] - 3, y, _fmt_num(d.get("sub_5") or "0"))
+    c.drawRightString(COLS[7] - 3, y, _fmt_num(d.get("sub_10") or "0"))
+    c.setFont(FONT_BOLD, 8)
+    c.drawRightString(COLS[7] - 3, y - 18, _fmt_num(d.get("total") or "0"))
+    c.setFont(FONT, 7)
+    c.drawString(185, y - 36, _fmt_num(d.get("iva_5") or "0"))
+    c.drawString(318, y - 36, _fmt_num(d.get("iva_10") or "0"))
+    c.drawRightString(COLS[7] - 3, y - 36, _fmt_num(d.get("total_iva") or "0"))
+
+
+def draw_kude(c: pdf_canvas.Canvas, data: Dict[str, Any]) -> int:
+    """
+    Dibuja un KuDE (una o más páginas) en el canvas a partir de prepare_kude().
+
+    Returns:
+        Cantidad de páginas dibujadas
+    """
+    _ensure_static_form(c)
+    items = data.get("items") or []
+    pages = max(1, -(-len(items) // ROWS_PER_PAGE))
+
+    # El QR se define una vez por documento y se repite en cada página
+    c._kude_docs = getattr(c, "_kude_docs", 0) + 1
+    qr_form = f"kude_qr_{c._kude_docs}"
+    c.beginForm(qr_form)
+    _draw_qr(c, data, LEFT + 8, TOTALS_BOTTOM - 8, QR_SIZE)
+    c.endForm()
+
+    for page in range(1, pages + 1):
+        _draw_header(c, data, page, pages)
+        _draw_items(c, items[(page - 1) * ROWS_PER_PAGE:page * ROWS_PER_PAGE])
+        if page == pages:
+            _draw_totals(c, data)
+        else:
+            c.setFont(FONT, 7)
+            c.drawRightString(COLS[7] - 3, TOTALS_TOP - 14, "Continúa en la página siguiente")
+        c.doForm(qr_form)
+        c.showPage()
+    return pages
+
+
+# rl_config es global del proceso y las rutas KuDE renderizan en el threadpool:
+# sin lock, dos guardados solapados podían restaurar el valor del otro y dejar
+# useA85 cambiado para siempre. Un PDF de otro módulo que se guarde justo en ese
+# momento sale con streams binarios, igual de válidos.
+_RL_CONFIG_LOCK = threading.Lock()
+
+
+def _new_canvas(buffer: io.BytesIO, title: str) -> pdf_canvas.Canvas:
+    c = pdf_canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    c.setTitle(title)
+    c.setCreator("tesaka-cv")
+    return c
+
+
+def render_prepared(prepared: Iterable[Dict[str, Any]], title: str = "KuDE") -> bytes:
+    """Dibuja varios KuDE ya preparados en un único PDF"""
+    buffer = io.BytesIO()
+    c = _new_canvas(buffer, title)
+    for data in prepared:
+        draw_kude(c, data)
+    # Streams binarios (solo zlib): el ASCII85 de reportlab es Python puro y
+    # costaba la mitad del tiempo por página. rl_config se lee recién al guardar.
+    with _RL_CONFIG_LOCK:
+        use_a85 = rl_config.useA85
+        rl_config.useA85 = 0
+        try:
+            c.save()
+        finally:
+            rl_config.useA85 = use_a85
+    return buffer.getvalue()
+
+
+def render_kude(
+    xml: Union[str, bytes],
+    csc: Optional[str] = None,
+    csc_id: Optional[str] = None,
+    env: Optional[str] = None,
+) -> bytes:
+    """Genera el PDF del KuDE de un DE firmado"""
+    data = prepare_kude(xml, csc=csc, csc_id=csc_id, env=env)
+    return render_prepared([data], title=f"KuDE {data['cdc']}")
+
+
+def _render_named(xml: Union[str, bytes], csc=None, csc_id=None, env=None) -> Tuple[str, bytes]:
+    data = prepare_kude(xml, csc=csc, csc_id=csc_id, env=env)
+    return data["cdc"], render_prepared([data], title=f"KuDE {data['cdc']}")
+
+
+def _pool_map(fn, xmls: List[Union[str, bytes]], workers: Optional[int]) -> List[Any]:
+    """Aplica fn en un pool de procesos (o en el proceso actual si no vale la pena)"""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(xmls) < MIN_PARALLEL_BATCH:
+        return [fn(xml) for xml in xmls]
+    chunksize = max(1, len(xmls) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fn, xmls, chunksize=chunksize))
+
+
+def render_kude_batch(
+    xmls: Sequence[Union[str, bytes]],
+    output: str = "pdf",
+    workers: Optional[int] = None,
+    csc: Optional[str] = None,
+    csc_id: Optional[str] = None,
+    env: Optional[str] = None,
+) -> bytes:
+    """
+    Genera los KuDE de varios DE firmados.
+
+    Args:
+        xmls: XML firmados (DE o rDE)
+        output: "pdf" (un único PDF con todos los KuDE, en el orden recibido)
+            o "zip" (un PDF por DE, nombrado {CDC}.pdf)
+        workers: Procesos del pool (default: cantidad de CPUs; 1 = sin pool)
+        csc, csc_id, env: Para armar el QR de DEs sin dCarQR (ver build_qr_url)
+
+    Returns:
+        Bytes del PDF o del ZIP
+    """
+    xmls = list(xmls)
+    if output == "pdf":
+        # Los procesos parsean y codifican el QR; el dibujo va a un solo canvas
+        # para reutilizar el layout fijo en todas las páginas.
+        prepared = _pool_map(partial(prepare_kude, csc=csc, csc_id=csc_id, env=env), xmls, workers)
+        return render_prepared(prepared, title=f"KuDE ({len(prepared)} documentos)")
+    if output == "zip":
+        rendered = _pool_map(partial(_render_named, csc=csc, csc_id=csc_id, env=env), xmls, workers)
+        buffer = io.BytesIO()
+        # Los PDF ya van comprimidos: ZIP_STORED evita recomprimirlos
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+            for cdc, pdf in rendered:
+                zf.writestr(f"{cdc}.pdf", pdf)
+        return buffer.getvalue()
+    raise ValueError(f"output inválido: {output!r} (usar 'pdf' o 'zip')")
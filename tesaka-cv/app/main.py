@@ -2,7 +2,6 @@
 Aplicación web FastAPI para crear y administrar comprobantes Tesaka
 """
 import json
-import os
 from datetime import datetime
 from typing import List, Optional
 from fastapi import FastAPI, Request, Form, HTTPException, Query
@@ -11,10 +10,17 @@ from fastapi.staticfiles import StaticFiles
 from jinja2 import Template, Environment, FileSystemLoader
 from dotenv import load_dotenv
 
-from .db import get_db, init_db
+from .db import get_archived_row, get_archived_rows, get_db, init_db
+from .executors import CPU_WORKERS, install_loop_lag_monitor, map_cpu, run_cpu, shutdown_cpu_executor
+from .profiling import install_profiling
+from .sifen_client.metrics import install_metrics
 from .models import Invoice
+from .search import search as fts_search
 from .tesaka import convert_to_tesaka, validate_tesaka, load_schema
 from .tesaka_client import TesakaClient, TesakaClientError
+from .tesaka_batch import (
+    close_shared_client, get_shared_client, get_tesaka_config, select_unsent_invoices, submit_invoices
+)
 
 # Cargar variables de entorno
 load_dotenv()
@@ -49,6 +55,21 @@ except:
 def startup_event():
     init_db()
 
+# Cerrar el pool de procesos (PDFs, reportes) y el cliente Tesaka al apagar
+@app.on_event("shutdown")
+def shutdown_event():
+    shutdown_cpu_executor()
+    close_shared_client()
+
+# Monitor de lag del event loop (GET /_internal/loop-lag)
+install_loop_lag_monitor(app)
+
+# Latencia por ruta y métricas SIFEN en formato Prometheus (GET /metrics)
+install_metrics(app, "app")
+
+# Profiling de una fracción de los requests (PROFILE_SAMPLE_RATE, ver app/profiling.py)
+install_profiling(app)
+
 # Importar y registrar rutas de módulos
 from .routes_contracts import register_contract_routes
 from .routes_purchase_orders import register_purchase_order_routes
@@ -68,7 +89,7 @@ register_sifen_routes(app, jinja_env)
 
 
 @app.get("/", response_class=HTMLResponse)
-async def root(request: Request):
+def root(request: Request):
     """Muestra el dashboard con estadísticas del sistema"""
     conn = get_db()
     cursor = conn.cursor()
@@ -165,29 +186,17 @@ async def root(request: Request):
     else:
         stats['sales_invoices'] = {'total': 0}
     
-    # Facturas Tesaka
-    cursor.execute("SELECT COUNT(*) as total FROM invoices")
+    # Facturas Tesaka (total facturado desde la columna normalizada, sin decodificar data_json)
+    cursor.execute("SELECT COUNT(*) as total, COALESCE(SUM(total), 0) as total_facturado FROM invoices")
     row = cursor.fetchone()
     if row:
         row_dict = dict(row)
-        stats['invoices'] = {'total': row_dict.get('total', 0) or 0}
+        stats['invoices'] = {
+            'total': row_dict.get('total', 0) or 0,
+            'total_facturado': float(row_dict.get('total_facturado', 0) or 0)
+        }
     else:
-        stats['invoices'] = {'total': 0}
-    
-    # Total facturado (Tesaka)
-    cursor.execute("SELECT data_json FROM invoices")
-    rows = cursor.fetchall()
-    total_facturado = 0.0
-    for row in rows:
-        try:
-            invoice_data = json.loads(row['data_json'])
-            total_facturado += sum(
-                item.get('cantidad', 0) * item.get('precioUnitario', 0)
-                for item in invoice_data.get('items', [])
-            )
-        except:
-            pass
-    stats['invoices']['total_facturado'] = total_facturado
+        stats['invoices'] = {'total': 0, 'total_facturado': 0.0}
     
     # Envíos a Tesaka
     cursor.execute("""
@@ -232,33 +241,63 @@ async def root(request: Request):
 
 
 @app.get("/invoices", response_class=HTMLResponse)
-async def invoices_list(request: Request):
-    """Lista todas las facturas guardadas"""
+def invoices_list(
+    request: Request,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    ruc: Optional[str] = None,
+    q: Optional[str] = None
+):
+    """Lista las facturas guardadas, con filtros opcionales por fecha, RUC y comprador"""
+    where = []
+    params = []
+    if desde:
+        where.append("issue_date >= ?")
+        params.append(desde)
+    if hasta:
+        where.append("issue_date <= ?")
+        params.append(hasta)
+    if ruc:
+        where.append("buyer_ruc = ?")
+        params.append(ruc.strip())
+    if q:
+        where.append("buyer_name LIKE ?")
+        params.append(f"%{q.strip()}%")
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT id, created_at, issue_date, buyer_name, data_json
+    cursor.execute(f"""
+        SELECT id, created_at, issue_date, buyer_name, buyer_ruc, total
         FROM invoices
+        {where_sql}
         ORDER BY created_at DESC
-    """)
+    """, params)
     
     rows = cursor.fetchall()
     invoices = [Invoice.from_row(row) for row in rows]
     
+    cursor.execute(f"SELECT COALESCE(SUM(total), 0) AS total FROM invoices {where_sql}", params)
+    total_filtrado = float(cursor.fetchone()['total'])
+    
     conn.close()
     
-    return render_template("invoices_list.html", request, invoices=invoices)
+    filters = {'desde': desde or '', 'hasta': hasta or '', 'ruc': ruc or '', 'q': q or ''}
+    return render_template(
+        "invoices_list.html", request,
+        invoices=invoices, filters=filters, total_filtrado=total_filtrado
+    )
 
 
 @app.get("/invoices/new", response_class=HTMLResponse)
-async def invoice_form(request: Request):
+def invoice_form(request: Request):
     """Muestra el formulario para crear una nueva factura"""
     return render_template("invoice_form.html", request, invoice=None)
 
 
 @app.post("/invoices")
-async def create_invoice(
+def create_invoice(
     request: Request,
     issue_date: str = Form(...),
     issue_datetime: Optional[str] = Form(None),
@@ -439,7 +478,7 @@ async def create_invoice(
 
 
 @app.get("/invoices/{invoice_id}", response_class=HTMLResponse)
-async def invoice_view(request: Request, invoice_id: int):
+def invoice_view(request: Request, invoice_id: int):
     """Muestra el detalle de una factura"""
     conn = get_db()
     cursor = conn.cursor()
@@ -453,6 +492,9 @@ async def invoice_view(request: Request, invoice_id: int):
     row = cursor.fetchone()
     conn.close()
     
+    if not row:
+        row = get_archived_row("invoices", "id = ?", (invoice_id,), "id, created_at, issue_date, buyer_name, data_json")
+    
     if not row:
         raise HTTPException(status_code=404, detail="Factura no encontrada")
     
@@ -462,7 +504,7 @@ async def invoice_view(request: Request, invoice_id: int):
 
 
 @app.post("/invoices/{invoice_id}/validate")
-async def validate_invoice(invoice_id: int):
+def validate_invoice(invoice_id: int):
     """Valida una factura contra el schema de importación"""
     conn = get_db()
     cursor = conn.cursor()
@@ -476,6 +518,9 @@ async def validate_invoice(invoice_id: int):
     row = cursor.fetchone()
     conn.close()
     
+    if not row:
+        row = get_archived_row("invoices", "id = ?", (invoice_id,), "data_json")
+    
     if not row:
         raise HTTPException(status_code=404, detail="Factura no encontrada")
     
@@ -500,7 +545,7 @@ async def validate_invoice(invoice_id: int):
 
 
 @app.get("/invoices/{invoice_id}/export")
-async def export_invoice(invoice_id: int):
+def export_invoice(invoice_id: int):
     """Exporta una factura como JSON Tesaka"""
     conn = get_db()
     cursor = conn.cursor()
@@ -514,6 +559,9 @@ async def export_invoice(invoice_id: int):
     row = cursor.fetchone()
     conn.close()
     
+    if not row:
+        row = get_archived_row("invoices", "id = ?", (invoice_id,), "data_json, buyer_name, issue_date")
+    
     if not row:
         raise HTTPException(status_code=404, detail="Factura no encontrada")
     
@@ -556,23 +604,48 @@ async def export_invoice(invoice_id: int):
 
 # ===== Rutas de Envío a Tesaka =====
 
-def _get_tesaka_config():
-    """Obtiene la configuración de Tesaka desde variables de entorno"""
-    env = os.getenv('TESAKA_ENV', 'homo')
-    user = os.getenv('TESAKA_USER', '')
-    password = os.getenv('TESAKA_PASS', '')
-    timeout = int(os.getenv('REQUEST_TIMEOUT', '30'))
-    
-    return {
-        'env': env,
-        'user': user,
-        'password': password,
-        'timeout': timeout
-    }
+@app.post("/invoices/send/{kind}")
+def send_invoices_bulk_to_tesaka(
+    kind: str,
+    ids: Optional[str] = Query(None, description="IDs separados por coma (default: todas las no enviadas)"),
+    limit: int = Query(1000, ge=1, le=10000),
+    workers: int = Query(4, ge=1, le=16),
+    dry_run: bool = Query(False)
+):
+    """
+    Envía a Tesaka todas las facturas sin envío exitoso de este tipo
+    
+    Convierte y valida en paralelo, sube en lotes (TESAKA_CHUNK_ITEMS /
+    TESAKA_CHUNK_BYTES) por el cliente compartido y registra cada factura en
+    submissions. Las facturas inválidas se informan en errors y no se envían.
+    """
+    if kind not in TesakaClient.KIND_METHODS:
+        raise HTTPException(status_code=400, detail=f"Tipo inválido: {kind}. Debe ser 'factura', 'retencion' o 'autofactura'")
+    
+    invoice_ids = None
+    if ids:
+        try:
+            invoice_ids = [int(x) for x in ids.split(",") if x.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids debe ser una lista de números separados por coma")
+    
+    config = get_tesaka_config()
+    items = select_unsent_invoices(kind, config['env'], invoice_ids=invoice_ids, limit=limit)
+    client = None if dry_run else get_shared_client(config)
+    # Conversión/validación en el pool de procesos compartido (no uno por request)
+    summary = submit_invoices(
+        client, kind, config['env'], items, workers=workers,
+        prepare_workers=CPU_WORKERS, prepare_pool_map=map_cpu, dry_run=dry_run,
+    )
+    
+    return JSONResponse({
+        "ok": summary["failed"] == 0 and summary["invalid"] == 0,
+        **summary
+    })
 
 
 @app.post("/invoices/{invoice_id}/send/{kind}")
-async def send_invoice_to_tesaka(invoice_id: int, kind: str):
+def send_invoice_to_tesaka(invoice_id: int, kind: str):
     """
     Envía una factura a Tesaka (SET)
     
@@ -627,45 +700,35 @@ async def send_invoice_to_tesaka(invoice_id: int, kind: str):
         )
     
     # Obtener configuración de Tesaka
-    config = _get_tesaka_config()
+    config = get_tesaka_config()
     
     # Enviar a Tesaka
     try:
-        with TesakaClient(
-            env=config['env'],
-            user=config['user'],
-            password=config['password'],
-            timeout=config['timeout']
-        ) as client:
-            # Determinar método según el tipo
-            if kind == 'factura':
-                response = client.enviar_facturas(tesaka_data)
-            elif kind == 'retencion':
-                response = client.enviar_retenciones(tesaka_data)
-            else:  # autofactura
-                response = client.enviar_autofacturas(tesaka_data)
-            
-            # Guardar submission exitoso
-            cursor.execute("""
-                INSERT INTO submissions 
-                (invoice_id, kind, env, request_json, response_json, ok)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                invoice_id,
-                kind,
-                config['env'],
-                json.dumps(tesaka_data, ensure_ascii=False),
-                json.dumps(response, ensure_ascii=False),
-                1
-            ))
-            
-            conn.commit()
-            conn.close()
-            
-            return JSONResponse({
-                "ok": True,
-                "response": response
-            })
+        # Cliente compartido: reutiliza las conexiones keep-alive entre envíos
+        client = get_shared_client(config)
+        response = client.enviar(kind, tesaka_data)
+        
+        # Guardar submission exitoso
+        cursor.execute("""
+            INSERT INTO submissions 
+            (invoice_id, kind, env, request_json, response_json, ok)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            invoice_id,
+            kind,
+            config['env'],
+            json.dumps(tesaka_data, ensure_ascii=False),
+            json.dumps(response, ensure_ascii=False),
+            1
+        ))
+        
+        conn.commit()
+        conn.close()
+        
+        return JSONResponse({
+            "ok": True,
+            "response": response
+        })
     
     except TesakaClientError as e:
         # Guardar submission con error
@@ -725,7 +788,7 @@ async def send_invoice_to_tesaka(invoice_id: int, kind: str):
 
 
 @app.get("/invoices/{invoice_id}/submissions")
-async def get_invoice_submissions(invoice_id: int):
+def get_invoice_submissions(invoice_id: int):
     """
     Obtiene el historial de envíos (submissions) de una factura
     """
@@ -734,20 +797,25 @@ async def get_invoice_submissions(invoice_id: int):
     
     # Verificar que la factura existe
     cursor.execute("SELECT id FROM invoices WHERE id = ?", (invoice_id,))
-    if not cursor.fetchone():
+    if cursor.fetchone():
+        # Obtener submissions
+        cursor.execute("""
+            SELECT id, kind, env, created_at, request_json, response_json, ok, error
+            FROM submissions
+            WHERE invoice_id = ?
+            ORDER BY created_at DESC
+        """, (invoice_id,))
+        rows = cursor.fetchall()
         conn.close()
-        raise HTTPException(status_code=404, detail="Factura no encontrada")
-    
-    # Obtener submissions
-    cursor.execute("""
-        SELECT id, kind, env, created_at, request_json, response_json, ok, error
-        FROM submissions
-        WHERE invoice_id = ?
-        ORDER BY created_at DESC
-    """, (invoice_id,))
-    
-    rows = cursor.fetchall()
-    conn.close()
+    else:
+        conn.close()
+        # Factura archivada: sus submissions se archivaron con ella
+        if not get_archived_row("invoices", "id = ?", (invoice_id,), "id"):
+            raise HTTPException(status_code=404, detail="Factura no encontrada")
+        rows = get_archived_rows(
+            "submissions", "invoice_id = ? ORDER BY created_at DESC", (invoice_id,),
+            "id, kind, env, created_at, request_json, response_json, ok, error",
+        )
     
     submissions = []
     for row in rows:
@@ -781,7 +849,7 @@ async def export_contracts_excel(
         'numero_id': numero_id,
         'estado': estado
     }
-    data = generate_contracts_excel(filters)
+    data = await run_cpu(generate_contracts_excel, filters)
     return Response(
         content=data,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -804,7 +872,7 @@ async def export_contracts_pdf(
         'numero_id': numero_id,
         'estado': estado
     }
-    data = generate_contracts_pdf(filters)
+    data = await run_cpu(generate_contracts_pdf, filters)
     return Response(
         content=data,
         media_type="application/pdf",
@@ -814,7 +882,7 @@ async def export_contracts_pdf(
 
 # ===== Rutas de Clientes =====
 @app.get("/clients", response_class=HTMLResponse)
-async def clients_list(request: Request):
+def clients_list(request: Request):
     """Lista todos los clientes"""
     conn = get_db()
     cursor = conn.cursor()
@@ -826,13 +894,13 @@ async def clients_list(request: Request):
 
 
 @app.get("/clients/new", response_class=HTMLResponse)
-async def client_form(request: Request):
+def client_form(request: Request):
     """Formulario para crear cliente"""
     return render_template("clients/form.html", request, client=None)
 
 
 @app.post("/clients")
-async def create_client(
+def create_client(
     request: Request,
     nombre: str = Form(...),
     ruc: Optional[str] = Form(None),
@@ -853,6 +921,18 @@ async def create_client(
     return RedirectResponse(url="/clients", status_code=303)
 
 
+@app.get("/api/clients")
+def api_clients_search(
+    q: str = Query(...),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Autocompletado de clientes: búsqueda FTS por prefijo en nombre y RUC"""
+    conn = get_db()
+    clients = fts_search(conn, "clients", q, fields=("id", "nombre", "ruc"), limit=limit)
+    conn.close()
+    return JSONResponse(content=clients)
+
+
 # ===== Endpoints de Reportes Adicionales =====
 @app.get("/reports/purchase_orders.xlsx")
 async def export_purchase_orders_excel(
@@ -863,7 +943,7 @@ async def export_purchase_orders_excel(
     """Exporta reporte Excel de órdenes de compra"""
     from .reports import generate_purchase_orders_excel
     filters = {'cliente': cliente, 'contract_id': contract_id, 'id': id}
-    data = generate_purchase_orders_excel(filters)
+    data = await run_cpu(generate_purchase_orders_excel, filters)
     return Response(
         content=data,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -880,7 +960,7 @@ async def export_purchase_orders_pdf(
     """Exporta reporte PDF de órdenes de compra"""
     from .reports import generate_purchase_orders_pdf
     filters = {'cliente': cliente, 'contract_id': contract_id, 'id': id}
-    data = generate_purchase_orders_pdf(filters)
+    data = await run_cpu(generate_purchase_orders_pdf, filters)
     return Response(
         content=data,
         media_type="application/pdf",
@@ -896,7 +976,7 @@ async def export_delivery_notes_excel(
     """Exporta reporte Excel de notas de entrega"""
     from .reports import generate_delivery_notes_excel
     filters = {'cliente': cliente, 'contract_id': contract_id}
-    data = generate_delivery_notes_excel(filters)
+    data = await run_cpu(generate_delivery_notes_excel, filters)
     return Response(
         content=data,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -912,7 +992,7 @@ async def export_delivery_notes_pdf(
     """Exporta reporte PDF de notas de entrega"""
     from .reports import generate_delivery_notes_pdf
     filters = {'cliente': cliente, 'contract_id': contract_id}
-    data = generate_delivery_notes_pdf(filters)
+    data = await run_cpu(generate_delivery_notes_pdf, filters)
     return Response(
         content=data,
         media_type="application/pdf",
@@ -928,7 +1008,7 @@ async def export_remissions_excel(
     """Exporta reporte Excel de remisiones"""
     from .reports import generate_remissions_excel
     filters = {'cliente': cliente, 'contract_id': contract_id}
-    data = generate_remissions_excel(filters)
+    data = await run_cpu(generate_remissions_excel, filters)
     return Response(
         content=data,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -944,7 +1024,7 @@ async def export_remissions_pdf(
     """Exporta reporte PDF de remisiones"""
     from .reports import generate_remissions_pdf
     filters = {'cliente': cliente, 'contract_id': contract_id}
-    data = generate_remissions_pdf(filters)
+    data = await run_cpu(generate_remissions_pdf, filters)
     return Response(
         content=data,
         media_type="application/pdf",
@@ -960,7 +1040,7 @@ async def export_sales_invoices_excel(
     """Exporta reporte Excel de facturas de venta"""
     from .reports import generate_sales_invoices_excel
     filters = {'cliente': cliente, 'contract_id': contract_id}
-    data = generate_sales_invoices_excel(filters)
+    data = await run_cpu(generate_sales_invoices_excel, filters)
     return Response(
         content=data,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -976,7 +1056,7 @@ async def export_sales_invoices_pdf(
     """Exporta reporte PDF de facturas de venta"""
     from .reports import generate_sales_invoices_pdf
     filters = {'cliente': cliente, 'contract_id': contract_id}
-    data = generate_sales_invoices_pdf(filters)
+    data = await run_cpu(generate_sales_invoices_pdf, filters)
     return Response(
         content=data,
         media_type="application/pdf",
@@ -14,7 +14,9 @@ class Invoice:
     created_at: datetime
     issue_date: str
     buyer_name: str
-    data_json: str
+    data_json: Optional[str]
+    buyer_ruc: Optional[str] = None
+    total: Optional[float] = None
     
     @property
     def data(self) -> Dict[str, Any]:
@@ -23,17 +25,24 @@ class Invoice:
     
     @classmethod
     def from_row(cls, row) -> 'Invoice':
-        """Crea una instancia desde una fila de SQLite"""
+        """Crea una instancia desde una fila de SQLite (data_json, buyer_ruc y total son opcionales)"""
+        keys = row.keys()
         return cls(
             id=row['id'],
             created_at=datetime.fromisoformat(row['created_at']) if isinstance(row['created_at'], str) else row['created_at'],
             issue_date=row['issue_date'],
             buyer_name=row['buyer_name'],
-            data_json=row['data_json']
+            data_json=row['data_json'] if 'data_json' in keys else None,
+            buyer_ruc=row['buyer_ruc'] if 'buyer_ruc' in keys else None,
+            total=row['total'] if 'total' in keys else None
         )
     
     def calculate_total(self) -> float:
-        """Calcula el total simple desde los items"""
+        """Calcula el total simple desde los items (usa la columna total si vino de la base)"""
+        if self.total is not None:
+            return self.total
+        if self.data_json is None:
+            return 0.0
         total = 0.0
         data = self.data
         if 'items' in data:
@@ -1,38 +1,113 @@
 """
 Módulo para generar PDFs de documentos imprimibles
+
+Los estilos (hoja de estilos, título, TableStyle de cada tipo de tabla) se
+construyen una sola vez al importar el módulo y se comparten entre llamadas.
+Cada documento se arma como lista de flowables, así varios documentos pueden
+ir en un mismo PDF (generate_batch_pdf). render_pdf_async corre la
+generación en un pool de procesos para no bloquear el event loop.
 """
 import io
 from datetime import datetime
+from typing import Any, Callable, Iterable, List, Optional, Tuple
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 
+from .executors import run_cpu, shutdown_cpu_executor
 
-def generate_purchase_order_pdf(purchase_order, cliente, items, monto_total) -> bytes:
-    """Genera PDF de orden de compra"""
+
+# Estilos compartidos (TableStyle solo se lee en Table.setStyle, se puede reusar)
+STYLES = getSampleStyleSheet()
+NORMAL_STYLE = STYLES['Normal']
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=16,
+    textColor=colors.HexColor('#000000'),
+    alignment=TA_CENTER,
+    spaceAfter=12,
+)
+
+# Tabla de datos (cliente / proveedor / transporte / logística)
+INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+# Tabla de items sin fila de total
+ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+# Tabla de items con fila de TOTAL al final
+ITEMS_TOTAL_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+])
+
+SIGNATURE_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+])
+
+
+def _build_pdf(elements: List[Any]) -> bytes:
+    """Arma el PDF A4 con los márgenes estándar"""
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, 
+    doc = SimpleDocTemplate(buffer, pagesize=A4,
                             rightMargin=1.5*cm, leftMargin=1.5*cm,
                             topMargin=1.5*cm, bottomMargin=1.5*cm)
-    
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def _signature_table(left: str, right: str, firmas: Tuple[Optional[str], Optional[str]] = (None, None)) -> Table:
+    """Tabla de firmas de dos columnas"""
+    signature_data = [
+        [left, right],
+        [firmas[0] or '_________________________', firmas[1] or '_________________________'],
+        ['Firma y Aclaración', 'Firma y Aclaración'],
+    ]
+    sig_table = Table(signature_data, colWidths=[9*cm, 9*cm])
+    sig_table.setStyle(SIGNATURE_TABLE_STYLE)
+    return sig_table
+
+
+def _purchase_order_elements(purchase_order, cliente, items, monto_total) -> List[Any]:
+    """Flowables de una orden de compra"""
     elements = []
-    styles = getSampleStyleSheet()
     
     # Título
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#000000'),
-        alignment=TA_CENTER,
-        spaceAfter=12,
-    )
-    elements.append(Paragraph("ORDEN DE COMPRA", title_style))
-    elements.append(Paragraph(f"Número: {purchase_order.numero}", styles['Normal']))
-    elements.append(Paragraph(f"Fecha: {purchase_order.fecha}", styles['Normal']))
+    elements.append(Paragraph("ORDEN DE COMPRA", TITLE_STYLE))
+    elements.append(Paragraph(f"Número: {purchase_order.numero}", NORMAL_STYLE))
+    elements.append(Paragraph(f"Fecha: {purchase_order.fecha}", NORMAL_STYLE))
     elements.append(Spacer(1, 0.5*cm))
     
     # Información
@@ -47,17 +122,7 @@ def generate_purchase_order_pdf(purchase_order, cliente, items, monto_total) ->
         info_data.append([f"Dirección: {cliente['direccion']}", ""])
     
     info_table = Table(info_data, colWidths=[9*cm, 9*cm])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
+    info_table.setStyle(INFO_TABLE_STYLE)
     elements.append(info_table)
     elements.append(Spacer(1, 0.5*cm))
     
@@ -74,60 +139,22 @@ def generate_purchase_order_pdf(purchase_order, cliente, items, monto_total) ->
     table_data.append(['', '', '', 'TOTAL:', f"{monto_total:.2f}"])
     
     table = Table(table_data, colWidths=[7*cm, 2.5*cm, 2.5*cm, 3*cm, 3*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-    ]))
+    table.setStyle(ITEMS_TOTAL_TABLE_STYLE)
     elements.append(table)
     elements.append(Spacer(1, 1*cm))
     
     # Firmas
-    signature_data = [
-        ['PROVEEDOR', 'COMPRADOR'],
-        ['_________________________', '_________________________'],
-        ['Firma y Aclaración', 'Firma y Aclaración'],
-    ]
-    sig_table = Table(signature_data, colWidths=[9*cm, 9*cm])
-    sig_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-    ]))
-    elements.append(sig_table)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer.getvalue()
+    elements.append(_signature_table('PROVEEDOR', 'COMPRADOR'))
+    return elements
 
 
-def generate_delivery_note_pdf(delivery_note, cliente, items) -> bytes:
-    """Genera PDF de nota de entrega"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
-                            rightMargin=1.5*cm, leftMargin=1.5*cm,
-                            topMargin=1.5*cm, bottomMargin=1.5*cm)
-    
+def _delivery_note_elements(delivery_note, cliente, items) -> List[Any]:
+    """Flowables de una nota de entrega"""
     elements = []
-    styles = getSampleStyleSheet()
     
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#000000'),
-        alignment=TA_CENTER,
-        spaceAfter=12,
-    )
-    elements.append(Paragraph("NOTA INTERNA DE ENTREGA", title_style))
-    elements.append(Paragraph(f"Número: {delivery_note.numero_nota}", styles['Normal']))
-    elements.append(Paragraph(f"Fecha: {delivery_note.fecha}", styles['Normal']))
+    elements.append(Paragraph("NOTA INTERNA DE ENTREGA", TITLE_STYLE))
+    elements.append(Paragraph(f"Número: {delivery_note.numero_nota}", NORMAL_STYLE))
+    elements.append(Paragraph(f"Fecha: {delivery_note.fecha}", NORMAL_STYLE))
     elements.append(Spacer(1, 0.5*cm))
     
     # Información
@@ -139,20 +166,11 @@ def generate_delivery_note_pdf(delivery_note, cliente, items) -> bytes:
     ]
     if delivery_note.direccion_entrega:
         info_data.append([f"Dirección: {delivery_note.direccion_entrega}", ""])
-    if delivery_note.numero_contrato:
+    if getattr(delivery_note, 'numero_contrato', None):
         info_data.append([f"Contrato: {delivery_note.numero_contrato}", ""])
     
     info_table = Table(info_data, colWidths=[9*cm, 9*cm])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
+    info_table.setStyle(INFO_TABLE_STYLE)
     elements.append(info_table)
     elements.append(Spacer(1, 0.5*cm))
     
@@ -166,64 +184,24 @@ def generate_delivery_note_pdf(delivery_note, cliente, items) -> bytes:
         ])
     
     table = Table(table_data, colWidths=[12*cm, 3*cm, 3*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
+    table.setStyle(ITEMS_TABLE_STYLE)
     elements.append(table)
     elements.append(Spacer(1, 1*cm))
     
     # Firmas
-    signature_data = [
-        ['ENTREGA', 'RECIBE'],
-        ['_________________________', '_________________________'],
-        ['Firma y Aclaración', 'Firma y Aclaración'],
-    ]
-    if delivery_note.firma_entrega:
-        signature_data[1][0] = delivery_note.firma_entrega
-    if delivery_note.firma_recibe:
-        signature_data[1][1] = delivery_note.firma_recibe
-    
-    sig_table = Table(signature_data, colWidths=[9*cm, 9*cm])
-    sig_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-    ]))
-    elements.append(sig_table)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer.getvalue()
+    elements.append(_signature_table(
+        'ENTREGA', 'RECIBE', (delivery_note.firma_entrega, delivery_note.firma_recibe)
+    ))
+    return elements
 
 
-def generate_remission_pdf(remission, cliente, items) -> bytes:
-    """Genera PDF de remisión"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
-                            rightMargin=1.5*cm, leftMargin=1.5*cm,
-                            topMargin=1.5*cm, bottomMargin=1.5*cm)
-    
+def _remission_elements(remission, cliente, items) -> List[Any]:
+    """Flowables de una remisión"""
     elements = []
-    styles = getSampleStyleSheet()
     
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#000000'),
-        alignment=TA_CENTER,
-        spaceAfter=12,
-    )
-    elements.append(Paragraph("REMISIÓN", title_style))
-    elements.append(Paragraph(f"Número: {remission.numero_remision}", styles['Normal']))
-    elements.append(Paragraph(f"Fecha: {remission.fecha_inicio}", styles['Normal']))
+    elements.append(Paragraph("REMISIÓN", TITLE_STYLE))
+    elements.append(Paragraph(f"Número: {remission.numero_remision}", NORMAL_STYLE))
+    elements.append(Paragraph(f"Fecha: {remission.fecha_inicio}", NORMAL_STYLE))
     elements.append(Spacer(1, 0.5*cm))
     
     # Información
@@ -233,7 +211,7 @@ def generate_remission_pdf(remission, cliente, items) -> bytes:
          f"Transportista: {remission.transportista_nombre or '-'}"],
         [f"RUC: {cliente.get('ruc', '-') if cliente else '-'}",
          f"RUC Transportista: {remission.transportista_ruc or '-'}"],
-        [f"Contrato: {remission.numero_contrato or '-'}",
+        [f"Contrato: {getattr(remission, 'numero_contrato', None) or '-'}",
          f"Vehículo: {remission.vehiculo_marca or '-'}"],
         ['', f"Chapa: {remission.chapa or '-'}"],
         ['', f"Conductor: {remission.conductor_nombre or '-'}"],
@@ -241,16 +219,7 @@ def generate_remission_pdf(remission, cliente, items) -> bytes:
     ]
     
     info_table = Table(info_data, colWidths=[9*cm, 9*cm])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
+    info_table.setStyle(INFO_TABLE_STYLE)
     elements.append(info_table)
     elements.append(Spacer(1, 0.3*cm))
     
@@ -261,16 +230,7 @@ def generate_remission_pdf(remission, cliente, items) -> bytes:
         [f"Llegada: {remission.llegada or '-'}"],
     ]
     logistics_table = Table(logistics_data, colWidths=[18*cm])
-    logistics_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
+    logistics_table.setStyle(INFO_TABLE_STYLE)
     elements.append(logistics_table)
     elements.append(Spacer(1, 0.5*cm))
     
@@ -284,60 +244,23 @@ def generate_remission_pdf(remission, cliente, items) -> bytes:
         ])
     
     table = Table(table_data, colWidths=[12*cm, 3*cm, 3*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
+    table.setStyle(ITEMS_TABLE_STYLE)
     elements.append(table)
     elements.append(Spacer(1, 1*cm))
     
     # Firmas
-    signature_data = [
-        ['EMISOR', 'CONDUCTOR'],
-        ['_________________________', '_________________________'],
-        ['Firma y Aclaración', 'Firma y Aclaración'],
-    ]
-    sig_table = Table(signature_data, colWidths=[9*cm, 9*cm])
-    sig_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-    ]))
-    elements.append(sig_table)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer.getvalue()
+    elements.append(_signature_table('EMISOR', 'CONDUCTOR'))
+    return elements
 
 
-def generate_sales_invoice_pdf(sales_invoice, cliente, items, monto_total) -> bytes:
-    """Genera PDF de factura de venta"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
-                            rightMargin=1.5*cm, leftMargin=1.5*cm,
-                            topMargin=1.5*cm, bottomMargin=1.5*cm)
-    
+def _sales_invoice_elements(sales_invoice, cliente, items, monto_total) -> List[Any]:
+    """Flowables de una factura de venta"""
     elements = []
-    styles = getSampleStyleSheet()
     
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#000000'),
-        alignment=TA_CENTER,
-        spaceAfter=12,
-    )
-    elements.append(Paragraph("FACTURA DE VENTA", title_style))
-    elements.append(Paragraph(f"Número: {sales_invoice.numero}", styles['Normal']))
-    elements.append(Paragraph(f"Fecha: {sales_invoice.fecha}", styles['Normal']))
-    elements.append(Paragraph(f"Condición: {sales_invoice.condicion_venta.upper()}", styles['Normal']))
+    elements.append(Paragraph("FACTURA DE VENTA", TITLE_STYLE))
+    elements.append(Paragraph(f"Número: {sales_invoice.numero}", NORMAL_STYLE))
+    elements.append(Paragraph(f"Fecha: {sales_invoice.fecha}", NORMAL_STYLE))
+    elements.append(Paragraph(f"Condición: {sales_invoice.condicion_venta.upper()}", NORMAL_STYLE))
     elements.append(Spacer(1, 0.5*cm))
     
     # Información
@@ -349,20 +272,11 @@ def generate_sales_invoice_pdf(sales_invoice, cliente, items, monto_total) -> by
     ]
     if sales_invoice.direccion:
         info_data.append([f"Dirección: {sales_invoice.direccion}", ""])
-    if sales_invoice.numero_contrato:
+    if getattr(sales_invoice, 'numero_contrato', None):
         info_data.append([f"Contrato: {sales_invoice.numero_contrato}", ""])
     
     info_table = Table(info_data, colWidths=[9*cm, 9*cm])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
+    info_table.setStyle(INFO_TABLE_STYLE)
     elements.append(info_table)
     elements.append(Spacer(1, 0.5*cm))
     
@@ -379,35 +293,78 @@ def generate_sales_invoice_pdf(sales_invoice, cliente, items, monto_total) -> by
     table_data.append(['', '', '', 'TOTAL:', f"{monto_total:.2f}"])
     
     table = Table(table_data, colWidths=[6*cm, 2.5*cm, 2.5*cm, 3*cm, 4*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-    ]))
+    table.setStyle(ITEMS_TOTAL_TABLE_STYLE)
     elements.append(table)
     elements.append(Spacer(1, 1*cm))
     
     # Firmas
-    signature_data = [
-        ['VENDEDOR', 'CLIENTE'],
-        ['_________________________', '_________________________'],
-        ['Firma y Aclaración', 'Firma y Aclaración'],
-    ]
-    sig_table = Table(signature_data, colWidths=[9*cm, 9*cm])
-    sig_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-    ]))
-    elements.append(sig_table)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer.getvalue()
+    elements.append(_signature_table('VENDEDOR', 'CLIENTE'))
+    return elements
+
+
+# Armadores de flowables por tipo de documento (para generate_batch_pdf)
+DOCUMENT_BUILDERS = {
+    'purchase_order': _purchase_order_elements,
+    'delivery_note': _delivery_note_elements,
+    'remission': _remission_elements,
+    'sales_invoice': _sales_invoice_elements,
+}
+
+
+def generate_purchase_order_pdf(purchase_order, cliente, items, monto_total) -> bytes:
+    """Genera PDF de orden de compra"""
+    return _build_pdf(_purchase_order_elements(purchase_order, cliente, items, monto_total))
+
+
+def generate_delivery_note_pdf(delivery_note, cliente, items) -> bytes:
+    """Genera PDF de nota de entrega"""
+    return _build_pdf(_delivery_note_elements(delivery_note, cliente, items))
+
+
+def generate_remission_pdf(remission, cliente, items) -> bytes:
+    """Genera PDF de remisión"""
+    return _build_pdf(_remission_elements(remission, cliente, items))
+
+
+def generate_sales_invoice_pdf(sales_invoice, cliente, items, monto_total) -> bytes:
+    """Genera PDF de factura de venta"""
+    return _build_pdf(_sales_invoice_elements(sales_invoice, cliente, items, monto_total))
+
+
+def generate_batch_pdf(kind: str, documents: Iterable[Tuple]) -> bytes:
+    """
+    Genera un único PDF con varios documentos del mismo tipo, cada uno desde
+    una página nueva.
+    
+    Args:
+        kind: Tipo de documento (clave de DOCUMENT_BUILDERS: 'delivery_note', ...)
+        documents: Tuplas con los mismos argumentos que el generate_*_pdf del tipo
+            (ej: (delivery_note, cliente, items))
+    """
+    if kind not in DOCUMENT_BUILDERS:
+        raise ValueError(f"Tipo de documento inválido: {kind!r}")
+    builder = DOCUMENT_BUILDERS[kind]
+    
+    elements: List[Any] = []
+    for args in documents:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(builder(*args))
+    if not elements:
+        raise ValueError("No hay documentos para generar")
+    return _build_pdf(elements)
+
+
+async def render_pdf_async(fn: Callable[..., bytes], *args) -> bytes:
+    """
+    Ejecuta un generador de PDF en el pool de procesos (app.executors.run_cpu)
+    sin bloquear el event loop.
+    
+    Ejemplo:
+        pdf = await render_pdf_async(generate_delivery_note_pdf, dn, cliente, items)
+    """
+    return await run_cpu(fn, *args)
+
 
+# El pool es el compartido de app.executors
+shutdown_pdf_executor = shutdown_cpu_executor
@@ -0,0 +1,282 @@
+"""
+Profiling opcional de requests y corridas de CLI
+
+Dos modos:
+- sample (default): un thread toma el stack de todos los threads cada
+  PROFILE_INTERVAL_MS y cuenta stacks iguales. Es tiempo de reloj, así que
+  las esperas (HTTP a SIFEN, locks de SQLite) aparecen igual que el CPU. Sale
+  en formato "folded" (una línea `frame;frame;frame N` por stack), que leen
+  flamegraph.pl, speedscope e inferno. Los threads ociosos (loop esperando en
+  select, workers esperando trabajo) se descartan.
+- cprofile: cProfile del thread que atiende. Sale como .prof (pstats,
+  snakeviz/flameprof). En los apps FastAPI solo ve el thread del event loop,
+  no el threadpool donde corren los handlers `def`: para requests conviene
+  sample.
+
+Requests (install_profiling): se perfila una fracción PROFILE_SAMPLE_RATE
+(0 = desactivado, el default) y, como mucho, uno a la vez por proceso. Con
+PROFILE_MIN_MS solo se guardan los requests más lentos que ese umbral. En
+modo sample el profile cubre todo el proceso mientras dura el request: si hay
+otros requests concurrentes, sus stacks también aparecen.
+
+CLIs (add_profile_argument / profile_at_exit): --profile [sample|cprofile]
+perfila la corrida completa y guarda al salir.
+
+Los archivos van a PROFILE_DIR/<ruta o comando>/ y el directorio se mantiene
+acotado (PROFILE_MAX_FILES, PROFILE_MAX_MB): se borran los más viejos.
+"""
+import atexit
+import cProfile
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sample", "cprofile")
+DEFAULT_PROFILE_DIR = Path("artifacts") / "profiles"
+
+# Hojas de stack que indican un thread esperando trabajo (no un request esperando I/O)
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("_thread.py", "_worker"),
+    ("socketserver.py", "serve_forever"),
+}
+
+
+def _frame_label(code) -> str:
+    path = Path(code.co_filename)
+    return f"{code.co_name} ({path.parent.name}/{path.name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Muestreo estadístico del stack de todos los threads del proceso."""
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self._stacks
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if not self.include_idle and (Path(code.co_filename).name, code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """Stacks en formato folded (flamegraph.pl / speedscope / inferno)."""
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+class Profiler:
+    """Un profile (sample o cprofile) que se inicia, se detiene y se guarda."""
+
+    def __init__(self, mode: str = "sample", interval: float = 0.005):
+        if mode not in MODES:
+            raise ValueError(f"Modo de profiling inválido: {mode!r}. Válidos: {MODES}")
+        self.mode = mode
+        self.interval = interval
+        self._sampler: Optional[StackSampler] = None
+        self._profile: Optional[cProfile.Profile] = None
+
+    def start(self) -> "Profiler":
+        if self.mode == "sample":
+            self._sampler = StackSampler(self.interval).start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def stop(self) -> None:
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._profile is not None:
+            self._profile.disable()
+
+    def save(self, store: "ProfileStore", key: str, duration_ms: float) -> Optional[Path]:
+        suffix = ".folded" if self.mode == "sample" else ".prof"
+        path = store.path_for(key, duration_ms, suffix)
+        if self._sampler is not None:
+            if not self._sampler._stacks:
+                return None
+            path.write_text(self._sampler.folded(), encoding="utf-8")
+        else:
+            self._profile.dump_stats(str(path))
+        store.prune()
+        return path
+
+
+class ProfileStore:
+    """Directorio de profiles acotado por cantidad de archivos y tamaño total."""
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_PROFILE_DIR, max_files: int = 200, max_bytes: int = 50 * 1024 * 1024):
+        self.root = Path(root)
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ProfileStore":
+        return cls(
+            os.getenv("PROFILE_DIR") or DEFAULT_PROFILE_DIR,
+            max_files=int(os.getenv("PROFILE_MAX_FILES", "200")),
+            max_bytes=int(float(os.getenv("PROFILE_MAX_MB", "50")) * 1024 * 1024),
+        )
+
+    def path_for(self, key: str, duration_ms: float, suffix: str) -> Path:
+        directory = self.root / (re.sub(r"[^A-Za-z0-9._-]+", "_", key).strip("_") or "root")
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return directory / f"{stamp}-{duration_ms:.0f}ms-{os.getpid()}{suffix}"
+
+    def files(self) -> List[Path]:
+        return sorted((p for p in self.root.glob("*/*") if p.is_file()), key=lambda p: p.stat().st_mtime)
+
+    def prune(self) -> int:
+        """Borra los profiles más viejos hasta respetar los límites. Devuelve cuántos borró."""
+        with self._lock:
+            files = self.files()
+            sizes = {p: p.stat().st_size for p in files}
+            total = sum(sizes.values())
+            removed = 0
+            while files and (len(files) > self.max_files or total > self.max_bytes):
+                oldest = files.pop(0)
+                total -= sizes[oldest]
+                oldest.unlink(missing_ok=True)
+                removed += 1
+            return removed
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI que perfila una fracción de los requests HTTP."""
+
+    def __init__(self, app, sample_rate: float, mode: str = "sample", interval: float = 0.005,
+                 min_ms: float = 0.0, store: Optional[ProfileStore] = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+        self.min_ms = min_ms
+        self.store = store or ProfileStore.from_env()
+        # Un profile a la vez: acota el overhead y cProfile no admite dos activos
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            profiler = Profiler(self.mode, self.interval).start()
+            start = time.perf_counter()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                profiler.stop()
+                duration_ms = (time.perf_counter() - start) * 1000
+                if duration_ms >= self.min_ms:
+                    route = getattr(scope.get("route"), "path", None) or "unmatched"
+                    key = f"{scope['method']} {route}"
+                    # Import diferido: los CLIs usan este módulo sin starlette
+                    from starlette.concurrency import run_in_threadpool
+
+                    try:
+                        await run_in_threadpool(profiler.save, self.store, key, duration_ms)
+                    except OSError as e:
+                        logger.warning(f"No se pudo guardar el profile de {key}: {e}")
+        finally:
+            self._busy.release()
+
+
+def install_profiling(app) -> Optional[float]:
+    """
+    Agrega el middleware de profiling si PROFILE_SAMPLE_RATE > 0. Se configura
+    con PROFILE_MODE (sample|cprofile), PROFILE_INTERVAL_MS, PROFILE_MIN_MS,
+    PROFILE_DIR, PROFILE_MAX_FILES y PROFILE_MAX_MB. Devuelve la fracción
+    de requests que se perfila (None si está desactivado).
+    """
+    sample_rate = min(float(os.getenv("PROFILE_SAMPLE_RATE", "0")), 1.0)
+    if sample_rate <= 0:
+        return None
+
+    mode = os.getenv("PROFILE_MODE", "sample")
+    if mode not in MODES:
+        raise ValueError(f"PROFILE_MODE inválido: {mode!r}. Válidos: {MODES}")
+    app.add_middleware(
+        ProfilingMiddleware,
+        sample_rate=sample_rate,
+        mode=mode,
+        interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+        min_ms=float(os.getenv("PROFILE_MIN_MS", "0")),
+    )
+    logger.info(f"Profiling activo: {sample_rate:.1%} de los requests, modo {mode}")
+    return sample_rate
+
+
+def add_profile_argument(parser) -> None:
+    """Agrega --profile [sample|cprofile] a un CLI."""
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="sample",
+        choices=MODES,
+        default=None,
+        help="Perfilar la corrida y guardar el profile al salir en PROFILE_DIR "
+             "(default: artifacts/profiles). sample: stacks folded para flamegraph; cprofile: .prof",
+    )
+
+
+def profile_at_exit(command: str, mode: str = "sample") -> Profiler:
+    """Inicia un profile de la corrida y registra su guardado al terminar el proceso."""
+    store = ProfileStore.from_env()
+    profiler = Profiler(mode, float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000).start()
+    start = time.perf_counter()
+
+    def _save():
+        profiler.stop()
+        try:
+            path = profiler.save(store, command, (time.perf_counter() - start) * 1000)
+            if path:
+                logger.info(f"Profile guardado en {path}")
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el profile de {command}: {e}")
+
+    atexit.register(_save)
+    return profiler
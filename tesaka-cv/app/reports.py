@@ -13,6 +13,7 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 
 from .db import get_db
+from .search import search_filter
 
 
 def generate_contracts_excel(filters: Optional[Dict] = None) -> bytes:
@@ -49,14 +50,17 @@ def generate_contracts_excel(filters: Optional[Dict] = None) -> bytes:
     
     if filters:
         if filters.get('cliente'):
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{filters['cliente']}%")
+            fts_sql, fts_params = search_filter("clients", filters['cliente'], "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('numero_contrato'):
-            query += " AND c.numero_contrato LIKE ?"
-            params.append(f"%{filters['numero_contrato']}%")
+            fts_sql, fts_params = search_filter("contracts", filters['numero_contrato'], "c.id", ("numero_contrato",))
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('numero_id'):
-            query += " AND c.numero_id LIKE ?"
-            params.append(f"%{filters['numero_id']}%")
+            fts_sql, fts_params = search_filter("contracts", filters['numero_id'], "c.id", ("numero_id",))
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('estado'):
             query += " AND c.estado = ?"
             params.append(filters['estado'])
@@ -134,14 +138,17 @@ def generate_contracts_pdf(filters: Optional[Dict] = None) -> bytes:
     
     if filters:
         if filters.get('cliente'):
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{filters['cliente']}%")
+            fts_sql, fts_params = search_filter("clients", filters['cliente'], "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('numero_contrato'):
-            query += " AND c.numero_contrato LIKE ?"
-            params.append(f"%{filters['numero_contrato']}%")
+            fts_sql, fts_params = search_filter("contracts", filters['numero_contrato'], "c.id", ("numero_contrato",))
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('numero_id'):
-            query += " AND c.numero_id LIKE ?"
-            params.append(f"%{filters['numero_id']}%")
+            fts_sql, fts_params = search_filter("contracts", filters['numero_id'], "c.id", ("numero_id",))
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('estado'):
             query += " AND c.estado = ?"
             params.append(filters['estado'])
@@ -216,8 +223,9 @@ def generate_purchase_orders_excel(filters: Optional[Dict] = None) -> bytes:
     
     if filters:
         if filters.get('cliente'):
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{filters['cliente']}%")
+            fts_sql, fts_params = search_filter("clients", filters['cliente'], "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('contract_id'):
             query += " AND po.contract_id = ?"
             params.append(filters['contract_id'])
@@ -294,8 +302,9 @@ def generate_purchase_orders_pdf(filters: Optional[Dict] = None) -> bytes:
     
     if filters:
         if filters.get('cliente'):
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{filters['cliente']}%")
+            fts_sql, fts_params = search_filter("clients", filters['cliente'], "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('contract_id'):
             query += " AND po.contract_id = ?"
             params.append(filters['contract_id'])
@@ -371,8 +380,9 @@ def generate_delivery_notes_excel(filters: Optional[Dict] = None) -> bytes:
     
     if filters:
         if filters.get('cliente'):
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{filters['cliente']}%")
+            fts_sql, fts_params = search_filter("clients", filters['cliente'], "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('contract_id'):
             query += " AND dn.contract_id = ?"
             params.append(filters['contract_id'])
@@ -445,8 +455,9 @@ def generate_delivery_notes_pdf(filters: Optional[Dict] = None) -> bytes:
     
     if filters:
         if filters.get('cliente'):
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{filters['cliente']}%")
+            fts_sql, fts_params = search_filter("clients", filters['cliente'], "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('contract_id'):
             query += " AND dn.contract_id = ?"
             params.append(filters['contract_id'])
@@ -519,8 +530,9 @@ def generate_remissions_excel(filters: Optional[Dict] = None) -> bytes:
     
     if filters:
         if filters.get('cliente'):
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{filters['cliente']}%")
+            fts_sql, fts_params = search_filter("clients", filters['cliente'], "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('contract_id'):
             query += " AND r.contract_id = ?"
             params.append(filters['contract_id'])
@@ -593,8 +605,9 @@ def generate_remissions_pdf(filters: Optional[Dict] = None) -> bytes:
     
     if filters:
         if filters.get('cliente'):
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{filters['cliente']}%")
+            fts_sql, fts_params = search_filter("clients", filters['cliente'], "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('contract_id'):
             query += " AND r.contract_id = ?"
             params.append(filters['contract_id'])
@@ -666,8 +679,9 @@ def generate_sales_invoices_excel(filters: Optional[Dict] = None) -> bytes:
     
     if filters:
         if filters.get('cliente'):
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{filters['cliente']}%")
+            fts_sql, fts_params = search_filter("clients", filters['cliente'], "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('contract_id'):
             query += " AND si.contract_id = ?"
             params.append(filters['contract_id'])
@@ -751,8 +765,9 @@ def generate_sales_invoices_pdf(filters: Optional[Dict] = None) -> bytes:
     
     if filters:
         if filters.get('cliente'):
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{filters['cliente']}%")
+            fts_sql, fts_params = search_filter("clients", filters['cliente'], "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if filters.get('contract_id'):
             query += " AND si.contract_id = ?"
             params.append(filters['contract_id'])
@@ -5,10 +5,11 @@ import json
 from datetime import datetime
 from typing import List, Optional
 from fastapi import Request, Form, HTTPException, Query
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
 from jinja2 import Environment, FileSystemLoader
 
 from .db import get_db
+from .search import search as fts_search, search_filter
 from .models_system import Contract, ContractItem, Client
 from .utils import get_contract_balance
 
@@ -21,7 +22,7 @@ def register_contract_routes(app, jinja_env: Environment):
         return HTMLResponse(template.render(request=request, **kwargs))
     
     @app.get("/contracts", response_class=HTMLResponse)
-    async def contracts_list(
+    def contracts_list(
         request: Request,
         cliente: Optional[str] = Query(None),
         numero_contrato: Optional[str] = Query(None),
@@ -42,14 +43,17 @@ def register_contract_routes(app, jinja_env: Environment):
         params = []
         
         if cliente:
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{cliente}%")
+            fts_sql, fts_params = search_filter("clients", cliente, "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if numero_contrato:
-            query += " AND c.numero_contrato LIKE ?"
-            params.append(f"%{numero_contrato}%")
+            fts_sql, fts_params = search_filter("contracts", numero_contrato, "c.id", ("numero_contrato",))
+            query += fts_sql
+            params.extend(fts_params)
         if numero_id:
-            query += " AND c.numero_id LIKE ?"
-            params.append(f"%{numero_id}%")
+            fts_sql, fts_params = search_filter("contracts", numero_id, "c.id", ("numero_id",))
+            query += fts_sql
+            params.extend(fts_params)
         if estado:
             query += " AND c.estado = ?"
             params.append(estado)
@@ -88,7 +92,7 @@ def register_contract_routes(app, jinja_env: Environment):
                                                'numero_id': numero_id, 'estado': estado})
     
     @app.get("/contracts/new", response_class=HTMLResponse)
-    async def contract_form(request: Request):
+    def contract_form(request: Request):
         """Muestra el formulario para crear un nuevo contrato"""
         conn = get_db()
         cursor = conn.cursor()
@@ -101,7 +105,7 @@ def register_contract_routes(app, jinja_env: Environment):
         return render_template_internal("contracts/form.html", request, contract=None, clients=clients, products=products)
     
     @app.get("/contracts/{contract_id}", response_class=HTMLResponse)
-    async def contract_view(request: Request, contract_id: int):
+    def contract_view(request: Request, contract_id: int):
         """Muestra el detalle de un contrato"""
         conn = get_db()
         cursor = conn.cursor()
@@ -132,7 +136,7 @@ def register_contract_routes(app, jinja_env: Environment):
         items = [ContractItem.from_row(row) for row in cursor.fetchall()]
         
         # Calcular saldos
-        balances = get_contract_balance(contract_id)
+        balances = get_contract_balance(contract_id, conn)
         for item in items:
             item.saldo_disponible = balances.get(item.id, item.cantidad_total)
         
@@ -145,7 +149,7 @@ def register_contract_routes(app, jinja_env: Environment):
                                        contract=contract, items=items, monto_total=monto_total)
     
     @app.post("/contracts")
-    async def create_contract(
+    def create_contract(
         request: Request,
         fecha: str = Form(...),
         numero_contrato: str = Form(...),
@@ -189,7 +193,7 @@ def register_contract_routes(app, jinja_env: Environment):
         return RedirectResponse(url=f"/contracts/{contract_id}", status_code=303)
     
     @app.get("/contracts/{contract_id}/edit", response_class=HTMLResponse)
-    async def contract_edit_form(request: Request, contract_id: int):
+    def contract_edit_form(request: Request, contract_id: int):
         """Muestra el formulario para editar un contrato"""
         conn = get_db()
         cursor = conn.cursor()
@@ -216,7 +220,7 @@ def register_contract_routes(app, jinja_env: Environment):
                                        contract=contract, items=items, clients=clients, products=products)
     
     @app.post("/contracts/{contract_id}")
-    async def update_contract(
+    def update_contract(
         request: Request,
         contract_id: int,
         fecha: str = Form(...),
@@ -269,3 +273,18 @@ def register_contract_routes(app, jinja_env: Environment):
         
         return RedirectResponse(url=f"/contracts/{contract_id}", status_code=303)
 
+    
+    @app.get("/api/contracts")
+    def api_contracts_search(
+        q: str = Query(...),
+        limit: int = Query(20, ge=1, le=100)
+    ):
+        """Autocompletado de contratos: búsqueda FTS por prefijo en número de contrato / ID"""
+        conn = get_db()
+        contracts = fts_search(
+            conn, "contracts", q,
+            fields=("id", "fecha", "numero_contrato", "numero_id", "estado", "client_id"),
+            limit=limit
+        )
+        conn.close()
+        return JSONResponse(content=contracts)
@@ -7,11 +7,71 @@ from fastapi import Request, Query, HTTPException, Form
 from fastapi.responses import HTMLResponse, Response, RedirectResponse
 
 from .db import get_db
+from .search import search_filter
+from .executors import run_io
 from .models_system import DeliveryNote
 from .utils import get_next_delivery_note_number, validate_delivery_note_quantities
 from jinja2 import Environment
 
 
+def _load_delivery_note(cursor, dn_id: int):
+    """
+    Carga una nota de entrega con cliente, contrato e items para imprimir.
+    
+    Returns:
+        (delivery_note, cliente, items) o None si no existe
+    """
+    cursor.execute("""
+        SELECT dn.*, cl.*, c.numero_contrato
+        FROM delivery_notes dn
+        LEFT JOIN clients cl ON dn.client_id = cl.id
+        LEFT JOIN contracts c ON dn.contract_id = c.id
+        WHERE dn.id = ?
+    """, (dn_id,))
+    
+    row = cursor.fetchone()
+    if not row:
+        return None
+    
+    data = dict(row)
+    dn = DeliveryNote.from_row(row)
+    dn.numero_contrato = data.get('numero_contrato')
+    
+    cliente = data if data.get('nombre') else None
+    
+    cursor.execute("""
+        SELECT * FROM delivery_note_items
+        WHERE delivery_note_id = ?
+        ORDER BY id
+    """, (dn_id,))
+    
+    items = [dict(row) for row in cursor.fetchall()]
+    return dn, cliente, items
+
+
+def _load_delivery_notes(dn_ids: List[int]):
+    """
+    Carga varias notas de entrega (blocking, se llama con run_io).
+    
+    Returns:
+        (documentos en el orden de dn_ids, ids no encontrados)
+    """
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        documents = []
+        missing = []
+        for dn_id in dn_ids:
+            loaded = _load_delivery_note(cursor, dn_id)
+            if loaded:
+                documents.append(loaded)
+            else:
+                missing.append(dn_id)
+        return documents, missing
+    finally:
+        conn.close()
+
+
 def register_delivery_note_routes(app, jinja_env: Environment):
     """Registra las rutas de notas de entrega en la app"""
     
@@ -20,7 +80,7 @@ def register_delivery_note_routes(app, jinja_env: Environment):
         return HTMLResponse(template.render(request=request, **kwargs))
     
     @app.get("/delivery-notes", response_class=HTMLResponse)
-    async def delivery_notes_list(
+    def delivery_notes_list(
         request: Request,
         cliente: Optional[str] = Query(None),
         contract_id: Optional[int] = Query(None)
@@ -41,8 +101,9 @@ def register_delivery_note_routes(app, jinja_env: Environment):
         params = []
         
         if cliente:
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{cliente}%")
+            fts_sql, fts_params = search_filter("clients", cliente, "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if contract_id:
             query += " AND dn.contract_id = ?"
             params.append(contract_id)
@@ -67,7 +128,7 @@ def register_delivery_note_routes(app, jinja_env: Environment):
                                        filters={'cliente': cliente, 'contract_id': contract_id})
     
     @app.get("/delivery-notes/new", response_class=HTMLResponse)
-    async def delivery_note_form(request: Request):
+    def delivery_note_form(request: Request):
         """Muestra el formulario para crear una nueva nota de entrega"""
         conn = get_db()
         cursor = conn.cursor()
@@ -87,7 +148,7 @@ def register_delivery_note_routes(app, jinja_env: Environment):
                                        delivery_note=None, clients=clients, contracts=contracts, products=products)
     
     @app.post("/delivery-notes")
-    async def create_delivery_note(
+    def create_delivery_note(
         request: Request,
         fecha: str = Form(...),
         contract_id: Optional[int] = Form(None),
@@ -141,8 +202,32 @@ def register_delivery_note_routes(app, jinja_env: Environment):
         
         return RedirectResponse(url=f"/delivery-notes/{dn_id}", status_code=303)
     
-    @app.get("/delivery-notes/{dn_id}", response_class=HTMLResponse)
-    async def delivery_note_view(request: Request, dn_id: int):
+    @app.get("/delivery-notes/batch.pdf")
+    async def delivery_notes_batch_pdf(ids: str = Query(..., description="IDs separados por coma")):
+        """Exporta varias notas de entrega en un único PDF (una por página, en el orden de ids)"""
+        from .pdf_generator import generate_batch_pdf, render_pdf_async
+        
+        try:
+            dn_ids = [int(x) for x in ids.split(",") if x.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids debe ser una lista de números separados por coma")
+        if not dn_ids:
+            raise HTTPException(status_code=400, detail="Debe indicar al menos una nota de entrega")
+        
+        documents, missing = await run_io(_load_delivery_notes, dn_ids)
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Notas de entrega no encontradas: {missing}")
+        
+        pdf_data = await render_pdf_async(generate_batch_pdf, "delivery_note", documents)
+        
+        return Response(
+            content=pdf_data,
+            media_type="application/pdf",
+            headers={"Content-Disposition": f"attachment; filename=notas_entrega_{len(documents)}.pdf"}
+        )
+    
+    @app.get("/delivery-notes/{dn_id:int}", response_class=HTMLResponse)
+    def delivery_note_view(request: Request, dn_id: int):
         """Muestra el detalle de una nota de entrega"""
         conn = get_db()
         cursor = conn.cursor()
@@ -179,37 +264,16 @@ def register_delivery_note_routes(app, jinja_env: Environment):
                                        delivery_note=dn, items=items)
     
     @app.get("/delivery-notes/{dn_id}/print", response_class=HTMLResponse)
-    async def delivery_note_print(request: Request, dn_id: int):
+    def delivery_note_print(request: Request, dn_id: int):
         """Vista imprimible de nota de entrega"""
         conn = get_db()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT dn.*, cl.*, c.numero_contrato
-            FROM delivery_notes dn
-            LEFT JOIN clients cl ON dn.client_id = cl.id
-            LEFT JOIN contracts c ON dn.contract_id = c.id
-            WHERE dn.id = ?
-        """, (dn_id,))
-        
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Nota de entrega no encontrada")
-        
-        dn = DeliveryNote.from_row(row)
-        dn.numero_contrato = row.get('numero_contrato')
-        
-        cliente = dict(row) if row.get('nombre') else None
-        
-        cursor.execute("""
-            SELECT * FROM delivery_note_items
-            WHERE delivery_note_id = ?
-            ORDER BY id
-        """, (dn_id,))
-        
-        items = [dict(row) for row in cursor.fetchall()]
-        
+        loaded = _load_delivery_note(cursor, dn_id)
         conn.close()
+        if not loaded:
+            raise HTTPException(status_code=404, detail="Nota de entrega no encontrada")
+        dn, cliente, items = loaded
         
         template = jinja_env.get_template("print_delivery_note.html")
         return HTMLResponse(template.render(
@@ -222,43 +286,17 @@ def register_delivery_note_routes(app, jinja_env: Environment):
     @app.get("/delivery-notes/{dn_id}.pdf")
     async def delivery_note_pdf(dn_id: int):
         """Exporta nota de entrega como PDF"""
-        from .pdf_generator import generate_delivery_note_pdf
+        from .pdf_generator import generate_delivery_note_pdf, render_pdf_async
         
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT dn.*, cl.*, c.numero_contrato
-            FROM delivery_notes dn
-            LEFT JOIN clients cl ON dn.client_id = cl.id
-            LEFT JOIN contracts c ON dn.contract_id = c.id
-            WHERE dn.id = ?
-        """, (dn_id,))
-        
-        row = cursor.fetchone()
-        if not row:
+        documents, _ = await run_io(_load_delivery_notes, [dn_id])
+        if not documents:
             raise HTTPException(status_code=404, detail="Nota de entrega no encontrada")
+        dn, cliente, items = documents[0]
         
-        dn = DeliveryNote.from_row(row)
-        dn.numero_contrato = row.get('numero_contrato')
-        
-        cliente = dict(row) if row.get('nombre') else None
-        
-        cursor.execute("""
-            SELECT * FROM delivery_note_items
-            WHERE delivery_note_id = ?
-            ORDER BY id
-        """, (dn_id,))
-        
-        items = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
-        
-        pdf_data = generate_delivery_note_pdf(dn, cliente, items)
+        pdf_data = await render_pdf_async(generate_delivery_note_pdf, dn, cliente, items)
         
         return Response(
             content=pdf_data,
             media_type="application/pdf",
             headers={"Content-Disposition": f"attachment; filename=nota_entrega_{dn.numero_nota}.pdf"}
         )
-
@@ -6,6 +6,7 @@ from fastapi import Request, Query, HTTPException, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 
 from .db import get_db
+from .search import search as fts_search, search_filter
 from .models_products import Product
 from jinja2 import Environment
 
@@ -18,7 +19,7 @@ def register_product_routes(app, jinja_env: Environment):
         return HTMLResponse(template.render(request=request, **kwargs))
     
     @app.get("/products", response_class=HTMLResponse)
-    async def products_list(
+    def products_list(
         request: Request,
         search: Optional[str] = Query(None),
         activo: Optional[str] = Query(None)
@@ -34,9 +35,9 @@ def register_product_routes(app, jinja_env: Environment):
         params = []
         
         if search:
-            query += " AND (nombre LIKE ? OR codigo LIKE ? OR descripcion LIKE ?)"
-            search_term = f"%{search}%"
-            params.extend([search_term, search_term, search_term])
+            fts_sql, fts_params = search_filter("products", search, "products.id")
+            query += fts_sql
+            params.extend(fts_params)
         
         if activo is not None:
             query += " AND activo = ?"
@@ -58,12 +59,12 @@ def register_product_routes(app, jinja_env: Environment):
                                        filters={'search': search, 'activo': activo})
     
     @app.get("/products/new", response_class=HTMLResponse)
-    async def product_form(request: Request):
+    def product_form(request: Request):
         """Muestra el formulario para crear un nuevo producto"""
         return render_template_internal("products/form.html", request, product=None)
     
     @app.get("/products/{product_id}", response_class=HTMLResponse)
-    async def product_view(request: Request, product_id: int):
+    def product_view(request: Request, product_id: int):
         """Muestra el detalle de un producto"""
         conn = get_db()
         cursor = conn.cursor()
@@ -80,7 +81,7 @@ def register_product_routes(app, jinja_env: Environment):
         return render_template_internal("products/view.html", request, product=product)
     
     @app.post("/products")
-    async def create_product(
+    def create_product(
         request: Request,
         codigo: Optional[str] = Form(None),
         nombre: str = Form(...),
@@ -112,7 +113,7 @@ def register_product_routes(app, jinja_env: Environment):
         return RedirectResponse(url=f"/products/{product_id}", status_code=303)
     
     @app.get("/products/{product_id}/edit", response_class=HTMLResponse)
-    async def product_edit_form(request: Request, product_id: int):
+    def product_edit_form(request: Request, product_id: int):
         """Muestra el formulario para editar un producto"""
         conn = get_db()
         cursor = conn.cursor()
@@ -129,7 +130,7 @@ def register_product_routes(app, jinja_env: Environment):
         return render_template_internal("products/form.html", request, product=product)
     
     @app.post("/products/{product_id}")
-    async def update_product(
+    def update_product(
         request: Request,
         product_id: int,
         codigo: Optional[str] = Form(None),
@@ -170,12 +171,26 @@ def register_product_routes(app, jinja_env: Environment):
         return RedirectResponse(url=f"/products/{product_id}", status_code=303)
     
     @app.get("/api/products", response_class=HTMLResponse)
-    async def api_products_json(request: Request):
-        """API endpoint para obtener productos como JSON (para selects dinámicos)"""
+    def api_products_json(
+        request: Request,
+        q: Optional[str] = Query(None),
+        limit: int = Query(20, ge=1, le=100)
+    ):
+        """
+        API endpoint para obtener productos como JSON (para selects dinámicos)
+        
+        Sin q devuelve todos los activos; con q es el autocompletado: búsqueda
+        FTS por prefijo sobre código/nombre/descripción, ordenada por relevancia.
+        """
         from fastapi.responses import JSONResponse
-        import json
         
+        fields = ("id", "codigo", "nombre", "unidad_medida", "precio_base")
         conn = get_db()
+        if q is not None:
+            products = fts_search(conn, "products", q, fields=fields, where="t.activo = 1", limit=limit)
+            conn.close()
+            return JSONResponse(content=products)
+        
         cursor = conn.cursor()
         cursor.execute("SELECT id, codigo, nombre, unidad_medida, precio_base FROM products WHERE activo = 1 ORDER BY nombre")
         rows = cursor.fetchall()
@@ -183,4 +198,3 @@ def register_product_routes(app, jinja_env: Environment):
         
         products = [dict(row) for row in rows]
         return JSONResponse(content=products)
-
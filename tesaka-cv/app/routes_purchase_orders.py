@@ -7,6 +7,8 @@ from fastapi import Request, Query, HTTPException, Form
 from fastapi.responses import HTMLResponse, Response, RedirectResponse
 
 from .db import get_db
+from .search import search_filter
+from .executors import run_io
 from .models_system import PurchaseOrder
 from .utils import validate_po_item_quantities
 from jinja2 import Environment
@@ -20,7 +22,7 @@ def register_purchase_order_routes(app, jinja_env: Environment):
         return HTMLResponse(template.render(request=request, **kwargs))
     
     @app.get("/purchase-orders", response_class=HTMLResponse)
-    async def purchase_orders_list(
+    def purchase_orders_list(
         request: Request,
         cliente: Optional[str] = Query(None),
         contract_id: Optional[int] = Query(None),
@@ -41,8 +43,9 @@ def register_purchase_order_routes(app, jinja_env: Environment):
         params = []
         
         if cliente:
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{cliente}%")
+            fts_sql, fts_params = search_filter("clients", cliente, "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if contract_id:
             query += " AND po.contract_id = ?"
             params.append(contract_id)
@@ -83,7 +86,7 @@ def register_purchase_order_routes(app, jinja_env: Environment):
                                        filters={'cliente': cliente, 'contract_id': contract_id, 'id': id})
     
     @app.get("/purchase-orders/new", response_class=HTMLResponse)
-    async def purchase_order_form(request: Request):
+    def purchase_order_form(request: Request):
         """Muestra el formulario para crear una nueva orden de compra"""
         conn = get_db()
         cursor = conn.cursor()
@@ -103,7 +106,7 @@ def register_purchase_order_routes(app, jinja_env: Environment):
                                        purchase_order=None, clients=clients, contracts=contracts, products=products)
     
     @app.post("/purchase-orders")
-    async def create_purchase_order(
+    def create_purchase_order(
         request: Request,
         fecha: str = Form(...),
         numero: str = Form(...),
@@ -118,6 +121,21 @@ def register_purchase_order_routes(app, jinja_env: Environment):
         """Crea una nueva orden de compra"""
         conn = get_db()
         cursor = conn.cursor()
+        linked = bool(contract_id) and sync_mode == 'linked'
+        
+        # Validación e inserción en una sola transacción de escritura: los
+        # saldos leídos no pueden cambiar hasta el commit
+        cursor.execute("BEGIN IMMEDIATE")
+        
+        # Items del contrato por producto (el primero si hay repetidos), en una consulta
+        contract_item_ids = {}
+        if linked:
+            cursor.execute("""
+                SELECT id, producto FROM contract_items
+                WHERE contract_id = ?
+                ORDER BY id DESC
+            """, (contract_id,))
+            contract_item_ids = {row['producto']: row['id'] for row in cursor.fetchall()}
         
         # Construir items
         items = []
@@ -126,13 +144,15 @@ def register_purchase_order_routes(app, jinja_env: Environment):
                 'producto': producto[i],
                 'unidad_medida': unidad_medida[i],
                 'cantidad': cantidad[i],
-                'precio_unitario': precio_unitario[i]
+                'precio_unitario': precio_unitario[i],
+                'contract_item_id': contract_item_ids.get(producto[i])
             })
         
         # Validar cantidades si está vinculado a contrato
-        if contract_id and sync_mode == 'linked':
-            is_valid, errors = validate_po_item_quantities(items, contract_id)
+        if linked:
+            is_valid, errors = validate_po_item_quantities(items, contract_id, conn)
             if not is_valid:
+                conn.rollback()
                 conn.close()
                 # Devolver errores (simplificado por ahora)
                 raise HTTPException(status_code=400, detail="; ".join(errors))
@@ -145,34 +165,24 @@ def register_purchase_order_routes(app, jinja_env: Environment):
         
         po_id = cursor.lastrowid
         
-        # Insertar items
-        for i, item in enumerate(items):
-            contract_item_id = None
-            # Si está vinculado, buscar contract_item_id
-            if contract_id and sync_mode == 'linked':
-                cursor.execute("""
-                    SELECT id FROM contract_items
-                    WHERE contract_id = ? AND producto = ?
-                    LIMIT 1
-                """, (contract_id, item['producto']))
-                ci_row = cursor.fetchone()
-                if ci_row:
-                    contract_item_id = ci_row['id']
-            
-            cursor.execute("""
-                INSERT INTO purchase_order_items 
-                (purchase_order_id, contract_item_id, producto, unidad_medida, cantidad, precio_unitario)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (po_id, contract_item_id, item['producto'], item['unidad_medida'], 
-                  item['cantidad'], item['precio_unitario']))
+        # Insertar items (los saldos se actualizan por trigger en esta misma transacción)
+        cursor.executemany("""
+            INSERT INTO purchase_order_items 
+            (purchase_order_id, contract_item_id, producto, unidad_medida, cantidad, precio_unitario)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [
+            (po_id, item['contract_item_id'], item['producto'], item['unidad_medida'],
+             item['cantidad'], item['precio_unitario'])
+            for item in items
+        ])
         
         conn.commit()
         conn.close()
         
         return RedirectResponse(url=f"/purchase-orders/{po_id}", status_code=303)
     
-    @app.get("/purchase-orders/{po_id}", response_class=HTMLResponse)
-    async def purchase_order_view(request: Request, po_id: int):
+    @app.get("/purchase-orders/{po_id:int}", response_class=HTMLResponse)
+    def purchase_order_view(request: Request, po_id: int):
         """Muestra el detalle de una orden de compra"""
         conn = get_db()
         cursor = conn.cursor()
@@ -218,7 +228,7 @@ def register_purchase_order_routes(app, jinja_env: Environment):
                                        purchase_order=po, items=items, monto_total=monto_total)
     
     @app.get("/purchase-orders/{po_id}/print", response_class=HTMLResponse)
-    async def purchase_order_print(request: Request, po_id: int):
+    def purchase_order_print(request: Request, po_id: int):
         """Vista imprimible de orden de compra"""
         conn = get_db()
         cursor = conn.cursor()
@@ -268,45 +278,49 @@ def register_purchase_order_routes(app, jinja_env: Environment):
     @app.get("/purchase-orders/{po_id}.pdf")
     async def purchase_order_pdf(po_id: int):
         """Exporta orden de compra como PDF"""
-        from .pdf_generator import generate_purchase_order_pdf
+        from .pdf_generator import generate_purchase_order_pdf, render_pdf_async
         
-        conn = get_db()
-        cursor = conn.cursor()
+        def _load():
+            conn = get_db()
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT po.*, cl.*, c.numero_contrato
-            FROM purchase_orders po
-            LEFT JOIN clients cl ON po.client_id = cl.id
-            LEFT JOIN contracts c ON po.contract_id = c.id
-            WHERE po.id = ?
-        """, (po_id,))
+            cursor.execute("""
+                SELECT po.*, cl.*, c.numero_contrato
+                FROM purchase_orders po
+                LEFT JOIN clients cl ON po.client_id = cl.id
+                LEFT JOIN contracts c ON po.contract_id = c.id
+                WHERE po.id = ?
+            """, (po_id,))
         
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Orden de compra no encontrada")
+            row = cursor.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Orden de compra no encontrada")
         
-        po = PurchaseOrder.from_row(row)
-        row_dict = dict(row) if hasattr(row, 'keys') else row
-        po.numero_contrato = row_dict.get('numero_contrato')
+            po = PurchaseOrder.from_row(row)
+            row_dict = dict(row) if hasattr(row, 'keys') else row
+            po.numero_contrato = row_dict.get('numero_contrato')
         
-        cliente = dict(row) if row_dict.get('nombre') else None
+            cliente = dict(row) if row_dict.get('nombre') else None
         
-        cursor.execute("""
-            SELECT * FROM purchase_order_items
-            WHERE purchase_order_id = ?
-            ORDER BY id
-        """, (po_id,))
+            cursor.execute("""
+                SELECT * FROM purchase_order_items
+                WHERE purchase_order_id = ?
+                ORDER BY id
+            """, (po_id,))
         
-        items = []
-        for item_row in cursor.fetchall():
-            item_dict = dict(item_row) if hasattr(item_row, 'keys') else item_row
-            items.append(item_dict)
+            items = []
+            for item_row in cursor.fetchall():
+                item_dict = dict(item_row) if hasattr(item_row, 'keys') else item_row
+                items.append(item_dict)
         
-        monto_total = sum(float(item['cantidad']) * float(item['precio_unitario']) for item in items)
+            monto_total = sum(float(item['cantidad']) * float(item['precio_unitario']) for item in items)
         
-        conn.close()
+            conn.close()
+            return po, cliente, items, monto_total
+
+        po, cliente, items, monto_total = await run_io(_load)
         
-        pdf_data = generate_purchase_order_pdf(po, cliente, items, monto_total)
+        pdf_data = await render_pdf_async(generate_purchase_order_pdf, po, cliente, items, monto_total)
         
         return Response(
             content=pdf_data,
@@ -7,6 +7,8 @@ from fastapi import Request, Query, HTTPException, Form
 from fastapi.responses import HTMLResponse, Response, RedirectResponse
 
 from .db import get_db
+from .search import search_filter
+from .executors import run_io
 from .models_system import Remission
 from .utils import get_next_remission_number, get_config_value
 from jinja2 import Environment
@@ -20,7 +22,7 @@ def register_remission_routes(app, jinja_env: Environment):
         return HTMLResponse(template.render(request=request, **kwargs))
     
     @app.get("/remissions", response_class=HTMLResponse)
-    async def remissions_list(
+    def remissions_list(
         request: Request,
         cliente: Optional[str] = Query(None),
         contract_id: Optional[int] = Query(None)
@@ -41,8 +43,9 @@ def register_remission_routes(app, jinja_env: Environment):
         params = []
         
         if cliente:
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{cliente}%")
+            fts_sql, fts_params = search_filter("clients", cliente, "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if contract_id:
             query += " AND r.contract_id = ?"
             params.append(contract_id)
@@ -66,7 +69,7 @@ def register_remission_routes(app, jinja_env: Environment):
                                        filters={'cliente': cliente, 'contract_id': contract_id})
     
     @app.get("/remissions/new", response_class=HTMLResponse)
-    async def remission_form(request: Request):
+    def remission_form(request: Request):
         """Muestra el formulario para crear una nueva remisión"""
         conn = get_db()
         cursor = conn.cursor()
@@ -86,7 +89,7 @@ def register_remission_routes(app, jinja_env: Environment):
                                        remission=None, clients=clients, contracts=contracts, products=products)
     
     @app.post("/remissions")
-    async def create_remission(
+    def create_remission(
         request: Request,
         fecha_inicio: str = Form(...),
         fecha_fin: Optional[str] = Form(None),
@@ -146,8 +149,8 @@ def register_remission_routes(app, jinja_env: Environment):
         
         return RedirectResponse(url=f"/remissions/{remission_id}", status_code=303)
     
-    @app.get("/remissions/{remission_id}", response_class=HTMLResponse)
-    async def remission_view(request: Request, remission_id: int):
+    @app.get("/remissions/{remission_id:int}", response_class=HTMLResponse)
+    def remission_view(request: Request, remission_id: int):
         """Muestra el detalle de una remisión"""
         conn = get_db()
         cursor = conn.cursor()
@@ -184,7 +187,7 @@ def register_remission_routes(app, jinja_env: Environment):
                                        remission=r, items=items)
     
     @app.get("/remissions/{remission_id}/print", response_class=HTMLResponse)
-    async def remission_print(request: Request, remission_id: int):
+    def remission_print(request: Request, remission_id: int):
         """Vista imprimible de remisión"""
         conn = get_db()
         cursor = conn.cursor()
@@ -227,39 +230,43 @@ def register_remission_routes(app, jinja_env: Environment):
     @app.get("/remissions/{remission_id}.pdf")
     async def remission_pdf(remission_id: int):
         """Exporta remisión como PDF"""
-        from .pdf_generator import generate_remission_pdf
+        from .pdf_generator import generate_remission_pdf, render_pdf_async
         
-        conn = get_db()
-        cursor = conn.cursor()
+        def _load():
+            conn = get_db()
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT r.*, cl.*, c.numero_contrato
-            FROM remissions r
-            LEFT JOIN clients cl ON r.client_id = cl.id
-            LEFT JOIN contracts c ON r.contract_id = c.id
-            WHERE r.id = ?
-        """, (remission_id,))
+            cursor.execute("""
+                SELECT r.*, cl.*, c.numero_contrato
+                FROM remissions r
+                LEFT JOIN clients cl ON r.client_id = cl.id
+                LEFT JOIN contracts c ON r.contract_id = c.id
+                WHERE r.id = ?
+            """, (remission_id,))
         
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Remisión no encontrada")
+            row = cursor.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Remisión no encontrada")
         
-        r = Remission.from_row(row)
-        r.numero_contrato = row.get('numero_contrato')
+            r = Remission.from_row(row)
+            r.numero_contrato = row.get('numero_contrato')
         
-        cliente = dict(row) if row.get('nombre') else None
+            cliente = dict(row) if row.get('nombre') else None
         
-        cursor.execute("""
-            SELECT * FROM remission_items
-            WHERE remission_id = ?
-            ORDER BY id
-        """, (remission_id,))
+            cursor.execute("""
+                SELECT * FROM remission_items
+                WHERE remission_id = ?
+                ORDER BY id
+            """, (remission_id,))
         
-        items = [dict(row) for row in cursor.fetchall()]
+            items = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
+            conn.close()
+            return r, cliente, items
+
+        r, cliente, items = await run_io(_load)
         
-        pdf_data = generate_remission_pdf(r, cliente, items)
+        pdf_data = await render_pdf_async(generate_remission_pdf, r, cliente, items)
         
         return Response(
             content=pdf_data,
@@ -7,6 +7,8 @@ from fastapi import Request, Query, HTTPException, Form
 from fastapi.responses import HTMLResponse, Response, RedirectResponse
 
 from .db import get_db
+from .search import search_filter
+from .executors import run_io
 from .models_system import SalesInvoice
 from .utils import get_next_invoice_number
 from jinja2 import Environment
@@ -20,7 +22,7 @@ def register_sales_invoice_routes(app, jinja_env: Environment):
         return HTMLResponse(template.render(request=request, **kwargs))
     
     @app.get("/sales-invoices", response_class=HTMLResponse)
-    async def sales_invoices_list(
+    def sales_invoices_list(
         request: Request,
         cliente: Optional[str] = Query(None),
         contract_id: Optional[int] = Query(None)
@@ -39,8 +41,9 @@ def register_sales_invoice_routes(app, jinja_env: Environment):
         params = []
         
         if cliente:
-            query += " AND cl.nombre LIKE ?"
-            params.append(f"%{cliente}%")
+            fts_sql, fts_params = search_filter("clients", cliente, "cl.id")
+            query += fts_sql
+            params.extend(fts_params)
         if contract_id:
             query += " AND si.contract_id = ?"
             params.append(contract_id)
@@ -72,7 +75,7 @@ def register_sales_invoice_routes(app, jinja_env: Environment):
                                        filters={'cliente': cliente, 'contract_id': contract_id})
     
     @app.get("/sales-invoices/new", response_class=HTMLResponse)
-    async def sales_invoice_form(request: Request):
+    def sales_invoice_form(request: Request):
         """Muestra el formulario para crear una nueva factura de venta"""
         conn = get_db()
         cursor = conn.cursor()
@@ -95,7 +98,7 @@ def register_sales_invoice_routes(app, jinja_env: Environment):
                                        sales_invoice=None, clients=clients, contracts=contracts, remissions=remissions, products=products)
     
     @app.post("/sales-invoices")
-    async def create_sales_invoice(
+    def create_sales_invoice(
         request: Request,
         fecha: str = Form(...),
         condicion_venta: str = Form("contado"),
@@ -146,8 +149,8 @@ def register_sales_invoice_routes(app, jinja_env: Environment):
         
         return RedirectResponse(url=f"/sales-invoices/{invoice_id}", status_code=303)
     
-    @app.get("/sales-invoices/{invoice_id}", response_class=HTMLResponse)
-    async def sales_invoice_view(request: Request, invoice_id: int):
+    @app.get("/sales-invoices/{invoice_id:int}", response_class=HTMLResponse)
+    def sales_invoice_view(request: Request, invoice_id: int):
         """Muestra el detalle de una factura de venta"""
         conn = get_db()
         cursor = conn.cursor()
@@ -187,7 +190,7 @@ def register_sales_invoice_routes(app, jinja_env: Environment):
                                        sales_invoice=si, items=items, monto_total=monto_total)
     
     @app.get("/sales-invoices/{invoice_id}/print", response_class=HTMLResponse)
-    async def sales_invoice_print(request: Request, invoice_id: int):
+    def sales_invoice_print(request: Request, invoice_id: int):
         """Vista imprimible de factura de venta"""
         conn = get_db()
         cursor = conn.cursor()
@@ -233,41 +236,45 @@ def register_sales_invoice_routes(app, jinja_env: Environment):
     @app.get("/sales-invoices/{invoice_id}.pdf")
     async def sales_invoice_pdf(invoice_id: int):
         """Exporta factura de venta como PDF"""
-        from .pdf_generator import generate_sales_invoice_pdf
+        from .pdf_generator import generate_sales_invoice_pdf, render_pdf_async
         
-        conn = get_db()
-        cursor = conn.cursor()
+        def _load():
+            conn = get_db()
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT si.*, cl.*, c.numero_contrato
-            FROM sales_invoices si
-            LEFT JOIN clients cl ON si.client_id = cl.id
-            LEFT JOIN contracts c ON si.contract_id = c.id
-            WHERE si.id = ?
-        """, (invoice_id,))
+            cursor.execute("""
+                SELECT si.*, cl.*, c.numero_contrato
+                FROM sales_invoices si
+                LEFT JOIN clients cl ON si.client_id = cl.id
+                LEFT JOIN contracts c ON si.contract_id = c.id
+                WHERE si.id = ?
+            """, (invoice_id,))
         
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Factura no encontrada")
+            row = cursor.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Factura no encontrada")
         
-        si = SalesInvoice.from_row(row)
-        si.numero_contrato = row.get('numero_contrato')
+            si = SalesInvoice.from_row(row)
+            si.numero_contrato = row.get('numero_contrato')
         
-        cliente = dict(row) if row.get('nombre') else None
+            cliente = dict(row) if row.get('nombre') else None
         
-        cursor.execute("""
-            SELECT * FROM sales_invoice_items
-            WHERE sales_invoice_id = ?
-            ORDER BY id
-        """, (invoice_id,))
+            cursor.execute("""
+                SELECT * FROM sales_invoice_items
+                WHERE sales_invoice_id = ?
+                ORDER BY id
+            """, (invoice_id,))
         
-        items = [dict(row) for row in cursor.fetchall()]
+            items = [dict(row) for row in cursor.fetchall()]
         
-        monto_total = sum(item['cantidad'] * item['precio_unitario'] for item in items)
+            monto_total = sum(item['cantidad'] * item['precio_unitario'] for item in items)
         
-        conn.close()
+            conn.close()
+            return si, cliente, items, monto_total
+
+        si, cliente, items, monto_total = await run_io(_load)
         
-        pdf_data = generate_sales_invoice_pdf(si, cliente, items, monto_total)
+        pdf_data = await render_pdf_async(generate_sales_invoice_pdf, si, cliente, items, monto_total)
         
         return Response(
             content=pdf_data,
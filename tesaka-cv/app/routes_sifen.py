@@ -9,6 +9,7 @@ from fastapi import Request, HTTPException
 from fastapi.responses import HTMLResponse, JSONResponse
 from jinja2 import Environment
 
+from .executors import run_io
 from .sifen_client import SifenClient, SifenValidator, get_sifen_config, SifenClientError
 
 
@@ -20,7 +21,7 @@ def register_sifen_routes(app, jinja_env: Environment):
         return HTMLResponse(template.render(request=request, **kwargs))
     
     @app.post("/dev/sifen-smoke-test")
-    async def sifen_smoke_test(request: Request):
+    def sifen_smoke_test(request: Request):
         """
         Ejecuta un smoke test end-to-end contra SIFEN ambiente de pruebas.
         
@@ -269,12 +270,12 @@ def register_sifen_routes(app, jinja_env: Environment):
             )
     
     @app.get("/dev/sifen-smoke-test", response_class=HTMLResponse)
-    async def sifen_smoke_test_page(request: Request):
+    def sifen_smoke_test_page(request: Request):
         """Página HTML para ejecutar smoke test"""
         return render_template_internal("sifen/test.html", request)
     
     @app.get("/dev/sifen-test-angular")
-    async def sifen_test_angular_connection(request: Request):
+    def sifen_test_angular_connection(request: Request):
         """
         Prueba la conexión con la aplicación Angular del Prevalidador
         """
@@ -318,9 +319,15 @@ def register_sifen_routes(app, jinja_env: Environment):
             
             from app.sifen_client.angular_prevalidador import AngularPrevalidadorClient
             
-            client = AngularPrevalidadorClient()
-            result = client.prevalidate_xml(xml_content)
-            client.close()
+            def _prevalidate():
+                client = AngularPrevalidadorClient()
+                try:
+                    return client.prevalidate_xml(xml_content)
+                finally:
+                    client.close()
+            
+            # Navegador/HTTP blocking: fuera del event loop
+            result = await run_io(_prevalidate)
             
             return JSONResponse({
                 "ok": result.get("valid", False),
@@ -368,7 +375,7 @@ def register_sifen_routes(app, jinja_env: Environment):
                 )
             
             validator = SifenValidator()
-            result = validator.prevalidate_with_service(xml_content)
+            result = await run_io(validator.prevalidate_with_service, xml_content)
             
             return JSONResponse({
                 "ok": result.get("valid", False),
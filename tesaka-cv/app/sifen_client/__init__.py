@@ -1,14 +1,15 @@
 """
 Módulo cliente para integración con SIFEN (Sistema Integrado de Facturación Electrónica Nacional)
 Paraguay - DNIT
+
+Los nombres públicos se cargan al primer acceso (PEP 562): importar un
+submódulo liviano (config, cdc_utils, lote_payload...) no arrastra zeep,
+httpx, cryptography ni signxml. `from app.sifen_client import SoapClient`
+sigue funcionando igual.
 """
-from .config import SifenConfig, get_sifen_config
-from .client import SifenClient, SifenClientError
-from .validator import SifenValidator
-from .xml_signer import XmlSigner, XmlSignerError
-from .qr_generator import QRGenerator, QRGeneratorError
-from .soap_client import SoapClient, SIZE_LIMITS
-from .pkcs12_utils import p12_to_temp_pem_files, cleanup_pem_files, PKCS12Error
+import importlib
+from typing import TYPE_CHECKING
+
 from .exceptions import (
     SifenException,
     SifenValidationError,
@@ -18,6 +19,47 @@ from .exceptions import (
     SifenResponseError
 )
 
+# Nombre público -> submódulo que lo define
+_LAZY_ATTRS = {
+    'SifenConfig': '.config',
+    'get_sifen_config': '.config',
+    'SifenClient': '.client',
+    'SifenClientError': '.client',
+    'SifenValidator': '.validator',
+    'XmlSigner': '.xml_signer',
+    'XmlSignerError': '.xml_signer',
+    'QRGenerator': '.qr_generator',
+    'QRGeneratorError': '.qr_generator',
+    'SoapClient': '.soap_client',
+    'SIZE_LIMITS': '.soap_client',
+    'p12_to_temp_pem_files': '.pkcs12_utils',
+    'cleanup_pem_files': '.pkcs12_utils',
+    'PKCS12Error': '.pkcs12_utils',
+}
+
+if TYPE_CHECKING:
+    from .config import SifenConfig, get_sifen_config
+    from .client import SifenClient, SifenClientError
+    from .validator import SifenValidator
+    from .xml_signer import XmlSigner, XmlSignerError
+    from .qr_generator import QRGenerator, QRGeneratorError
+    from .soap_client import SoapClient, SIZE_LIMITS
+    from .pkcs12_utils import p12_to_temp_pem_files, cleanup_pem_files, PKCS12Error
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # los accesos siguientes no pasan por __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
 __all__ = [
     'SifenConfig',
     'get_sifen_config',
@@ -40,4 +82,3 @@ __all__ = [
     'cleanup_pem_files',
     'PKCS12Error',
 ]
-
@@ -0,0 +1,151 @@
+"""
+Validación y corrección masiva del DV de CDCs SIFEN (vectorizada).
+
+En lugar de recorrer cada CDC dígito por dígito en Python, arma una matriz de
+dígitos (N x 43) con NumPy y calcula todos los DV con un único producto
+matriz-vector contra el vector de pesos módulo 11. Si NumPy no está
+instalado, calcula fila por fila con los mismos pesos.
+
+El CLI (auditoría de la base y de directorios, benchmark) está en
+tools/cdc_batch.py.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None  # type: ignore
+    NUMPY_AVAILABLE = False
+
+# Pesos mod 11 por posición (izquierda a derecha) para una base de 43 dígitos:
+# el dígito de más a la derecha lleva peso 2 y se cicla 2..9 hacia la izquierda.
+WEIGHTS_43 = [2 + ((42 - i) % 8) for i in range(43)]
+
+if NUMPY_AVAILABLE:
+    _WEIGHTS_43 = np.array(WEIGHTS_43, dtype=np.int32)
+
+_ZERO = ord("0")
+
+
+def _calc_dv(base_43: str) -> int:
+    """DV mod 11 de una base ya normalizada (43 dígitos), sin NumPy."""
+    dv = 11 - sum(int(d) * w for d, w in zip(base_43, WEIGHTS_43)) % 11
+    return 0 if dv == 11 else 1 if dv == 10 else dv
+
+
+def _normalize(values: Sequence[str], width: int) -> Tuple[List[str], List[bool]]:
+    """
+    Deja solo dígitos en cada valor (igual que tools.cdc_dv) y marca los que
+    no tienen exactamente `width` dígitos. Los inválidos se reemplazan por ceros
+    para poder armar una matriz rectangular.
+    """
+    normalized: List[str] = []
+    ok: List[bool] = []
+    placeholder = "0" * width
+    for value in values:
+        if not isinstance(value, str):
+            normalized.append(placeholder)
+            ok.append(False)
+            continue
+        if not (len(value) == width and value.isascii() and value.isdigit()):
+            value = "".join(c for c in value if c.isdigit())
+            if len(value) != width or not value.isascii():
+                normalized.append(placeholder)
+                ok.append(False)
+                continue
+        normalized.append(value)
+        ok.append(True)
+    return normalized, ok
+
+
+def digit_matrix(values: Sequence[str], width: int):
+    """
+    Convierte una lista de strings de `width` dígitos ASCII en una matriz
+    NumPy uint8 de forma (N, width) sin recorrer los dígitos en Python.
+    """
+    buf = "".join(values).encode("ascii")
+    return (np.frombuffer(buf, dtype=np.uint8).reshape(len(values), width) - _ZERO)
+
+
+def _dv_from_matrix(matrix):
+    """Calcula el DV mod 11 de cada fila de una matriz (N, 43)."""
+    dv = 11 - (matrix.astype(np.int32) @ _WEIGHTS_43) % 11
+    dv[dv == 11] = 0
+    dv[dv == 10] = 1
+    return dv
+
+
+def calc_cdc_dv_batch(bases_43: Sequence[str]):
+    """
+    Calcula el DV de muchas bases de CDC (43 dígitos) a la vez.
+
+    Args:
+        bases_43: Secuencia de strings con 43 dígitos
+
+    Returns:
+        Array de DV (numpy.ndarray si NumPy está disponible, lista si no)
+
+    Raises:
+        ValueError: Si alguna base no tiene exactamente 43 dígitos
+    """
+    normalized, ok = _normalize(bases_43, 43)
+    if not all(ok):
+        bad = next(i for i, valid in enumerate(ok) if not valid)
+        raise ValueError(f"base_43 debe tener exactamente 43 dígitos. Índice {bad}: {bases_43[bad]!r}")
+    if not normalized:
+        return np.zeros(0, dtype=np.int32) if NUMPY_AVAILABLE else []
+    if not NUMPY_AVAILABLE:
+        return [_calc_dv(base) for base in normalized]
+    return _dv_from_matrix(digit_matrix(normalized, 43))
+
+
+def validate_cdc_batch(cdcs_44: Sequence[str]):
+    """
+    Valida el DV de muchos CDCs de 44 dígitos a la vez.
+
+    Mismo criterio que cdc_utils.validate_cdc, pero vectorizado.
+
+    Returns:
+        Tupla (valido, dv_original, dv_calculado) de arrays paralelos a la entrada.
+        Los CDCs mal formados (no 44 dígitos) quedan con valido=False y DVs -1.
+    """
+    normalized, ok = _normalize(cdcs_44, 44)
+    if not NUMPY_AVAILABLE:
+        valid, dv_orig, dv_calc = [], [], []
+        for cdc, is_ok in zip(normalized, ok):
+            if not is_ok:
+                valid.append(False)
+                dv_orig.append(-1)
+                dv_calc.append(-1)
+                continue
+            calc = _calc_dv(cdc[:43])
+            valid.append(int(cdc[43]) == calc)
+            dv_orig.append(int(cdc[43]))
+            dv_calc.append(calc)
+        return valid, dv_orig, dv_calc
+
+    if not normalized:
+        empty = np.zeros(0, dtype=np.int32)
+        return np.zeros(0, dtype=bool), empty, empty
+
+    matrix = digit_matrix(normalized, 44)
+    well_formed = np.array(ok, dtype=bool)
+    dv_orig = matrix[:, 43].astype(np.int32)
+    dv_calc = _dv_from_matrix(matrix[:, :43])
+    dv_orig[~well_formed] = -1
+    dv_calc[~well_formed] = -1
+    valid = well_formed & (dv_orig == dv_calc)
+    return valid, dv_orig, dv_calc
+
+
+def fix_cdc_batch(cdcs_44: Sequence[str]) -> List[Optional[str]]:
+    """
+    Devuelve los CDCs con el DV corregido (None para los mal formados).
+    """
+    normalized, ok = _normalize(cdcs_44, 44)
+    _, _, dv_calc = validate_cdc_batch(normalized)
+    return [
+        cdc[:43] + str(int(dv)) if is_ok else None
+        for cdc, is_ok, dv in zip(normalized, ok, dv_calc)
+    ]
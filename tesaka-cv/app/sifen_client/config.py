@@ -89,6 +89,10 @@ class SifenConfig:
     
     # URLs base según "Guía de Mejores Prácticas para la Gestión del Envío de DE" (Oct 2024)
     # Fuente: https://ekuatia.set.gov.py
+    DEFAULT_BASE_URLS = {
+        "test": "https://sifen-test.set.gov.py",
+        "prod": "https://sifen.set.gov.py",
+    }
     BASE_URLS = {
         "test": os.getenv("SIFEN_TEST_BASE_URL", "https://sifen-test.set.gov.py"),
         "prod": os.getenv("SIFEN_PROD_BASE_URL", "https://sifen.set.gov.py"),
@@ -138,7 +142,9 @@ class SifenConfig:
             raise ValueError(f"Ambiente inválido: {env}. Debe ser 'test' o 'prod'")
         
         self.env = env
-        self.base_url = self.BASE_URLS[env]
+        # SIFEN_TEST_BASE_URL / SIFEN_PROD_BASE_URL se leen también al instanciar
+        # (ej. para apuntar a tools/sifen_mock_server.py después de importar)
+        self.base_url = os.getenv(f"SIFEN_{env.upper()}_BASE_URL") or self.BASE_URLS[env]
         
         # Autenticación - mTLS es REQUERIDO según Manual Técnico SIFEN V150
         # TLS 1.2 con autenticación mutua usando certificados X.509 v3
@@ -215,7 +221,23 @@ class SifenConfig:
             if override_url:
                 return override_url
         
-        return self.SOAP_SERVICES[self.env][service_key]
+        return self.rebase_url(self.SOAP_SERVICES[self.env][service_key])
+    
+    def rebase_url(self, url: str) -> str:
+        """
+        Reemplaza el host oficial de SIFEN por base_url si fue sobreescrito
+        
+        Args:
+            url: URL oficial (ej. https://sifen-test.set.gov.py/de/ws/...)
+            
+        Returns:
+            La misma ruta sobre base_url; la URL sin cambios si base_url es el oficial
+        """
+        default = self.DEFAULT_BASE_URLS[self.env]
+        base_url = self.base_url.rstrip("/")
+        if base_url != default and url.startswith(default):
+            return base_url + url[len(default):]
+        return url
     
     def get_endpoint_url(self, endpoint_key: str) -> str:
         """
@@ -0,0 +1,373 @@
+"""
+Constructor precompilado de DE (Documento Electrónico) SIFEN v150.
+
+El XML se arma a partir de fragmentos de plantilla compilados una sola vez al
+importar el módulo (cabecera, gCamItem, gTotSub y los bloques estáticos de
+receptor, firma placeholder y gCamFuFD). Los totales y los gCamItem se calculan
+en una única pasada sobre los items y el resultado se une con un solo join.
+
+Lo usan tanto el formulario web (web/main.py) como tools/build_de.build_de_xml.
+"""
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from .xml_generator_v150 import generate_cdc
+from .cdc_utils import validate_cdc, fix_cdc
+
+# Texto obligatorio de dNomEmi en el ambiente de pruebas
+TEST_NOMBRE_EMISOR = "DE generado en ambiente de prueba - sin valor comercial ni fiscal"
+
+# Item por defecto (DE de prueba sin items explícitos)
+DEFAULT_ITEMS = [
+    {"codigo": "001", "descripcion": "Producto de Prueba", "cantidad": 1, "precio": 100000, "tasa_iva": 0},
+]
+
+_HEAD = """<DE xmlns="http://ekuatia.set.gov.py/sifen/xsd" Id="{cdc}">
+    <dDVId>{dv_id}</dDVId>
+    <dFecFirma>{fecha_firma}</dFecFirma>
+    <dSisFact>1</dSisFact>
+    <gOpeDE>
+        <iTipEmi>1</iTipEmi>
+        <dDesTipEmi>Normal</dDesTipEmi>
+        <dCodSeg>{cod_seg}</dCodSeg>
+    </gOpeDE>
+    <gTimb>
+        <iTiDE>{tipo}</iTiDE>
+        <dDesTiDE>Factura electrónica</dDesTiDE>
+        <dNumTim>{timbrado}</dNumTim>
+        <dEst>{est}</dEst>
+        <dPunExp>{pun}</dPunExp>
+        <dNumDoc>{num}</dNumDoc>
+        <dFeIniT>{fecha}</dFeIniT>
+    </gTimb>
+    <gDatGralOpe>
+        <dFeEmiDE>{fecha_firma}</dFeEmiDE>
+        <gEmis>
+            <dRucEm>{ruc}</dRucEm>
+            <dDVEmi>{dv_ruc}</dDVEmi>
+            <iTipCont>1</iTipCont>
+            <dNomEmi>{nom_emi}</dNomEmi>
+            <dDirEmi>Asunción</dDirEmi>
+            <dNumCas>1234</dNumCas>
+            <cDepEmi>1</cDepEmi>
+            <dDesDepEmi>CAPITAL</dDesDepEmi>
+            <cCiuEmi>1</cCiuEmi>
+            <dDesCiuEmi>Asunción</dDesCiuEmi>
+            <dTelEmi>021123456</dTelEmi>
+            <dEmailE>test@example.com</dEmailE>
+            <gActEco>
+                <cActEco>471100</cActEco>
+                <dDesActEco>Venta al por menor en comercios no especializados</dDesActEco>
+            </gActEco>
+        </gEmis>
+        <gDatRec>
+            <iNatRec>1</iNatRec>
+            <iTiOpe>1</iTiOpe>
+            <cPaisRec>PRY</cPaisRec>
+            <dDesPaisRec>Paraguay</dDesPaisRec>
+            <dRucRec>80012345</dRucRec>
+            <dDVRec>7</dDVRec>
+            <dNomRec>Cliente de Prueba</dNomRec>
+            <dDirRec>Asunción</dDirRec>
+            <dNumCasRec>5678</dNumCasRec>
+            <cDepRec>1</cDepRec>
+            <dDesDepRec>CAPITAL</dDesDepRec>
+            <cCiuRec>1</cCiuRec>
+            <dDesCiuRec>Asunción</dDesCiuRec>
+        </gDatRec>
+    </gDatGralOpe>
+    <gDtipDE>
+""".format
+
+_ITEM = """        <gCamItem>
+            <dCodInt>%s</dCodInt>
+            <dDesProSer>%s</dDesProSer>
+            <cUniMed>77</cUniMed>
+            <dDesUniMed>UNI</dDesUniMed>
+            <dCantProSer>%.2f</dCantProSer>
+            <gValorItem>
+                <dPUniProSer>%.0f</dPUniProSer>
+                <dTotBruOpeItem>%.0f</dTotBruOpeItem>
+                <gValorRestaItem>
+                    <dTotOpeItem>%.0f</dTotOpeItem>
+                </gValorRestaItem>
+            </gValorItem>
+        </gCamItem>
+"""
+
+_TOT_SUB = """    </gDtipDE>
+    <gTotSub>
+        <dSubExe>{sub_exe:.0f}</dSubExe>
+        <dSubExo>0</dSubExo>
+        <dSub5>{sub_5:.0f}</dSub5>
+        <dSub10>{sub_10:.0f}</dSub10>
+        <dTotOpe>{tot_ope:.0f}</dTotOpe>
+        <dTotDesc>0</dTotDesc>
+        <dTotDescGlotem>0</dTotDescGlotem>
+        <dTotAntItem>0</dTotAntItem>
+        <dTotAnt>0</dTotAnt>
+        <dPorcDescTotal>0</dPorcDescTotal>
+        <dDescTotal>0</dDescTotal>
+        <dAnticipo>0</dAnticipo>
+        <dRedon>0</dRedon>
+        <dTotGralOpe>{tot_ope:.0f}</dTotGralOpe>
+        <dIVA5>{iva_5:.0f}</dIVA5>
+        <dIVA10>{iva_10:.0f}</dIVA10>
+        <dLiqTotIVA5>{iva_5:.0f}</dLiqTotIVA5>
+        <dLiqTotIVA10>{iva_10:.0f}</dLiqTotIVA10>
+        <dIVAComi>0</dIVAComi>
+        <dTotIVA>{iva_total:.0f}</dTotIVA>
+        <dBaseGrav5>{sub_5:.0f}</dBaseGrav5>
+        <dBaseGrav10>{sub_10:.0f}</dBaseGrav10>
+        <dTBasGraIVA>{base_grav:.0f}</dTBasGraIVA>
+        <dTotalGs>{total:.0f}</dTotalGs>
+    </gTotSub>
+""".format
+
+_TAIL = """    <ds:Signature xmlns:ds="http://www.w3.org/2000/09/xmldsig#">
+        <ds:SignedInfo>
+            <ds:CanonicalizationMethod Algorithm="http://www.w3.org/TR/2001/REC-xml-c14n-20010315"/>
+            <ds:SignatureMethod Algorithm="http://www.w3.org/2000/09/xmldsig#rsa-sha1"/>
+            <ds:Reference URI="">
+                <ds:Transforms>
+                    <ds:Transform Algorithm="http://www.w3.org/2000/09/xmldsig#enveloped-signature"/>
+                </ds:Transforms>
+                <ds:DigestMethod Algorithm="http://www.w3.org/2000/09/xmldsig#sha1"/>
+                <ds:DigestValue>dGhpcyBpcyBhIHRlc3QgZGlnZXN0IHZhbHVl</ds:DigestValue>
+            </ds:Reference>
+        </ds:SignedInfo>
+        <ds:SignatureValue>dGhpcyBpcyBhIHRlc3Qgc2lnbmF0dXJlIHZhbHVlIGZvciBwcnVlYmFzIG9ubHk=</ds:SignatureValue>
+        <ds:KeyInfo>
+            <ds:X509Data>
+                <ds:X509Certificate>LS0tLS1CRUdJTiBDRVJUSUZJQ0FURS0tLS0tCk1JSUVKakNDQWpLZ0F3SUJBZ0lEQW5CZ2txaGtpRzl3MEJBUXNGQUFEV1lqRU1NQW9HQTFVRUNoTURVbVZzWVcKd2dnRWlNQTBHQ1NxR1NJYjM=</ds:X509Certificate>
+            </ds:X509Data>
+        </ds:KeyInfo>
+    </ds:Signature>
+    <gCamFuFD>
+        <dCarQR>TESTQRCODE12345678901234567890123456789012345678901234567890123456789012345678901234567890123456789012345678901234567890</dCarQR>
+    </gCamFuFD>
+</DE>"""
+
+
+def _escape(text: str) -> str:
+    # La mayoría de los textos no tienen caracteres especiales: evitar los replace
+    if "&" in text or "<" in text or ">" in text:
+        return escape(text)
+    return text
+
+
+def _parse_ruc(ruc: str) -> Tuple[str, str]:
+    """
+    Parsea el RUC del emisor ("RUC-DV" o solo "RUC").
+
+    Returns:
+        Tupla (ruc8, dv): RUC normalizado a 8 dígitos y su DV
+    """
+    ruc_str = str(ruc or "").strip()
+    if not ruc_str:
+        ruc_str = os.getenv("SIFEN_EMISOR_RUC") or os.getenv("SIFEN_TEST_RUC") or "80012345"
+
+    if "-" in ruc_str:
+        ruc_num, dv_ruc = ruc_str.split("-", 1)
+        ruc_num = ruc_num.strip()
+        dv_ruc = dv_ruc.strip()
+        if not dv_ruc.isdigit() or len(dv_ruc) != 1:
+            raise ValueError(f"DV del RUC debe ser exactamente 1 dígito. Valor recibido: '{dv_ruc}'")
+    else:
+        ruc_num = ruc_str
+        ruc_digits = "".join(c for c in ruc_num if c.isdigit())
+        dv_ruc = str(sum(int(d) for d in ruc_digits) % 10) if ruc_digits else "0"
+
+    ruc_clean = "".join(c for c in ruc_num if c.isdigit())
+    if not ruc_clean:
+        raise ValueError(f"RUC debe contener al menos un dígito. Valor recibido: '{ruc_num}'")
+    return ruc_clean.zfill(8)[-8:], dv_ruc
+
+
+def build_items(items: Iterable[Dict[str, Any]]) -> Tuple[List[str], Dict[str, float]]:
+    """
+    Genera los fragmentos gCamItem y calcula los totales en la misma pasada.
+
+    Cada item es un dict con: codigo, descripcion, cantidad, precio (sin IVA) y tasa_iva (0, 5 o 10).
+
+    Returns:
+        Tupla (fragmentos, totales) con totales: total_general, subtotal_exe,
+        subtotal_5, subtotal_10, iva_5, iva_10
+    """
+    parts = []
+    append = parts.append
+    total_general = subtotal_exe = subtotal_5 = subtotal_10 = iva_5 = iva_10 = 0.0
+
+    for idx, item in enumerate(items, 1):
+        cantidad = float(item.get("cantidad", 1))
+        precio = float(item.get("precio", 0))
+        tasa_iva = int(item.get("tasa_iva", 0))
+
+        subtotal_item = cantidad * precio
+        iva_item = subtotal_item * tasa_iva / 100 if tasa_iva > 0 else 0.0
+        total_item = subtotal_item + iva_item
+        total_general += total_item
+
+        if tasa_iva == 0:
+            subtotal_exe += subtotal_item
+        elif tasa_iva == 5:
+            subtotal_5 += subtotal_item
+            iva_5 += iva_item
+        elif tasa_iva == 10:
+            subtotal_10 += subtotal_item
+            iva_10 += iva_item
+
+        append(_ITEM % (
+            _escape(str(item.get("codigo") or f"{idx:03d}")),
+            _escape(str(item.get("descripcion") or "Producto")),
+            cantidad, precio, subtotal_item, total_item,
+        ))
+
+    return parts, {
+        "total_general": total_general,
+        "subtotal_exe": subtotal_exe,
+        "subtotal_5": subtotal_5,
+        "subtotal_10": subtotal_10,
+        "iva_5": iva_5,
+        "iva_10": iva_10,
+    }
+
+
+def _make_cdc(ruc8: str, dv_ruc: str, timbrado: str, est: str, pun: str, num: str,
+              tipo: str, fecha: str) -> str:
+    cdc = str(generate_cdc(f"{ruc8}-{dv_ruc}", timbrado, est, pun, num, tipo,
+                           fecha.replace("-", ""), "0")).strip()
+    if len(cdc) != 44 or not cdc.isdigit():
+        raise ValueError(f"CDC generado inválido (esperado: 44 dígitos). CDC recibido: {cdc!r}")
+    es_valido, _, _ = validate_cdc(cdc)
+    if not es_valido:
+        cdc = fix_cdc(cdc)
+    return cdc
+
+
+def build_de_xml(
+    ruc: str,
+    timbrado: str,
+    establecimiento: str = "001",
+    punto_expedicion: str = "001",
+    numero_documento: str = "0000001",
+    tipo_documento: str = "1",
+    items: Optional[List[Dict[str, Any]]] = None,
+    fecha: Optional[str] = None,
+    hora: Optional[str] = None,
+    csc: Optional[str] = None,
+    env: str = "test",
+    nombre_emisor: Optional[str] = None,
+) -> str:
+    """
+    Construye el XML del elemento <DE> (tipo tDE de DE_v150.xsd, sin wrapper rDE ni prolog).
+
+    Args:
+        ruc: RUC del emisor ("RUC-DV" o solo "RUC")
+        timbrado: Número de timbrado
+        establecimiento: Código de establecimiento
+        punto_expedicion: Código de punto de expedición
+        numero_documento: Número de documento
+        tipo_documento: Tipo de documento (1=Factura)
+        items: Lista de dicts con codigo, descripcion, cantidad, precio, tasa_iva
+               (default: un item de prueba de 100.000 exento)
+        fecha: Fecha de emisión (YYYY-MM-DD)
+        hora: Hora de emisión (HH:MM:SS)
+        csc: Código de Seguridad del Contribuyente
+        env: Ambiente (en "test" dNomEmi lleva el texto obligatorio de pruebas)
+        nombre_emisor: dNomEmi para prod (default: SIFEN_EMISOR_NOMBRE)
+
+    Returns:
+        XML DE como string
+    """
+    now = datetime.now()
+    if fecha is None:
+        fecha = now.strftime("%Y-%m-%d")
+    if hora is None:
+        hora = now.strftime("%H:%M:%S")
+
+    ruc8, dv_ruc = _parse_ruc(ruc)
+    est = str(establecimiento).zfill(3)[-3:]
+    pun = str(punto_expedicion).zfill(3)[-3:]
+    num = str(numero_documento).zfill(7)[-7:]
+    tipo = str(tipo_documento).zfill(2)[-2:]
+    timbrado_clean = str(timbrado or "").strip() or "12345678"
+
+    cdc = _make_cdc(ruc8, dv_ruc, timbrado_clean, est, pun, num, tipo, fecha)
+
+    if csc:
+        cod_seg_digits = "".join(c for c in str(csc) if c.isdigit())
+        cod_seg = cod_seg_digits[:9].zfill(9) if cod_seg_digits else "123456789"
+    else:
+        cod_seg = "123456789"
+
+    if env == "test":
+        d_nom_emi = TEST_NOMBRE_EMISOR
+    else:
+        d_nom_emi = (nombre_emisor or os.getenv("SIFEN_EMISOR_NOMBRE") or "Emisor").strip() or "Emisor"
+
+    item_parts, totals = build_items(items if items is not None else DEFAULT_ITEMS)
+    iva_total = totals["iva_5"] + totals["iva_10"]
+
+    parts = [_HEAD(
+        cdc=cdc,
+        dv_id=cdc[-1],
+        fecha_firma=f"{fecha}T{hora}",
+        cod_seg=cod_seg,
+        tipo=tipo,
+        timbrado=_escape(timbrado_clean),
+        est=est,
+        pun=pun,
+        num=num,
+        fecha=fecha,
+        ruc=ruc8,
+        dv_ruc=dv_ruc,
+        nom_emi=_escape(d_nom_emi),
+    )]
+    parts.extend(item_parts)
+    parts.append(_TOT_SUB(
+        sub_exe=totals["subtotal_exe"],
+        sub_5=totals["subtotal_5"],
+        sub_10=totals["subtotal_10"],
+        tot_ope=totals["total_general"] - iva_total,
+        iva_5=totals["iva_5"],
+        iva_10=totals["iva_10"],
+        iva_total=iva_total,
+        base_grav=totals["subtotal_5"] + totals["subtotal_10"],
+        total=totals["total_general"],
+    ))
+    parts.append(_TAIL)
+    return "".join(parts)
+
+
+def benchmark(item_counts: Iterable[int] = (1, 10, 100, 500, 1000), repeat: int = 20) -> List[Dict[str, Any]]:
+    """
+    Microbenchmark del costo por DE según la cantidad de items.
+
+    Returns:
+        Lista de dicts con: items, repeat, ms_per_de, bytes
+    """
+    results = []
+    for n in item_counts:
+        items = [
+            {"codigo": f"{i:05d}", "descripcion": f"Producto {i}", "cantidad": 1 + i % 7,
+             "precio": 1000 + i, "tasa_iva": (0, 5, 10)[i % 3]}
+            for i in range(n)
+        ]
+        kwargs = dict(ruc="80012345-7", timbrado="12345678", items=items,
+                      fecha="2026-01-01", hora="10:00:00")
+        xml = build_de_xml(**kwargs)
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            build_de_xml(**kwargs)
+        elapsed = time.perf_counter() - t0
+        results.append({
+            "items": n,
+            "repeat": repeat,
+            "ms_per_de": round(elapsed * 1000 / repeat, 3),
+            "bytes": len(xml.encode("utf-8")),
+        })
+    return results
@@ -0,0 +1,335 @@
+"""
+Construcción, firma y empaquetado de eventos del emisor (siRecepEvento).
+
+Soporta los eventos de Cancelación (rGeVeCan) e Inutilización (rGeVeInu)
+según Evento_v150.xsd / WS_SiRecepEvento_v150.xsd:
+
+    rEnviEventoDe
+      dId
+      dEvReg
+        gGroupGesEve
+          rGesEve (1..15)
+            rEve Id="<id evento>"  (dFecFirma, dVerFor, gGroupTiEvt)
+            Signature              (enveloped, Reference URI="#<id evento>")
+
+Cada rGesEve se arma desde una plantilla, se firma y se serializa una sola
+vez; el rEnviEventoDe se arma empalmando los rGesEve ya firmados (sin volver
+a parsear ni re-serializar). La firma carga el certificado una sola vez por
+corrida (EventoSigner), no una vez por evento.
+"""
+import logging
+import random
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+from xml.sax.saxutils import escape
+
+try:
+    import lxml.etree as etree  # noqa: F401
+except ImportError:
+    etree = None  # type: ignore
+
+from .exceptions import SifenClientError
+
+logger = logging.getLogger(__name__)
+
+SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
+DS_NS = "http://www.w3.org/2000/09/xmldsig#"
+XSI_NS = "http://www.w3.org/2001/XMLSchema-instance"
+
+# tgGroupGesEve: rGesEve maxOccurs="15"
+MAX_EVENTOS_POR_ENVIO = 15
+
+TIPO_CANCELACION = "cancelacion"
+TIPO_INUTILIZACION = "inutilizacion"
+
+_RGESEVE_HEAD = (
+    f'<rGesEve xmlns="{SIFEN_NS}" xmlns:xsi="{XSI_NS}" '
+    f'xsi:schemaLocation="http://ekuatia.set.gov.py/sifen/xsd/siRecepEvento_v150.xsd">'
+    '<rEve Id="%d"><dFecFirma>%s</dFecFirma><dVerFor>150</dVerFor><gGroupTiEvt>'
+)
+_RGESEVE_TAIL = "</gGroupTiEvt></rEve></rGesEve>"
+
+_CANCELACION = "<rGeVeCan><Id>%s</Id><mOtEve>%s</mOtEve></rGeVeCan>"
+_INUTILIZACION = (
+    "<rGeVeInu><dNumTim>%s</dNumTim><dEst>%s</dEst><dPunExp>%s</dPunExp>"
+    "<dNumIn>%s</dNumIn><dNumFin>%s</dNumFin><iTiDE>%d</iTiDE><mOtEve>%s</mOtEve></rGeVeInu>"
+)
+
+_RENVI_EVENTO_HEAD = f'<rEnviEventoDe xmlns="{SIFEN_NS}"><dId>'.encode("ascii")
+_RENVI_EVENTO_MID = b"</dId><dEvReg><gGroupGesEve>"
+_RENVI_EVENTO_TAIL = b"</gGroupGesEve></dEvReg></rEnviEventoDe>"
+
+_XML_DECL = b"<?xml version='1.0' encoding='UTF-8'?>\n"
+
+
+def make_did() -> str:
+    """dId de 15 dígitos: YYYYMMDDHHMMSS + 1 dígito aleatorio."""
+    return datetime.now().strftime("%Y%m%d%H%M%S") + str(random.randint(0, 9))
+
+
+def _validate_motivo(motivo: str) -> str:
+    motivo = (motivo or "").strip()
+    if not 5 <= len(motivo) <= 500:
+        raise ValueError(f"mOtEve debe tener entre 5 y 500 caracteres. Valor recibido: {motivo!r}")
+    return escape(motivo)
+
+
+def _num_de(value: Union[int, str]) -> str:
+    """Número de documento (tdNumDE) con 7 dígitos."""
+    num = int(value)
+    if not 1 <= num <= 9999999:
+        raise ValueError(f"Número de documento fuera de rango (1..9999999): {value}")
+    return f"{num:07d}"
+
+
+def build_cancelacion(evento_id: int, cdc: str, motivo: str, fecha_firma: Optional[str] = None) -> str:
+    """
+    rGesEve (sin firma) de Cancelación de un DE.
+
+    Args:
+        evento_id: Id del evento (tdIdEve, 1..9999999999)
+        cdc: CDC de 44 caracteres del DE a cancelar
+        motivo: Motivo (5..500 caracteres)
+        fecha_firma: AAAA-MM-DDThh:mm:ss (default: ahora)
+    """
+    cdc = (cdc or "").strip()
+    if len(cdc) != 44 or not cdc.isalnum():
+        raise ValueError(f"CDC inválido (debe tener 44 caracteres): {cdc!r}")
+    body = _CANCELACION % (cdc, _validate_motivo(motivo))
+    return _wrap(evento_id, body, fecha_firma)
+
+
+def build_inutilizacion(
+    evento_id: int,
+    timbrado: str,
+    establecimiento: str,
+    punto_expedicion: str,
+    numero_inicio: Union[int, str],
+    numero_fin: Union[int, str],
+    motivo: str,
+    tipo_documento: int = 1,
+    fecha_firma: Optional[str] = None,
+) -> str:
+    """
+    rGesEve (sin firma) de Inutilización de un rango de numeración.
+
+    Args:
+        evento_id: Id del evento (tdIdEve, 1..9999999999)
+        timbrado: Número de timbrado (8 dígitos)
+        establecimiento: Código de establecimiento (3 dígitos)
+        punto_expedicion: Punto de expedición (3 dígitos)
+        numero_inicio: Primer número del rango
+        numero_fin: Último número del rango (inclusive)
+        motivo: Motivo (5..500 caracteres)
+        tipo_documento: iTiDE (1=Factura electrónica, 5=Nota de crédito, ...)
+        fecha_firma: AAAA-MM-DDThh:mm:ss (default: ahora)
+    """
+    timbrado = str(timbrado).strip()
+    if len(timbrado) != 8 or not timbrado.isdigit():
+        raise ValueError(f"Timbrado inválido (8 dígitos): {timbrado!r}")
+    if int(numero_inicio) > int(numero_fin):
+        raise ValueError(f"Rango inválido: {numero_inicio} > {numero_fin}")
+    if tipo_documento not in range(1, 10):
+        raise ValueError(f"iTiDE inválido: {tipo_documento}")
+    body = _INUTILIZACION % (
+        timbrado,
+        str(establecimiento).strip().zfill(3),
+        str(punto_expedicion).strip().zfill(3),
+        _num_de(numero_inicio),
+        _num_de(numero_fin),
+        tipo_documento,
+        _validate_motivo(motivo),
+    )
+    return _wrap(evento_id, body, fecha_firma)
+
+
+def _wrap(evento_id: int, body: str, fecha_firma: Optional[str]) -> str:
+    if not 1 <= int(evento_id) <= 9999999999:
+        raise ValueError(f"Id de evento fuera de rango (1..9999999999): {evento_id}")
+    fecha_firma = fecha_firma or datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    return (_RGESEVE_HEAD % (int(evento_id), fecha_firma)) + body + _RGESEVE_TAIL
+
+
+def build_evento(evento: Dict[str, Any], fecha_firma: Optional[str] = None) -> str:
+    """
+    rGesEve (sin firma) a partir de un dict de evento.
+
+    El dict tiene `id`, `tipo` (cancelacion|inutilizacion), `motivo` y los
+    campos del tipo: `cdc`, o `timbrado`, `establecimiento`, `punto_expedicion`,
+    `numero_inicio`, `numero_fin` y opcionalmente `tipo_documento`.
+    """
+    if evento["tipo"] == TIPO_CANCELACION:
+        return build_cancelacion(evento["id"], evento["cdc"], evento["motivo"], fecha_firma)
+    if evento["tipo"] == TIPO_INUTILIZACION:
+        return build_inutilizacion(
+            evento["id"],
+            evento["timbrado"],
+            evento["establecimiento"],
+            evento["punto_expedicion"],
+            evento["numero_inicio"],
+            evento["numero_fin"],
+            evento["motivo"],
+            tipo_documento=int(evento.get("tipo_documento") or 1),
+            fecha_firma=fecha_firma,
+        )
+    raise ValueError(f"Tipo de evento no soportado: {evento['tipo']!r}")
+
+
+class EventoSigner:
+    """
+    Firma rGesEve con XMLDSig (RSA-SHA256, SHA-256, exc-c14n, enveloped).
+
+    Mismos algoritmos y forma de Signature (default namespace, sin prefijo ds:)
+    que xmlsec_signer.sign_de_with_p12, pero el P12 se convierte y carga una
+    sola vez para todos los eventos de la corrida.
+    """
+
+    def __init__(self, p12_path: str, p12_password: str):
+        from .xmlsec_signer import XMLSEC_AVAILABLE, XMLSecError, xmlsec
+        from .pkcs12_utils import p12_to_temp_pem_files, cleanup_pem_files
+
+        if not XMLSEC_AVAILABLE:
+            raise XMLSecError("python-xmlsec no está instalado. Instale con: pip install python-xmlsec")
+        from cryptography.hazmat.primitives.serialization import pkcs12, Encoding
+
+        self._xmlsec = xmlsec
+        cert_pem_path, key_pem_path = p12_to_temp_pem_files(p12_path, p12_password)
+        try:
+            self._key = xmlsec.Key.from_file(key_pem_path, xmlsec.KeyFormat.PEM)
+            self._key.load_cert_from_file(cert_pem_path, xmlsec.KeyFormat.PEM)
+        finally:
+            cleanup_pem_files(cert_pem_path, key_pem_path)
+
+        with open(p12_path, "rb") as f:
+            _, cert, _ = pkcs12.load_key_and_certificates(
+                f.read(), p12_password.encode("utf-8") if p12_password else None
+            )
+        pem_lines = cert.public_bytes(Encoding.PEM).decode("ascii").splitlines()
+        self._cert_b64 = "".join(line for line in pem_lines if line and not line.startswith("-----"))
+
+    def _template(self, ref_id: str) -> Any:
+        q = lambda name: etree.QName(DS_NS, name)  # noqa: E731
+        sig = etree.Element(q("Signature"), nsmap={None: DS_NS})
+        signed_info = etree.SubElement(sig, q("SignedInfo"))
+        etree.SubElement(signed_info, q("CanonicalizationMethod")).set(
+            "Algorithm", "http://www.w3.org/2001/10/xml-exc-c14n#"
+        )
+        etree.SubElement(signed_info, q("SignatureMethod")).set(
+            "Algorithm", "http://www.w3.org/2001/04/xmldsig-more#rsa-sha256"
+        )
+        ref = etree.SubElement(signed_info, q("Reference"))
+        ref.set("URI", f"#{ref_id}")
+        transforms = etree.SubElement(ref, q("Transforms"))
+        etree.SubElement(transforms, q("Transform")).set(
+            "Algorithm", "http://www.w3.org/2000/09/xmldsig#enveloped-signature"
+        )
+        etree.SubElement(transforms, q("Transform")).set(
+            "Algorithm", "http://www.w3.org/2001/10/xml-exc-c14n#"
+        )
+        etree.SubElement(ref, q("DigestMethod")).set("Algorithm", "http://www.w3.org/2001/04/xmlenc#sha256")
+        etree.SubElement(ref, q("DigestValue"))
+        etree.SubElement(sig, q("SignatureValue"))
+        x509 = etree.SubElement(etree.SubElement(sig, q("KeyInfo")), q("X509Data"))
+        etree.SubElement(x509, q("X509Certificate")).text = self._cert_b64
+        return sig
+
+    def __call__(self, rges_eve: Any) -> None:
+        """Firma in-place un rGesEve (agrega Signature como hermano de rEve)."""
+        from .xmlsec_signer import XMLSecError
+
+        r_eve = rges_eve.find(f"{{{SIFEN_NS}}}rEve")
+        if r_eve is None or not r_eve.get("Id"):
+            raise XMLSecError("rGesEve sin rEve/@Id")
+        sig = self._template(r_eve.get("Id"))
+        rges_eve.append(sig)
+        self._xmlsec.tree.add_ids(rges_eve, ["Id"])
+        ctx = self._xmlsec.SignatureContext()
+        ctx.key = self._key
+        try:
+            ctx.sign(sig)
+        except Exception as e:
+            raise XMLSecError(f"Error al firmar evento {r_eve.get('Id')}: {e}") from e
+
+
+def sign_evento(rges_eve_xml: str, signer) -> bytes:
+    """
+    Parsea, firma y serializa (sin declaración XML) un rGesEve.
+
+    Args:
+        rges_eve_xml: rGesEve sin firma (build_evento)
+        signer: callable que firma in-place el elemento rGesEve (EventoSigner)
+    """
+    if etree is None:
+        raise SifenClientError("lxml no está disponible")
+    rges_eve = etree.fromstring(rges_eve_xml.encode("utf-8"))
+    signer(rges_eve)
+    return etree.tostring(rges_eve, encoding="utf-8")
+
+
+def build_r_envi_evento(did: Union[int, str], signed_eventos: Iterable[bytes]) -> bytes:
+    """
+    Arma rEnviEventoDe empalmando rGesEve ya firmados (máximo 15).
+
+    Returns:
+        rEnviEventoDe como bytes (con declaración XML)
+    """
+    signed_eventos = list(signed_eventos)
+    if not 1 <= len(signed_eventos) <= MAX_EVENTOS_POR_ENVIO:
+        raise ValueError(
+            f"rEnviEventoDe admite de 1 a {MAX_EVENTOS_POR_ENVIO} eventos. Recibidos: {len(signed_eventos)}"
+        )
+    did_bytes = str(did).encode("ascii")
+    if not did_bytes.isdigit() or len(did_bytes) > 15:
+        raise ValueError(f"dId inválido: {did!r}")
+    return b"".join(
+        [_XML_DECL, _RENVI_EVENTO_HEAD, did_bytes, _RENVI_EVENTO_MID, *signed_eventos, _RENVI_EVENTO_TAIL]
+    )
+
+
+def chunk_eventos(eventos: List[Any], size: int = MAX_EVENTOS_POR_ENVIO) -> List[List[Any]]:
+    """Divide la lista de eventos en grupos de hasta `size` (máximo 15 por rEnviEventoDe)."""
+    if not 1 <= size <= MAX_EVENTOS_POR_ENVIO:
+        raise ValueError(f"size debe estar entre 1 y {MAX_EVENTOS_POR_ENVIO}")
+    return [eventos[i:i + size] for i in range(0, len(eventos), size)]
+
+
+def parse_evento_response(xml_bytes: bytes) -> Dict[str, Any]:
+    """
+    Parsea rRetEnviEventoDe.
+
+    Returns:
+        Dict con d_fec_proc y resultados: lista de dicts con id, estado
+        (dEstRes), prot_aut, codigo y mensaje (primer gResProc)
+    """
+    if etree is None:
+        raise SifenClientError("lxml no está disponible")
+    try:
+        root = etree.fromstring(xml_bytes)
+    except Exception as e:
+        raise SifenClientError(f"Error al parsear respuesta XML de SIFEN: {e}") from e
+
+    def text(elem: Any, name: str) -> Optional[str]:
+        found = elem.xpath(f"*[local-name()='{name}']")
+        return found[0].text.strip() if found and found[0].text else None
+
+    result: Dict[str, Any] = {"d_fec_proc": None, "resultados": []}
+    ret = root.xpath("//*[local-name()='rRetEnviEventoDe']")
+    if not ret:
+        # Respuesta de error genérica (ej. rRetEnviDe/dCodRes fuera de rRetEnviEventoDe)
+        codes = root.xpath("//*[local-name()='dCodRes']/text()")
+        msgs = root.xpath("//*[local-name()='dMsgRes']/text()")
+        result["codigo"] = codes[0].strip() if codes else None
+        result["mensaje"] = msgs[0].strip() if msgs else None
+        return result
+
+    result["d_fec_proc"] = text(ret[0], "dFecProc")
+    for g in ret[0].xpath("*[local-name()='gResProcEVe']"):
+        res_proc = g.xpath("*[local-name()='gResProc']")
+        result["resultados"].append({
+            "id": text(g, "id"),
+            "estado": text(g, "dEstRes"),
+            "prot_aut": text(g, "dProtAut"),
+            "codigo": text(res_proc[0], "dCodRes") if res_proc else None,
+            "mensaje": text(res_proc[0], "dMsgRes") if res_proc else None,
+        })
+    return result
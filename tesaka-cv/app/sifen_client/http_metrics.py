@@ -0,0 +1,68 @@
+"""
+Tiempos HTTP por conexión de urllib3 (http_connect, http_tls, http_wait).
+
+Separado de metrics para que los timers (timed, timed_operation) no carguen
+requests/urllib3: solo lo importa quien arma una sesión HTTP.
+"""
+from time import perf_counter
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .metrics import STAGE_SECONDS
+
+
+class _TimedConnectionMixin:
+    _tcp_seconds = 0.0
+
+    def _new_conn(self):
+        start = perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._tcp_seconds = perf_counter() - start
+
+    def connect(self) -> None:
+        self._tcp_seconds = 0.0
+        start = perf_counter()
+        super().connect()
+        total = perf_counter() - start
+        STAGE_SECONDS.observe(self._tcp_seconds, stage="http_connect")
+        if isinstance(self, HTTPSConnection):
+            STAGE_SECONDS.observe(max(total - self._tcp_seconds, 0.0), stage="http_tls")
+
+    def getresponse(self, *args, **kwargs):
+        # Hasta tener los headers: el body se lee después (resp.content)
+        start = perf_counter()
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            STAGE_SECONDS.observe(perf_counter() - start, stage="http_wait")
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter que registra http_connect, http_tls y http_wait de cada request."""
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
@@ -8,7 +8,7 @@ from typing import Dict, Any, Optional
 from pathlib import Path
 import sys
 
-# Agregar tools al path para importar call_consulta_lote_raw
+# Agregar tools al path para importar call_consulta_lote_raw (en check_lote_status)
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from requests import Session
@@ -16,13 +16,6 @@ from lxml import etree
 
 logger = logging.getLogger(__name__)
 
-# Importar función de consulta desde tools y helper PKCS12
-try:
-    from tools.consulta_lote_de import call_consulta_lote_raw
-except ImportError:
-    logger.error("No se pudo importar call_consulta_lote_raw desde tools.consulta_lote_de")
-    raise
-
 # Importar helper PKCS12 desde módulo correcto
 try:
     from app.sifen_client.pkcs12_utils import p12_to_temp_pem_files
@@ -30,6 +23,9 @@ except ImportError:
     logger.error("No se pudo importar p12_to_temp_pem_files desde app.sifen_client.pkcs12_utils")
     raise
 
+from app.sifen_client.metrics import record_result_code, timed, timed_operation
+from app.sifen_client.response_parser import LoteResult, first_text, parse_consulta_lote
+
 
 def validate_prot_cons_lote(prot: str) -> bool:
     """
@@ -67,21 +63,8 @@ def parse_lote_response(xml_response: str) -> Dict[str, Any]:
 
     try:
         root = etree.fromstring(xml_response.encode("utf-8"))
-
-        def find_text(xpath_expr: str) -> Optional[str]:
-            try:
-                nodes = root.xpath(xpath_expr)
-                if nodes:
-                    val = nodes[0].text
-                    return val.strip() if val else None
-            except Exception:
-                return None
-            return None
-
-        # Buscar dCodResLot y dMsgResLot por local-name
-        result["cod_res_lot"] = find_text('//*[local-name()="dCodResLot"]')
-        result["msg_res_lot"] = find_text('//*[local-name()="dMsgResLot"]')
-
+        result["cod_res_lot"] = first_text(root, "dCodResLot")
+        result["msg_res_lot"] = first_text(root, "dMsgResLot")
         result["ok"] = True
 
     except Exception as e:
@@ -91,6 +74,7 @@ def parse_lote_response(xml_response: str) -> Dict[str, Any]:
     return result
 
 
+@timed_operation("check_lote_status")
 def check_lote_status(
     env: str,
     prot: str,
@@ -139,6 +123,14 @@ def check_lote_status(
                 "error": str(e),
             }
 
+    # Import diferido: tools.consulta_lote_de carga zeep, que este módulo no necesita
+    # hasta consultar (los pollers e importadores livianos no lo pagan al arrancar)
+    try:
+        from tools.consulta_lote_de import call_consulta_lote_raw
+    except ImportError:
+        logger.error("No se pudo importar call_consulta_lote_raw desde tools.consulta_lote_de")
+        raise
+
     # Convertir P12 a PEM temporales (una sola vez, no por cada reintento)
     cert_path = None
     key_path = None
@@ -222,14 +214,28 @@ def check_lote_status(
                     raise
 
         # Parsear respuesta
-        parsed = parse_lote_response(xml_response)
+        # Una sola pasada: código del lote y resultados por DE (streaming si es grande)
+        with timed("response_parse"):
+            try:
+                parsed = parse_consulta_lote(xml_response)
+            except etree.XMLSyntaxError as e:
+                logger.warning(f"Error al parsear respuesta XML del lote {prot}: {e}")
+                parsed = LoteResult(cod_res_lot=None, msg_res_lot=None, de_results=[])
+
+            result = {
+                "success": True,
+                "cod_res_lot": parsed.cod_res_lot,
+                "msg_res_lot": parsed.msg_res_lot,
+                "response_xml": xml_response,
+                "de_results": [],
+            }
+            if parsed.cod_res_lot == "0362":
+                result["de_results"] = [de_result.as_dict() for de_result in parsed.de_results]
 
-        result = {
-            "success": True,
-            "cod_res_lot": parsed.get("cod_res_lot"),
-            "msg_res_lot": parsed.get("msg_res_lot"),
-            "response_xml": xml_response,
-        }
+        record_result_code("dCodResLot", parsed.cod_res_lot)
+        for de_result in result["de_results"]:
+            for resultado in de_result["resultados"]:
+                record_result_code("dCodRes", resultado.get("codigo"))
 
         return result
 
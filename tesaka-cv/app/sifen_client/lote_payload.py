@@ -0,0 +1,191 @@
+"""
+Armado sin copias del payload siRecepLoteDE (ZIP -> Base64 -> envelope SOAP).
+
+El camino anterior hacía varias copias completas del lote por envío:
+lote.xml -> ZIP bytes -> str Base64 -> str rEnvioLote -> .encode() -> re-parse
+-> etree.tostring -> envelope bytes.
+
+Acá el ZIP se escribe por bloques en un BytesIO (se lee con getbuffer(), sin
+copiar), y el Base64 se codifica por bloques directamente dentro de un
+bytearray preasignado con el tamaño exacto del envelope. El resultado se
+entrega como memoryview a la capa HTTP (requests lo envía tal cual).
+"""
+import binascii
+import random
+import re
+import tracemalloc
+import zipfile
+from datetime import datetime
+from io import BytesIO
+from typing import Any, Dict, Optional, Union
+
+from .soap_templates import (
+    RECEPCION_LOTE_HEAD,
+    RECEPCION_LOTE_MID,
+    RECEPCION_LOTE_TAIL,
+    SIFEN_NS,
+    XML_DECL,
+)
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# Bloque de entrada para Base64 (múltiplo de 3 => sin padding intermedio)
+B64_CHUNK = 3 * 16384
+ZIP_CHUNK = 64 * 1024
+
+_DID_RE = re.compile(r"<(?:[\w.-]+:)?dId>\s*(\d+)\s*</")
+_R_ENVIO_LOTE_OPEN = b"<xsd:rEnvioLote>"
+_R_ENVIO_LOTE_START = len(RECEPCION_LOTE_HEAD) - len(_R_ENVIO_LOTE_OPEN + b"<xsd:dId>")
+_SOAP_BODY_TAIL = b"</soap:Body></soap:Envelope>"
+
+
+def make_did() -> str:
+    """dId de 15 dígitos: YYYYMMDDHHMMSS + 1 dígito aleatorio (igual que build_r_envio_lote_xml)."""
+    return datetime.now().strftime("%Y%m%d%H%M%S") + str(random.randint(0, 9))
+
+
+def b64_len(n: int) -> int:
+    """Largo del Base64 estándar (con padding, sin saltos de línea) de n bytes."""
+    return 4 * ((n + 2) // 3)
+
+
+def zip_lote(lote_xml: BytesLike) -> memoryview:
+    """
+    Comprime lote.xml en un ZIP (ZIP_DEFLATED, mismo formato que writestr).
+
+    Returns:
+        memoryview sobre el buffer del BytesIO (sin copia final con getvalue())
+    """
+    data = memoryview(lote_xml)
+    mem = BytesIO()
+    with zipfile.ZipFile(mem, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zinfo = zipfile.ZipInfo("lote.xml", date_time=datetime.now().timetuple()[:6])
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.external_attr = 0o600 << 16
+        zinfo.file_size = len(data)
+        with zf.open(zinfo, mode="w") as dest:
+            for i in range(0, len(data), ZIP_CHUNK):
+                dest.write(data[i:i + ZIP_CHUNK])
+    return mem.getbuffer()
+
+
+def assemble_lote_envelope(did: Union[int, str], zip_data: BytesLike) -> memoryview:
+    """
+    Arma el envelope siRecepLoteDE en un único bytearray preasignado.
+
+    El Base64 del ZIP se codifica por bloques de B64_CHUNK bytes directamente
+    en su posición final dentro del envelope.
+
+    Args:
+        did: dId del envío (solo dígitos)
+        zip_data: ZIP del lote (bytes, bytearray o memoryview)
+
+    Returns:
+        memoryview del envelope completo (byte a byte igual a soap_templates.recepcion_lote)
+    """
+    did_bytes = str(did).encode("ascii")
+    if not did_bytes.isdigit():
+        raise ValueError(f"dId debe ser numérico: {did!r}")
+
+    src = memoryview(zip_data)
+    n_b64 = b64_len(len(src))
+    total = (
+        len(RECEPCION_LOTE_HEAD) + len(did_bytes) + len(RECEPCION_LOTE_MID)
+        + n_b64 + len(RECEPCION_LOTE_TAIL)
+    )
+    buf = bytearray(total)
+
+    pos = 0
+    for part in (RECEPCION_LOTE_HEAD, did_bytes, RECEPCION_LOTE_MID):
+        buf[pos:pos + len(part)] = part
+        pos += len(part)
+
+    for i in range(0, len(src), B64_CHUNK):
+        encoded = binascii.b2a_base64(src[i:i + B64_CHUNK], newline=False)
+        buf[pos:pos + len(encoded)] = encoded
+        pos += len(encoded)
+
+    buf[pos:] = RECEPCION_LOTE_TAIL
+    return memoryview(buf)
+
+
+def build_lote_envelope(lote_xml: BytesLike, did: Union[int, str, None] = None) -> memoryview:
+    """ZIP + Base64 + envelope siRecepLoteDE en un solo paso (ver assemble_lote_envelope)."""
+    return assemble_lote_envelope(did if did is not None else make_did(), zip_lote(lote_xml))
+
+
+def payload_did(payload_xml: Union[str, BytesLike]) -> Optional[str]:
+    """dId de un rEnvioLote/rEnviDe/envelope sin parsear el documento (None si no tiene)."""
+    if not isinstance(payload_xml, str):
+        payload_xml = bytes(memoryview(payload_xml)[:4096]).decode("ascii", errors="replace")
+    match = _DID_RE.search(payload_xml)
+    return match.group(1) if match else None
+
+
+def r_envio_lote_xml(envelope: BytesLike) -> str:
+    """
+    rEnvioLote de un envelope de assemble_lote_envelope, como documento propio.
+
+    Es lo que efectivamente se envió, con el mismo formato que
+    build_r_envio_lote_xml (para guardarlo como sirecepde_xml).
+    """
+    body = memoryview(envelope)[_R_ENVIO_LOTE_START:-len(_SOAP_BODY_TAIL)]
+    head = XML_DECL + f'<xsd:rEnvioLote xmlns:xsd="{SIFEN_NS}">'.encode("ascii")
+    return (head + body[len(_R_ENVIO_LOTE_OPEN):].tobytes()).decode("ascii")
+
+
+def _legacy_envelope(lote_xml: bytes, did: str) -> bytes:
+    """Camino anterior (build_r_envio_lote_xml + recepcion_lote), solo para medir."""
+    import base64
+    import lxml.etree as etree
+    from .soap_templates import SIFEN_NS, SOAP12_NS
+
+    mem = BytesIO()
+    with zipfile.ZipFile(mem, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("lote.xml", lote_xml)
+    zip_bytes = mem.getvalue()
+    xde_b64 = base64.b64encode(zip_bytes).decode("ascii")
+
+    r_envio_lote = etree.Element(etree.QName(SIFEN_NS, "rEnvioLote"), nsmap={"xsd": SIFEN_NS})
+    etree.SubElement(r_envio_lote, etree.QName(SIFEN_NS, "dId")).text = did
+    etree.SubElement(r_envio_lote, etree.QName(SIFEN_NS, "xDE")).text = xde_b64
+    payload_xml = etree.tostring(r_envio_lote, xml_declaration=True, encoding="utf-8").decode("utf-8")
+
+    xml_root = etree.fromstring(payload_xml.encode("utf-8"))
+    envelope = etree.Element(f"{{{SOAP12_NS}}}Envelope", nsmap={"soap": SOAP12_NS, "xsd": SIFEN_NS})
+    etree.SubElement(envelope, f"{{{SOAP12_NS}}}Header")
+    body = etree.SubElement(envelope, f"{{{SOAP12_NS}}}Body")
+    prefixed = etree.SubElement(body, etree.QName(SIFEN_NS, "rEnvioLote"))
+    for child in xml_root:
+        etree.SubElement(prefixed, etree.QName(SIFEN_NS, etree.QName(child).localname)).text = child.text
+    return etree.tostring(envelope, xml_declaration=True, encoding="UTF-8", pretty_print=False)
+
+
+def measure(lote_xml: bytes) -> Dict[str, Any]:
+    """
+    Mide el pico de memoria Python (tracemalloc) del armado anterior vs. el actual.
+
+    Nota: tracemalloc no ve las copias internas de libxml2 del camino anterior,
+    así que la diferencia real de RSS es mayor (ver tools/bench_lote_payload.py).
+
+    Returns:
+        Dict con lote_bytes, envelope_bytes, legacy_peak y zero_copy_peak (bytes)
+    """
+    did = make_did()
+    result: Dict[str, Any] = {"lote_bytes": len(lote_xml)}
+
+    tracemalloc.start()
+    legacy = _legacy_envelope(lote_xml, did)
+    result["legacy_peak"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    legacy_len = len(legacy)
+    del legacy
+
+    tracemalloc.start()
+    envelope = build_lote_envelope(lote_xml, did)
+    result["zero_copy_peak"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result["envelope_bytes"] = len(envelope)
+    result["same_size"] = len(envelope) == legacy_len
+    return result
@@ -0,0 +1,342 @@
+"""
+Métricas de latencia y códigos de resultado SIFEN (formato texto Prometheus)
+
+Registro propio, sin dependencias: histogramas y contadores con labels,
+seguros entre threads, que se exponen en GET /metrics (install_metrics) o se
+vuelcan a archivo desde los CLIs (dump / dump_at_exit).
+
+Métricas:
+- sifen_stage_seconds{stage}: etapas del camino caliente. parse (XML de
+  entrada), sign, zip, validate (XSD), http_connect (TCP), http_tls
+  (handshake), http_wait (request enviado -> headers de respuesta; los tres
+  con http_metrics.TimedHTTPAdapter) y response_parse (extracción de campos
+  de la respuesta).
+- sifen_operation_seconds{operation,outcome}: duración total de cada operación
+  (build_and_sign_lote, preflight, recepcion_lote, check_lote_status, ...).
+- sifen_result_codes_total{field,code}: dCodRes / dCodResLot recibidos.
+- http_request_duration_seconds{app,method,route,status}: handlers FastAPI,
+  por template de ruta (no por URL, para acotar la cardinalidad).
+
+Las métricas viven en memoria del proceso: con varios workers de uvicorn cada
+uno expone las suyas, y lo que corre en el pool de procesos (run_cpu) no se
+registra acá.
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Segundos: de sub-milisegundo (parse/zip) a timeouts de SIFEN
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels {sorted(labels)} != {sorted(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    """Contador monótono por combinación de labels."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in series]
+
+    def samples(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in series]
+
+
+class Histogram(_Metric):
+    """Histograma acumulativo (buckets fijos, suma y cantidad) por combinación de labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [conteo por bucket (el último es +Inf), suma]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, **labels: Any) -> "_Timer":
+        """Context manager / decorador que observa la duración del bloque."""
+        return _Timer(self, labels)
+
+    def _cumulative(self, counts: List[int]) -> List[int]:
+        total, out = 0, []
+        for count in counts:
+            total += count
+            out.append(total)
+        return out
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = self._cumulative(counts)
+            for bound, count in zip(self.buckets + (float("inf"),), cumulative):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative[-1]}")
+        return lines
+
+    def samples(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        out = []
+        for key, (counts, total) in series:
+            cumulative = self._cumulative(counts)
+            out.append({
+                "labels": dict(zip(self.labelnames, key)),
+                "count": cumulative[-1],
+                "sum": total,
+                "buckets": {_format_value(b): c for b, c in zip(self.buckets + (float("inf"),), cumulative)},
+            })
+        return out
+
+
+class Registry:
+    """Conjunto de métricas que se renderizan juntas."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            metric.name: {"type": metric.kind, "help": metric.help, "samples": metric.samples()}
+            for metric in self._metrics
+        }
+
+    def clear(self) -> None:
+        for metric in self._metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "sifen_stage_seconds", "Duración de cada etapa del envío/consulta a SIFEN", ("stage",)))
+OPERATION_SECONDS = REGISTRY.register(Histogram(
+    "sifen_operation_seconds", "Duración total de cada operación SIFEN", ("operation", "outcome")))
+RESULT_CODES = REGISTRY.register(Counter(
+    "sifen_result_codes_total", "Códigos de resultado recibidos de SIFEN", ("field", "code")))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Duración de los requests HTTP atendidos por FastAPI",
+    ("app", "method", "route", "status")))
+
+
+class _Timer:
+    """Mide un bloque (with) o cada llamada a una función (decorador)."""
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any], outcome: bool = False):
+        self._histogram = histogram
+        self._labels = labels
+        self._outcome = outcome
+        self._start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = perf_counter() - self._start
+        labels = dict(self._labels)
+        if self._outcome:
+            labels["outcome"] = "error" if exc_type is not None else "ok"
+        self._histogram.observe(elapsed, **labels)
+        return False
+
+    def __call__(self, fn: Callable) -> Callable:
+        # Un _Timer nuevo por llamada: el decorador es reentrante y thread-safe
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(self._histogram, self._labels, self._outcome):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def timed(stage: str) -> _Timer:
+    """`with timed("sign"):` o `@timed("validate")` -> sifen_stage_seconds."""
+    return _Timer(STAGE_SECONDS, {"stage": stage})
+
+
+def timed_operation(operation: str) -> _Timer:
+    """Como timed(), para sifen_operation_seconds (outcome=ok|error según si hubo excepción)."""
+    return _Timer(OPERATION_SECONDS, {"operation": operation}, outcome=True)
+
+
+def record_result_code(field: str, code: Optional[str]) -> None:
+    """Cuenta un dCodRes/dCodResLot recibido (ignora vacíos)."""
+    if code:
+        RESULT_CODES.inc(field=field, code=code.strip())
+
+
+# ---------------------------------------------------------------------------
+# Exposición: /metrics y volcado a archivo
+# ---------------------------------------------------------------------------
+
+def render_prometheus() -> str:
+    """Todas las métricas en formato texto Prometheus 0.0.4."""
+    return REGISTRY.render()
+
+
+def snapshot() -> Dict[str, Any]:
+    """Todas las métricas como dict (para JSON)."""
+    return REGISTRY.snapshot()
+
+
+def dump(path: Union[str, Path]) -> Path:
+    """Escribe las métricas en path: JSON si termina en .json, texto Prometheus si no."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".json":
+        path.write_text(json.dumps(snapshot(), indent=2, ensure_ascii=False), encoding="utf-8")
+    else:
+        path.write_text(render_prometheus(), encoding="utf-8")
+    return path
+
+
+def dump_at_exit(path: Union[str, Path]) -> None:
+    """Registra el volcado de métricas al terminar el proceso (CLIs: --metrics-out)."""
+    def _dump():
+        try:
+            logger.info(f"Métricas guardadas en {dump(path)}")
+        except OSError as e:
+            logger.warning(f"No se pudieron guardar las métricas en {path}: {e}")
+
+    atexit.register(_dump)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide cada request HTTP por template de ruta y status."""
+
+    def __init__(self, app, app_name: str):
+        self.app = app
+        self.app_name = app_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # El router deja la ruta resuelta en el scope; sin ruta no se usa el path crudo
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                perf_counter() - start,
+                app=self.app_name, method=scope["method"], route=route, status=status,
+            )
+
+
+def install_metrics(app, app_name: str, path: str = "/metrics") -> Optional[Registry]:
+    """
+    Agrega el middleware de latencia HTTP y la ruta con las métricas en formato
+    Prometheus. Se desactiva con METRICS_ENDPOINT=0.
+    """
+    if os.getenv("METRICS_ENDPOINT", "1") == "0":
+        return None
+
+    from starlette.responses import Response
+
+    # async: responde desde el loop aunque el threadpool esté saturado
+    async def metrics_endpoint():
+        return Response(render_prometheus(), media_type=CONTENT_TYPE)
+
+    app.add_middleware(MetricsMiddleware, app_name=app_name)
+    app.add_api_route(path, metrics_endpoint, methods=["GET"], include_in_schema=False)
+    app.state.metrics = REGISTRY
+    return REGISTRY
@@ -127,35 +127,50 @@ class QRGenerator:
                 str(d_dv_emi)
             )
             
-            # Paso 2: Concatenar CSC (SOLO para generar hash)
-            datos_con_csc = datos + self.csc
-            
-            # Paso 3: Generar hash SHA-256
-            hash_obj = hashlib.sha256(datos_con_csc.encode('utf-8'))
-            hash_hex = hash_obj.hexdigest().upper()
-            
-            # Paso 4: Construir URL final (SIN CSC)
-            # Formato: URL_BASE + datos + &cHashQR=hash
-            url_params = f"{datos}&cHashQR={hash_hex}"
-            url_final = self.qr_url_base + url_params
-            
-            # Paso 5: Escapar para XML
-            url_xml = url_final.replace('&', '&amp;')
+            # Pasos 2 a 5
+            result = self.build_url(datos)
             
             logger.info(f"QR generado exitosamente para documento {d_id}")
             # NO loggear CSC ni datos sensibles
             
-            return {
-                'url': url_final,
-                'url_xml': url_xml,
-                'hash': hash_hex,
-                'datos': datos,  # Datos sin CSC (seguro para logs)
-                'csc_id': self.csc_id  # ID del CSC (no es secreto)
-            }
+            return result
         
         except Exception as e:
             raise QRGeneratorError(f"Error al generar QR: {str(e)}")
     
+    @staticmethod
+    def hash_qr(datos: str, csc: str) -> str:
+        """
+        cHashQR: SHA-256 de los datos concatenados con el CSC, en hexadecimal
+        mayúsculas. Única regla de hash del QR (DE y KuDE).
+        """
+        return hashlib.sha256((datos + csc).encode('utf-8')).hexdigest().upper()
+    
+    def build_url(self, datos: str) -> dict:
+        """
+        Arma la URL QR a partir de los datos ya concatenados (pasos 2 a 5).
+        
+        Returns:
+            Mismo diccionario que generate()
+        """
+        # Pasos 2 y 3: hash SHA-256 de datos + CSC (el CSC SOLO se usa para el hash)
+        hash_hex = self.hash_qr(datos, self.csc)
+        
+        # Paso 4: Construir URL final (SIN CSC)
+        # Formato: URL_BASE + datos + &cHashQR=hash
+        url_final = self.qr_url_base + f"{datos}&cHashQR={hash_hex}"
+        
+        # Paso 5: Escapar para XML
+        url_xml = url_final.replace('&', '&amp;')
+        
+        return {
+            'url': url_final,
+            'url_xml': url_xml,
+            'hash': hash_hex,
+            'datos': datos,  # Datos sin CSC (seguro para logs)
+            'csc_id': self.csc_id  # ID del CSC (no es secreto)
+        }
+    
     def sanitize_for_logging(self, url: str) -> str:
         """
         Sanitiza una URL para logging (remueve cualquier referencia a CSC)
@@ -0,0 +1,227 @@
+"""
+Parsing de respuestas SIFEN con XPath precompilado
+
+Los campos de las respuestas vienen en el namespace SIFEN (o sin namespace en
+algunos ejemplos y mocks). En lugar de recorrer todo el árbol con
+`//*[local-name()="campo"]` cada vez, cada búsqueda es un etree.XPath
+compilado una sola vez con el mapa de namespaces (`s:campo | campo`).
+
+Consulta de lote (siConsLoteDE), dos modos:
+- árbol: parsea el documento completo; es lo más rápido para respuestas chicas.
+- streaming (iterparse): procesa cada gResProcLote al terminar de leerlo y lo
+  libera, sin armar el árbol completo. Se usa por encima de STREAM_THRESHOLD
+  bytes (SIFEN_PARSE_STREAM_BYTES) o pidiéndolo con stream=True.
+
+Los resultados son registros compactos (NamedTuple). as_dict() devuelve el
+formato de dict que ya usan lote_checker, de_trace y la web.
+"""
+import os
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from lxml import etree
+
+SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
+NSMAP = {"s": SIFEN_NS}
+
+# Por encima de este tamaño la consulta de lote se parsea en streaming
+STREAM_THRESHOLD = int(os.getenv("SIFEN_PARSE_STREAM_BYTES", str(512 * 1024)))
+
+# Resultado por DE: gResProcLote (SIFEN) o, en el formato plano de algunos
+# ejemplos, un gResProc con id propio
+_LOTE_ENTRIES = etree.XPath(
+    "//s:gResProcLote | //gResProcLote | //s:gResProc[s:id] | //gResProc[id]",
+    namespaces=NSMAP,
+)
+_ENTRY_TAGS = tuple(
+    tag for name in ("gResProcLote", "gResProc") for tag in (f"{{{SIFEN_NS}}}{name}", name)
+)
+_LOTE_HEADER_TAGS = tuple(
+    tag for name in ("dCodResLot", "dMsgResLot") for tag in (f"{{{SIFEN_NS}}}{name}", name)
+)
+
+
+class LoteDEResult(NamedTuple):
+    """Resultado de un DE dentro de una consulta de lote."""
+    cdc: Optional[str]
+    estado: Optional[str]
+    prot_aut: Optional[str]
+    fec_proc: Optional[str]
+    resultados: Tuple[Tuple[Optional[str], Optional[str]], ...]  # (dCodRes, dMsgRes) por gResProc
+
+    @property
+    def codigos(self) -> List[str]:
+        return [codigo for codigo, _ in self.resultados if codigo]
+
+    @property
+    def mensajes(self) -> List[str]:
+        return [mensaje for _, mensaje in self.resultados if mensaje]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Formato de de_results en lote_checker.check_lote_status."""
+        return {
+            "cdc": self.cdc,
+            "estado": self.estado,
+            "prot_aut": self.prot_aut,
+            "resultados": [{"codigo": codigo, "mensaje": mensaje} for codigo, mensaje in self.resultados],
+        }
+
+
+class LoteResult(NamedTuple):
+    """Respuesta de siConsLoteDE: código del lote y resultados por DE."""
+    cod_res_lot: Optional[str]
+    msg_res_lot: Optional[str]
+    de_results: List[LoteDEResult]
+
+
+class RecepcionResult(NamedTuple):
+    """Campos de una respuesta siRecepDE / siRecepLoteDE."""
+    cod_res: Optional[str]
+    msg_res: Optional[str]
+    est_res: Optional[str]
+    cdc: Optional[str]
+    prot_cons_lote: Optional[str]
+    tpo_proces: Optional[str]
+
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return value.strip() or None
+
+
+@lru_cache(maxsize=None)
+def _first_text_xpath(field: str) -> etree.XPath:
+    return etree.XPath(f"(//s:{field} | //{field})[1]/text()", namespaces=NSMAP, smart_strings=False)
+
+
+def first_text(root: Any, field: str) -> Optional[str]:
+    """Texto (sin espacios) del primer elemento `field` del documento, con o sin namespace SIFEN."""
+    nodes = _first_text_xpath(field)(root)
+    return _clean(nodes[0]) if nodes else None
+
+
+def _to_bytes(xml: Union[str, bytes]) -> bytes:
+    return xml.encode("utf-8") if isinstance(xml, str) else xml
+
+
+def _localname(tag: Any) -> Optional[str]:
+    return tag.rpartition("}")[2] if isinstance(tag, str) else None
+
+
+def _entry_record(entry: Any) -> LoteDEResult:
+    """Arma el registro de un gResProcLote recorriendo solo sus hijos directos."""
+    fields: Dict[str, Optional[str]] = {}
+    resultados = []
+    for child in entry:
+        name = _localname(child.tag)
+        if name == "gResProc":
+            codigo = mensaje = None
+            for item in child:
+                item_name = _localname(item.tag)
+                if item_name == "dCodRes":
+                    codigo = _clean(item.text)
+                elif item_name == "dMsgRes":
+                    mensaje = _clean(item.text)
+            resultados.append((codigo, mensaje))
+        elif name is not None and name not in fields:
+            fields[name] = _clean(child.text)
+    return LoteDEResult(
+        cdc=fields.get("id"),
+        estado=fields.get("dEstRes"),
+        prot_aut=fields.get("dProtAut"),
+        fec_proc=fields.get("dFecProc"),
+        resultados=tuple(resultados),
+    )
+
+
+def _is_entry(elem: Any) -> bool:
+    if _localname(elem.tag) == "gResProcLote":
+        return True
+    # gResProc con id propio (formato plano); los gResProc de mensajes no tienen id
+    return any(_localname(child.tag) == "id" for child in elem)
+
+
+def _stream_lote(xml_bytes: bytes) -> Iterator[Tuple[str, Any]]:
+    """
+    Recorre la respuesta con iterparse. Emite ("dCodResLot"/"dMsgResLot", texto)
+    y ("entry", LoteDEResult) a medida que se leen; cada entrada se libera al
+    procesarla, así la memoria no crece con la cantidad de DEs.
+    """
+    context = etree.iterparse(
+        BytesIO(xml_bytes), events=("end",), tag=_ENTRY_TAGS + _LOTE_HEADER_TAGS,
+        resolve_entities=False,
+    )
+    for _, elem in context:
+        name = _localname(elem.tag)
+        if name in ("dCodResLot", "dMsgResLot"):
+            yield name, _clean(elem.text)
+            continue
+        if name == "gResProc" and not _is_entry(elem):
+            # gResProc de mensajes: lo procesa su gResProcLote al terminar
+            continue
+        yield "entry", _entry_record(elem)
+        elem.clear()
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def iter_lote_de_results(xml: Union[str, bytes], stream: Optional[bool] = None) -> Iterator[LoteDEResult]:
+    """
+    Resultados por DE de una respuesta siConsLoteDE, en el orden de la respuesta.
+
+    stream=None elige el modo según el tamaño (STREAM_THRESHOLD). Lanza
+    etree.XMLSyntaxError si el XML está mal formado.
+    """
+    xml_bytes = _to_bytes(xml)
+    if stream is None:
+        stream = len(xml_bytes) > STREAM_THRESHOLD
+    if stream:
+        for kind, value in _stream_lote(xml_bytes):
+            if kind == "entry":
+                yield value
+        return
+    root = etree.fromstring(xml_bytes)
+    for entry in _LOTE_ENTRIES(root):
+        yield _entry_record(entry)
+
+
+def parse_consulta_lote(xml: Union[str, bytes], stream: Optional[bool] = None) -> LoteResult:
+    """
+    dCodResLot, dMsgResLot y resultados por DE de una respuesta siConsLoteDE
+    en una sola pasada. Lanza etree.XMLSyntaxError si el XML está mal formado.
+    """
+    xml_bytes = _to_bytes(xml)
+    if stream is None:
+        stream = len(xml_bytes) > STREAM_THRESHOLD
+    if not stream:
+        root = etree.fromstring(xml_bytes)
+        return LoteResult(
+            cod_res_lot=first_text(root, "dCodResLot"),
+            msg_res_lot=first_text(root, "dMsgResLot"),
+            de_results=[_entry_record(entry) for entry in _LOTE_ENTRIES(root)],
+        )
+
+    header: Dict[str, Optional[str]] = {}
+    de_results = []
+    for kind, value in _stream_lote(xml_bytes):
+        if kind == "entry":
+            de_results.append(value)
+        else:
+            header.setdefault(kind, value)
+    return LoteResult(header.get("dCodResLot"), header.get("dMsgResLot"), de_results)
+
+
+def parse_recepcion(root: Any) -> RecepcionResult:
+    """Campos de la respuesta de recepción (siRecepDE / siRecepLoteDE) ya parseada."""
+    return RecepcionResult(
+        cod_res=first_text(root, "dCodRes"),
+        msg_res=first_text(root, "dMsgRes"),
+        est_res=first_text(root, "dEstRes"),
+        cdc=first_text(root, "Id") or first_text(root, "cdc"),
+        prot_cons_lote=first_text(root, "dProtConsLote"),
+        tpo_proces=first_text(root, "dTpoProces"),
+    )
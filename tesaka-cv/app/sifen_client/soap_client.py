@@ -14,6 +14,7 @@ Notas importantes:
 """
 
 import os
+import importlib.util
 import logging
 import time
 from typing import Dict, Any, Optional, List, TYPE_CHECKING
@@ -29,24 +30,34 @@ except ImportError:
 if TYPE_CHECKING:
     from lxml.etree import _Element as etree_type  # noqa: F401
 
-try:
-    from zeep import Client, Settings
-    from zeep.transports import Transport
-    from zeep.exceptions import Fault, TransportError
-    from zeep.helpers import serialize_object
-
-    ZEEP_AVAILABLE = True
-except ImportError:
-    ZEEP_AVAILABLE = False
-    serialize_object = None
-    Client = None
-    Settings = None
-    Transport = None
-    Fault = Exception
-    TransportError = Exception
+# zeep se carga de forma diferida (_load_zeep): solo lo usan consulta_lote_de y el
+# diagnóstico de WSDL. Los envíos/consultas RAW usan soap_templates.
+ZEEP_AVAILABLE = importlib.util.find_spec("zeep") is not None
+serialize_object = None
+Client = None
+Settings = None
+Transport = None
+Fault = Exception
+TransportError = Exception
+
+
+def _load_zeep() -> None:
+    """Importa zeep la primera vez que se necesita (Client, Transport, Fault, ...)."""
+    global Client, Settings, Transport, Fault, TransportError, serialize_object
+    if Client is not None:
+        return
+    if not ZEEP_AVAILABLE:
+        raise SifenClientError("zeep no está instalado. Instale con: pip install zeep")
+    from zeep import Client as _Client, Settings as _Settings
+    from zeep.transports import Transport as _Transport
+    from zeep.exceptions import Fault as _Fault, TransportError as _TransportError
+    from zeep.helpers import serialize_object as _serialize_object
+
+    Client, Settings, Transport = _Client, _Settings, _Transport
+    Fault, TransportError = _Fault, _TransportError
+    serialize_object = _serialize_object
 
 from requests import Session
-from requests.adapters import HTTPAdapter
 import requests
 
 from .config import SifenConfig, get_mtls_cert_path_and_password
@@ -55,6 +66,10 @@ from .exceptions import (
     SifenSizeLimitError,
 )
 from .pkcs12_utils import p12_to_temp_pem_files, cleanup_pem_files, PKCS12Error
+from .http_metrics import TimedHTTPAdapter
+from .metrics import record_result_code, timed, timed_operation
+from .response_parser import first_text, parse_recepcion
+from . import soap_templates
 
 try:
     from .wsdl_introspect import inspect_wsdl, save_wsdl_inspection
@@ -92,17 +107,21 @@ ERROR_CODES = {
 }
 
 
+class RawTransport:
+    """Sesión requests con mTLS + timeouts (misma interfaz `.session` que el Transport de zeep)."""
+
+    def __init__(self, session: Session, timeout: Any, operation_timeout: Optional[int] = None):
+        self.session = session
+        self.timeout = timeout
+        self.operation_timeout = operation_timeout
+
+
 class SoapClient:
     """Cliente SOAP 1.2 (document/literal) para SIFEN, con mTLS."""
 
     def __init__(self, config: SifenConfig):
         self.config = config
 
-        if not ZEEP_AVAILABLE:
-            raise SifenClientError(
-                "zeep no está instalado. Instale con: pip install zeep"
-            )
-
         # Timeouts / retries
         self.connect_timeout = int(os.getenv("SIFEN_SOAP_TIMEOUT_CONNECT", "15"))
         self.read_timeout = int(os.getenv("SIFEN_SOAP_TIMEOUT_READ", "45"))
@@ -118,7 +137,9 @@ class SoapClient:
 
         # Cache
         self.clients: Dict[str, Any] = {}  # Client de Zeep
+        self._zeep_transport: Any = None
         self._soap_address: Dict[str, str] = {}
+        self._endpoints: Optional[Dict[str, str]] = None
 
         # PEM temporales (si se convierten desde P12)
         self._temp_pem_files: Optional[tuple[str, str]] = None
@@ -246,8 +267,8 @@ class SoapClient:
     # ---------------------------------------------------------------------
     # Transport (mTLS)
     # ---------------------------------------------------------------------
-    def _create_transport(self) -> Any:  # Transport de Zeep
-        """Crea el transporte Zeep con requests.Session configurada para mTLS."""
+    def _create_transport(self) -> RawTransport:
+        """Crea el transporte (requests.Session configurada para mTLS)."""
         session = Session()
 
         # Modo 1: PEM directo (prioridad)
@@ -344,18 +365,35 @@ class SoapClient:
         session.verify = True
         ca_bundle_path = getattr(self.config, "ca_bundle_path", None)
         if ca_bundle_path:
-            session.verify = ca_bundle_path
+            # str: requests ignora un Path en verify y cae al bundle por defecto
+            session.verify = str(ca_bundle_path)
 
-        session.mount("https://", HTTPAdapter())
+        session.mount("https://", TimedHTTPAdapter())
 
-        # Transport está disponible porque ZEEP_AVAILABLE es True (verificado en __init__)
-        # timeout puede ser int o tuple (connect, read) según requests/zeep
-        return Transport(  # type: ignore[arg-type]
+        return RawTransport(
             session=session,
-            timeout=(self.connect_timeout, self.read_timeout),  # type: ignore[arg-type]
+            timeout=(self.connect_timeout, self.read_timeout),
             operation_timeout=self.read_timeout,
         )
 
+    def _get_zeep_transport(self) -> Any:  # Transport de Zeep
+        """Transport de zeep sobre la misma sesión mTLS (solo para Client WSDL-driven)."""
+        if self._zeep_transport is None:
+            _load_zeep()
+            # timeout puede ser int o tuple (connect, read) según requests/zeep
+            self._zeep_transport = Transport(  # type: ignore[misc]
+                session=self.transport.session,
+                timeout=self.transport.timeout,  # type: ignore[arg-type]
+                operation_timeout=self.transport.operation_timeout,
+            )
+        return self._zeep_transport
+
+    def _endpoint(self, service_key: str) -> str:
+        """URL de POST del servicio (tabla resuelta una sola vez desde config)."""
+        if self._endpoints is None:
+            self._endpoints = soap_templates.build_endpoint_table(self.config)
+        return self._endpoints[service_key]
+
     # ---------------------------------------------------------------------
     # Zeep client (solo para WSDL/address)
     # ---------------------------------------------------------------------
@@ -464,6 +502,7 @@ class SoapClient:
         wsdl_url_final = self._normalize_wsdl_url(wsdl_url)
 
         logger.info(f"Cargando WSDL para servicio '{service_key}': {wsdl_url_final}")
+        _load_zeep()
 
         # Validar acceso al WSDL antes de intentar cargarlo con zeep
         try:
@@ -484,10 +523,9 @@ class SoapClient:
                     self._history_plugins = {}
                 self._history_plugins[service_key] = history
 
-            # Client y Settings están disponibles porque ZEEP_AVAILABLE es True (verificado en __init__)
             client = Client(  # type: ignore
                 wsdl=wsdl_url_final,
-                transport=self.transport,
+                transport=self._get_zeep_transport(),
                 settings=Settings(strict=False, xml_huge_tree=True),  # type: ignore
                 plugins=plugins or None,
             )
@@ -544,8 +582,8 @@ class SoapClient:
     # ---------------------------------------------------------------------
     # Size validation
     # ---------------------------------------------------------------------
-    def _validate_size(self, service: str, content: str) -> None:
-        size = len(content.encode("utf-8"))
+    def _validate_size(self, service: str, content: "str | bytes | memoryview") -> None:
+        size = len(content.encode("utf-8")) if isinstance(content, str) else len(content)
         limit = SIZE_LIMITS.get(service)
         if limit and size > limit:
             error_code = {
@@ -806,21 +844,8 @@ class SoapClient:
             r_envi_de_bytes: XML bytes a embeder (rEnviDe, rEnvioLote, rEnviConsLoteDe, etc.)
             action: Acción SOAP (opcional, para headers)
         """
-        import lxml.etree as etree  # noqa: F401
-
-        # Envelope SOAP 1.2
-        envelope = etree.Element(f"{{{SOAP_NS}}}Envelope", nsmap={"soap-env": SOAP_NS})
-        body = etree.SubElement(envelope, f"{{{SOAP_NS}}}Body")
-
-        # Parsear el rEnviDe original y embederlo directamente (sin modificar)
-        # Esto preserva namespaces y estructura original
-        r_envi_de_elem = etree.fromstring(r_envi_de_bytes)
-        body.append(r_envi_de_elem)
-
-        # Serializar
-        return etree.tostring(
-            envelope, xml_declaration=True, encoding="UTF-8", pretty_print=False
-        )
+        # Empalmar los bytes en la plantilla precompilada (sin parsear ni re-serializar)
+        return soap_templates.recepcion_de(r_envi_de_bytes)
 
     # ---------------------------------------------------------------------
     # SOAP Helpers
@@ -1176,16 +1201,26 @@ class SoapClient:
     # RAW POST (requests)
     # ---------------------------------------------------------------------
     def _post_raw_soap(self, service_key: str, soap_bytes: bytes) -> bytes:
-        if service_key not in self._soap_address:
+        # SIFEN_SOAP_RESOLVE_WSDL=1 (diagnóstico) o SIFEN_SOAP_COMPAT=roshka: resolver el
+        # address desde el WSDL una sola vez (queda en _soap_address). En modo Roshka se
+        # postea al soap:address tal cual está escrito, sin normalize_soap_endpoint.
+        resolve_wsdl = self.roshka_compat or os.getenv("SIFEN_SOAP_RESOLVE_WSDL", "0") in ("1", "true", "True")
+        if service_key not in self._soap_address and resolve_wsdl:
             self._get_client(service_key)  # intenta poblar _soap_address
 
-        if service_key not in self._soap_address:
-            wsdl_url = self._normalize_wsdl_url(
-                self.config.get_soap_service_url(service_key)
-            )
-            addr = self._extract_soap_address_from_wsdl(wsdl_url)
-            if addr:
-                self._soap_address[service_key] = addr
+            if service_key not in self._soap_address:
+                wsdl_url = self._normalize_wsdl_url(
+                    self.config.get_soap_service_url(service_key)
+                )
+                addr = self._extract_soap_address_from_wsdl(wsdl_url)
+                if addr:
+                    self._soap_address[service_key] = addr
+
+        if service_key not in self._soap_address and not self.roshka_compat:
+            try:
+                self._soap_address[service_key] = self._endpoint(service_key)
+            except KeyError:
+                pass
 
         if service_key not in self._soap_address:
             raise SifenClientError(
@@ -1332,6 +1367,7 @@ class SoapClient:
     # ---------------------------------------------------------------------
     # Parsing de respuesta (XML)
     # ---------------------------------------------------------------------
+    @timed("response_parse")
     def _parse_recepcion_response_from_xml(self, xml_root: Any) -> Dict[str, Any]:
         import lxml.etree as etree  # noqa: F401
 
@@ -1346,37 +1382,28 @@ class SoapClient:
             "parsed_fields": {},
         }
 
-        def find_text(xpath_expr: str) -> Optional[str]:
-            try:
-                nodes = xml_root.xpath(xpath_expr)
-                if nodes:
-                    val = nodes[0].text
-                    return val.strip() if val else None
-            except Exception:
-                return None
-            return None
-
-        # Busca por local-name para tolerar prefijos
-        result["codigo_respuesta"] = find_text('//*[local-name()="dCodRes"]')
-        result["mensaje"] = find_text('//*[local-name()="dMsgRes"]')
-        result["estado"] = find_text('//*[local-name()="dEstRes"]')
-        result["cdc"] = find_text('//*[local-name()="Id"]') or find_text(
-            '//*[local-name()="cdc"]'
-        )
+        # XPath precompilados (con o sin namespace SIFEN, ver response_parser)
+        parsed = parse_recepcion(xml_root)
+        result["codigo_respuesta"] = parsed.cod_res
+        result["mensaje"] = parsed.msg_res
+        result["estado"] = parsed.est_res
+        result["cdc"] = parsed.cdc
         # Para respuestas de lote, extraer también dProtConsLote y dTpoProces
-        result["d_prot_cons_lote"] = find_text('//*[local-name()="dProtConsLote"]')
-        result["d_tpo_proces"] = find_text('//*[local-name()="dTpoProces"]')
+        result["d_prot_cons_lote"] = parsed.prot_cons_lote
+        result["d_tpo_proces"] = parsed.tpo_proces
 
         result["parsed_fields"] = {"xml": etree.tostring(xml_root, encoding="unicode")}
 
         codigo = (result.get("codigo_respuesta") or "").strip()
         result["ok"] = codigo in ("0200", "0300", "0301", "0302")
+        record_result_code("dCodRes", codigo)
 
         return result
 
     # ---------------------------------------------------------------------
     # Public API
     # ---------------------------------------------------------------------
+    @timed_operation("recepcion_de")
     def recepcion_de(self, xml_sirecepde: str) -> Dict[str, Any]:
         """Envía un rEnviDe (siRecepDE) a SIFEN vía SOAP 1.2 (RAW).
 
@@ -1497,6 +1524,7 @@ class SoapClient:
         except Exception as e:
             logger.warning(f"Error al guardar dump HTTP artifacts: {e}")
 
+    @timed("validate")
     def _assert_request_is_valid(self, soap_bytes: bytes, artifacts_dir: Path) -> None:
         """
         Valida el request SOAP antes de enviarlo (HARD FAIL si está mal).
@@ -1705,6 +1733,7 @@ class SoapClient:
         except Exception as e:
             raise RuntimeError(f"Error al validar request: {e}") from e
     
+    @timed_operation("recepcion_lote")
     def recepcion_lote(self, xml_renvio_lote: str, dump_http: bool = False) -> Dict[str, Any]:
         """Envía un rEnvioLote (siRecepLoteDE) a SIFEN vía SOAP 1.2 document/literal.
 
@@ -2389,6 +2418,107 @@ class SoapClient:
             self._save_raw_soap_debug(soap_bytes, None, suffix="_lote")
             raise SifenClientError(f"Error al enviar SOAP a SIFEN: {e}") from e
 
+    @timed_operation("recepcion_lote")
+    def recepcion_lote_envelope(self, envelope: "memoryview | bytes", validate: bool = False) -> Dict[str, Any]:
+        """
+        Envía un envelope siRecepLoteDE ya armado (ver lote_payload.assemble_lote_envelope).
+
+        A diferencia de recepcion_lote, no re-serializa el rEnvioLote: el
+        memoryview se pasa tal cual a requests, sin copias adicionales del
+        ZIP/Base64. Los artifacts de debug solo se escriben con SIFEN_DEBUG_SOAP=1.
+
+        Args:
+            envelope: Envelope SOAP completo (memoryview, bytearray o bytes)
+            validate: Validar el request (xDE -> ZIP -> lote.xml firmado) antes de enviar,
+                como recepcion_lote. Requiere una copia del envelope; no hace falta si el
+                mismo rEnvioLote ya pasó por preflight_soap_request (web/main.py).
+
+        Returns:
+            Dict con la respuesta parseada (mismas claves que recepcion_lote)
+
+        Raises:
+            SifenSizeLimitError: Si el envelope supera el límite de siRecepLoteDE (0270)
+        """
+        import lxml.etree as etree
+
+        self._validate_size("siRecepLoteDE", envelope)
+        if validate:
+            artifacts_dir = Path("artifacts")
+            artifacts_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                self._assert_request_is_valid(bytes(envelope), artifacts_dir)
+            except Exception as e:
+                raise SifenClientError(f"VALIDACIÓN DE REQUEST FALLÓ ANTES DE ENVIAR HTTP: {e}") from e
+
+        url = self._endpoint("recibe_lote")
+        logger.info(f"Enviando siRecepLoteDE ({len(envelope)} bytes) a: {url}")
+        try:
+            resp = self.transport.session.post(
+                url,
+                data=envelope,
+                headers=dict(soap_templates.HEADERS["siRecepLoteDE"]),
+                timeout=(self.connect_timeout, self.read_timeout),
+            )
+        except requests.exceptions.RequestException as e:
+            raise SifenClientError(f"Error al enviar SOAP a SIFEN: {e}") from e
+
+        body = resp.content
+        if os.getenv("SIFEN_DEBUG_SOAP", "0") in ("1", "true", "True"):
+            self._save_raw_soap_debug(bytes(envelope), body, suffix="_lote")
+
+        if b"<rRetEnviDe" in body and b"<rResEnviLoteDe" not in body:
+            raise SifenClientError(
+                "Servidor respondió rRetEnviDe; esto indica que NO se enrutó a recibe-lote. "
+                f"Response preview: {body[:500].decode('utf-8', errors='replace')}"
+            )
+        if resp.status_code != 200 and b"<dCodRes>" not in body and b":dCodRes>" not in body:
+            raise SifenClientError(
+                f"Error HTTP {resp.status_code} al enviar lote: {resp.text[:500]}"
+            )
+
+        try:
+            resp_root = etree.fromstring(body)
+        except Exception as e:
+            raise SifenClientError(f"Error al parsear respuesta XML de SIFEN: {e}")
+        return self._parse_recepcion_response_from_xml(resp_root)
+
+    @timed_operation("recepcion_evento")
+    def recepcion_evento(self, r_envi_evento: bytes) -> Dict[str, Any]:
+        """
+        Envía un rEnviEventoDe firmado (hasta 15 eventos) a siRecepEvento.
+
+        Args:
+            r_envi_evento: rEnviEventoDe (ver evento_builder.build_r_envi_evento)
+
+        Returns:
+            Dict con http_status, raw_xml, d_fec_proc y resultados (uno por
+            gResProcEVe: id, estado, prot_aut, codigo, mensaje)
+        """
+        from .evento_builder import parse_evento_response
+
+        soap_bytes = soap_templates.recepcion_evento(r_envi_evento)
+        url = self._endpoint("evento")
+        try:
+            resp = self.transport.session.post(
+                url,
+                data=soap_bytes,
+                headers=dict(soap_templates.HEADERS["siRecepEvento"]),
+                timeout=(self.connect_timeout, self.read_timeout),
+            )
+        except requests.exceptions.RequestException as e:
+            raise SifenClientError(f"Error al enviar eventos a SIFEN: {e}") from e
+
+        self._save_raw_soap_debug(soap_bytes, resp.content, suffix="_evento")
+        if resp.status_code != 200 and b"dCodRes>" not in resp.content:
+            raise SifenClientError(
+                f"Error HTTP {resp.status_code} al enviar eventos: {resp.text[:500]}"
+            )
+
+        result = parse_evento_response(resp.content)
+        result["http_status"] = resp.status_code
+        result["raw_xml"] = resp.content.decode("utf-8", errors="replace")
+        return result
+
     def _detect_xsd_dir(self) -> Optional[Path]:
         """
         Detecta automáticamente el directorio XSD.
@@ -2890,6 +3020,7 @@ class SoapClient:
                 error_msg += "\nArtifacts guardados en artifacts/consulta_last_*.xml"
             raise SifenClientError(error_msg) from e
 
+    @timed("response_parse")
     def _parse_consulta_lote_response_from_xml(self, xml_root: Any) -> Dict[str, Any]:
         """Parsea la respuesta de consulta de lote desde XML."""
         import lxml.etree as etree  # noqa: F401
@@ -2902,26 +3033,18 @@ class SoapClient:
             "response_xml": etree.tostring(xml_root, encoding="unicode"),
         }
         
-        def find_text(xpath_expr: str) -> Optional[str]:
-            try:
-                nodes = xml_root.xpath(xpath_expr)
-                if nodes:
-                    val = nodes[0].text
-                    return val.strip() if val else None
-            except Exception:
-                return None
-            return None
-        
         # Buscar campos de respuesta de consulta lote
         # Pueden estar en diferentes ubicaciones según la estructura de respuesta
-        cod_res_lot = find_text('//*[local-name()="dCodResLot"]')
-        msg_res_lot = find_text('//*[local-name()="dMsgResLot"]')
+        cod_res_lot = first_text(xml_root, "dCodResLot")
+        msg_res_lot = first_text(xml_root, "dMsgResLot")
+        record_result_code("dCodResLot", cod_res_lot)
         
         # También buscar dCodRes y dMsgRes (formato genérico)
         if not cod_res_lot:
-            cod_res_lot = find_text('//*[local-name()="dCodRes"]')
+            cod_res_lot = first_text(xml_root, "dCodRes")
+            record_result_code("dCodRes", cod_res_lot)
         if not msg_res_lot:
-            msg_res_lot = find_text('//*[local-name()="dMsgRes"]')
+            msg_res_lot = first_text(xml_root, "dMsgRes")
         
         result["codigo_respuesta"] = cod_res_lot
         result["mensaje"] = msg_res_lot
@@ -2929,7 +3052,7 @@ class SoapClient:
         result["parsed_fields"]["dMsgResLot"] = msg_res_lot
         
         # Buscar otros campos opcionales
-        d_prot_cons_lote = find_text('//*[local-name()="dProtConsLote"]')
+        d_prot_cons_lote = first_text(xml_root, "dProtConsLote")
         if d_prot_cons_lote:
             result["parsed_fields"]["dProtConsLote"] = d_prot_cons_lote
         
@@ -2943,6 +3066,7 @@ class SoapClient:
         
         return result
 
+    @timed_operation("consulta_lote")
     def consulta_lote_raw(self, dprot_cons_lote: str, did: int = 1, dump_http: bool = False) -> Dict[str, Any]:
         """Consulta lote sin depender del WSDL (POST directo al endpoint).
         
@@ -2957,49 +3081,15 @@ class SoapClient:
         """
         import lxml.etree as etree  # noqa: F401
         
-        # Construir SOAP 1.2 envelope con estructura exacta requerida
-        # SOAP 1.2 namespace
-        SOAP_12_NS = "http://www.w3.org/2003/05/soap-envelope"
+        # SOAP 1.2 envelope desde plantilla: rEnviConsLoteDe con namespace default
+        # (dId y dProtConsLote sin prefijo, heredan el default namespace)
+        soap_bytes = soap_templates.consulta_lote(did, dprot_cons_lote)
         
-        # Envelope SOAP 1.2 (sin prefijo sifen en nsmap, se usa default namespace en rEnviConsLoteDe)
-        envelope = etree.Element(
-            f"{{{SOAP_12_NS}}}Envelope",
-            nsmap={"soap": SOAP_12_NS}
-        )
-        
-        # Header vacío
-        header = etree.SubElement(envelope, f"{{{SOAP_12_NS}}}Header")
-        
-        # Body
-        body = etree.SubElement(envelope, f"{{{SOAP_12_NS}}}Body")
-        
-        # rEnviConsLoteDe directamente en Body con namespace default (sin prefijo sifen:)
-        # Usar xmlns="http://ekuatia.set.gov.py/sifen/xsd" como default namespace
-        r_envi_cons = etree.SubElement(
-            body, "rEnviConsLoteDe", nsmap={None: SIFEN_NS}
-        )
-        
-        # dId y dProtConsLote sin prefijo (unqualified, heredan el default namespace)
-        d_id_elem = etree.SubElement(r_envi_cons, "dId")
-        d_id_elem.text = str(did)
-        d_prot_elem = etree.SubElement(r_envi_cons, "dProtConsLote")
-        d_prot_elem.text = str(dprot_cons_lote)
-        
-        soap_bytes = etree.tostring(
-            envelope, xml_declaration=True, encoding="UTF-8", pretty_print=False
-        )
-        
-        # Determinar endpoint según ambiente (con .wsdl al final)
-        if self.config.env == "test":
-            endpoint = "https://sifen-test.set.gov.py/de/ws/consultas/consulta-lote.wsdl"
-        else:
-            endpoint = "https://sifen.set.gov.py/de/ws/consultas/consulta-lote.wsdl"
+        # Endpoint según ambiente (con .wsdl al final)
+        endpoint = self._endpoint("consulta_lote")
         
         # Headers SOAP 1.2 (application/soap+xml con action, sin SOAPAction header)
-        headers = {
-            "Content-Type": 'application/soap+xml; charset=utf-8; action="rEnviConsLoteDe"',
-            "Accept": "application/soap+xml",
-        }
+        headers = dict(soap_templates.HEADERS["siConsLoteDE"])
         
         # Guardar debug antes de enviar
         debug_enabled = os.getenv("SIFEN_DEBUG_SOAP", "0") in ("1", "true", "True")
@@ -3064,6 +3154,7 @@ class SoapClient:
                 msg_res = resp_root.find(".//{http://ekuatia.set.gov.py/sifen/xsd}dMsgResLot")
                 if cod_res is not None and cod_res.text:
                     result["dCodResLot"] = cod_res.text.strip()
+                    record_result_code("dCodResLot", result["dCodResLot"])
                 if msg_res is not None and msg_res.text:
                     result["dMsgResLot"] = msg_res.text.strip()
             except Exception:
@@ -3084,6 +3175,7 @@ class SoapClient:
         
         return result
     
+    @timed_operation("consulta_de")
     def consulta_de_por_cdc_raw(self, cdc: str, dump_http: bool = False, did: Optional[str] = None) -> Dict[str, Any]:
         """Consulta estado de un DE individual por CDC (sin depender del WSDL).
         
@@ -3109,39 +3201,8 @@ class SoapClient:
         
         # Construir SOAP 1.2 envelope con estructura exacta requerida según XSD
         # XSD: WS_SiConsDE_v141.xsd define rEnviConsDeRequest con dId y dCDC
-        SOAP_12_NS = "http://www.w3.org/2003/05/soap-envelope"
-        
-        # Envelope SOAP 1.2
-        envelope = etree.Element(
-            f"{{{SOAP_12_NS}}}Envelope",
-            nsmap={"soap": SOAP_12_NS}
-        )
-        
-        # Header vacío
-        header = etree.SubElement(envelope, f"{{{SOAP_12_NS}}}Header")
-        
-        # Body
-        body = etree.SubElement(envelope, f"{{{SOAP_12_NS}}}Body")
-        
-        # rEnviConsDeRequest según XSD (targetNamespace: http://ekuatia.set.gov.py/sifen/xsd)
-        # XSD define: <xs:element name="rEnviConsDeRequest">
-        # IMPORTANTE: Usar "rEnviConsDeRequest" (con D mayúscula y "Request")
-        r_envi_cons_de_request = etree.SubElement(
-            body, "rEnviConsDeRequest", nsmap={None: SIFEN_NS}
-        )
-        
-        # dId OBLIGATORIO según XSD (tipo: dIdType) - debe ser hijo directo y primero
-        d_id_elem = etree.SubElement(r_envi_cons_de_request, "dId")
-        d_id_elem.text = str(did)
-        
-        # dCDC requerido según XSD (tipo: tCDC) - debe ser hijo directo y segundo
-        d_cdc_elem = etree.SubElement(r_envi_cons_de_request, "dCDC")
-        d_cdc_elem.text = str(cdc)
-        
-        # Serializar SOAP
-        soap_bytes = etree.tostring(
-            envelope, xml_declaration=True, encoding="UTF-8", pretty_print=False
-        )
+        # IMPORTANTE: "rEnviConsDeRequest" (con D mayúscula y "Request"); dId primero, dCDC segundo
+        soap_bytes = soap_templates.consulta_de(did, cdc)
         
         # HARD-FAIL LOCAL ANTES DE ENVIAR: Verificar que el SOAP generado parsea correctamente
         try:
@@ -3251,14 +3312,11 @@ class SoapClient:
         except Exception as e:
             raise RuntimeError(f"Error al validar SOAP generado: {e}") from e
         
-        # Determinar endpoint según ambiente (usar config existente)
-        endpoint = self.config.get_soap_service_url("consulta")
+        # Determinar endpoint según ambiente (tabla resuelta desde config)
+        endpoint = self._endpoint("consulta")
         
         # Headers SOAP 1.2 (application/soap+xml con action="siConsDE", NO "rEnviConsDE")
-        headers = {
-            "Content-Type": 'application/soap+xml; charset=utf-8; action="siConsDE"',
-            "Accept": "application/soap+xml, text/xml, */*",
-        }
+        headers = dict(soap_templates.HEADERS["siConsDE"])
         
         # Si dump_http está activo, guardar headers y XML enviados
         soap_xml_str = soap_bytes.decode("utf-8", errors="replace")
@@ -3351,6 +3409,7 @@ class SoapClient:
                     prot_aut = resp_root.find(".//{http://ekuatia.set.gov.py/sifen/xsd}dProtAut")
                     if cod_res is not None and cod_res.text:
                         result["dCodRes"] = cod_res.text.strip()
+                        record_result_code("dCodRes", result["dCodRes"])
                     if msg_res is not None and msg_res.text:
                         result["dMsgRes"] = msg_res.text.strip()
                     if prot_aut is not None and prot_aut.text:
@@ -3446,6 +3505,7 @@ class SoapClient:
         #     print(f"dMsgRes: {result.get('dMsgRes', 'N/A')}")
         #     print(f"dProtAut: {result.get('dProtAut', 'N/A')}")
 
+    @timed_operation("consulta_ruc")
     def consulta_ruc_raw(self, ruc: str, dump_http: bool = False, did: Optional[str] = None) -> Dict[str, Any]:
         """Consulta estado y habilitación de un RUC (sin depender del WSDL).
         
@@ -3480,40 +3540,8 @@ class SoapClient:
         # Construir SOAP 1.2 envelope con estructura exacta requerida según XSD
         # XSD: WS_SiConsRUC_v141.xsd define rEnviConsRUC con dId y dRUCCons
         # Elemento root: rEnviConsRUC (NO rEnviConsRucRequest)
-        SOAP_12_NS = "http://www.w3.org/2003/05/soap-envelope"
-        
-        # Envelope SOAP 1.2
-        envelope = etree.Element(
-            f"{{{SOAP_12_NS}}}Envelope",
-            nsmap={"soap": SOAP_12_NS}
-        )
-        
-        # Header vacío
-        header = etree.SubElement(envelope, f"{{{SOAP_12_NS}}}Header")
-        
-        # Body
-        body = etree.SubElement(envelope, f"{{{SOAP_12_NS}}}Body")
-        
-        # rEnviConsRUC según XSD (targetNamespace: http://ekuatia.set.gov.py/sifen/xsd)
-        # XSD define: <xs:element name="rEnviConsRUC">
-        # IMPORTANTE: Usar "rEnviConsRUC" (NO "rEnviConsRucRequest")
-        r_envi_cons_ruc = etree.SubElement(
-            body, "rEnviConsRUC", nsmap={None: SIFEN_NS}
-        )
-        
-        # dId OBLIGATORIO según XSD (tipo: dIdType) - debe ser hijo directo y primero
-        d_id_elem = etree.SubElement(r_envi_cons_ruc, "dId")
-        d_id_elem.text = str(did)
-        
-        # dRUCCons requerido según XSD (tipo: tRuc) - debe ser hijo directo y segundo
         # tRuc: minLength=5, maxLength=8, pattern=[1-9][0-9]*[0-9A-D]? (puede incluir DV)
-        d_ruc_cons_elem = etree.SubElement(r_envi_cons_ruc, "dRUCCons")
-        d_ruc_cons_elem.text = str(ruc_final)
-        
-        # Serializar SOAP
-        soap_bytes = etree.tostring(
-            envelope, xml_declaration=True, encoding="UTF-8", pretty_print=False
-        )
+        soap_bytes = soap_templates.consulta_ruc(did, ruc_final)
         
         # HARD-FAIL LOCAL ANTES DE ENVIAR: Verificar que el SOAP generado parsea correctamente
         try:
@@ -3623,14 +3651,11 @@ class SoapClient:
         except Exception as e:
             raise RuntimeError(f"Error al validar SOAP generado: {e}") from e
         
-        # Determinar endpoint según ambiente (usar config existente)
-        endpoint = self.config.get_soap_service_url("consulta_ruc")
+        # Determinar endpoint según ambiente (tabla resuelta desde config)
+        endpoint = self._endpoint("consulta_ruc")
         
         # Headers SOAP 1.2 (application/soap+xml con action="siConsRUC", NO "rEnviConsRUC")
-        headers = {
-            "Content-Type": 'application/soap+xml; charset=utf-8; action="siConsRUC"',
-            "Accept": "application/soap+xml, text/xml, */*",
-        }
+        headers = dict(soap_templates.HEADERS["siConsRUC"])
         
         # Si dump_http está activo, guardar headers y XML enviados
         soap_xml_str = soap_bytes.decode("utf-8", errors="replace")
@@ -3724,6 +3749,7 @@ class SoapClient:
                     msg_res = resp_root.find(".//{http://ekuatia.set.gov.py/sifen/xsd}dMsgRes")
                     if cod_res is not None and cod_res.text:
                         result["dCodRes"] = cod_res.text.strip()
+                        record_result_code("dCodRes", result["dCodRes"])
                     if msg_res is not None and msg_res.text:
                         result["dMsgRes"] = msg_res.text.strip()
                     
@@ -0,0 +1,184 @@
+"""
+Plantillas precompiladas de envelopes SOAP 1.2 para SIFEN.
+
+Los envelopes de siRecepDE, siRecepLoteDE, siRecepEvento, siConsLoteDE, siConsDE
+y siConsRUC se arman empalmando bytes sobre prefijos/sufijos constantes, sin construir
+árboles lxml ni cargar el WSDL con zeep. La salida es byte a byte igual a la que
+generaba SoapClient con etree (mismos prefijos y declaración XML).
+
+La tabla de endpoints (POST URL por servicio) se resuelve una sola vez desde
+SifenConfig; zeep queda solo para diagnóstico (consulta_lote_de / inspección WSDL).
+"""
+import re
+from typing import Dict, Union
+from xml.sax.saxutils import escape
+
+SOAP12_NS = "http://www.w3.org/2003/05/soap-envelope"
+SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
+
+# Misma declaración que emite lxml con xml_declaration=True, encoding="UTF-8"
+XML_DECL = b"<?xml version='1.0' encoding='UTF-8'?>\n"
+
+# Envelope con prefijo soap: y Header vacío (consultas y lote)
+_SOAP_HEAD = XML_DECL + (
+    f'<soap:Envelope xmlns:soap="{SOAP12_NS}"><soap:Header/><soap:Body>'
+).encode("ascii")
+_SOAP_TAIL = b"</soap:Body></soap:Envelope>"
+
+# Envelope de siRecepDE (prefijo soap-env:, sin Header)
+_RECEPCION_DE_HEAD = XML_DECL + (
+    f'<soap-env:Envelope xmlns:soap-env="{SOAP12_NS}"><soap-env:Body>'
+).encode("ascii")
+_RECEPCION_DE_TAIL = b"</soap-env:Body></soap-env:Envelope>"
+
+# siRecepLoteDE: rEnvioLote con prefijo xsd: declarado en el Envelope
+RECEPCION_LOTE_HEAD = XML_DECL + (
+    f'<soap:Envelope xmlns:soap="{SOAP12_NS}" xmlns:xsd="{SIFEN_NS}">'
+    f"<soap:Header/><soap:Body><xsd:rEnvioLote><xsd:dId>"
+).encode("ascii")
+RECEPCION_LOTE_MID = b"</xsd:dId><xsd:xDE>"
+RECEPCION_LOTE_TAIL = b"</xsd:xDE></xsd:rEnvioLote></soap:Body></soap:Envelope>"
+
+_CONSULTA_DE = (
+    f'<rEnviConsDeRequest xmlns="{SIFEN_NS}"><dId>%s</dId><dCDC>%s</dCDC></rEnviConsDeRequest>'
+)
+_CONSULTA_LOTE = (
+    f'<rEnviConsLoteDe xmlns="{SIFEN_NS}"><dId>%s</dId><dProtConsLote>%s</dProtConsLote></rEnviConsLoteDe>'
+)
+_CONSULTA_RUC = (
+    f'<rEnviConsRUC xmlns="{SIFEN_NS}"><dId>%s</dId><dRUCCons>%s</dRUCCons></rEnviConsRUC>'
+)
+
+_XML_DECL_RE = re.compile(rb"^\s*<\?xml[^>]*\?>\s*")
+
+# Headers HTTP por operación (action en Content-Type, SOAP 1.2)
+HEADERS = {
+    "siRecepDE": {
+        "Content-Type": 'application/soap+xml; charset=utf-8; action="rEnviDe"',
+    },
+    "siRecepLoteDE": {
+        "Content-Type": 'application/soap+xml; charset=utf-8; action="siRecepLoteDE"',
+        "Accept": "application/soap+xml, text/xml, */*",
+    },
+    "siConsLoteDE": {
+        "Content-Type": 'application/soap+xml; charset=utf-8; action="rEnviConsLoteDe"',
+        "Accept": "application/soap+xml",
+    },
+    "siConsDE": {
+        "Content-Type": 'application/soap+xml; charset=utf-8; action="siConsDE"',
+        "Accept": "application/soap+xml, text/xml, */*",
+    },
+    "siConsRUC": {
+        "Content-Type": 'application/soap+xml; charset=utf-8; action="siConsRUC"',
+        "Accept": "application/soap+xml, text/xml, */*",
+    },
+    "siRecepEvento": {
+        "Content-Type": 'application/soap+xml; charset=utf-8; action="siRecepEvento"',
+        "Accept": "application/soap+xml, text/xml, */*",
+    },
+}
+
+# consulta_lote_raw postea a /consultas/ (no /consultas-lote/ como el WSDL de config)
+_CONSULTA_LOTE_RAW_URL = {
+    "test": "https://sifen-test.set.gov.py/de/ws/consultas/consulta-lote.wsdl",
+    "prod": "https://sifen.set.gov.py/de/ws/consultas/consulta-lote.wsdl",
+}
+
+
+def _to_bytes(payload: Union[str, bytes]) -> bytes:
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    # Quitar declaración XML del payload (no puede ir dentro del Body)
+    if payload[:5] == b"<?xml" or payload[:1].isspace():
+        payload = _XML_DECL_RE.sub(b"", payload, count=1)
+    return payload
+
+
+def _text(value: object) -> bytes:
+    return escape(str(value)).encode("utf-8")
+
+
+def normalize_soap_endpoint(url: str) -> str:
+    """Quita query string y sufijo .wsdl (https://.../recibe.wsdl?wsdl -> https://.../recibe)."""
+    if not url:
+        return url
+    url = url.split("?")[0]
+    if url.endswith(".wsdl"):
+        url = url[:-5]
+    return url
+
+
+def build_endpoint_table(config) -> Dict[str, str]:
+    """
+    Resuelve una sola vez la URL de POST de cada servicio SOAP.
+
+    Mantiene las URLs que usaba cada operación:
+    - recibe: SOAP address del WSDL (URL sin .wsdl)
+    - recibe_lote: URL del WSDL sin query (?wsdl)
+    - consulta_lote: endpoint /consultas/consulta-lote.wsdl
+    - consulta, consulta_ruc, evento: URL configurada tal cual
+
+    Con SIFEN_SOAP_COMPAT=roshka, SoapClient no usa la entrada "recibe": postea
+    al soap:address del WSDL sin normalizar (ver SoapClient._post_raw_soap).
+
+    Args:
+        config: SifenConfig
+
+    Returns:
+        Dict service_key -> URL
+    """
+    env = getattr(config, "env", "test")
+    consulta_lote = _CONSULTA_LOTE_RAW_URL.get(env, _CONSULTA_LOTE_RAW_URL["test"])
+    if isinstance(getattr(config, "base_url", None), str):
+        consulta_lote = config.rebase_url(consulta_lote)
+    return {
+        "recibe": normalize_soap_endpoint(config.get_soap_service_url("recibe")),
+        "recibe_lote": config.get_soap_service_url("recibe_lote").split("?")[0],
+        "consulta_lote": consulta_lote,
+        "consulta": config.get_soap_service_url("consulta"),
+        "consulta_ruc": config.get_soap_service_url("consulta_ruc"),
+        "evento": config.get_soap_service_url("evento"),
+    }
+
+
+def envelope(payload: Union[str, bytes]) -> bytes:
+    """Envelope SOAP 1.2 (Header vacío) con el payload empalmado en el Body."""
+    return b"".join((_SOAP_HEAD, _to_bytes(payload), _SOAP_TAIL))
+
+
+def recepcion_de(r_envi_de: Union[str, bytes]) -> bytes:
+    """Envelope siRecepDE con el rEnviDe original embebido sin re-serializar."""
+    return b"".join((_RECEPCION_DE_HEAD, _to_bytes(r_envi_de), _RECEPCION_DE_TAIL))
+
+
+def recepcion_lote(did: object, xde_b64: Union[str, bytes]) -> bytes:
+    """
+    Envelope siRecepLoteDE (rEnvioLote bare con prefijo xsd:).
+
+    Args:
+        did: dId del envío
+        xde_b64: ZIP del lote en Base64 (se empalma tal cual, sin copiar a un árbol)
+    """
+    if isinstance(xde_b64, str):
+        xde_b64 = xde_b64.encode("ascii")
+    return b"".join((RECEPCION_LOTE_HEAD, _text(did), RECEPCION_LOTE_MID, xde_b64, RECEPCION_LOTE_TAIL))
+
+
+def recepcion_evento(r_envi_evento: Union[str, bytes]) -> bytes:
+    """Envelope siRecepEvento con el rEnviEventoDe (ya firmado) empalmado sin re-serializar."""
+    return envelope(r_envi_evento)
+
+
+def consulta_de(did: object, cdc: str) -> bytes:
+    """Envelope siConsDE (rEnviConsDeRequest con dId y dCDC)."""
+    return envelope((_CONSULTA_DE % (escape(str(did)), escape(str(cdc)))).encode("utf-8"))
+
+
+def consulta_lote(did: object, dprot_cons_lote: str) -> bytes:
+    """Envelope siConsLoteDE (rEnviConsLoteDe con dId y dProtConsLote)."""
+    return envelope((_CONSULTA_LOTE % (escape(str(did)), escape(str(dprot_cons_lote)))).encode("utf-8"))
+
+
+def consulta_ruc(did: object, ruc: str) -> bytes:
+    """Envelope siConsRUC (rEnviConsRUC con dId y dRUCCons)."""
+    return envelope((_CONSULTA_RUC % (escape(str(did)), escape(str(ruc)))).encode("utf-8"))
@@ -13,6 +13,8 @@ try:
 except ImportError:
     raise ImportError("lxml es requerido para validación XSD. Instalar con: pip install lxml")
 
+from .metrics import timed
+
 # Constantes de namespace
 SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
 DSIG_NS = "http://www.w3.org/2000/09/xmldsig#"
@@ -244,6 +246,7 @@ def find_xsd_declaring_global_element(
     return candidates[0]
 
 
+@timed("validate")
 def validate_rde_and_lote(
     rde_signed_bytes: bytes,
     lote_xml_bytes: Optional[bytes],
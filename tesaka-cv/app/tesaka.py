@@ -1,25 +1,19 @@
 """
 Lógica de conversión a formato Tesaka (reutilizable)
 """
-import json
-from pathlib import Path
 from typing import Dict, Any, List
 
 try:
-    from jsonschema import Draft202012Validator, ValidationError
+    from jsonschema import ValidationError
 except ImportError:
     raise ImportError("jsonschema no está instalado. Instálalo con: pip install jsonschema")
 
+from src import schema_registry
+
 
 def load_schema() -> Dict[str, Any]:
-    """Carga el schema de importación"""
-    schema_path = Path(__file__).parent.parent / "schemas" / "importacion.schema.json"
-    
-    if not schema_path.exists():
-        raise FileNotFoundError(f"No se encontró el schema {schema_path}")
-    
-    with open(schema_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Carga el schema de importación (una vez por proceso, ver src.schema_registry)"""
+    return schema_registry.load_schema("import")
 
 
 def format_validation_error(error: ValidationError) -> str:
@@ -92,17 +86,9 @@ def validate_tesaka(tesaka_data: List[Dict[str, Any]], schema: Dict[str, Any] =
     Returns:
         Lista de errores formateados (vacía si no hay errores)
     """
-    if schema is None:
-        schema = load_schema()
-    
-    validator = Draft202012Validator(schema)
-    errors = list(validator.iter_errors(tesaka_data))
-    
-    if not errors:
-        return []
-    
-    # Ordenar errores de manera estable
-    errors.sort(key=lambda e: ("/".join(str(p) for p in e.absolute_path), e.message))
+    # Validator compilado una sola vez (salvo que se pase otro schema)
+    validator = schema_registry.validator_for(schema if schema is not None else "import")
+    errors = schema_registry.sorted_errors(validator, tesaka_data)
     
     return [format_validation_error(err) for err in errors]
 
@@ -0,0 +1,298 @@
+"""
+Envío masivo de comprobantes a Tesaka (SET)
+
+Selecciona las facturas que todavía no tienen un envío exitoso del tipo y
+ambiente pedidos, las convierte y valida contra el schema de importación (en
+un pool de procesos si son muchas), y las sube en lotes acotados por cantidad
+y tamaño del JSON. Los lotes se envían en paralelo sobre un único
+TesakaClient (pool de conexiones keep-alive) y cada lote se registra en
+submissions con un solo executemany.
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .db import get_db
+from .tesaka import convert_to_tesaka, validate_tesaka
+from .tesaka_client import TesakaClient, TesakaClientError
+
+logger = logging.getLogger(__name__)
+
+# Límites por request (la API no documenta un máximo; valores conservadores)
+MAX_CHUNK_ITEMS = int(os.getenv("TESAKA_CHUNK_ITEMS", "100"))
+MAX_CHUNK_BYTES = int(os.getenv("TESAKA_CHUNK_BYTES", str(1024 * 1024)))
+
+# Debajo de esta cantidad convertir/validar en el proceso actual es más rápido
+MIN_PARALLEL_BATCH = 64
+
+_shared_client: Optional[TesakaClient] = None
+_shared_client_key: Optional[Tuple] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_tesaka_config() -> Dict[str, Any]:
+    """Obtiene la configuración de Tesaka desde variables de entorno"""
+    return {
+        "env": os.getenv("TESAKA_ENV", "homo"),
+        "user": os.getenv("TESAKA_USER", ""),
+        "password": os.getenv("TESAKA_PASS", ""),
+        "timeout": int(os.getenv("REQUEST_TIMEOUT", "30")),
+    }
+
+
+def get_shared_client(config: Dict[str, Any], max_connections: int = 16) -> TesakaClient:
+    """
+    TesakaClient compartido por el proceso (se recrea si cambia la configuración).
+
+    Args:
+        config: Diccionario con env, user, password y timeout
+    """
+    global _shared_client, _shared_client_key
+    key = (config["env"], config["user"], config["password"], config["timeout"])
+    with _shared_client_lock:
+        if _shared_client is None or _shared_client_key != key:
+            if _shared_client is not None:
+                _shared_client.close()
+            _shared_client = TesakaClient(
+                env=config["env"],
+                user=config["user"],
+                password=config["password"],
+                timeout=config["timeout"],
+                max_connections=max_connections,
+            )
+            _shared_client_key = key
+        return _shared_client
+
+
+def close_shared_client() -> None:
+    """Cierra el TesakaClient compartido (al apagar la app)"""
+    global _shared_client, _shared_client_key
+    with _shared_client_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
+            _shared_client_key = None
+
+
+def select_unsent_invoices(
+    kind: str,
+    env: str,
+    invoice_ids: Optional[Sequence[int]] = None,
+    limit: Optional[int] = None,
+) -> List[Tuple[int, str]]:
+    """
+    Facturas sin envío exitoso (ok = 1) para kind/env.
+
+    Returns:
+        Lista de (invoice_id, data_json) ordenada por id
+    """
+    query = """
+        SELECT i.id, i.data_json
+        FROM invoices i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM submissions s
+            WHERE s.invoice_id = i.id AND s.kind = ? AND s.env = ? AND s.ok = 1
+        )
+    """
+    params: List[Any] = [kind, env]
+    if invoice_ids is not None:
+        query += f" AND i.id IN ({','.join('?' * len(invoice_ids))})"
+        params.extend(invoice_ids)
+    query += " ORDER BY i.id"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    conn = get_db()
+    try:
+        return [(row["id"], row["data_json"]) for row in conn.execute(query, params)]
+    finally:
+        conn.close()
+
+
+def _prepare_one(item: Tuple[int, str]) -> Dict[str, Any]:
+    """Convierte y valida una factura (corre en un worker; nunca lanza)"""
+    invoice_id, data_json = item
+    try:
+        comprobantes = convert_to_tesaka(json.loads(data_json))
+    except Exception as e:
+        return {"invoice_id": invoice_id, "errors": [f"Error durante la conversión: {e}"]}
+    errors = validate_tesaka(comprobantes)
+    if errors:
+        return {"invoice_id": invoice_id, "errors": errors}
+    return {
+        "invoice_id": invoice_id,
+        "comprobantes": comprobantes,
+        "request_json": json.dumps(comprobantes, ensure_ascii=False),
+    }
+
+
+def prepare_invoices(
+    items: Sequence[Tuple[int, str]],
+    workers: Optional[int] = None,
+    pool_map: Optional[Callable[..., List[Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Convierte y valida facturas, en un pool de procesos si el lote es grande.
+
+    Args:
+        items: Lista de (invoice_id, data_json)
+        workers: Procesos del pool (default: CPUs)
+        pool_map: map(fn, items, chunksize=...) sobre un pool ya existente (la web
+            usa app.executors.map_cpu). Sin él se crea un pool propio (CLI).
+
+    Returns:
+        Un dict por factura (mismo orden): con comprobantes/request_json si es
+        válida o con errors si no
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(items) < MIN_PARALLEL_BATCH:
+        return [_prepare_one(item) for item in items]
+    chunksize = max(1, len(items) // (workers * 4))
+    if pool_map is not None:
+        return list(pool_map(_prepare_one, items, chunksize=chunksize))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_prepare_one, items, chunksize=chunksize))
+
+
+def chunk_prepared(
+    prepared: Iterable[Dict[str, Any]],
+    max_items: int = MAX_CHUNK_ITEMS,
+    max_bytes: int = MAX_CHUNK_BYTES,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Agrupa facturas válidas en lotes de hasta max_items comprobantes y
+    max_bytes de JSON. Una factura que sola supera max_bytes va en su propio lote.
+    """
+    if max_items < 1:
+        raise ValueError(f"max_items debe ser >= 1. Valor recibido: {max_items}")
+    chunks: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_items = 0
+    current_bytes = 2  # "[]"
+    for entry in prepared:
+        n_items = len(entry["comprobantes"])
+        # Los comprobantes de una factura van sin los corchetes y con la coma
+        n_bytes = len(entry["request_json"].encode("utf-8")) - 1
+        if current and (current_items + n_items > max_items or current_bytes + n_bytes > max_bytes):
+            chunks.append(current)
+            current, current_items, current_bytes = [], 0, 2
+        current.append(entry)
+        current_items += n_items
+        current_bytes += n_bytes
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def record_submissions(rows: List[Tuple]) -> None:
+    """
+    Inserta en submissions en una sola transacción.
+
+    Args:
+        rows: (invoice_id, kind, env, request_json, response_json, ok, error)
+    """
+    if not rows:
+        return
+    conn = get_db()
+    try:
+        conn.executemany("""
+            INSERT INTO submissions
+            (invoice_id, kind, env, request_json, response_json, ok, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _send_chunk(client: TesakaClient, kind: str, chunk: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Envía un lote y devuelve (respuesta, error) (nunca lanza)"""
+    payload = [comprobante for entry in chunk for comprobante in entry["comprobantes"]]
+    try:
+        return client.enviar(kind, payload), None
+    except TesakaClientError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f"Error inesperado: {e}"
+
+
+def submit_invoices(
+    client: Optional[TesakaClient],
+    kind: str,
+    env: str,
+    items: Sequence[Tuple[int, str]],
+    workers: int = 4,
+    prepare_workers: Optional[int] = None,
+    prepare_pool_map: Optional[Callable[..., List[Any]]] = None,
+    max_items: int = MAX_CHUNK_ITEMS,
+    max_bytes: int = MAX_CHUNK_BYTES,
+    dry_run: bool = False,
+    on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Convierte, valida y envía facturas a Tesaka en lotes concurrentes.
+
+    Args:
+        client: TesakaClient compartido entre los threads (puede ser None con dry_run)
+        kind: 'factura', 'retencion' o 'autofactura'
+        env: Ambiente del cliente ('prod' o 'homo'), se registra en submissions
+        items: Lista de (invoice_id, data_json), ej. select_unsent_invoices()
+        workers: Lotes enviados en paralelo
+        prepare_workers: Procesos para convertir/validar (default: CPUs)
+        prepare_pool_map: Pool compartido para convertir/validar (ver prepare_invoices)
+        max_items / max_bytes: Límites de cada lote
+        dry_run: Si True, convierte, valida y arma los lotes pero no envía
+        on_chunk: Callback opcional con el resultado de cada lote
+
+    Returns:
+        Resumen con: invoices, invalid, requests, sent, failed, errors
+    """
+    if kind not in TesakaClient.KIND_METHODS:
+        raise ValueError(f"Tipo inválido: {kind}. Debe ser 'factura', 'retencion' o 'autofactura'")
+    if workers < 1:
+        raise ValueError(f"workers debe ser >= 1. Valor recibido: {workers}")
+
+    prepared = prepare_invoices(items, prepare_workers, prepare_pool_map)
+    valid = [entry for entry in prepared if "errors" not in entry]
+    chunks = chunk_prepared(valid, max_items, max_bytes)
+
+    summary: Dict[str, Any] = {
+        "invoices": len(prepared),
+        "invalid": len(prepared) - len(valid),
+        "requests": len(chunks),
+        "sent": 0,
+        "failed": 0,
+        "errors": {entry["invoice_id"]: entry["errors"] for entry in prepared if "errors" in entry},
+    }
+    if dry_run or not chunks:
+        return summary
+
+    def run(chunk):
+        return chunk, _send_chunk(client, kind, chunk)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk, (response, error) in executor.map(run, chunks):
+            response_json = json.dumps(response, ensure_ascii=False) if response is not None else None
+            record_submissions([
+                (entry["invoice_id"], kind, env, entry["request_json"], response_json, 0 if error else 1, error)
+                for entry in chunk
+            ])
+            ids = [entry["invoice_id"] for entry in chunk]
+            if error:
+                summary["failed"] += len(chunk)
+                for invoice_id in ids:
+                    summary["errors"][invoice_id] = [error]
+            else:
+                summary["sent"] += len(chunk)
+            if on_chunk:
+                on_chunk({"invoice_ids": ids, "ok": error is None, "error": error})
+
+    logger.info(
+        f"Tesaka {kind}: {summary['sent']} enviadas, {summary['failed']} con error, "
+        f"{summary['invalid']} inválidas en {summary['requests']} requests"
+    )
+    return summary
@@ -33,7 +33,15 @@ class TesakaClient:
         'contribuyente': '/contribuyentes/consultar'
     }
     
-    def __init__(self, env: str = 'homo', user: str = '', password: str = '', timeout: int = 30, verify: bool = True):
+    # Métodos de envío según tipo de comprobante
+    KIND_METHODS = {
+        'factura': 'enviar_facturas',
+        'retencion': 'enviar_retenciones',
+        'autofactura': 'enviar_autofacturas',
+    }
+    
+    def __init__(self, env: str = 'homo', user: str = '', password: str = '', timeout: int = 30, verify: bool = True,
+                 max_connections: int = 10):
         """
         Inicializa el cliente Tesaka
         
@@ -43,6 +51,8 @@ class TesakaClient:
             password: Contraseña para Basic Auth
             timeout: Timeout de peticiones HTTP en segundos
             verify: Si verificar certificados SSL (default: True)
+            max_connections: Conexiones keep-alive del pool (el cliente es
+                thread-safe y se puede compartir entre envíos concurrentes)
         """
         if env not in self.BASE_URLS:
             raise ValueError(f"Entorno inválido: {env}. Debe ser 'prod' o 'homo'")
@@ -58,7 +68,8 @@ class TesakaClient:
         self.client = httpx.Client(
             auth=(self.user, self.password),
             timeout=self.timeout,
-            verify=self.verify
+            verify=self.verify,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
         )
     
     def _build_url(self, endpoint_key: str) -> str:
@@ -160,6 +171,18 @@ class TesakaClient:
         url = self._build_url('autofactura')
         return self._make_request('POST', url, json_data=payload_json_array)
     
+    def enviar(self, kind: str, payload_json_array: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Envía comprobantes según su tipo ('factura', 'retencion' o 'autofactura')
+        
+        Raises:
+            ValueError: Si el tipo no es válido
+        """
+        method = self.KIND_METHODS.get(kind)
+        if not method:
+            raise ValueError(f"Tipo inválido: {kind}. Debe ser 'factura', 'retencion' o 'autofactura'")
+        return getattr(self, method)(payload_json_array)
+    
     def consultar_contribuyente(self, ruc: str) -> Dict[str, Any]:
         """
         Consulta información de un contribuyente por RUC
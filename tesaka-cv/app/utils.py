@@ -1,73 +1,41 @@
 """
 Utilidades y funciones auxiliares para el sistema
 """
+import sqlite3
 from typing import Dict, List, Optional, Tuple
+from .balances import get_contract_balances, get_po_item_balances
 from .db import get_db
 
 
-def get_contract_balance(contract_id: int) -> Dict[int, float]:
+def get_contract_balance(contract_id: int, conn: Optional[sqlite3.Connection] = None) -> Dict[int, float]:
     """
     Calcula el saldo disponible por producto de un contrato
     Retorna dict: {contract_item_id: saldo_disponible}
+    
+    Lee la tabla de saldos incrementales (app.balances); con conn se usa la
+    conexión (y la transacción) del llamador.
     """
+    if conn is not None:
+        return get_contract_balances(conn, contract_id)
     conn = get_db()
-    cursor = conn.cursor()
-    
-    # Obtener items del contrato
-    cursor.execute("""
-        SELECT id, cantidad_total FROM contract_items
-        WHERE contract_id = ?
-    """, (contract_id,))
-    contract_items = {row['id']: row['cantidad_total'] for row in cursor.fetchall()}
-    
-    # Calcular cantidad ya usada en OCs vinculadas
-    cursor.execute("""
-        SELECT contract_item_id, SUM(cantidad) as total_used
-        FROM purchase_order_items
-        WHERE contract_item_id IN ({})
-        GROUP BY contract_item_id
-    """.format(','.join(map(str, contract_items.keys()))) if contract_items else "SELECT 1 WHERE 0")
-    
-    used = {row['contract_item_id']: row['total_used'] for row in cursor.fetchall()}
-    conn.close()
-    
-    # Calcular saldos
-    balances = {}
-    for item_id, total in contract_items.items():
-        used_amount = used.get(item_id, 0.0)
-        balances[item_id] = max(0.0, total - used_amount)
-    
-    return balances
+    try:
+        return get_contract_balances(conn, contract_id)
+    finally:
+        conn.close()
 
 
-def get_po_item_balance(po_item_id: int) -> float:
+def get_po_item_balance(po_item_id: int, conn: Optional[sqlite3.Connection] = None) -> float:
     """
     Calcula el saldo disponible de un item de orden de compra
     Retorna: saldo_disponible (cantidad - cantidad ya entregada)
     """
+    if conn is not None:
+        return get_po_item_balances(conn, [po_item_id]).get(po_item_id, 0.0)
     conn = get_db()
-    cursor = conn.cursor()
-    
-    # Obtener cantidad de la OC
-    cursor.execute("SELECT cantidad FROM purchase_order_items WHERE id = ?", (po_item_id,))
-    po_item = cursor.fetchone()
-    if not po_item:
+    try:
+        return get_po_item_balances(conn, [po_item_id]).get(po_item_id, 0.0)
+    finally:
         conn.close()
-        return 0.0
-    
-    cantidad_oc = po_item['cantidad']
-    
-    # Calcular cantidad ya entregada
-    cursor.execute("""
-        SELECT COALESCE(SUM(cantidad), 0) as total_delivered
-        FROM delivery_note_items
-        WHERE source_po_item_id = ?
-    """, (po_item_id,))
-    
-    delivered = cursor.fetchone()['total_delivered']
-    conn.close()
-    
-    return max(0.0, cantidad_oc - delivered)
 
 
 def get_next_delivery_note_number() -> int:
@@ -137,50 +105,79 @@ def get_next_invoice_number() -> str:
         base_number += 1
 
 
-def validate_po_item_quantities(po_items: List[Dict], contract_id: Optional[int] = None) -> Tuple[bool, List[str]]:
+def validate_po_item_quantities(
+    po_items: List[Dict],
+    contract_id: Optional[int] = None,
+    conn: Optional[sqlite3.Connection] = None
+) -> Tuple[bool, List[str]]:
     """
     Valida que las cantidades de items de OC no excedan el contrato
     Retorna: (es_valido, lista_errores)
+    
+    Los saldos del contrato se leen una sola vez; si la OC repite un item del
+    contrato se valida la suma de sus líneas.
     """
     if not contract_id:
         return True, []
     
     errors = []
-    balances = get_contract_balance(contract_id)
+    balances = get_contract_balance(contract_id, conn)
+    requested: Dict[int, float] = {}
     
     for item in po_items:
         contract_item_id = item.get('contract_item_id')
         cantidad = item.get('cantidad', 0)
         
         if contract_item_id and contract_item_id in balances:
+            requested[contract_item_id] = requested.get(contract_item_id, 0.0) + cantidad
             available = balances[contract_item_id]
-            if cantidad > available:
+            if requested[contract_item_id] > available:
                 producto = item.get('producto', 'Desconocido')
                 errors.append(
-                    f"Producto '{producto}': cantidad solicitada ({cantidad}) "
+                    f"Producto '{producto}': cantidad solicitada ({requested[contract_item_id]}) "
                     f"excede saldo disponible del contrato ({available})"
                 )
     
     return len(errors) == 0, errors
 
 
-def validate_delivery_note_quantities(dn_items: List[Dict]) -> Tuple[bool, List[str]]:
+def validate_delivery_note_quantities(
+    dn_items: List[Dict],
+    conn: Optional[sqlite3.Connection] = None
+) -> Tuple[bool, List[str]]:
     """
     Valida que las cantidades de items de nota de entrega no excedan la OC
     Retorna: (es_valido, lista_errores)
+    
+    Los saldos de todos los items de OC referenciados se leen en una consulta.
     """
+    po_item_ids = [item['source_po_item_id'] for item in dn_items if item.get('source_po_item_id')]
+    if not po_item_ids:
+        return True, []
+    
+    if conn is not None:
+        balances = get_po_item_balances(conn, po_item_ids)
+    else:
+        conn = get_db()
+        try:
+            balances = get_po_item_balances(conn, po_item_ids)
+        finally:
+            conn.close()
+    
     errors = []
+    requested: Dict[int, float] = {}
     
     for item in dn_items:
         po_item_id = item.get('source_po_item_id')
         cantidad = item.get('cantidad', 0)
         
         if po_item_id:
-            available = get_po_item_balance(po_item_id)
-            if cantidad > available:
+            requested[po_item_id] = requested.get(po_item_id, 0.0) + cantidad
+            available = balances.get(po_item_id, 0.0)
+            if requested[po_item_id] > available:
                 producto = item.get('producto', 'Desconocido')
                 errors.append(
-                    f"Producto '{producto}': cantidad solicitada ({cantidad}) "
+                    f"Producto '{producto}': cantidad solicitada ({requested[po_item_id]}) "
                     f"excede saldo disponible de la OC ({available})"
                 )
     
@@ -295,8 +295,13 @@ def adapt(raw: Dict[str, Any]) -> Dict[str, Any]:
 
 def main():
     """Función principal del CLI"""
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        from . import batch
+        sys.exit(batch.main("adapt", sys.argv[2:]))
+    
     if len(sys.argv) != 3:
         print("Uso: python -m src.adapt_from_my_system <raw_input.json> <output_tesaka_import.json>", file=sys.stderr)
+        print("   o: python -m src.adapt_from_my_system --batch <directorio|entrada.jsonl|array.json> <salida.jsonl> [--workers N] [--resume]", file=sys.stderr)
         print("\nEjemplo:", file=sys.stderr)
         print("  python -m src.adapt_from_my_system examples/raw_invoice_sample.json output.json", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,364 @@
+"""
+Modo batch (streaming) para adapt_from_my_system y convert_to_import
+
+Lee registros de forma incremental desde:
+- un directorio (un registro por archivo *.json),
+- un archivo JSONL / NDJSON (o '-' para stdin),
+- un archivo con un array JSON grande (se decodifica elemento por elemento,
+  sin cargar el archivo entero).
+
+Los registros se adaptan / convierten / validan en un pool de procesos en
+bloques, con un máximo de bloques en vuelo (la memoria no depende del tamaño
+de la entrada), y los resultados se escriben en orden:
+- salida JSONL: {"key", "tesaka"} por cada registro válido,
+- errores JSONL: {"key", "stage", "errors"} por cada registro que falló.
+
+Cada registro tiene una clave estable (archivo o archivo#índice). Con
+--resume se leen las claves ya escritas en ambos archivos y se saltean.
+
+Uso:
+    python -m src.adapt_from_my_system --batch export_erp/ salida.jsonl
+    python -m src.convert_to_import --batch facturas.jsonl salida.jsonl --workers 4
+    python -m src.convert_to_import --batch facturas_enero.json salida.jsonl --resume
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from . import schema_registry
+from .adapt_from_my_system import adapt
+from .convert_to_import import convert_to_tesaka
+
+# Registros por tarea del pool
+CHUNK_SIZE = 200
+
+# Tamaño de lectura para el decodificador incremental
+READ_SIZE = 1 << 16
+
+_WHITESPACE = " \t\r\n"
+
+
+class BatchInputError(Exception):
+    """Error al leer la entrada del batch (JSON mal formado, archivo inexistente)"""
+    pass
+
+
+def iter_json_values(fp: TextIO, read_size: int = READ_SIZE) -> Iterator[Any]:
+    """
+    Decodifica valores JSON de un stream sin leerlo entero.
+
+    Si el stream empieza con '[' se devuelven los elementos del array; si no,
+    se devuelven los valores concatenados (JSONL, o un único objeto).
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        data = fp.read(read_size)
+        if not data:
+            eof = True
+            return False
+        buf = buf[pos:] + data
+        pos = 0
+        return True
+
+    def skip(chars: str) -> Optional[str]:
+        """Saltea caracteres de chars y devuelve el siguiente (None en EOF)"""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                return None
+
+    def decode() -> Any:
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                # Puede ser un valor cortado por el borde del buffer
+                if fill():
+                    continue
+                raise BatchInputError(f"JSON inválido: {e}")
+            # Un número al final del buffer puede seguir en el próximo bloque
+            if end == len(buf) and not eof and not isinstance(value, (dict, list, str)):
+                if fill():
+                    continue
+            pos = end
+            return value
+
+    first = skip(_WHITESPACE)
+    if first is None:
+        return
+    if first != "[":
+        while skip(_WHITESPACE) is not None:
+            yield decode()
+        return
+
+    pos += 1
+    if skip(_WHITESPACE) == "]":
+        return
+    while True:
+        if skip(_WHITESPACE) is None:
+            raise BatchInputError("Array JSON sin cerrar")
+        yield decode()
+        sep = skip(_WHITESPACE)
+        if sep == ",":
+            pos += 1
+        elif sep == "]":
+            return
+        else:
+            raise BatchInputError(f"Se esperaba ',' o ']' en el array, se encontró {sep!r}")
+
+
+def iter_records(source: str) -> Iterator[Tuple[str, Any]]:
+    """
+    Registros (clave, valor) de un directorio, JSONL, array JSON o '-' (stdin)
+    """
+    if source == "-":
+        for index, value in enumerate(iter_json_values(sys.stdin)):
+            yield f"stdin#{index}", value
+        return
+
+    path = Path(source)
+    if path.is_dir():
+        for file_path in sorted(path.rglob("*.json")):
+            key = file_path.relative_to(path).as_posix()
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    yield key, json.load(f)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                yield key, BatchInputError(f"JSON inválido: {e}")
+        return
+
+    if not path.exists():
+        raise BatchInputError(f"No existe la entrada {source}")
+    if path.suffix.lower() in (".jsonl", ".ndjson"):
+        # Línea por línea: una línea mal formada no corta el resto
+        with open(path, "r", encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                if not line.strip():
+                    continue
+                try:
+                    yield f"{path.name}#{index}", json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield f"{path.name}#{index}", BatchInputError(f"JSON inválido: {e}")
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for index, value in enumerate(iter_json_values(f)):
+            yield f"{path.name}#{index}", value
+
+
+def process_record(mode: str, key: str, raw: Any) -> Dict[str, Any]:
+    """
+    Adapta (mode='adapt'), convierte y valida un registro (nunca lanza)
+
+    Returns:
+        {"key", "tesaka"} si es válido, o {"key", "stage", "errors"} si falló
+    """
+    if isinstance(raw, BatchInputError):
+        return {"key": key, "stage": "read", "errors": [{"path": "", "message": str(raw)}]}
+    stage = "adapt"
+    try:
+        invoice = adapt(raw) if mode == "adapt" else raw
+        stage = "convert"
+        tesaka = convert_to_tesaka(invoice)
+    except KeyError as e:
+        return {"key": key, "stage": stage, "errors": [{"path": "", "message": f"Campo requerido faltante: {e}"}]}
+    except Exception as e:
+        return {"key": key, "stage": stage, "errors": [{"path": "", "message": str(e)}]}
+
+    validator = schema_registry.get_validator("import")
+    errors = schema_registry.sorted_errors(validator, tesaka)
+    if errors:
+        return {"key": key, "stage": "validate", "errors": [schema_registry.error_to_dict(e) for e in errors]}
+    return {"key": key, "tesaka": tesaka}
+
+
+def _process_chunk(mode: str, chunk: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    return [process_record(mode, key, raw) for key, raw in chunk]
+
+
+def _chunks(records: Iterable[Tuple[str, Any]], size: int) -> Iterator[List[Tuple[str, Any]]]:
+    chunk: List[Tuple[str, Any]] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(
+    records: Iterable[Tuple[str, Any]],
+    mode: str,
+    workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_inflight: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Procesa registros en un pool de procesos y devuelve los resultados en el
+    orden de entrada. Como máximo max_inflight bloques quedan pendientes.
+    """
+    if mode not in ("adapt", "convert"):
+        raise ValueError(f"Modo inválido: {mode}. Debe ser 'adapt' o 'convert'")
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(records, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _process_chunk(mode, chunk)
+        return
+
+    max_inflight = max_inflight or workers * 2
+    fn = partial(_process_chunk, mode)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(fn, chunk))
+            if len(pending) >= max_inflight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _done_keys(path: Path) -> Set[str]:
+    """
+    Claves ya escritas en un JSONL de salida. Si la última línea quedó cortada
+    (proceso interrumpido) se trunca el archivo antes de ella.
+    """
+    keys: Set[str] = set()
+    if not path.exists():
+        return keys
+    with open(path, "rb+") as f:
+        good_end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                keys.add(json.loads(line)["key"])
+            except (ValueError, KeyError):
+                break
+            good_end += len(line)
+        f.truncate(good_end)
+    return keys
+
+
+def process_to_jsonl(
+    source: str,
+    output: Path,
+    mode: str,
+    errors_output: Optional[Path] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    resume: bool = False,
+    on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+) -> Dict[str, int]:
+    """
+    Procesa una entrada completa y escribe los resultados en JSONL
+
+    Args:
+        source: Directorio, archivo JSONL / array JSON, o '-'
+        output: JSONL con los comprobantes válidos
+        mode: 'adapt' (JSON crudo del ERP) o 'convert' (factura interna)
+        errors_output: JSONL de errores (default: <output>.errors.jsonl)
+        resume: Saltear las claves que ya están en output / errors_output
+
+    Returns:
+        Contadores: processed, ok, failed, skipped
+    """
+    errors_output = errors_output or output.with_name(output.name + ".errors.jsonl")
+    done: Set[str] = set()
+    if resume:
+        done = _done_keys(output) | _done_keys(errors_output)
+    file_mode = "a" if resume else "w"
+
+    stats = {"processed": 0, "ok": 0, "failed": 0, "skipped": 0}
+
+    def pending_records():
+        for key, raw in iter_records(source):
+            if key in done:
+                stats["skipped"] += 1
+                continue
+            yield key, raw
+
+    with open(output, file_mode, encoding="utf-8") as out, open(errors_output, file_mode, encoding="utf-8") as err:
+        for result in run_batch(pending_records(), mode, workers=workers, chunk_size=chunk_size):
+            stats["processed"] += 1
+            if "tesaka" in result:
+                stats["ok"] += 1
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            else:
+                stats["failed"] += 1
+                err.write(json.dumps(result, ensure_ascii=False) + "\n")
+            if stats["processed"] % chunk_size == 0:
+                out.flush()
+                err.flush()
+                if on_progress:
+                    on_progress(stats)
+    return stats
+
+
+def main(mode: str, argv: List[str]) -> int:
+    """CLI del modo batch (llamado desde los main de adapt / convert)"""
+    prog = "python -m src.adapt_from_my_system --batch" if mode == "adapt" else "python -m src.convert_to_import --batch"
+    parser = argparse.ArgumentParser(prog=prog, description="Procesa muchas facturas y escribe los resultados en JSONL")
+    parser.add_argument("input", help="Directorio, archivo JSONL, archivo con un array JSON, o '-' (stdin)")
+    parser.add_argument("output", type=Path, help="JSONL de salida con los comprobantes válidos")
+    parser.add_argument("--errors", type=Path, help="JSONL de errores (default: <output>.errors.jsonl)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: CPUs; 1 = sin pool)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help=f"Registros por tarea (default: {CHUNK_SIZE})")
+    parser.add_argument("--resume", action="store_true", help="Continuar una corrida interrumpida")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    last_report = start
+
+    def on_progress(stats):
+        nonlocal last_report
+        now = time.perf_counter()
+        if now - last_report >= 5:
+            last_report = now
+            print(f"  {stats['processed']} procesados ({stats['failed']} con error)", file=sys.stderr)
+
+    try:
+        stats = process_to_jsonl(
+            args.input,
+            args.output,
+            mode,
+            errors_output=args.errors,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            resume=args.resume,
+            on_progress=on_progress,
+        )
+    except BatchInputError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("Interrumpido. Continuar con --resume", file=sys.stderr)
+        return 130
+    elapsed = time.perf_counter() - start
+
+    rate = stats["processed"] / elapsed if elapsed else 0.0
+    skipped = f", {stats['skipped']} ya procesados" if stats["skipped"] else ""
+    print(
+        f"{'✅' if not stats['failed'] else '❌'} {stats['ok']} válidos, {stats['failed']} con error{skipped} "
+        f"({elapsed:.1f}s, {rate:.0f} registros/s). Salida: {args.output}"
+    )
+    return 1 if stats["failed"] else 0
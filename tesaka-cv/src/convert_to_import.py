@@ -5,26 +5,28 @@ Convertidor de factura interna a formato Tesaka de importación
 import json
 import sys
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 try:
-    from jsonschema import Draft202012Validator, ValidationError
+    from jsonschema import ValidationError
 except ImportError:
     print("Error: jsonschema no está instalado. Instálalo con: pip install jsonschema", file=sys.stderr)
     sys.exit(1)
 
+try:
+    from . import schema_registry
+except ImportError:
+    # Ejecutado como script (python convert_to_import.py)
+    import schema_registry
+
 
 def load_schema() -> Dict[str, Any]:
-    """Carga el schema de importación"""
-    script_dir = Path(__file__).parent.parent
-    schema_path = script_dir / "schemas" / "importacion.schema.json"
-    
-    if not schema_path.exists():
-        print(f"Error: No se encontró el schema {schema_path}", file=sys.stderr)
+    """Carga el schema de importación (una vez por proceso)"""
+    try:
+        return schema_registry.load_schema("import")
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
-    
-    with open(schema_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
 
 
 def load_invoice(file_path: str) -> Dict[str, Any]:
@@ -100,29 +102,33 @@ def convert_to_tesaka(invoice: Dict[str, Any]) -> list:
     return [comprobante]
 
 
-def validate_tesaka(tesaka_data: list, schema: Dict[str, Any]) -> list:
+def validate_tesaka(tesaka_data: list, schema: Optional[Dict[str, Any]] = None) -> list:
     """
-    Valida los datos Tesaka contra el schema
+    Valida los datos Tesaka contra el schema (por defecto el de importación,
+    con el validator compilado y cacheado)
     
     Returns:
         Lista de errores formateados (vacía si no hay errores)
     """
-    validator = Draft202012Validator(schema)
-    errors = list(validator.iter_errors(tesaka_data))
-    
-    if not errors:
-        return []
-    
-    # Ordenar errores de manera estable
-    errors.sort(key=lambda e: ("/".join(str(p) for p in e.absolute_path), e.message))
+    validator = schema_registry.validator_for(schema if schema is not None else "import")
+    errors = schema_registry.sorted_errors(validator, tesaka_data)
     
     return [format_validation_error(err) for err in errors]
 
 
 def main():
     """Función principal del CLI"""
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        try:
+            from . import batch
+        except ImportError:
+            print("Error: el modo batch se ejecuta como módulo: python -m src.convert_to_import --batch ...", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(batch.main("convert", sys.argv[2:]))
+    
     if len(sys.argv) != 3:
         print("Uso: python -m src.convert_to_import <input_invoice.json> <output_tesaka_import.json>", file=sys.stderr)
+        print("   o: python -m src.convert_to_import --batch <directorio|entrada.jsonl|array.json> <salida.jsonl> [--workers N] [--resume]", file=sys.stderr)
         print("\nEjemplo:", file=sys.stderr)
         print("  python -m src.convert_to_import examples/source_invoice_ok.json output.json", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,146 @@
+"""
+Registro de schemas JSON de Tesaka (importación / exportación)
+
+Cada schema se lee del disco y se compila a un Draft202012Validator una sola
+vez por proceso. validate_batch valida miles de comprobantes repartiéndolos
+en un pool de procesos (cada worker compila su validator una vez) y devuelve
+errores estructurados.
+
+Los dicts devueltos por load_schema son compartidos: no modificarlos.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from jsonschema import Draft202012Validator, ValidationError
+
+SCHEMAS_DIR = Path(__file__).parent.parent / "schemas"
+
+# Nombre lógico -> archivo (se aceptan los nombres en inglés y en español)
+SCHEMA_FILES = {
+    "import": "importacion.schema.json",
+    "importacion": "importacion.schema.json",
+    "export": "exportacion.schema.json",
+    "exportacion": "exportacion.schema.json",
+}
+
+# Debajo de esta cantidad validar en el proceso actual es más rápido
+MIN_PARALLEL_BATCH = 256
+
+_schemas: Dict[str, Dict[str, Any]] = {}
+_validators: Dict[str, Draft202012Validator] = {}
+_lock = threading.Lock()
+
+
+def _schema_file(name: str) -> str:
+    try:
+        return SCHEMA_FILES[name]
+    except KeyError:
+        raise ValueError(f"Schema desconocido: {name}. Debe ser 'import' o 'export'")
+
+
+def load_schema(name: str = "import") -> Dict[str, Any]:
+    """
+    Carga (una vez) el schema por nombre lógico
+
+    Raises:
+        FileNotFoundError: Si no existe el archivo del schema
+    """
+    filename = _schema_file(name)
+    schema = _schemas.get(filename)
+    if schema is None:
+        schema_path = SCHEMAS_DIR / filename
+        if not schema_path.exists():
+            raise FileNotFoundError(f"No se encontró el schema {schema_path}")
+        with open(schema_path, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+        with _lock:
+            schema = _schemas.setdefault(filename, loaded)
+    return schema
+
+
+def get_validator(name: str = "import") -> Draft202012Validator:
+    """Validator compilado (y verificado) del schema, uno por proceso"""
+    filename = _schema_file(name)
+    validator = _validators.get(filename)
+    if validator is None:
+        schema = load_schema(name)
+        Draft202012Validator.check_schema(schema)
+        with _lock:
+            validator = _validators.setdefault(filename, Draft202012Validator(schema))
+    return validator
+
+
+def validator_for(schema: Union[str, Dict[str, Any]]) -> Draft202012Validator:
+    """
+    Validator para un nombre lógico o un dict de schema. Si el dict es uno de
+    los cargados por load_schema se reusa el validator compilado.
+    """
+    if isinstance(schema, str):
+        return get_validator(schema)
+    for filename, cached in _schemas.items():
+        if schema is cached:
+            return get_validator(filename.split(".", 1)[0])
+    return Draft202012Validator(schema)
+
+
+def sorted_errors(validator: Draft202012Validator, data: Any) -> List[ValidationError]:
+    """Errores de validación en orden estable (por ruta y mensaje)"""
+    errors = list(validator.iter_errors(data))
+    errors.sort(key=lambda e: ("/".join(str(p) for p in e.absolute_path), e.message))
+    return errors
+
+
+def error_to_dict(error: ValidationError) -> Dict[str, Any]:
+    """Error de validación como dict serializable"""
+    return {
+        "path": "/".join(str(p) for p in error.absolute_path),
+        "message": error.message,
+        "validator": error.validator,
+        "schema_path": "/".join(str(p) for p in error.absolute_schema_path),
+    }
+
+
+def _validate_chunk(name: str, documents: Sequence[Any]) -> List[List[Dict[str, Any]]]:
+    """Valida un bloque de documentos (corre en un worker)"""
+    validator = get_validator(name)
+    return [[error_to_dict(e) for e in sorted_errors(validator, doc)] for doc in documents]
+
+
+def validate_batch(
+    documents: Sequence[Any],
+    name: str = "import",
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Valida muchos documentos contra el schema
+
+    Args:
+        documents: Documentos a validar (para import, cada uno es la lista de
+            comprobantes de un archivo)
+        name: Schema lógico ('import' o 'export')
+        workers: Procesos (default: CPUs; 1 = en el proceso actual)
+        chunksize: Documentos por tarea del pool
+
+    Returns:
+        Un dict por documento, en el mismo orden: {index, valid, errors}
+        donde errors es una lista de {path, message, validator, schema_path}
+    """
+    _schema_file(name)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(documents) < MIN_PARALLEL_BATCH:
+        per_doc = _validate_chunk(name, documents)
+    else:
+        chunksize = chunksize or max(1, len(documents) // (workers * 4))
+        chunks = [documents[i:i + chunksize] for i in range(0, len(documents), chunksize)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            per_doc = [errors for chunk in pool.map(partial(_validate_chunk, name), chunks) for errors in chunk]
+    return [
+        {"index": index, "valid": not errors, "errors": errors}
+        for index, errors in enumerate(per_doc)
+    ]
@@ -7,28 +7,29 @@ Valida archivos JSON según los schemas de importación o exportación
 import json
 import sys
 import os
-from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 try:
     import jsonschema
-    from jsonschema import Draft202012Validator, ValidationError
+    from jsonschema import ValidationError
 except ImportError:
     print("Error: jsonschema no está instalado. Instálalo con: pip install jsonschema", file=sys.stderr)
     sys.exit(1)
 
+try:
+    from . import schema_registry
+except ImportError:
+    # Ejecutado como script (python validate.py)
+    import schema_registry
+
 
 def load_schema(schema_name: str) -> Dict[str, Any]:
-    """Carga el schema JSON desde el directorio schemas"""
-    script_dir = Path(__file__).parent.parent
-    schema_path = script_dir / "schemas" / f"{schema_name}.schema.json"
-    
-    if not schema_path.exists():
-        print(f"Error: No se encontró el schema {schema_path}", file=sys.stderr)
+    """Carga el schema JSON (import/export) desde el directorio schemas, una vez por proceso"""
+    try:
+        return schema_registry.load_schema(schema_name)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
-    
-    with open(schema_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
 
 
 def load_json(file_path: str) -> Any:
@@ -84,7 +85,7 @@ def format_validation_error(error: ValidationError) -> str:
 
 def validate(data: Any, schema: Dict[str, Any]) -> List[str]:
     """Valida los datos contra el schema y retorna lista de errores formateados"""
-    validator = Draft202012Validator(schema)
+    validator = schema_registry.validator_for(schema)
     errors = list(validator.iter_errors(data))
     
     if not errors:
@@ -97,22 +98,62 @@ def validate(data: Any, schema: Dict[str, Any]) -> List[str]:
     return formatted_errors
 
 
+def validate_files(command: str, file_paths: List[str], workers: Optional[int] = None) -> int:
+    """
+    Valida muchos archivos en paralelo (schema_registry.validate_batch)
+    
+    Returns:
+        Cantidad de archivos inválidos
+    """
+    documents = [load_json(path) for path in file_paths]
+    results = schema_registry.validate_batch(documents, command, workers=workers)
+    
+    invalid = 0
+    for path, result in zip(file_paths, results):
+        if result["valid"]:
+            print(f"✅ {path}")
+            continue
+        invalid += 1
+        print(f"❌ {path} ({len(result['errors'])} error(es))", file=sys.stderr)
+        for error in result["errors"]:
+            print(f"   {error['path'] or 'raíz'}: {error['message']}", file=sys.stderr)
+    
+    print(f"\n{len(file_paths) - invalid} válidos, {invalid} inválidos de {len(file_paths)} archivos")
+    return invalid
+
+
 def main():
     """Función principal del CLI"""
-    if len(sys.argv) != 3:
-        print("Uso: python validate.py <import|export> <archivo.json>", file=sys.stderr)
+    args = sys.argv[1:]
+    workers = None
+    if "--workers" in args:
+        i = args.index("--workers")
+        try:
+            workers = int(args[i + 1])
+        except (IndexError, ValueError):
+            print("Error: --workers requiere un número", file=sys.stderr)
+            sys.exit(1)
+        del args[i:i + 2]
+    
+    if len(args) < 2:
+        print("Uso: python validate.py <import|export> <archivo.json> [archivo2.json ...] [--workers N]", file=sys.stderr)
         print("\nEjemplos:")
         print("  python validate.py import comprobante.json")
         print("  python validate.py export respuesta.json")
+        print("  python validate.py import comprobantes_2025/*.json --workers 4")
         sys.exit(1)
     
-    command = sys.argv[1].lower()
-    file_path = sys.argv[2]
+    command = args[0].lower()
+    file_paths = args[1:]
     
     if command not in ['import', 'export']:
         print(f"Error: Comando inválido '{command}'. Debe ser 'import' o 'export'", file=sys.stderr)
         sys.exit(1)
     
+    if len(file_paths) > 1:
+        sys.exit(1 if validate_files(command, file_paths, workers) else 0)
+    file_path = file_paths[0]
+    
     # Cargar schema y datos
     schema = load_schema(command)
     data = load_json(file_path)
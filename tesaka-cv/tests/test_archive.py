@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para el archivo histórico por período (app.archive) y las búsquedas
+que siguen en los archivos cuando la fila ya no está en la base viva.
+
+Ejecutar:
+    python -m pytest tests/test_archive.py -v
+"""
+
+import json
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import archive
+from app import db as app_db
+from web import db, de_trace, lotes_db
+from web.document_status import STATUS_APPROVED, STATUS_PENDING_SIFEN
+
+NOW = datetime(2026, 10, 15)
+DE_XML = "<rDE>" + "<gCamItem/>" * 100 + "</rDE>"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "tesaka.db"
+    with patch.object(db, "DB_PATH", path), patch.object(lotes_db, "DB_PATH", path), \
+            patch.object(de_trace, "DB_PATH", path), patch.object(app_db, "DB_PATH", path):
+        yield path
+
+
+def _set_created_at(path, table, row_id, created_at):
+    conn = sqlite3.connect(str(path))
+    conn.execute(f"UPDATE {table} SET created_at = ? WHERE id = ?", (created_at, row_id))
+    conn.commit()
+    conn.close()
+
+
+def _seed(path):
+    """Un DE viejo aprobado, uno viejo pendiente y uno reciente aprobado; lotes y una factura."""
+    old, pending, recent = (db.insert_document(f"{i:044d}", "80012345", "12345678", DE_XML) for i in range(3))
+    for doc_id in (old, recent):
+        db.update_document_status(doc_id, STATUS_APPROVED, signed_xml=DE_XML + f"<!-- {doc_id} -->")
+    db.update_document_status(pending, STATUS_PENDING_SIFEN)
+    de_trace.record_event(f"{0:044d}", de_trace.STAGE_APPROVED, de_document_id=old)
+    _set_created_at(path, "de_documents", old, "2025-03-10 12:00:00")
+    _set_created_at(path, "de_documents", pending, "2025-03-11 12:00:00")
+
+    done = lotes_db.create_lote("test", "111", de_document_id=old)
+    lotes_db.update_lote_status(done, lotes_db.LOTE_STATUS_DONE, response_xml="<resp>111</resp>")
+    waiting = lotes_db.create_lote("test", "222")
+    _set_created_at(path, "sifen_lotes", done, "2025-04-01 08:00:00")
+    _set_created_at(path, "sifen_lotes", waiting, "2025-04-01 08:00:00")
+
+    app_db.init_db()
+    conn = sqlite3.connect(str(path))
+    invoice = conn.execute(
+        "INSERT INTO invoices (created_at, issue_date, buyer_name, data_json) VALUES (?, ?, ?, ?)",
+        ("2025-03-20 10:00:00", "2025-03-20", "Comprador", json.dumps({"items": [{"cantidad": 1, "precioUnitario": 5}]})),
+    ).lastrowid
+    conn.execute(
+        "INSERT INTO submissions (invoice_id, kind, env, created_at, request_json, ok) VALUES (?, 'factura', 'homo', ?, '{}', 1)",
+        (invoice, "2025-03-20 10:05:00"),
+    )
+    conn.commit()
+    conn.close()
+    return {"old": old, "pending": pending, "recent": recent, "lote": done, "waiting": waiting, "invoice": invoice}
+
+
+def test_archive_moves_closed_old_rows_and_lookups_fall_through(db_path):
+    ids = _seed(db_path)
+    archive_dir = archive.archive_dir_for(db_path)
+
+    assert archive.archive_old_data(db_path, months=12, now=NOW, dry_run=True) == {
+        "2025-03": {"de_documents": 1, "invoices": 1},
+        "2025-04": {"sifen_lotes": 1},
+    }
+    assert not archive_dir.exists()
+
+    summary = archive.archive_old_data(db_path, months=12, now=NOW)
+    assert summary["2025-03"] == {"de_events": 1, "de_documents": 1, "invoice_items": 1, "submissions": 1, "invoices": 1}
+    assert [p.name for p in archive.archive_files(archive_dir)] == [
+        "tesaka-archive-2025-04.db", "tesaka-archive-2025-03.db",
+    ]
+
+    # La base viva quedó solo con lo abierto o reciente
+    conn = sqlite3.connect(str(db_path))
+    assert [r[0] for r in conn.execute("SELECT id FROM de_documents ORDER BY id")] == [ids["pending"], ids["recent"]]
+    assert [r[0] for r in conn.execute("SELECT id FROM sifen_lotes")] == [ids["waiting"]]
+    assert conn.execute("SELECT COUNT(*) FROM invoices").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM de_events").fetchone()[0] == 0
+    # El de_xml es el mismo en los tres DEs (sigue en uso); el signed_xml del viejo se liberó
+    assert conn.execute("SELECT COUNT(*) FROM xml_blobs").fetchone()[0] == 2
+    conn.close()
+
+    # Las búsquedas siguen en los archivos, con los XML cargados del archivo
+    doc = db.get_document(ids["old"])
+    assert doc["last_status"] == STATUS_APPROVED and doc["de_xml"] == DE_XML
+    assert doc["signed_xml"].endswith(f"<!-- {ids['old']} -->")
+    assert db.get_document_by_cdc(f"{0:044d}")["id"] == ids["old"]
+    assert db.get_document(9999) is None
+    assert lotes_db.get_lote_by_prot("test", "111")["last_response_xml"] == "<resp>111</resp>"
+    assert lotes_db.get_lote(ids["lote"])["status"] == lotes_db.LOTE_STATUS_DONE
+    assert [e["stage"] for e in de_trace.get_timeline(f"{0:044d}")] == [de_trace.STAGE_APPROVED]
+    assert app_db.get_archived_row("invoices", "id = ?", (ids["invoice"],), "buyer_name")["buyer_name"] == "Comprador"
+    assert len(app_db.get_archived_rows("submissions", "invoice_id = ?", (ids["invoice"],))) == 1
+
+    # Los archivos son de solo lectura
+    with pytest.raises(sqlite3.OperationalError):
+        archive.connect_archive(archive.archive_path(archive_dir, "2025-03")).execute("DELETE FROM de_documents")
+
+
+def test_rerun_appends_to_existing_period(db_path):
+    ids = _seed(db_path)
+    archive.archive_old_data(db_path, months=12, now=NOW)
+    assert archive.archive_old_data(db_path, months=12, now=NOW) == {}
+
+    # El pendiente se resolvió después: la próxima corrida lo agrega al mismo archivo
+    db.update_document_status(ids["pending"], STATUS_APPROVED)
+    assert archive.archive_old_data(db_path, months=12, now=NOW) == {"2025-03": {"de_events": 0, "de_documents": 1}}
+    found = archive.find_all_archived(archive.archive_dir_for(db_path), "de_documents", "1 = 1", columns="id")
+    assert sorted(row["id"] for row, _ in found) == [ids["old"], ids["pending"]]
+    assert db.get_document(ids["pending"])["de_xml"] == DE_XML
+
+
+def test_cutoff_for_whole_months():
+    assert archive.cutoff_for(12, NOW) == "2025-10-01 00:00:00"
+    assert archive.cutoff_for(10, datetime(2026, 10, 1)) == "2025-12-01 00:00:00"
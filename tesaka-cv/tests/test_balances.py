@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para los saldos incrementales de contratos y OCs (app.balances).
+
+Ejecutar:
+    python -m pytest tests/test_balances.py -v
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from app import balances
+from app import db as app_db
+from app.utils import get_contract_balance, validate_delivery_note_quantities, validate_po_item_quantities
+
+
+@pytest.fixture
+def contract_db(tmp_path):
+    """Contrato 1 con Cemento (100) y Arena (50)"""
+    with patch.object(app_db, "DB_PATH", tmp_path / "app.db"):
+        app_db.init_db()
+        conn = app_db.get_db()
+        conn.execute("INSERT INTO contracts (fecha, numero_contrato) VALUES ('2025-01-10', 'CT-1')")
+        conn.executemany(
+            "INSERT INTO contract_items (contract_id, producto, unidad_medida, cantidad_total, precio_unitario) "
+            "VALUES (1, ?, ?, ?, ?)",
+            [("Cemento", "BOL", 100, 50000), ("Arena", "M3", 50, 120000)],
+        )
+        conn.commit()
+        yield conn
+        conn.close()
+
+
+def _add_po(conn, lines):
+    po_id = conn.execute(
+        "INSERT INTO purchase_orders (fecha, numero, contract_id) VALUES ('2025-02-01', 'OC', 1)"
+    ).lastrowid
+    conn.executemany(
+        "INSERT INTO purchase_order_items (purchase_order_id, contract_item_id, producto, unidad_medida, cantidad, precio_unitario) "
+        "VALUES (?, ?, 'x', 'UNI', ?, 1)",
+        [(po_id, contract_item_id, cantidad) for contract_item_id, cantidad in lines],
+    )
+    return po_id
+
+
+def test_triggers_maintain_balances(contract_db):
+    po_id = _add_po(contract_db, [(1, 30), (2, 10), (1, 5)])
+    assert balances.get_contract_balances(contract_db, 1) == {1: 65.0, 2: 40.0}
+
+    poi = [row[0] for row in contract_db.execute("SELECT id FROM purchase_order_items ORDER BY id")]
+    contract_db.executemany(
+        "INSERT INTO delivery_note_items (delivery_note_id, source_po_item_id, producto, unidad_medida, cantidad) "
+        "VALUES (1, ?, 'x', 'UNI', ?)",
+        [(poi[0], 20), (poi[0], 5), (poi[1], 10)],
+    )
+    assert balances.get_po_balances(contract_db, po_id) == {poi[0]: 5.0, poi[1]: 0.0, poi[2]: 5.0}
+
+    contract_db.execute("UPDATE purchase_order_items SET cantidad = 40 WHERE id = ?", (poi[0],))
+    contract_db.execute("UPDATE purchase_order_items SET contract_item_id = 2 WHERE id = ?", (poi[2],))
+    contract_db.execute("DELETE FROM delivery_note_items WHERE cantidad = 5")
+    contract_db.execute("UPDATE contract_items SET cantidad_total = 120 WHERE id = 1")
+    assert balances.get_contract_balances(contract_db, 1) == {1: 80.0, 2: 35.0}
+    assert balances.get_po_item_balances(contract_db, [poi[0], poi[2], 999]) == {poi[0]: 20.0, poi[2]: 5.0}
+
+    contract_db.execute("DELETE FROM purchase_order_items WHERE id = ?", (poi[1],))
+    assert balances.get_contract_balances(contract_db, 1) == {1: 80.0, 2: 45.0}
+    assert balances.check_balances(contract_db) == []
+
+
+def test_checker_detects_and_rebuild_fixes(contract_db):
+    _add_po(contract_db, [(1, 30)])
+    contract_db.execute("UPDATE contract_item_balances SET cantidad_usada = 0 WHERE contract_item_id = 1")
+    contract_db.execute("DELETE FROM po_item_balances")
+
+    problems = balances.check_balances(contract_db)
+    assert {"tabla": "contract_item_balances", "item_id": 1, "campo": "cantidad_usada",
+            "saldo": 0.0, "esperado": 30.0} in problems
+    assert any(p["tabla"] == "po_item_balances" and p["saldo"] is None for p in problems)
+
+    balances.rebuild_balances(contract_db)
+    assert balances.check_balances(contract_db) == []
+    assert get_contract_balance(1) == {1: 70.0, 2: 50.0}
+
+
+def test_existing_database_is_backfilled(tmp_path):
+    with patch.object(app_db, "DB_PATH", tmp_path / "app.db"):
+        app_db.init_db()
+        conn = app_db.get_db()
+        # Base anterior a los saldos: sin tablas ni triggers
+        for trigger in balances._TRIGGERS:
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("DROP TABLE contract_item_balances")
+        conn.execute("DROP TABLE po_item_balances")
+        conn.execute("INSERT INTO contract_items (contract_id, producto, unidad_medida, cantidad_total, precio_unitario) VALUES (1, 'A', 'U', 10, 1)")
+        conn.execute("INSERT INTO purchase_order_items (purchase_order_id, contract_item_id, producto, unidad_medida, cantidad, precio_unitario) VALUES (1, 1, 'A', 'U', 4, 1)")
+        conn.commit()
+        app_db.init_db()
+        assert balances.get_contract_balances(conn, 1) == {1: 6.0}
+        conn.close()
+
+
+def test_validations_batch_and_accumulate(contract_db):
+    _add_po(contract_db, [(1, 90)])
+    poi = contract_db.execute("SELECT id FROM purchase_order_items").fetchone()[0]
+    contract_db.commit()
+
+    items = [{"producto": "Cemento", "contract_item_id": 1, "cantidad": 6},
+             {"producto": "Cemento", "contract_item_id": 1, "cantidad": 6}]
+    valid, errors = validate_po_item_quantities(items, 1, contract_db)
+    assert not valid and "excede saldo disponible del contrato (10.0)" in errors[0]
+    assert validate_po_item_quantities(items[:1], 1)[0]
+
+    valid, errors = validate_delivery_note_quantities(
+        [{"producto": "Cemento", "source_po_item_id": poi, "cantidad": 50},
+         {"producto": "Cemento", "source_po_item_id": poi, "cantidad": 50}]
+    )
+    assert not valid and len(errors) == 1
+
+
+def test_create_purchase_order_route(contract_db):
+    from app.main import app
+    statements = []
+    real_get_db = app_db.get_db
+
+    def traced_get_db():
+        conn = real_get_db()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    form = {
+        "fecha": "2025-02-01", "numero": "OC-200", "contract_id": "1", "sync_mode": "linked",
+        "producto": ["Cemento"] * 200, "unidad_medida": ["BOL"] * 200,
+        "cantidad": ["0.5"] * 200, "precio_unitario": ["50000"] * 200,
+    }
+    with TestClient(app) as client, patch("app.routes_purchase_orders.get_db", traced_get_db):
+        response = client.post("/purchase-orders", data=form, follow_redirects=False)
+        assert response.status_code == 303
+        # Lectura de items del contrato + saldos + cabecera + un executemany: sin consultas por línea
+        assert sum(1 for s in statements if s.lstrip().upper().startswith("SELECT")) == 2
+
+        assert get_contract_balance(1) == {1: 0.0, 2: 50.0}
+        form["numero"], form["producto"], form["cantidad"] = "OC-201", ["Cemento"], ["1"]
+        response = client.post("/purchase-orders", data=form, follow_redirects=False)
+        assert response.status_code == 400
+        assert "excede saldo disponible" in response.json()["detail"]
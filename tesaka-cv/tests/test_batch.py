@@ -0,0 +1,111 @@
+"""
+Tests para el modo batch de adapt / convert (src.batch)
+"""
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import batch
+from src.batch import BatchInputError, iter_json_values, process_to_jsonl
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+
+
+def load_example(filename):
+    with open(EXAMPLES_DIR / filename, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestIterJsonValues:
+    """Decodificación incremental con buffers chicos (valores cortados entre lecturas)"""
+
+    def test_array(self):
+        values = [{"n": i, "texto": "ñandú " * i} for i in range(50)] + [12345678, "fin", None, [1, 2]]
+        text = json.dumps(values, ensure_ascii=False, indent=1)
+        assert list(iter_json_values(io.StringIO(text), read_size=7)) == values
+
+    def test_concatenated_values(self):
+        text = '{"a": 1}\n{"a": 2}\n  3141592 \n[]\n'
+        assert list(iter_json_values(io.StringIO(text), read_size=3)) == [{"a": 1}, {"a": 2}, 3141592, []]
+        assert list(iter_json_values(io.StringIO("  \n "))) == []
+        assert list(iter_json_values(io.StringIO("[ ]"))) == []
+
+    def test_invalid(self):
+        with pytest.raises(BatchInputError):
+            list(iter_json_values(io.StringIO('[{"a": 1} {"a": 2}]')))
+        with pytest.raises(BatchInputError):
+            list(iter_json_values(io.StringIO('[{"a": 1},')))
+        with pytest.raises(BatchInputError):
+            list(iter_json_values(io.StringIO('{"a": ')))
+
+
+class TestProcessToJsonl:
+    """Procesamiento completo con salida, errores por registro y reanudación"""
+
+    def test_convert_array_in_pool(self, tmp_path):
+        ok, bad = load_example("source_invoice_ok.json"), load_example("source_invoice_bad.json")
+        records = [bad if i % 5 == 0 else ok for i in range(23)]
+        source = tmp_path / "facturas.json"
+        source.write_text(json.dumps(records), encoding="utf-8")
+        output = tmp_path / "salida.jsonl"
+
+        stats = process_to_jsonl(str(source), output, "convert", workers=2, chunk_size=4)
+
+        assert stats == {"processed": 23, "ok": 18, "failed": 5, "skipped": 0}
+        results = read_jsonl(output)
+        errors = read_jsonl(tmp_path / "salida.jsonl.errors.jsonl")
+        assert [r["key"] for r in results] == [f"facturas.json#{i}" for i in range(23) if i % 5]
+        assert results[0]["tesaka"][0]["informado"]["nombre"] == ok["buyer"]["nombre"]
+        assert [e["key"] for e in errors] == [f"facturas.json#{i}" for i in range(0, 23, 5)]
+        assert errors[0]["stage"] == "validate" and errors[0]["errors"][0]["path"]
+
+    def test_adapt_directory_and_jsonl(self, tmp_path):
+        raw = load_example("raw_invoice_sample.json")
+        source = tmp_path / "erp"
+        (source / "2025-01").mkdir(parents=True)
+        (source / "2025-01" / "a.json").write_text(json.dumps(raw), encoding="utf-8")
+        (source / "b.json").write_text("{roto", encoding="utf-8")
+        (source / "c.json").write_text(json.dumps({"otro": "formato"}), encoding="utf-8")
+
+        stats = process_to_jsonl(str(source), tmp_path / "out.jsonl", "adapt", workers=1)
+        assert stats["ok"] == 1 and stats["failed"] == 2
+        errors = {e["key"]: e["stage"] for e in read_jsonl(tmp_path / "out.jsonl.errors.jsonl")}
+        assert errors["b.json"] == "read"
+        assert errors["c.json"] in ("adapt", "convert")
+
+        lines = tmp_path / "erp.jsonl"
+        lines.write_text(json.dumps(raw) + "\n\n{roto\n" + json.dumps(raw) + "\n", encoding="utf-8")
+        stats = process_to_jsonl(str(lines), tmp_path / "out2.jsonl", "adapt", workers=1)
+        assert stats["ok"] == 2 and stats["failed"] == 1
+
+    def test_resume_skips_done_and_drops_partial_line(self, tmp_path):
+        ok = load_example("source_invoice_ok.json")
+        source = tmp_path / "facturas.jsonl"
+        source.write_text("".join(json.dumps(ok) + "\n" for _ in range(10)), encoding="utf-8")
+        output = tmp_path / "salida.jsonl"
+
+        process_to_jsonl(str(source), output, "convert", workers=1)
+        complete = output.read_text(encoding="utf-8")
+        lines = complete.splitlines(keepends=True)
+        # Simula una corrida cortada a mitad de la línea 5
+        output.write_text("".join(lines[:4]) + lines[4][:30], encoding="utf-8")
+
+        stats = process_to_jsonl(str(source), output, "convert", workers=1, resume=True)
+        assert stats["skipped"] == 4 and stats["processed"] == 6
+        assert output.read_text(encoding="utf-8") == complete
+
+    def test_main_exit_codes(self, tmp_path, capsys):
+        source = tmp_path / "facturas.json"
+        source.write_text(json.dumps([load_example("source_invoice_ok.json")]), encoding="utf-8")
+        assert batch.main("convert", [str(source), str(tmp_path / "out.jsonl"), "--workers", "1"]) == 0
+        assert batch.main("convert", [str(tmp_path / "no_existe.json"), str(tmp_path / "out.jsonl")]) == 1
+        assert "No existe" in capsys.readouterr().err
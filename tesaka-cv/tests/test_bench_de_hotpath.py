@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para el benchmark del camino caliente de DE (tools.bench_de_hotpath).
+
+Ejecutar:
+    python -m pytest tests/test_bench_de_hotpath.py -v
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools import bench_de_hotpath as bench
+from tools.sifen_mock_server import CRYPTOGRAPHY_AVAILABLE
+
+
+@pytest.mark.skipif(not CRYPTOGRAPHY_AVAILABLE, reason="cryptography no instalado")
+def test_quick_run_covers_stages(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    report = bench.run_benchmarks(item_counts=[1], lote_sizes=[2], min_time=0)
+
+    ran = {name.split("[")[0] for name in report["results"]}
+    assert ran | set(report["skipped"]) == set(bench.STAGES)
+    assert report["results"]["preflight[des=2]"]["ok"]
+    assert report["results"]["parse_lote_results[des=2]"]["ok"]
+    assert all(stats["ref_ms"] > 0 for stats in report["results"].values())
+    assert not (tmp_path / "artifacts").exists()
+
+
+def test_compare_scales_by_reference():
+    baseline = {"results": {
+        "build_de[items=1]": {"min_ms": 1.0, "ref_ms": 2.0},
+        "validate[items=1]": {"min_ms": 10.0, "ref_ms": 2.0},
+        "soap_envelope[des=1]": {"min_ms": 0.01, "ref_ms": 2.0},
+    }}
+    report = {"results": {
+        "build_de[items=1]": {"min_ms": 2.2, "ref_ms": 4.0},     # máquina 2x más lenta: dentro de tolerancia
+        "validate[items=1]": {"min_ms": 30.0, "ref_ms": 4.0},    # regresión real
+        "soap_envelope[des=1]": {"min_ms": 0.05, "ref_ms": 4.0}, # ruido por debajo de min_delta_ms
+        "lote_payload[des=1]": {"min_ms": 5.0, "ref_ms": 4.0},   # sin baseline
+    }}
+    regressions = bench.compare(report, baseline, tolerance=0.25, min_delta_ms=0.05)
+    assert [r["name"] for r in regressions] == ["validate[items=1]"]
+    assert regressions[0]["baseline_ms"] == 20.0 and regressions[0]["ratio"] == 1.5
+
+    merged = bench.merge_rounds([report, baseline])
+    assert merged["rounds"] == 2 and merged["results"]["validate[items=1]"] is baseline["results"]["validate[items=1]"]
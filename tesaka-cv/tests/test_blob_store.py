@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para el almacén de XML comprimidos por contenido (web.blob_store) y su
+uso desde web.db / web.lotes_db.
+
+Ejecutar:
+    python -m pytest tests/test_blob_store.py -v
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from web import blob_store, db, lotes_db
+
+DE_XML = "<rDE>" + "<gCamItem><dDesProSer>Servicio</dDesProSer></gCamItem>" * 50 + "</rDE>"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "tesaka.db"
+    with patch.object(db, "DB_PATH", path), patch.object(lotes_db, "DB_PATH", path):
+        yield path
+
+
+def test_put_blob_deduplicates_and_compresses(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "blobs.db"))
+    blob_store.ensure_blob_table(conn)
+
+    sha = blob_store.put_blob(conn, DE_XML)
+    assert blob_store.put_blob(conn, DE_XML) == sha == blob_store.blob_sha256(DE_XML)
+    assert blob_store.put_blob(conn, None) is None
+    small = blob_store.put_blob(conn, "<a/>")
+
+    codec, size, stored = conn.execute("SELECT codec, size, length(data) FROM xml_blobs WHERE sha256 = ?", (sha,)).fetchone()
+    assert codec in (blob_store.CODEC_ZLIB, blob_store.CODEC_ZSTD)
+    assert size == len(DE_XML) and stored < size // 5
+    assert conn.execute("SELECT COUNT(*) FROM xml_blobs").fetchone()[0] == 2
+    assert blob_store.get_blobs(conn, [sha, small, "nope", None]) == {sha: DE_XML, small: "<a/>"}
+    with pytest.raises(ValueError):
+        blob_store.decompress("lz4", b"")
+    conn.close()
+
+
+def test_documents_store_xml_by_hash_and_load_lazily(db_path):
+    ids = [db.insert_document(f"{i:044d}", "80012345", "12345678", DE_XML) for i in range(2)]
+    db.update_document_status(ids[0], "sent", signed_xml=DE_XML + "<!-- firmado -->", sirecepde_xml=DE_XML)
+
+    conn = sqlite3.connect(str(db_path))
+    assert conn.execute("SELECT COUNT(*) FROM xml_blobs").fetchone()[0] == 2  # de_xml y sirecepde_xml iguales
+    assert conn.execute("SELECT DISTINCT de_xml FROM de_documents").fetchall() == [("",)]
+    conn.close()
+
+    doc = db.get_document(ids[0])
+    assert "de_xml" in doc and "de_xml" not in doc.keys()  # todavía no se cargó
+    assert "de_xml_sha" not in doc
+    assert doc["de_xml"] == DE_XML and doc.get("sirecepde_xml") == DE_XML
+    assert doc["signed_xml"].endswith("<!-- firmado -->")
+    assert db.get_document(ids[1]).get("signed_xml") is None
+
+    xmls = db.get_documents_xml(ids)
+    assert [d["xml"] for d in xmls] == [DE_XML + "<!-- firmado -->", DE_XML]
+
+
+def test_inline_rows_are_migrated(db_path):
+    # Base creada con el esquema anterior (XML inline, sin columnas *_sha)
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("""
+        CREATE TABLE de_documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, cdc TEXT UNIQUE NOT NULL,
+            ruc_emisor TEXT NOT NULL, timbrado TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, de_xml TEXT NOT NULL,
+            sirecepde_xml TEXT, signed_xml TEXT, last_status TEXT, last_code TEXT,
+            last_message TEXT, d_prot_cons_lote TEXT, approved_at TEXT, updated_at TEXT
+        )
+    """)
+    conn.execute("INSERT INTO de_documents (cdc, ruc_emisor, timbrado, de_xml, signed_xml) VALUES ('1', 'r', 't', ?, ?)",
+                 (DE_XML, DE_XML))
+    conn.execute("""
+        CREATE TABLE sifen_lotes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, env TEXT NOT NULL, d_prot_cons_lote TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP, last_checked_at TIMESTAMP, last_cod_res_lot TEXT, last_msg_res_lot TEXT,
+            last_response_xml TEXT, status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER DEFAULT 0,
+            de_document_id INTEGER
+        )
+    """)
+    conn.execute("INSERT INTO sifen_lotes (env, d_prot_cons_lote, last_response_xml) VALUES ('test', '123', '<resp/>')")
+    conn.commit()
+    conn.close()
+
+    doc = db.get_document(1)
+    assert doc["de_xml"] == DE_XML and doc["signed_xml"] == DE_XML
+    lote = lotes_db.get_lote_by_prot("test", "123")
+    assert lote["last_response_xml"] == "<resp/>"
+
+    conn = sqlite3.connect(str(db_path))
+    assert conn.execute("SELECT de_xml, signed_xml, de_xml_sha = signed_xml_sha FROM de_documents").fetchone() == ("", None, 1)
+    assert conn.execute("SELECT last_response_xml FROM sifen_lotes").fetchone() == (None,)
+    assert conn.execute("SELECT COUNT(*) FROM xml_blobs").fetchone()[0] == 2
+    conn.close()
+
+    lotes_db.update_lote_status(lote["id"], lotes_db.LOTE_STATUS_DONE, response_xml="<resp2/>")
+    assert lotes_db.list_lotes()[0]["last_response_xml"] == "<resp2/>"
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para la validación masiva de CDC (app.sifen_client.cdc_batch y el CLI tools.cdc_batch).
+
+Ejecutar:
+    python -m pytest tests/test_cdc_batch.py -v
+"""
+
+import random
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.sifen_client import cdc_batch as cdc_batch_lib
+from tools import cdc_batch
+from tools.cdc_dv import calc_cdc_dv, is_cdc_valid
+
+CDC_OK = "01045547378001001000000112025123011234567895"
+CDC_BAD = "01045547378001001000000112025123011234567892"
+
+
+def _random_bases(n, seed=1):
+    rng = random.Random(seed)
+    return ["".join(rng.choices("0123456789", k=43)) for _ in range(n)]
+
+
+@pytest.mark.parametrize("numpy_available", [True, False])
+def test_calc_cdc_dv_batch_matches_scalar(numpy_available):
+    if numpy_available and not cdc_batch_lib.NUMPY_AVAILABLE:
+        pytest.skip("NumPy no instalado")
+    bases = _random_bases(2000)
+    with patch.object(cdc_batch_lib, "NUMPY_AVAILABLE", numpy_available):
+        batch = cdc_batch_lib.calc_cdc_dv_batch(bases)
+    assert [int(dv) for dv in batch] == [calc_cdc_dv(b) for b in bases]
+
+
+def test_calc_cdc_dv_batch_rejects_wrong_length():
+    with pytest.raises(ValueError):
+        cdc_batch_lib.calc_cdc_dv_batch(["123"])
+
+
+def test_validate_cdc_batch():
+    valid, dv_orig, dv_calc = cdc_batch_lib.validate_cdc_batch([CDC_OK, CDC_BAD, "abc", None])
+    assert [bool(v) for v in valid] == [True, False, False, False]
+    assert [int(d) for d in dv_orig] == [5, 2, -1, -1]
+    assert [int(d) for d in dv_calc] == [5, 5, -1, -1]
+
+
+def test_fix_cdc_batch():
+    fixed = cdc_batch_lib.fix_cdc_batch([CDC_BAD, CDC_OK, "123"])
+    assert fixed == [CDC_OK, CDC_OK, None]
+    assert is_cdc_valid(fixed[0])
+
+
+def test_audit_directory_fix():
+    xml = (
+        f'<rDE xmlns="http://ekuatia.set.gov.py/sifen/xsd"><DE Id="{CDC_BAD}">'
+        f'<dDVId>2</dDVId></DE><gCamFuFD><dCarQR>Id={CDC_BAD}</dCarQR></gCamFuFD></rDE>'
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "de.xml"
+        path.write_text(xml, encoding="utf-8")
+        (Path(tmp) / "otro.xml").write_text("<root/>", encoding="utf-8")
+
+        summary = cdc_batch.audit_directory(Path(tmp), fix=True)
+
+        assert summary["total"] == 1
+        assert len(summary["invalid"]) == 1
+        assert summary["fixed"] == 1
+        fixed = path.read_text(encoding="utf-8")
+        assert f'Id="{CDC_OK}"' in fixed
+        assert "<dDVId>5</dDVId>" in fixed
+        assert CDC_BAD not in fixed
+
+
+def test_audit_directory_does_not_fix_signed_xml():
+    xml = (
+        f'<rDE xmlns="http://ekuatia.set.gov.py/sifen/xsd"><DE Id="{CDC_BAD}"><dDVId>2</dDVId></DE>'
+        '<ds:Signature xmlns:ds="http://www.w3.org/2000/09/xmldsig#"/></rDE>'
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "firmado.xml"
+        path.write_text(xml, encoding="utf-8")
+
+        summary = cdc_batch.audit_directory(Path(tmp), fix=True)
+
+        assert summary["fixed"] == 0
+        assert summary["not_fixable"][0]["reason"].startswith("XML firmado")
+        assert path.read_text(encoding="utf-8") == xml
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests unitarios para la auditoría masiva de DEs (web.de_audit).
+"""
+import json
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from web import db
+from web.de_audit import audit_documents
+from web.sifen_pool import RateLimiter, ensure_pool_size
+from web.document_status import STATUS_APPROVED, STATUS_ERROR, STATUS_PENDING_SIFEN
+
+
+class FakeClient:
+    """Cliente falso: devuelve 0422 para CDCs en `approved`, 0420 para el resto."""
+
+    def __init__(self, approved, fail=()):
+        self.approved = set(approved)
+        self.fail = set(fail)
+        self.calls = []
+
+    def consulta_de_por_cdc_raw(self, cdc):
+        self.calls.append(cdc)
+        if cdc in self.fail:
+            raise ConnectionError("reset by peer")
+        if cdc in self.approved:
+            return {"http_status": 200, "dCodRes": "0422", "dMsgRes": "CDC encontrado"}
+        return {"http_status": 200, "dCodRes": "0420", "dMsgRes": "DE no existe"}
+
+
+class TestDeAudit(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_patch = patch.object(db, "DB_PATH", Path(self.tmp.name) / "test.db")
+        self.db_patch.start()
+        self.checkpoint = Path(self.tmp.name) / "checkpoint.json"
+        self.cdcs = [f"{i:044d}" for i in range(1, 8)]
+        self.ids = [db.insert_document(cdc, "80012345-7", "12345678", "<DE/>") for cdc in self.cdcs]
+        for doc_id in self.ids:
+            db.update_document_status(doc_id, STATUS_PENDING_SIFEN)
+        # Un documento aprobado localmente que SIFEN no conoce => discrepancia
+        db.update_document_status(self.ids[-1], STATUS_APPROVED)
+
+    def tearDown(self):
+        self.db_patch.stop()
+        self.tmp.cleanup()
+
+    def test_audit_updates_in_batches(self):
+        client = FakeClient(approved=self.cdcs[:3])
+        summary = audit_documents(client, workers=3, rate=1000, batch_size=2, checkpoint_path=self.checkpoint)
+
+        self.assertEqual(summary["processed"], 7)
+        self.assertEqual(summary["approved"], 3)
+        self.assertEqual(summary["discrepancies"], 1)
+        self.assertEqual(summary["errors"], 0)
+        self.assertEqual(sorted(client.calls), sorted(self.cdcs))
+
+        self.assertEqual(db.get_document(self.ids[0])["last_status"], STATUS_APPROVED)
+        self.assertIsNotNone(db.get_document(self.ids[0])["approved_at"])
+        self.assertEqual(db.get_document(self.ids[4])["last_status"], STATUS_PENDING_SIFEN)
+        self.assertEqual(db.get_document(self.ids[-1])["last_status"], STATUS_ERROR)
+        self.assertTrue(json.loads(self.checkpoint.read_text())["done"])
+
+    def test_audit_resumes_from_checkpoint(self):
+        state = {
+            "filters": {"since": None, "until": None, "statuses": None},
+            "done": False,
+            "processed": 4,
+            "last_id": self.ids[3],
+        }
+        self.checkpoint.write_text(json.dumps(state))
+
+        client = FakeClient(approved=self.cdcs)
+        summary = audit_documents(client, rate=1000, checkpoint_path=self.checkpoint)
+
+        self.assertTrue(summary["resumed"])
+        self.assertEqual(summary["processed"], 7)
+        self.assertEqual(client.calls, self.cdcs[4:])
+
+    def test_audit_status_filter_and_errors(self):
+        client = FakeClient(approved=[], fail=[self.cdcs[-1]])
+        summary = audit_documents(
+            client, statuses=[STATUS_APPROVED], rate=1000, checkpoint_path=None
+        )
+        self.assertEqual(client.calls, [self.cdcs[-1]])
+        self.assertEqual(summary["errors"], 1)
+        self.assertEqual(db.get_document(self.ids[-1])["last_status"], STATUS_APPROVED)
+
+    def test_dry_run_does_not_write(self):
+        client = FakeClient(approved=self.cdcs)
+        summary = audit_documents(client, rate=1000, checkpoint_path=None, dry_run=True)
+        self.assertEqual(summary["approved"], 6)
+        self.assertEqual(summary["updated"], 0)
+        self.assertEqual(db.get_document(self.ids[0])["last_status"], STATUS_PENDING_SIFEN)
+
+    def test_dry_run_ignores_checkpoint(self):
+        # Un dry-run (aunque se interrumpa) no debe hacer que la corrida real saltee documentos
+        client = FakeClient(approved=self.cdcs)
+        audit_documents(client, rate=1000, batch_size=2, checkpoint_path=self.checkpoint, dry_run=True)
+        self.assertFalse(self.checkpoint.exists())
+
+        self.checkpoint.write_text(json.dumps({
+            "filters": {"since": None, "until": None, "statuses": None}, "done": False, "last_id": self.ids[-1],
+        }))
+        summary = audit_documents(client, rate=1000, checkpoint_path=self.checkpoint, dry_run=True)
+        self.assertFalse(summary["resumed"])
+        self.assertEqual(summary["processed"], 7)
+
+    def test_pool_resize_keeps_timed_adapter(self):
+        import requests
+        from app.sifen_client.http_metrics import TimedHTTPAdapter
+
+        session = requests.Session()
+        session.mount("https://", TimedHTTPAdapter())
+        client = type("Client", (), {"transport": type("Transport", (), {"session": session})()})()
+        ensure_pool_size(client, 16)
+
+        adapter = session.get_adapter("https://sifen.set.gov.py")
+        self.assertIsInstance(adapter, TimedHTTPAdapter)
+        self.assertEqual(adapter.poolmanager.connection_pool_kw["maxsize"], 16)
+        self.assertEqual(adapter.poolmanager.pool_classes_by_scheme["https"].__name__, "_TimedHTTPSConnectionPool")
+
+    def test_rate_limiter_rejects_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para el constructor precompilado de DE (app.sifen_client.de_builder).
+
+Ejecutar:
+    python -m pytest tests/test_de_builder.py -v
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+from lxml import etree
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.sifen_client.de_builder import build_de_xml, benchmark
+from app.sifen_client.cdc_utils import validate_cdc
+from tools.validate_xsd import validate_against_xsd
+
+NS = {"s": "http://ekuatia.set.gov.py/sifen/xsd"}
+
+ITEMS = [
+    {"codigo": "A&1", "descripcion": "Tornillos <M8>", "cantidad": 3, "precio": 1000, "tasa_iva": 10},
+    {"codigo": "", "descripcion": "Servicio", "cantidad": 1, "precio": 5000, "tasa_iva": 5},
+    {"codigo": "E1", "descripcion": "Libro", "cantidad": 2, "precio": 2500, "tasa_iva": 0},
+]
+
+
+def _build(**kwargs):
+    params = dict(ruc="4554737-8", timbrado="12345678", fecha="2026-01-15", hora="10:30:00")
+    params.update(kwargs)
+    return etree.fromstring(build_de_xml(**params).encode("utf-8"))
+
+
+def _text(root, path):
+    return root.findtext(path, namespaces=NS)
+
+
+def test_cdc_valid_without_env(monkeypatch):
+    monkeypatch.delenv("SIFEN_EMISOR_RUC", raising=False)
+    root = _build()
+    cdc = root.get("Id")
+    assert len(cdc) == 44
+    assert validate_cdc(cdc)[0]
+    assert _text(root, "s:dDVId") == cdc[-1]
+    assert _text(root, "s:gDatGralOpe/s:gEmis/s:dRucEm") == "04554737"
+    assert _text(root, "s:gDatGralOpe/s:gEmis/s:dDVEmi") == "8"
+
+
+def test_items_and_totals_single_pass():
+    root = _build(items=ITEMS)
+    items = root.findall("s:gDtipDE/s:gCamItem", namespaces=NS)
+    assert len(items) == 3
+    assert _text(items[0], "s:dCodInt") == "A&1"
+    assert _text(items[0], "s:dDesProSer") == "Tornillos <M8>"
+    assert _text(items[1], "s:dCodInt") == "002"
+    assert _text(items[0], "s:gValorItem/s:gValorRestaItem/s:dTotOpeItem") == "3300"
+
+    assert _text(root, "s:gTotSub/s:dSubExe") == "5000"
+    assert _text(root, "s:gTotSub/s:dSub5") == "5000"
+    assert _text(root, "s:gTotSub/s:dSub10") == "3000"
+    assert _text(root, "s:gTotSub/s:dIVA5") == "250"
+    assert _text(root, "s:gTotSub/s:dIVA10") == "300"
+    assert _text(root, "s:gTotSub/s:dTotIVA") == "550"
+    assert _text(root, "s:gTotSub/s:dTotOpe") == "13000"
+    assert _text(root, "s:gTotSub/s:dTotalGs") == "13550"
+
+
+def test_valid_against_xsd():
+    xml = build_de_xml(ruc="4554737-8", timbrado="12345678", items=ITEMS * 50)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "de.xml"
+        path.write_text(xml, encoding="utf-8")
+        ok, errors = validate_against_xsd(path, "de")
+    assert ok, errors
+
+
+def test_nombre_emisor_by_env():
+    assert _text(_build(), "s:gDatGralOpe/s:gEmis/s:dNomEmi").startswith("DE generado en ambiente de prueba")
+    root = _build(env="prod", nombre_emisor="ACME & Cía")
+    assert _text(root, "s:gDatGralOpe/s:gEmis/s:dNomEmi") == "ACME & Cía"
+
+
+def test_benchmark_reports_cost():
+    results = benchmark([1, 20], repeat=2)
+    assert [r["items"] for r in results] == [1, 20]
+    assert all(r["ms_per_de"] >= 0 and r["bytes"] > 0 for r in results)
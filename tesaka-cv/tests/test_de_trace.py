@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para las trazas por DE (web.de_trace) y su integración con web/main.py.
+
+Ejecutar:
+    python -m pytest tests/test_de_trace.py -v
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.sifen_mock_server import CRYPTOGRAPHY_AVAILABLE, LatencyModel, MockBehavior, MockSifenServer
+from web import de_trace
+
+CDC_A = "01800123457001001000000122025010111234567891"
+CDC_B = "01800123457001001000000222025010111234567892"
+
+
+@pytest.fixture
+def trace_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(de_trace, "DB_PATH", tmp_path / "tesaka.db")
+    return tmp_path / "tesaka.db"
+
+
+def test_span_timeline_and_lote_result(trace_db):
+    de_trace.record_event(CDC_A, de_trace.STAGE_CREATED, ts=100.0, de_document_id=1)
+    de_trace.record_event(None, de_trace.STAGE_CREATED)  # sin CDC: se ignora
+    with pytest.raises(RuntimeError):
+        with de_trace.span(CDC_A, de_trace.STAGE_SIGN):
+            raise RuntimeError("sin xmlsec")
+    with de_trace.span(CDC_A, de_trace.STAGE_SEND, d_id="7") as ev:
+        ev.update(code="0300", d_prot_cons_lote="123")
+    de_trace.record_event(CDC_B, de_trace.STAGE_SEND, d_prot_cons_lote="123")
+
+    # CDC_A y CDC_B salen del lote por sus eventos de envío
+    de_trace.record_lote_result("123", "0362", [
+        {"cdc": CDC_A, "estado": "Aprobado", "resultados": [{"codigo": "0260"}]},
+        {"cdc": CDC_B, "estado": "Rechazado", "resultados": [{"codigo": "1000"}, {"codigo": "1003"}]},
+    ], duration_ms=12.0)
+
+    timeline = de_trace.get_timeline(CDC_A)
+    assert [e["stage"] for e in timeline] == ["created", "sign", "send", "lote_check", "approved"]
+    assert timeline[0]["elapsed_ms"] == 0 and timeline[0]["de_document_id"] == 1
+    assert not timeline[1]["ok"] and "sin xmlsec" in timeline[1]["detail"]
+    assert timeline[2]["d_id"] == "7" and timeline[2]["duration_ms"] is not None
+    assert timeline[3]["code"] == "0362" and timeline[3]["d_prot_cons_lote"] == "123"
+    assert [e["stage"] for e in de_trace.get_timeline(CDC_B)][-1] == "rejected"
+    assert sorted(de_trace.cdcs_for_lote("123")) == [CDC_A, CDC_B]
+
+    stats = de_trace.time_to_approval_stats()
+    assert (stats["documents"], stats["approved"], stats["rejected"], stats["pending"]) == (2, 1, 1, 0)
+    assert stats["time_to_approval"]["count"] == 1 and stats["time_to_approval"]["p50_s"] > 1000
+
+
+def test_time_to_approval_percentiles(trace_db):
+    for i in range(1, 101):
+        cdc = f"{i:044d}"
+        de_trace.record_event(cdc, de_trace.STAGE_CREATED, ts=1000.0)
+        de_trace.record_event(cdc, de_trace.STAGE_SEND, ts=1000.5)
+        de_trace.record_event(cdc, de_trace.STAGE_APPROVED, ts=1000.0 + i)
+    de_trace.record_event("9" * 44, de_trace.STAGE_CREATED, ts=1000.0)
+    de_trace.record_event("8" * 44, de_trace.STAGE_CREATED, ts=10.0)
+
+    stats = de_trace.time_to_approval_stats(since=500)
+    assert (stats["documents"], stats["approved"], stats["pending"]) == (101, 100, 1)
+    summary = stats["time_to_approval"]
+    assert (summary["p50_s"], summary["p95_s"], summary["p99_s"], summary["max_s"]) == (50, 95, 99, 100)
+    assert stats["send_to_approval"]["p50_s"] == 49.5
+
+
+@pytest.mark.skipif(not CRYPTOGRAPHY_AVAILABLE, reason="cryptography no instalado")
+def test_web_flow_records_timeline(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.sifen_client.lote_payload import payload_did
+    from web import db, lotes_db
+    from web.main import app
+
+    monkeypatch.chdir(tmp_path)
+    for module in (db, lotes_db, de_trace):
+        monkeypatch.setattr(module, "DB_PATH", tmp_path / "tesaka.db")
+    monkeypatch.setenv("SIFEN_EMISOR_RUC", "80012345-7")
+
+    behavior = MockBehavior(processing=LatencyModel("fixed", 0))
+    with MockSifenServer(behavior, certs_dir=tmp_path / "certs") as server:
+        for key, value in server.client_env().items():
+            monkeypatch.setenv(key, value)
+        client = TestClient(app)
+        form = {"timbrado": "12345678", "establecimiento": "001", "punto_expedicion": "001",
+                "numero_documento": "0000001", "item_codigo_0": "001", "item_descripcion_0": "Producto",
+                "item_cantidad_0": "1", "item_precio_0": "1000", "item_tasa_iva_0": "10"}
+        assert client.post("/de/new", data=form, follow_redirects=False).status_code == 303
+        assert client.post("/de/1/send?mode=direct", follow_redirects=False).status_code == 303
+
+    timeline = client.get("/de/1/timeline?format=json").json()
+    assert [e["stage"] for e in timeline["events"]] == ["created", "send", "approved"]
+    assert timeline["events"][1]["code"] == "0260"
+    # Send y approved llevan el dId del rEnviDe guardado (el que se envió)
+    sent_did = payload_did(db.get_document(1)["sirecepde_xml"])
+    assert sent_did and [e["d_id"] for e in timeline["events"][1:]] == [sent_did, sent_did]
+
+    page = client.get("/de/1/timeline")
+    assert page.status_code == 200 and "0260" in page.text
+    assert client.get("/de/99/timeline").status_code == 404
+    assert client.get("/admin/sifen/time-to-approval?days=1").json()["approved"] == 1
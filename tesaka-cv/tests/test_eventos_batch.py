@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Tests unitarios para el envío masivo de eventos (app.sifen_client.evento_builder, web.eventos_batch).
+"""
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+from lxml import etree
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.sifen_client import evento_builder
+from app.sifen_client.evento_builder import DS_NS, SIFEN_NS, EventoSigner
+from web import db, eventos_db
+from web.eventos_batch import parse_rango, plan_eventos, submit_eventos
+
+SCHEMAS_DIR = Path(__file__).parent.parent / "schemas_sifen"
+NS = {"s": SIFEN_NS}
+
+
+def fake_signer(rges_eve):
+    """Agrega un Signature con la estructura de EventoSigner y valores dummy (sin xmlsec)."""
+    signer = EventoSigner.__new__(EventoSigner)
+    signer._cert_b64 = "QUJD"
+    sig = signer._template(rges_eve.find(f"{{{SIFEN_NS}}}rEve").get("Id"))
+    sig.find(f".//{{{DS_NS}}}DigestValue").text = "QUJD"
+    sig.find(f"{{{DS_NS}}}SignatureValue").text = "QUJD"
+    rges_eve.append(sig)
+
+
+class _LocalResolver(etree.Resolver):
+    def resolve(self, url, pubid, context):
+        path = SCHEMAS_DIR / url.rsplit("/", 1)[-1]
+        if path.exists():
+            return self.resolve_filename(str(path), context)
+        return None
+
+
+class FakeClient:
+    """Cliente falso: aprueba todos los eventos salvo los ids en `rejected`."""
+
+    def __init__(self, rejected=(), fail_if_contains=None):
+        self.rejected = {str(i) for i in rejected}
+        self.fail_if_contains = fail_if_contains
+        self.requests = []
+
+    def recepcion_evento(self, r_envi_evento):
+        self.requests.append(r_envi_evento)
+        if self.fail_if_contains and self.fail_if_contains in r_envi_evento:
+            raise ConnectionError("reset by peer")
+        root = etree.fromstring(r_envi_evento)
+        ids = root.xpath("//s:rEve/@Id", namespaces=NS)
+        return {
+            "http_status": 200,
+            "resultados": [
+                {
+                    "id": i,
+                    "estado": "Rechazado" if i in self.rejected else "Aprobado",
+                    "prot_aut": None if i in self.rejected else "99" + i,
+                    "codigo": "4003" if i in self.rejected else "0600",
+                    "mensaje": "CDC inexistente" if i in self.rejected else "Evento registrado correctamente",
+                }
+                for i in ids
+            ],
+        }
+
+
+def _cdc(i):
+    return f"0104554737800100100{i:07d}12025123011234567"[:43] + "5"
+
+
+class TestEventoBuilder(unittest.TestCase):
+
+    def test_request_valid_against_xsd(self):
+        parser = etree.XMLParser()
+        parser.resolvers.add(_LocalResolver())
+        schema = etree.XMLSchema(etree.parse(str(SCHEMAS_DIR / "WS_SiRecepEvento_v150.xsd"), parser))
+
+        signed = [
+            evento_builder.sign_evento(
+                evento_builder.build_cancelacion(i + 1, _cdc(i), "Error de emisión & <datos>"), fake_signer
+            )
+            for i in range(14)
+        ]
+        signed.append(evento_builder.sign_evento(
+            evento_builder.build_inutilizacion(15, "12345678", "1", "1", 150, 180, "Numeración salteada"),
+            fake_signer,
+        ))
+        request = evento_builder.build_r_envi_evento(evento_builder.make_did(), signed)
+        root = etree.fromstring(request)
+
+        self.assertTrue(schema.validate(root), schema.error_log)
+        self.assertEqual(len(root.findall(".//s:rGesEve", NS)), 15)
+        self.assertEqual(root.findtext(".//s:rGeVeInu/s:dNumIn", namespaces=NS), "0000150")
+
+    def test_limits(self):
+        with self.assertRaises(ValueError):
+            evento_builder.build_r_envi_evento(1, [b"<x/>"] * 16)
+        with self.assertRaises(ValueError):
+            evento_builder.build_cancelacion(1, _cdc(1), "no")
+        with self.assertRaises(ValueError):
+            evento_builder.build_inutilizacion(1, "12345678", "1", "1", 9, 5, "Rango invertido")
+        self.assertEqual([len(g) for g in evento_builder.chunk_eventos(list(range(31)))], [15, 15, 1])
+
+    def test_parse_response(self):
+        xml = (
+            f'<env:Envelope xmlns:env="http://www.w3.org/2003/05/soap-envelope"><env:Body>'
+            f'<ns2:rRetEnviEventoDe xmlns:ns2="{SIFEN_NS}"><ns2:dFecProc>2026-01-15T10:00:00-03:00</ns2:dFecProc>'
+            f"<ns2:gResProcEVe><ns2:dEstRes>Aprobado</ns2:dEstRes><ns2:dProtAut>123</ns2:dProtAut><ns2:id>7</ns2:id>"
+            f"<ns2:gResProc><ns2:dCodRes>0600</ns2:dCodRes><ns2:dMsgRes>Evento registrado correctamente</ns2:dMsgRes></ns2:gResProc>"
+            f"</ns2:gResProcEVe></ns2:rRetEnviEventoDe></env:Body></env:Envelope>"
+        ).encode("utf-8")
+        result = evento_builder.parse_evento_response(xml)
+        self.assertEqual(result["d_fec_proc"], "2026-01-15T10:00:00-03:00")
+        self.assertEqual(result["resultados"], [{
+            "id": "7", "estado": "Aprobado", "prot_aut": "123",
+            "codigo": "0600", "mensaje": "Evento registrado correctamente",
+        }])
+
+
+class TestEventosBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmp.name) / "test.db"
+        self.patches = [patch.object(db, "DB_PATH", db_path), patch.object(eventos_db, "DB_PATH", db_path)]
+        for p in self.patches:
+            p.start()
+        self.cdcs = [_cdc(i) for i in range(40)]
+        self.doc_id = db.insert_document(self.cdcs[0], "4554737-8", "12345678", "<DE/>")
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def test_parse_rango(self):
+        self.assertEqual(parse_rango("12345678:1:2:150-180:5"), {
+            "timbrado": "12345678", "establecimiento": "001", "punto_expedicion": "002",
+            "numero_inicio": 150, "numero_fin": 180, "tipo_documento": 5,
+        })
+        self.assertEqual(parse_rango("12345678:001:001:42")["numero_fin"], 42)
+        with self.assertRaises(ValueError):
+            parse_rango("1234:001:001:1-2")
+
+    def test_submit_packs_and_records(self):
+        eventos = plan_eventos(self.cdcs + self.cdcs[:2], [parse_rango("12345678:001:001:1-9")], "Facturas con precio erróneo")
+        self.assertEqual(len(eventos), 41)
+
+        client = FakeClient(rejected=[3], fail_if_contains=b"<rGeVeInu>")
+        summary = submit_eventos(client, fake_signer, eventos, workers=3, rate=1000)
+
+        self.assertEqual(summary["requests"], 3)
+        self.assertEqual(len(client.requests), 3)
+        self.assertEqual(summary["errors"], 11)  # el request con la inutilización falló completo
+        self.assertEqual(summary["rejected"], 1)
+        self.assertEqual(summary["approved"], 29)
+
+        rows = {r["id"]: r for r in eventos_db.list_eventos(limit=100)}
+        self.assertEqual(len(rows), 41)
+        self.assertEqual(rows[1]["status"], eventos_db.EVENTO_STATUS_APPROVED)
+        self.assertEqual(rows[1]["prot_aut"], "991")
+        self.assertEqual(rows[1]["de_document_id"], self.doc_id)
+        self.assertEqual(rows[3]["status"], eventos_db.EVENTO_STATUS_REJECTED)
+        self.assertEqual(rows[41]["tipo"], "inutilizacion")
+        self.assertEqual(rows[41]["status"], eventos_db.EVENTO_STATUS_ERROR)
+
+    def test_dry_run_does_not_record(self):
+        eventos = plan_eventos(self.cdcs[:5], [], "Prueba de eventos")
+        client = FakeClient()
+        summary = submit_eventos(client, fake_signer, eventos, dry_run=True)
+        self.assertEqual(summary["requests"], 1)
+        self.assertEqual(client.requests, [])
+        self.assertEqual(eventos_db.list_eventos(), [])
+
+    def test_invalid_event_records_nothing(self):
+        eventos = plan_eventos(["123"], [], "Prueba de eventos")
+        with self.assertRaises(ValueError):
+            submit_eventos(FakeClient(), fake_signer, eventos)
+        self.assertEqual(eventos_db.list_eventos(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para el modelo de ejecución (app.executors): pools, monitor de lag y
+clasificación de los handlers FastAPI.
+
+Ejecutar:
+    python -m pytest tests/test_executors.py -v
+"""
+
+import ast
+import asyncio
+import inspect
+import sys
+import textwrap
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import executors
+from app.executors import LoopLagMonitor, run_cpu, run_io
+from app.sifen_client import metrics
+
+
+def _square(x):
+    return x * x
+
+
+def _async_endpoints(app):
+    for route in app.routes:
+        endpoint = getattr(route, "endpoint", None)
+        if endpoint is None or not inspect.iscoroutinefunction(endpoint):
+            continue
+        # Rutas propias de FastAPI (/docs, /openapi.json), del monitor y de /metrics
+        if endpoint.__module__.startswith("fastapi") or endpoint.__module__ in (executors.__name__, metrics.__name__):
+            continue
+        yield route.path, endpoint
+
+
+@pytest.mark.parametrize("module_name", ["app.main", "web.main"])
+def test_async_endpoints_always_await(module_name):
+    """Un handler async que no hace await corre blocking en el event loop: debe ser def"""
+    module = __import__(module_name, fromlist=["app"])
+    offenders = []
+    for path, endpoint in _async_endpoints(module.app):
+        tree = ast.parse(textwrap.dedent(inspect.getsource(endpoint)))
+        if not any(isinstance(node, ast.Await) for node in ast.walk(tree)):
+            offenders.append(path)
+    assert offenders == []
+
+
+def test_run_io_uses_threadpool():
+    main_thread = threading.get_ident()
+    thread_id = asyncio.run(run_io(threading.get_ident))
+    assert thread_id != main_thread
+
+
+def test_run_cpu_uses_process_pool():
+    try:
+        assert asyncio.run(run_cpu(_square, 12)) == 144
+    finally:
+        executors.shutdown_cpu_executor()
+
+
+def test_map_cpu_reuses_shared_pool():
+    try:
+        assert executors.map_cpu(_square, range(5), chunksize=2) == [0, 1, 4, 9, 16]
+        pool = executors._get_cpu_executor()
+        assert executors.map_cpu(_square, [3]) == [9]
+        assert executors._get_cpu_executor() is pool
+    finally:
+        executors.shutdown_cpu_executor()
+
+
+def test_loop_lag_monitor_detects_blocking():
+    monitor = LoopLagMonitor(interval=0.01, warn_threshold=0.05, report_every=0)
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.12)  # bloquea el loop
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+    stats = monitor.stats()
+    assert stats["samples"] >= 3
+    assert stats["max_ms"] >= 100
+    assert stats["warnings"] == 1
+    assert stats["p50_ms"] < stats["max_ms"]
+
+
+def test_loop_lag_stats_empty():
+    stats = LoopLagMonitor().stats()
+    assert stats["samples"] == 0
+    assert stats["p99_ms"] == 0.0
+
+
+def test_loop_lag_endpoint():
+    from web.main import app
+
+    with TestClient(app) as client:
+        stats = client.get("/_internal/loop-lag").json()
+    assert stats["interval_ms"] == 100.0
+    assert "p99_ms" in stats
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Presupuesto de tiempo de import de app.sifen_client y de la biblioteca de envío.
+
+Cada import se mide en un intérprete nuevo (como un CLI o un worker recién
+levantado). Además del tiempo, se verifica qué dependencias pesadas quedaron
+cargadas: eso no depende del ruido de la máquina.
+
+Ejecutar:
+    python -m pytest tests/test_import_time.py -v
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(ROOT))
+
+HEAVY = ("zeep", "httpx", "signxml", "cryptography", "requests", "qrcode", "dotenv")
+
+_PROBE = """
+import json, os, sys, time
+env_before, path_before = dict(os.environ), list(sys.path)
+start = time.perf_counter()
+{stmt}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "modules": sorted(m for m in {heavy!r} if m in sys.modules),
+    "env_changed": dict(os.environ) != env_before,
+    "path_changed": sys.path != path_before,
+}}))
+"""
+
+
+def _probe(stmt: str, runs: int = 3) -> dict:
+    """Importa en `runs` intérpretes nuevos; devuelve la corrida más rápida."""
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(stmt=stmt, heavy=HEAVY)],
+            cwd=ROOT, capture_output=True, text=True, timeout=60,
+            env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        )
+        assert out.returncode == 0, out.stderr
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(results, key=lambda r: r["seconds"])
+
+
+@pytest.mark.parametrize("stmt, allowed, budget_s", [
+    ("import app.sifen_client", (), 0.05),
+    # config carga el .env a propósito (ver config.py)
+    ("from app.sifen_client import get_sifen_config, SifenResponseError", ("dotenv",), 0.1),
+    ("import app.sifen_client.lote_payload", (), 0.1),
+    ("import app.sifen_client.lote_sender", (), 0.6),
+    # Los timers no cargan requests/urllib3 (TimedHTTPAdapter vive en http_metrics)
+    ("import app.sifen_client.metrics", (), 0.05),
+])
+def test_import_budget(stmt, allowed, budget_s):
+    result = _probe(stmt)
+    assert result["modules"] == sorted(allowed), f"{stmt} cargó {result['modules']}"
+    assert result["seconds"] < budget_s, f"{stmt}: {result['seconds'] * 1000:.0f} ms (presupuesto {budget_s * 1000:.0f} ms)"
+
+
+def test_lote_sender_import_has_no_side_effects():
+    # La web lo importa dentro de un request: no debe recargar .env ni tocar sys.path
+    result = _probe("import app.sifen_client.lote_sender", runs=1)
+    assert not result["env_changed"] and not result["path_changed"]
+
+
+def test_lazy_names_resolve_to_submodules():
+    import app.sifen_client as sifen_client
+    from app.sifen_client import client, soap_client
+
+    assert sifen_client.SoapClient is soap_client.SoapClient
+    assert sifen_client.SifenClientError is client.SifenClientError
+    assert set(sifen_client.__all__) <= set(dir(sifen_client))
+    with pytest.raises(AttributeError):
+        sifen_client.NoExiste
+
+    from tools import send_sirecepde
+    from app.sifen_client import lote_sender
+    assert send_sirecepde.build_and_sign_lote_from_xml is lote_sender.build_and_sign_lote_from_xml
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para la normalización de facturas (cabecera tipada + invoice_items).
+
+Ejecutar:
+    python -m pytest tests/test_invoice_lines.py -v
+"""
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from app import db as app_db
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+INVOICE_OK = json.loads((EXAMPLES_DIR / "source_invoice_ok.json").read_text(encoding="utf-8"))
+
+
+def _insert(conn, data, issue_date=None, buyer_name=None):
+    cursor = conn.execute(
+        "INSERT INTO invoices (issue_date, buyer_name, data_json) VALUES (?, ?, ?)",
+        (
+            issue_date or data["issue_date"],
+            buyer_name or data["buyer"]["nombre"],
+            data if isinstance(data, str) else json.dumps(data, ensure_ascii=False),
+        ),
+    )
+    return cursor.lastrowid
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "app.db"
+    with patch.object(app_db, "DB_PATH", path):
+        yield path
+
+
+def test_migration_backfills_legacy_rows(db_path):
+    # Base "vieja": solo la tabla invoices original, sin columnas ni triggers
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("""
+        CREATE TABLE invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            issue_date TEXT NOT NULL,
+            buyer_name TEXT NOT NULL,
+            data_json TEXT NOT NULL
+        )
+    """)
+    _insert(conn, INVOICE_OK)
+    _insert(conn, "{roto", issue_date="2024-01-16", buyer_name="Rota")
+    conn.commit()
+    conn.close()
+
+    app_db.init_db()
+    app_db.init_db()  # idempotente: no duplica items
+
+    conn = app_db.get_db()
+    header = dict(conn.execute("SELECT * FROM invoices WHERE id = 1").fetchone())
+    assert header["buyer_ruc"] == "80012345"
+    assert header["numero_comprobante"] == "001-001-00000001"
+    assert header["tipo_comprobante"] == 1 and header["moneda"] == "PYG"
+    assert header["items_count"] == 1 and header["total"] == pytest.approx(10500.0)
+    items = [dict(r) for r in conn.execute("SELECT * FROM invoice_items")]
+    assert len(items) == 1
+    assert items[0]["line_no"] == 1 and items[0]["tasa_aplica"] == 10
+    assert items[0]["subtotal"] == pytest.approx(10500.0)
+    # El JSON inválido no rompe la migración: queda sin normalizar
+    assert conn.execute("SELECT total FROM invoices WHERE id = 2").fetchone()["total"] is None
+    conn.close()
+
+
+def test_triggers_keep_lines_in_sync(db_path):
+    app_db.init_db()
+    conn = app_db.get_db()
+    data = json.loads(json.dumps(INVOICE_OK))
+    data["items"].append({"cantidad": 3, "tasaAplica": 5, "precioUnitario": 250, "descripcion": "Flete"})
+    invoice_id = _insert(conn, data)
+    assert conn.execute("SELECT total FROM invoices WHERE id = ?", (invoice_id,)).fetchone()["total"] == pytest.approx(11250.0)
+
+    data["items"] = data["items"][1:]
+    conn.execute("UPDATE invoices SET data_json = ? WHERE id = ?", (json.dumps(data), invoice_id))
+    row = conn.execute("SELECT total, items_count FROM invoices WHERE id = ?", (invoice_id,)).fetchone()
+    assert (row["total"], row["items_count"]) == (750.0, 1)
+    assert conn.execute("SELECT descripcion FROM invoice_items").fetchall()[0]["descripcion"] == "Flete"
+
+    conn.execute("DELETE FROM invoices WHERE id = ?", (invoice_id,))
+    assert conn.execute("SELECT COUNT(*) FROM invoice_items").fetchone()[0] == 0
+    conn.close()
+
+
+def test_dashboard_and_list_use_sql_totals(db_path):
+    app_db.init_db()
+    conn = app_db.get_db()
+    for i, ruc in enumerate(["80012345", "80099999", "80012345"], start=1):
+        data = json.loads(json.dumps(INVOICE_OK))
+        data["buyer"]["ruc"] = ruc
+        data["buyer"]["nombre"] = f"Comprador {i}"
+        _insert(conn, data, issue_date=f"2024-01-1{i}")
+    conn.commit()
+    conn.close()
+
+    from app.main import app
+    with TestClient(app) as client:
+        response = client.get("/")
+        assert response.status_code == 200
+        assert "31500.00" in response.text
+
+        response = client.get("/invoices", params={"ruc": "80012345", "desde": "2024-01-12"})
+        assert response.status_code == 200
+        assert "Comprador 3" in response.text and "Comprador 1" not in response.text
+        assert "Total: <strong>10500.00</strong>" in response.text
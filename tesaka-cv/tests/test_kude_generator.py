@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para el generador de KuDE (app.kude_generator).
+
+Ejecutar:
+    python -m pytest tests/test_kude_generator.py -v
+"""
+
+import hashlib
+import io
+import re
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+from reportlab.graphics.barcode import qrencoder
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import kude_generator
+from app.kude_generator import (
+    KudeError,
+    build_qr_url,
+    extract_kude_data,
+    qr_matrix,
+    render_kude,
+    render_kude_batch,
+)
+from app.sifen_client.de_builder import build_de_xml
+from app.sifen_client.qr_generator import QRGenerator
+
+CSC = "ABCD0000000000000000000000000000"
+
+
+def _de(numero=1, items=3):
+    return build_de_xml(
+        ruc="4554737-8",
+        timbrado="12345678",
+        numero_documento=f"{numero:07d}",
+        fecha="2026-01-15",
+        hora="10:30:00",
+        items=[
+            {"codigo": f"P{i}", "descripcion": f"Producto {i}", "cantidad": 1, "precio": 1000, "tasa_iva": 10}
+            for i in range(items)
+        ],
+    )
+
+
+def _page_count(pdf: bytes) -> int:
+    return int(re.search(rb"/Count (\d+) /Kids", pdf).group(1))
+
+
+@pytest.mark.parametrize("length", [1, 17, 120, 383, 700])
+def test_qr_matrix_matches_reportlab(length):
+    """La matriz es idéntica a la del encoder de reportlab con la misma versión y máscara"""
+    text = ("https://ekuatia.set.gov.py/consultas/qr?nVersion=150&Id=" * 20)[:length]
+    ref = qrencoder.QRCode(None, qrencoder.QRErrorCorrectLevel.M)
+    ref.addData(qrencoder.QR8bitByte(text))
+    ref.version = ref.calculate_version()
+    ref.makeImpl(False, kude_generator._QR_MASK)
+    assert qr_matrix(text) == ref.modules
+
+
+def test_extract_kude_data_from_rde():
+    xml = '<rDE xmlns="http://ekuatia.set.gov.py/sifen/xsd"><dVerFor>150</dVerFor>' + _de(items=4) + "</rDE>"
+    data = extract_kude_data(xml)
+
+    assert data["cdc"] == "01045547378001001000000112026011511234567890"
+    assert data["ruc_emisor"] == "04554737"
+    assert data["ruc_receptor"] == "80012345"
+    assert data["numero"] == "0000001"
+    assert data["digest_value"] == "dGhpcyBpcyBhIHRlc3QgZGlnZXN0IHZhbHVl"
+    assert len(data["items"]) == 4
+    assert data["items"][0] == {
+        "codigo": "P0", "descripcion": "Producto 0", "cantidad": "1.00", "precio": "1000", "total": "1100",
+    }
+    # El item no pisa los campos del documento
+    assert data["total"] == "4000" and "descripcion" not in data
+
+
+def test_extract_kude_data_invalid():
+    with pytest.raises(KudeError):
+        extract_kude_data("<DE>")
+    with pytest.raises(KudeError):
+        extract_kude_data("<gTimb/>")
+
+
+def test_build_qr_url():
+    data = extract_kude_data(_de())
+    url = build_qr_url(data, csc=CSC, csc_id="0002", env="prod")
+
+    base, params = url.split("?", 1)
+    assert base + "?" == "https://www.ekuatia.set.gov.py/consultas/qr?"
+    params, qr_hash = params.split("&cHashQR=")
+    # Misma regla que el QR del DE: hex en mayúsculas
+    assert qr_hash == hashlib.sha256((params + CSC).encode("utf-8")).hexdigest().upper()
+    assert qr_hash == QRGenerator.hash_qr(params, CSC)
+    assert f"&Id={data['cdc']}&" in params
+    assert "&dFeEmiDE=" + "2026-01-15T10:30:00".encode().hex() in params
+    assert "&cItems=3&" in params
+    assert params.endswith("&IdCSC=0002")
+
+    # Sin CSC no hay hash; dCarQR con URL se usa tal cual
+    assert "cHashQR" not in build_qr_url(data, csc="", env="test")
+    data["qr"] = "https://ekuatia.set.gov.py/consultas/qr?nVersion=150&Id=X&cHashQR=abc"
+    assert build_qr_url(data, csc=CSC) == data["qr"]
+
+
+def test_render_kude_paginates_items():
+    rows = kude_generator.ROWS_PER_PAGE
+    assert _page_count(render_kude(_de(items=1), csc=CSC)) == 1
+    assert _page_count(render_kude(_de(items=rows + 1), csc=CSC)) == 2
+
+
+def test_render_batch_merged_pdf():
+    xmls = [_de(i + 1, items=2) for i in range(3)] + [_de(9, items=kude_generator.ROWS_PER_PAGE * 2)]
+    pdf = render_kude_batch(xmls, output="pdf", workers=1, csc=CSC)
+    assert pdf.startswith(b"%PDF")
+    assert _page_count(pdf) == 5
+    # Un Form XObject para el layout fijo (compartido) más uno de QR por documento
+    assert pdf.count(b"/FormType 1") == 1 + len(xmls)
+
+
+def test_concurrent_renders_restore_rl_config():
+    from concurrent.futures import ThreadPoolExecutor
+
+    from reportlab import rl_config
+
+    before = rl_config.useA85
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        pdfs = list(pool.map(lambda i: render_kude(_de(i + 1), csc=CSC), range(8)))
+    assert all(pdf.startswith(b"%PDF") for pdf in pdfs)
+    assert rl_config.useA85 == before
+
+
+def test_render_batch_zip_in_pool():
+    xmls = [_de(i + 1) for i in range(kude_generator.MIN_PARALLEL_BATCH)]
+    content = render_kude_batch(xmls, output="zip", workers=2, csc=CSC)
+    with zipfile.ZipFile(io.BytesIO(content)) as zf:
+        names = zf.namelist()
+        assert len(names) == len(xmls)
+        assert names[0] == extract_kude_data(xmls[0])["cdc"] + ".pdf"
+        assert _page_count(zf.read(names[-1])) == 1
+
+    with pytest.raises(ValueError):
+        render_kude_batch(xmls[:1], output="png")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para la prueba de carga de web/ y app/ (tools.load_test_web).
+
+Ejecutar:
+    python -m pytest tests/test_load_test_web.py -v
+"""
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools import load_test_web as lt
+from tools.sifen_mock_server import CRYPTOGRAPHY_AVAILABLE, LatencyModel, MockBehavior
+from web import db
+
+
+def test_recorder_summary_and_saturation():
+    recorder = lt.Recorder()
+    for ms in range(1, 101):
+        recorder.add("GET /invoices", float(ms), "ok")
+    recorder.add("POST /de/new", 5000.0, "http_error", locked=True)
+    recorder.add("POST /de/new", 10.0, "app_error")
+
+    summary = recorder.summary(duration_s=2.0)
+    route = summary["routes"]["GET /invoices"]
+    assert (route["p50_ms"], route["p95_ms"], route["p99_ms"], route["max_ms"]) == (50.0, 95.0, 99.0, 100.0)
+    assert summary["routes"]["POST /de/new"]["error_rate"] == 0.5
+    assert summary["routes"]["POST /de/new"]["app_error_rate"] == 0.5
+    assert (summary["requests"], summary["rps"], summary["locked_errors"]) == (102, 51.0, 1)
+
+    levels = [{"concurrency": 1, "rps": 40}, {"concurrency": 4, "rps": 66}, {"concurrency": 8, "rps": 64}]
+    assert lt.find_saturation(levels) == 8
+    assert lt.find_saturation(levels[:2]) is None
+
+
+def test_lock_probe_measures_writer_wait(tmp_path):
+    db_path = tmp_path / "tesaka.db"
+    writer = sqlite3.connect(str(db_path), isolation_level=None)
+    writer.execute("CREATE TABLE t (x)")
+    probe = lt.LockProbe(db_path, interval=0.01)
+    probe.start()
+    time.sleep(0.05)
+    writer.execute("BEGIN IMMEDIATE")
+    time.sleep(0.3)
+    writer.execute("ROLLBACK")
+    time.sleep(0.05)
+    stats = probe.stop()
+    writer.close()
+    assert stats["probes"] > 3 and stats["probe_failures"] == 0
+    assert stats["max_ms"] >= 200
+
+
+def test_failed_insert_releases_write_lock(tmp_path):
+    # El traceback retiene el cursor: sin rollback explícito el lock sobrevive al close()
+    with patch.object(db, "DB_PATH", tmp_path / "tesaka.db"):
+        db.insert_document("X" * 44, "80012345-7", "12345678", "<DE/>")
+        try:
+            db.insert_document("X" * 44, "80012345-7", "12345678", "<DE/>")
+        except ConnectionError:
+            other = sqlite3.connect(str(tmp_path / "tesaka.db"), timeout=0)
+            other.execute("BEGIN IMMEDIATE")
+            other.execute("ROLLBACK")
+            other.close()
+
+
+@pytest.mark.skipif(not CRYPTOGRAPHY_AVAILABLE, reason="cryptography no instalado")
+def test_run_load_test_end_to_end(tmp_path):
+    pytest.importorskip("uvicorn")
+    report = lt.run_load_test(
+        [2], duration=2.0, scenario="both", send_mode="direct",
+        behavior=MockBehavior(processing=LatencyModel("fixed", 0)), workdir=tmp_path,
+        poll_interval=0.05, max_polls=2, reports=["/reports/sales_invoices.xlsx"],
+    )
+    level = report["levels"][0]
+    assert level["cycles"] > 0 and level["error_rate"] == 0
+    assert {"POST /de/new", "POST /de/{id}/send", "GET /de/{id}/status", "POST /invoices",
+            "GET /invoices", "GET /reports/sales_invoices.xlsx"} <= set(level["routes"])
+    assert level["sqlite"]["probes"] > 0 and level["sqlite"]["locked_errors"] == 0
+    assert sum(report["de_status"].values()) == level["routes"]["POST /de/new"]["count"]
+    assert report["sifen_mock"]["siRecepDE"]
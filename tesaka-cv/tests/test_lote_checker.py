@@ -99,6 +99,37 @@ class TestLoteChecker(unittest.TestCase):
         # Debe intentar parsear aunque falle
         self.assertIsNotNone(result)
 
+    def test_parse_lote_de_results(self):
+        """Test extracción de resultados por DE (gResProcLote) de una respuesta 0362"""
+        from web.sifen_status_mapper import parse_lote_de_results
+
+        xml = """<?xml version="1.0" encoding="UTF-8"?>
+<env:Envelope xmlns:env="http://www.w3.org/2003/05/soap-envelope">
+  <env:Body>
+    <ns2:rResEnviConsLoteDe xmlns:ns2="http://ekuatia.set.gov.py/sifen/xsd">
+      <ns2:dCodResLot>0362</ns2:dCodResLot>
+      <ns2:gResProcLote>
+        <ns2:id>01800123457001001000000122025010111234567891</ns2:id>
+        <ns2:dEstRes>Aprobado</ns2:dEstRes>
+        <ns2:dProtAut>1000000001</ns2:dProtAut>
+        <ns2:gResProc><ns2:dCodRes>0260</ns2:dCodRes><ns2:dMsgRes>Autorización del DE satisfactoria</ns2:dMsgRes></ns2:gResProc>
+      </ns2:gResProcLote>
+      <ns2:gResProcLote>
+        <ns2:id>01800123457001001000000222025010111234567892</ns2:id>
+        <ns2:dEstRes>Rechazado</ns2:dEstRes>
+        <ns2:gResProc><ns2:dCodRes>1000</ns2:dCodRes><ns2:dMsgRes>CDC no corresponde</ns2:dMsgRes></ns2:gResProc>
+        <ns2:gResProc><ns2:dCodRes>1003</ns2:dCodRes><ns2:dMsgRes>DV del CDC inválido</ns2:dMsgRes></ns2:gResProc>
+      </ns2:gResProcLote>
+    </ns2:rResEnviConsLoteDe>
+  </env:Body>
+</env:Envelope>"""
+
+        results = parse_lote_de_results(xml)
+        self.assertEqual([r["estado"] for r in results], ["Aprobado", "Rechazado"])
+        self.assertEqual(results[0]["d_prot_aut"], "1000000001")
+        self.assertIsNone(results[1]["d_prot_aut"])
+        self.assertEqual(results[1]["codigos"], ["1000", "1003"])
+
     def test_determine_status_from_cod_res_lot(self):
         """Test determinación de estado desde código de respuesta"""
         from app.sifen_client.lote_checker import determine_status_from_cod_res_lot
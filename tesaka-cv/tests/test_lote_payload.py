@@ -0,0 +1,116 @@
+"""
+Tests para el armado sin copias del payload siRecepLoteDE (app.sifen_client.lote_payload).
+"""
+import base64
+import io
+import os
+import sys
+import zipfile
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import lxml.etree as etree
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.sifen_client import lote_payload, soap_templates
+
+SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
+
+
+def _lote_xml(n: int = 50, random_data: bool = False) -> bytes:
+    def dat():
+        return os.urandom(2000).hex().encode("ascii") if random_data else b"x" * 4000
+
+    rdes = b"".join(b'<rDE><DE Id="%d"><dDat>%s</dDat></DE></rDE>' % (i, dat()) for i in range(n))
+    return f'<rLoteDE xmlns="{SIFEN_NS}">'.encode("ascii") + rdes + b"</rLoteDE>"
+
+
+def test_envelope_matches_template():
+    zip_data = lote_payload.zip_lote(_lote_xml())
+    envelope = lote_payload.assemble_lote_envelope("202601011200001", zip_data)
+
+    assert isinstance(envelope, memoryview)
+    assert bytes(envelope) == soap_templates.recepcion_lote(
+        "202601011200001", base64.b64encode(bytes(zip_data))
+    )
+
+
+def test_zip_round_trip():
+    lote_xml = _lote_xml()
+    envelope = lote_payload.build_lote_envelope(lote_xml, did=1)
+
+    root = etree.fromstring(bytes(envelope))
+    xde = root.findtext(f".//{{{SIFEN_NS}}}xDE")
+    with zipfile.ZipFile(io.BytesIO(base64.b64decode(xde))) as zf:
+        assert zf.namelist() == ["lote.xml"]
+        assert zf.getinfo("lote.xml").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.read("lote.xml") == lote_xml
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 3, 4, lote_payload.B64_CHUNK, lote_payload.B64_CHUNK + 1])
+def test_b64_len(n):
+    assert lote_payload.b64_len(n) == len(base64.b64encode(b"\0" * n))
+
+
+def test_rejects_non_numeric_did():
+    with pytest.raises(ValueError):
+        lote_payload.assemble_lote_envelope("1<x/>", b"PK")
+
+
+def test_measure_reports_lower_peak():
+    # Contenido poco comprimible (como firmas/certificados Base64)
+    result = lote_payload.measure(_lote_xml(random_data=True))
+    assert result["same_size"]
+    assert result["zero_copy_peak"] < result["legacy_peak"]
+
+
+def test_recepcion_lote_envelope_posts_memoryview():
+    from app.sifen_client.soap_client import SoapClient
+
+    response_xml = (
+        f'<env:Envelope xmlns:env="http://www.w3.org/2003/05/soap-envelope"><env:Body>'
+        f'<ns2:rResEnviLoteDe xmlns:ns2="{SIFEN_NS}"><ns2:dCodRes>0300</ns2:dCodRes>'
+        f"<ns2:dMsgRes>Lote recibido con éxito</ns2:dMsgRes><ns2:dProtConsLote>123</ns2:dProtConsLote>"
+        f"</ns2:rResEnviLoteDe></env:Body></env:Envelope>"
+    ).encode("utf-8")
+    client = SoapClient.__new__(SoapClient)
+    client._endpoints = {"recibe_lote": "https://sifen.test/recibe-lote"}
+    client.connect_timeout, client.read_timeout = 5, 10
+    client.transport = MagicMock()
+    client.transport.session.post.return_value = MagicMock(status_code=200, content=response_xml)
+
+    envelope = lote_payload.build_lote_envelope(_lote_xml(2), did=1)
+    result = client.recepcion_lote_envelope(envelope)
+
+    kwargs = client.transport.session.post.call_args.kwargs
+    assert kwargs["data"] is envelope
+    assert 'action="siRecepLoteDE"' in kwargs["headers"]["Content-Type"]
+    assert result["codigo_respuesta"] == "0300"
+
+
+def test_recepcion_lote_envelope_checks_size_before_post():
+    from app.sifen_client.exceptions import SifenSizeLimitError
+    from app.sifen_client.soap_client import SIZE_LIMITS, SoapClient
+
+    client = SoapClient.__new__(SoapClient)
+    client._endpoints = {"recibe_lote": "https://sifen.test/recibe-lote"}
+    client.transport = MagicMock()
+
+    envelope = lote_payload.assemble_lote_envelope(1, bytes(SIZE_LIMITS["siRecepLoteDE"]))
+    with pytest.raises(SifenSizeLimitError) as exc_info:
+        client.recepcion_lote_envelope(envelope)
+    assert exc_info.value.code == "0270"
+    client.transport.session.post.assert_not_called()
+
+
+def test_r_envio_lote_xml_keeps_sent_did():
+    envelope = lote_payload.build_lote_envelope(_lote_xml(2), did="202601011200001")
+    payload_xml = lote_payload.r_envio_lote_xml(envelope)
+
+    root = etree.fromstring(payload_xml.encode("utf-8"))
+    assert root.tag == f"{{{SIFEN_NS}}}rEnvioLote"
+    assert lote_payload.payload_did(payload_xml) == lote_payload.payload_did(envelope) == "202601011200001"
+    assert root.findtext(f"{{{SIFEN_NS}}}xDE").encode("ascii") in bytes(envelope)
@@ -0,0 +1,59 @@
+"""
+Tests de efectos secundarios de la biblioteca de lotes (app.sifen_client.lote_sender).
+
+Ejecutar:
+    python -m pytest tests/test_lote_sender.py -v
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(ROOT))
+
+from app.sifen_client import lote_sender
+
+SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
+
+
+def test_import_does_not_register_namespaces():
+    # En un intérprete nuevo: el registro de prefijos de lxml es global al proceso
+    code = (
+        "import lxml.etree as etree\n"
+        "import app.sifen_client.lote_sender\n"
+        f"print(etree.tostring(etree.Element('{{{SIFEN_NS}}}x')).decode())\n"
+        "app.sifen_client.lote_sender.register_sifen_namespaces()\n"
+        "print(etree.tostring(etree.Element('{http://www.w3.org/2000/09/xmldsig#}Signature')).decode())\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=60,
+    )
+    assert out.returncode == 0, out.stderr
+    before, after = out.stdout.strip().splitlines()
+    assert before == f'<ns0:x xmlns:ns0="{SIFEN_NS}"/>'
+    # El CLI sí los registra (register_sifen_namespaces)
+    assert after.startswith("<ds:Signature")
+
+
+def test_preflight_writes_nothing_without_debug(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("SIFEN_DEBUG_SOAP", raising=False)
+
+    ok, error = lote_sender.preflight_soap_request("<no-xml", b"")
+
+    assert not ok and "no parsea" in error
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_preflight_debug_artifacts_go_to_artifacts_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SIFEN_DEBUG_SOAP", "1")
+    artifacts_dir = tmp_path / "out"
+
+    ok, _ = lote_sender.preflight_soap_request("<no-xml", b"", artifacts_dir=artifacts_dir)
+
+    assert not ok
+    assert [p.name for p in tmp_path.iterdir()] == ["out"]
+    assert (artifacts_dir / "preflight_soap.xml").read_text(encoding="utf-8") == "<no-xml"
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para las métricas de latencia y códigos SIFEN (app.sifen_client.metrics).
+
+Ejecutar:
+    python -m pytest tests/test_metrics.py -v
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.sifen_client import metrics
+from app.sifen_client import lote_payload
+from tools.sifen_mock_server import CRYPTOGRAPHY_AVAILABLE, LatencyModel, MockBehavior, MockSifenServer
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.REGISTRY.clear()
+    yield
+    metrics.REGISTRY.clear()
+
+
+def _stage_count(stage: str) -> int:
+    for sample in metrics.STAGE_SECONDS.samples():
+        if sample["labels"] == {"stage": stage}:
+            return sample["count"]
+    return 0
+
+
+def test_histogram_counter_and_timers(tmp_path):
+    histogram = metrics.Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='a"b')
+    histogram.observe(0.5, stage='a"b')
+    histogram.observe(5.0, stage='a"b')
+    assert histogram.render() == [
+        't_seconds_bucket{stage="a\\"b",le="0.1"} 1',
+        't_seconds_bucket{stage="a\\"b",le="1"} 2',
+        't_seconds_bucket{stage="a\\"b",le="+Inf"} 3',
+        't_seconds_sum{stage="a\\"b"} 5.55',
+        't_seconds_count{stage="a\\"b"} 3',
+    ]
+    with pytest.raises(ValueError):
+        histogram.observe(1.0, other="x")
+
+    @metrics.timed_operation("op")
+    def fails():
+        raise RuntimeError("x")
+
+    with metrics.timed("sign"):
+        pass
+    with pytest.raises(RuntimeError):
+        fails()
+    metrics.record_result_code("dCodResLot", " 0362 ")
+    metrics.record_result_code("dCodRes", None)
+
+    assert _stage_count("sign") == 1
+    assert [s["labels"]["outcome"] for s in metrics.OPERATION_SECONDS.samples()] == ["error"]
+    assert metrics.RESULT_CODES.value(field="dCodResLot", code="0362") == 1
+    assert len(metrics.RESULT_CODES.samples()) == 1
+
+    text = metrics.render_prometheus()
+    assert "# TYPE sifen_stage_seconds histogram" in text
+    assert 'sifen_result_codes_total{field="dCodResLot",code="0362"} 1' in text
+    snapshot = json.loads(metrics.dump(tmp_path / "m.json").read_text(encoding="utf-8"))
+    assert snapshot["sifen_stage_seconds"]["samples"][0]["count"] == 1
+    assert metrics.dump(tmp_path / "m.prom").read_text(encoding="utf-8") == text
+
+
+def test_install_metrics_labels_by_route_template():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+
+    @app.get("/de/{doc_id}")
+    def get_de(doc_id: int):
+        return {"id": doc_id}
+
+    metrics.install_metrics(app, "web")
+    client = TestClient(app)
+    client.get("/de/1")
+    client.get("/de/2")
+    assert client.get("/nope").status_code == 404
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    series = {tuple(s["labels"].values()): s["count"] for s in metrics.HTTP_REQUEST_SECONDS.samples()}
+    assert series[("web", "GET", "/de/{doc_id}", "200")] == 2
+    assert series[("web", "GET", "unmatched", "404")] == 1
+    assert 'route="/de/{doc_id}"' in response.text
+
+
+@pytest.mark.skipif(not CRYPTOGRAPHY_AVAILABLE, reason="cryptography no instalado")
+def test_soap_client_records_http_phases_and_codes(tmp_path, monkeypatch):
+    from app.sifen_client.config import get_sifen_config
+    from app.sifen_client.lote_checker import check_lote_status
+    from app.sifen_client.soap_client import SoapClient
+
+    monkeypatch.chdir(tmp_path)  # check_lote_status guarda artifacts/ en el cwd
+    lote_xml = b'<rLoteDE><rDE><DE Id="01800123457001001000000122025010111234567891"/></rDE></rLoteDE>'
+    behavior = MockBehavior(processing=LatencyModel("fixed", 0))
+    with MockSifenServer(behavior, certs_dir=tmp_path / "certs") as server:
+        for key, value in server.client_env().items():
+            monkeypatch.setenv(key, value)
+        with SoapClient(get_sifen_config("test")) as client:
+            for _ in range(2):
+                prot = client.recepcion_lote_envelope(lote_payload.build_lote_envelope(lote_xml))["d_prot_cons_lote"]
+        assert check_lote_status("test", prot)["cod_res_lot"] == "0362"
+
+    # Keep-alive: dos envíos, una sola conexión (y un handshake) del SoapClient
+    assert _stage_count("http_connect") == _stage_count("http_tls") == 2
+    assert _stage_count("http_wait") == 3
+    assert _stage_count("response_parse") == 3
+    assert metrics.RESULT_CODES.value(field="dCodRes", code="0300") == 2
+    assert metrics.RESULT_CODES.value(field="dCodResLot", code="0362") == 1
+    operations = {s["labels"]["operation"]: s["count"] for s in metrics.OPERATION_SECONDS.samples()}
+    assert operations == {"recepcion_lote": 2, "check_lote_status": 1}
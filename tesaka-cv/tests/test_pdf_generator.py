@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para los PDFs imprimibles (app.pdf_generator) y la exportación masiva
+de notas de entrega.
+
+Ejecutar:
+    python -m pytest tests/test_pdf_generator.py -v
+"""
+
+import asyncio
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import db as app_db
+from app import pdf_generator
+from app.models_system import DeliveryNote
+
+
+def _page_count(pdf: bytes) -> int:
+    return int(re.search(rb"/Count (\d+) /Kids", pdf).group(1))
+
+
+def _delivery_note(numero, firma_recibe=None):
+    dn = DeliveryNote(
+        id=numero, created_at=datetime(2026, 1, 15), fecha="2026-01-15", numero_nota=numero,
+        contract_id=None, client_id=1, direccion_entrega="Ruta 2 km 30", firma_recibe=firma_recibe,
+        firma_entrega=None, sync_mode="manual", snapshot_json=None,
+    )
+    dn.numero_contrato = "C-001"
+    return dn
+
+
+CLIENTE = {"nombre": "Cliente S.A.", "ruc": "80012345-7"}
+ITEMS = [{"producto": f"Producto {i}", "unidad_medida": "UNI", "cantidad": i + 1} for i in range(5)]
+
+
+def test_styles_are_shared_between_calls():
+    first = pdf_generator._delivery_note_elements(_delivery_note(1), CLIENTE, ITEMS)
+    second = pdf_generator._delivery_note_elements(_delivery_note(2), CLIENTE, ITEMS)
+    assert first[0].style is second[0].style is pdf_generator.TITLE_STYLE
+    assert first[1].style is pdf_generator.NORMAL_STYLE
+
+
+def test_generate_delivery_note_pdf():
+    pdf = pdf_generator.generate_delivery_note_pdf(_delivery_note(1, firma_recibe="Juan"), CLIENTE, ITEMS)
+    assert pdf.startswith(b"%PDF")
+    assert _page_count(pdf) == 1
+
+
+def test_generate_batch_pdf_one_page_per_document():
+    documents = [(_delivery_note(i), CLIENTE, ITEMS) for i in range(1, 13)]
+    pdf = pdf_generator.generate_batch_pdf("delivery_note", documents)
+    assert _page_count(pdf) == 12
+
+    with pytest.raises(ValueError):
+        pdf_generator.generate_batch_pdf("delivery_note", [])
+    with pytest.raises(ValueError):
+        pdf_generator.generate_batch_pdf("factura", documents)
+
+
+def test_render_pdf_async_uses_pool():
+    try:
+        pdf = asyncio.run(pdf_generator.render_pdf_async(
+            pdf_generator.generate_delivery_note_pdf, _delivery_note(1), CLIENTE, ITEMS
+        ))
+    finally:
+        pdf_generator.shutdown_pdf_executor()
+    assert _page_count(pdf) == 1
+
+
+def test_delivery_notes_batch_route(tmp_path):
+    with patch.object(app_db, "DB_PATH", tmp_path / "app.db"):
+        app_db.init_db()
+        conn = app_db.get_db()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO clients (nombre, ruc) VALUES (?, ?)", ("Cliente S.A.", "80012345-7"))
+        for numero in (1, 2, 3):
+            cursor.execute(
+                "INSERT INTO delivery_notes (fecha, numero_nota, client_id, sync_mode) VALUES (?, ?, 1, 'manual')",
+                ("2026-01-15", numero),
+            )
+            cursor.execute(
+                "INSERT INTO delivery_note_items (delivery_note_id, producto, unidad_medida, cantidad) VALUES (?, ?, ?, ?)",
+                (numero, "Producto", "UNI", 2),
+            )
+        conn.commit()
+        conn.close()
+
+        from app.main import app
+        try:
+            with TestClient(app) as client:
+                response = client.get("/delivery-notes/batch.pdf", params={"ids": "3,1,2"})
+                assert response.status_code == 200
+                assert response.headers["content-type"] == "application/pdf"
+                assert _page_count(response.content) == 3
+
+                response = client.get("/delivery-notes/2.pdf")
+                assert response.status_code == 200
+                assert _page_count(response.content) == 1
+
+                assert client.get("/delivery-notes/batch.pdf", params={"ids": "1,99"}).status_code == 404
+                assert client.get("/delivery-notes/batch.pdf", params={"ids": "a,b"}).status_code == 400
+        finally:
+            pdf_generator.shutdown_pdf_executor()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para el profiling opcional de requests y CLIs (app.profiling).
+
+Ejecutar:
+    python -m pytest tests/test_profiling.py -v
+"""
+
+import pstats
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import profiling
+
+
+def _busy(ms: float) -> None:
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler_folded_output_and_bounded_store(tmp_path):
+    store = profiling.ProfileStore(tmp_path, max_files=3)
+    for _ in range(5):
+        profiler = profiling.Profiler("sample", interval=0.001).start()
+        _busy(30)
+        profiler.stop()
+        path = profiler.save(store, "GET /de/{doc_id}", 30)
+        time.sleep(0.01)  # mtimes distintos
+
+    assert path.parent.name == "GET_de_doc_id" and path.suffix == ".folded"
+    assert len(store.files()) == 3 and path in store.files()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and stack.startswith("MainThread;")
+    assert any("_busy (tests/test_profiling.py:" in line for line in lines)
+    assert not any("stack-sampler" in line for line in lines)
+
+    profiler = profiling.Profiler("cprofile").start()
+    _busy(5)
+    profiler.stop()
+    prof = profiler.save(profiling.ProfileStore(tmp_path / "c"), "cmd", 5)
+    assert any(name == "_busy" for _, _, name in pstats.Stats(str(prof)).stats)
+
+    with pytest.raises(ValueError):
+        profiling.Profiler("perf")
+
+
+def test_install_profiling_samples_requests_by_route(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+
+    @app.get("/slow/{n}")
+    def slow(n: int):
+        _busy(n)
+        return {"n": n}
+
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_INTERVAL_MS", "1")
+    assert profiling.install_profiling(app) is None  # desactivado por defecto
+
+    monkeypatch.setenv("PROFILE_SAMPLE_RATE", "1")
+    monkeypatch.setenv("PROFILE_MIN_MS", "20")
+    assert profiling.install_profiling(app) == 1.0
+    client = TestClient(app)
+    assert client.get("/slow/40").json() == {"n": 40}
+    assert client.get("/slow/0").status_code == 200  # más rápido que PROFILE_MIN_MS
+    assert client.get("/nope").status_code == 404
+
+    files = profiling.ProfileStore(tmp_path).files()
+    assert [p.parent.name for p in files] == ["GET_slow_n"]
+    # El handler `def` corre en el threadpool: el sampler lo ve igual
+    assert "slow (tests/test_profiling.py:" in files[0].read_text(encoding="utf-8")
+
+
+def test_cli_profile_flag(tmp_path):
+    root = Path(__file__).parent.parent
+    result = subprocess.run(
+        [sys.executable, str(root / "tools" / "poll_sifen_lotes.py"), "--once", "--profile", "cprofile"],
+        cwd=tmp_path,
+        env={"PATH": "", "PROFILE_DIR": str(tmp_path / "profiles"), "TESAKA_DB_PATH": str(tmp_path / "t.db")},
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    # Sin certificado el poller termina con error, pero el profile se guarda igual
+    assert "Traceback" not in result.stderr, result.stderr
+    files = profiling.ProfileStore(tmp_path / "profiles").files()
+    assert [p.parent.name for p in files] == ["poll_sifen_lotes"] and files[0].suffix == ".prof"
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para el parsing de respuestas SIFEN con XPath precompilado (app.sifen_client.response_parser).
+
+Ejecutar:
+    python -m pytest tests/test_response_parser.py -v
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+from lxml import etree
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.sifen_client import response_parser
+from app.sifen_client.lote_checker import parse_lote_response
+from web.sifen_status_mapper import map_lote_consulta_to_de_status, parse_lote_de_results
+
+NS = response_parser.SIFEN_NS
+
+
+def _lote_response(n: int, msgs: int) -> str:
+    entries = "".join(
+        f"<ns2:gResProcLote><ns2:id>{i:044d}</ns2:id>"
+        f"<ns2:dEstRes>{'Aprobado' if i % 2 else 'Rechazado'}</ns2:dEstRes>"
+        + (f"<ns2:dProtAut>{i}</ns2:dProtAut>" if i % 2 else "")
+        + "".join(
+            f"<ns2:gResProc><ns2:dCodRes>{1000 + j}</ns2:dCodRes><ns2:dMsgRes> Mensaje {j} </ns2:dMsgRes></ns2:gResProc>"
+            for j in range(msgs)
+        )
+        + "</ns2:gResProcLote>"
+        for i in range(n)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<env:Envelope xmlns:env="http://www.w3.org/2003/05/soap-envelope"><env:Body>'
+        f'<ns2:rResEnviConsLoteDe xmlns:ns2="{NS}">'
+        "<ns2:dCodResLot>0362</ns2:dCodResLot><ns2:dMsgResLot>Lote concluido</ns2:dMsgResLot>"
+        f"{entries}</ns2:rResEnviConsLoteDe></env:Body></env:Envelope>"
+    )
+
+
+def test_tree_and_stream_modes_match():
+    xml = _lote_response(50, 4)
+    tree = response_parser.parse_consulta_lote(xml, stream=False)
+    stream = response_parser.parse_consulta_lote(xml.encode("utf-8"), stream=True)
+
+    assert tree == stream
+    assert (tree.cod_res_lot, tree.msg_res_lot, len(tree.de_results)) == ("0362", "Lote concluido", 50)
+    first, second = tree.de_results[:2]
+    assert first == response_parser.LoteDEResult(
+        f"{0:044d}", "Rechazado", None, None, tuple((str(1000 + j), f"Mensaje {j}") for j in range(4))
+    )
+    assert second.prot_aut == "1" and second.codigos == ["1000", "1001", "1002", "1003"]
+    assert list(response_parser.iter_lote_de_results(xml, stream=True)) == tree.de_results
+
+    # El umbral decide el modo cuando no se indica
+    assert response_parser.parse_consulta_lote(xml) == tree
+    with pytest.raises(etree.XMLSyntaxError):
+        response_parser.parse_consulta_lote("<rResEnviConsLoteDe>", stream=True)
+
+
+def test_first_text_with_and_without_namespace():
+    namespaced = etree.fromstring(
+        f'<r xmlns="{NS}"><dCodRes> 0300 </dCodRes><dProtConsLote>123</dProtConsLote><dMsgRes/></r>'.encode()
+    )
+    plain = etree.fromstring(b"<r><x><dCodRes>0301</dCodRes></x><Id>CDC</Id></r>")
+
+    recepcion = response_parser.parse_recepcion(namespaced)
+    assert (recepcion.cod_res, recepcion.prot_cons_lote, recepcion.msg_res) == ("0300", "123", None)
+    assert response_parser.first_text(plain, "dCodRes") == "0301"
+    assert response_parser.parse_recepcion(plain).cdc == "CDC"
+    assert response_parser.first_text(plain, "dCodResLot") is None
+
+
+def test_lote_checker_and_mapper_use_same_records():
+    xml = _lote_response(3, 2)
+    assert parse_lote_response(xml) == {"cod_res_lot": "0362", "msg_res_lot": "Lote concluido", "ok": True}
+
+    # El mapper de la web encuentra los DEs en gResProcLote (formato real de SIFEN)
+    mapped = parse_lote_de_results(xml)
+    assert [r["cdc"] for r in mapped] == [f"{i:044d}" for i in range(3)]
+    assert mapped[1]["d_prot_aut"] == "1" and mapped[1]["codigos"] == ["1000", "1001"]
+    assert mapped[1]["mensajes"] == ["Mensaje 0", "Mensaje 1"]
+    status, code, _, _ = map_lote_consulta_to_de_status("0362", xml, f"{1:044d}")
+    assert (status, code) == ("approved", "1000")
@@ -0,0 +1,61 @@
+"""
+Tests para el registro de schemas Tesaka (src.schema_registry)
+"""
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import schema_registry
+from src.convert_to_import import load_schema, validate_tesaka
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+
+
+def load_example(filename):
+    with open(EXAMPLES_DIR / filename, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class TestSchemaRegistry:
+    """Tests para la compilación única y la validación por lotes"""
+
+    def test_validator_compiled_once(self):
+        assert schema_registry.get_validator("import") is schema_registry.get_validator("importacion")
+        assert schema_registry.get_validator("export") is not schema_registry.get_validator("import")
+        # Un dict del registro reusa el validator; otro dict se compila aparte
+        assert schema_registry.validator_for(load_schema()) is schema_registry.get_validator("import")
+        assert schema_registry.validator_for(dict(load_schema())) is not schema_registry.get_validator("import")
+
+    def test_validate_tesaka_does_not_reload_schema(self):
+        data = load_example("import_ok.json")
+        schema_registry.get_validator("import")
+        with patch("builtins.open", side_effect=AssertionError("no debe leer el disco")):
+            assert validate_tesaka(data) == []
+            assert validate_tesaka(data, load_schema()) == []
+
+    def test_unknown_schema(self):
+        with pytest.raises(ValueError):
+            schema_registry.get_validator("recibo")
+        with pytest.raises(ValueError):
+            schema_registry.validate_batch([], "recibo")
+
+    def test_validate_batch_structured_errors(self):
+        documents = [load_example("import_ok.json"), load_example("import_bad.json")]
+        results = schema_registry.validate_batch(documents, "import", workers=1)
+
+        assert [r["index"] for r in results] == [0, 1]
+        assert results[0] == {"index": 0, "valid": True, "errors": []}
+        assert not results[1]["valid"]
+        error = results[1]["errors"][0]
+        assert set(error) == {"path", "message", "validator", "schema_path"}
+        assert error["path"] == "0/informado" and error["validator"] == "required"
+
+    def test_validate_batch_in_pool_keeps_order(self):
+        ok, bad = load_example("import_ok.json"), load_example("import_bad.json")
+        documents = [bad if i % 7 == 0 else ok for i in range(schema_registry.MIN_PARALLEL_BATCH)]
+        results = schema_registry.validate_batch(documents, "import", workers=2)
+        assert [not r["valid"] for r in results] == [i % 7 == 0 for i in range(len(documents))]
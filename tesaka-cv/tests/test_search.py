@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para la búsqueda FTS5 de clientes, productos y contratos (app.search).
+
+Ejecutar:
+    python -m pytest tests/test_search.py -v
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from app import db as app_db
+from app import search
+
+pytestmark = pytest.mark.skipif(not search.FTS5_AVAILABLE, reason="SQLite sin FTS5")
+
+
+@pytest.fixture
+def catalog_db(tmp_path):
+    with patch.object(app_db, "DB_PATH", tmp_path / "app.db"):
+        app_db.init_db()
+        conn = app_db.get_db()
+        conn.executemany(
+            "INSERT INTO clients (nombre, ruc) VALUES (?, ?)",
+            [("Constructora Ñandutí S.A.", "80012345-7"), ("Cementos del Sur", "80099999-1")],
+        )
+        conn.executemany(
+            "INSERT INTO products (codigo, nombre, descripcion, unidad_medida, activo) VALUES (?, ?, ?, ?, ?)",
+            [
+                ("TOR-001", "Tornillo autoperforante", "Para chapa", "UNI", 1),
+                ("CEM-050", "Cemento Portland", "Bolsa de 50 kg, ideal para tornillería pesada", "BOL", 1),
+                ("TOR-002", "Tornillo descontinuado", None, "UNI", 0),
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO contracts (fecha, numero_contrato, numero_id, client_id) VALUES (?, ?, ?, ?)",
+            [("2025-01-10", "CT-2025-001", "LIC-77", 1), ("2025-02-10", "CT-2025-002", "LIC-78", 2)],
+        )
+        conn.commit()
+        yield conn
+        conn.close()
+
+
+def test_build_match_sanitizes_input():
+    assert search.build_match('torn "OR" *') == '"torn"* "OR"*'
+    assert search.build_match("  -- ") is None
+    assert search.build_match("80012345-7", ("ruc",)) == '{ruc} : ("80012345"* "7"*)'
+
+
+def test_ranked_prefix_search(catalog_db):
+    results = search.search(catalog_db, "products", "torn", fields=("codigo",), where="t.activo = 1")
+    # El código/nombre pesan más que la descripción; el inactivo queda afuera
+    assert [r["codigo"] for r in results] == ["TOR-001", "CEM-050"]
+
+    # Sin acentos y por prefijo en cualquier columna indexada
+    assert search.search(catalog_db, "clients", "nandu", fields=("id",)) == [{"id": 1}]
+    assert search.search(catalog_db, "clients", "80099", fields=("nombre",)) == [{"nombre": "Cementos del Sur"}]
+
+
+def test_search_filters_and_ranks_all_matches(catalog_db):
+    # 600 inactivos con ids bajos y, al final, el activo más relevante (código)
+    catalog_db.executemany(
+        "INSERT INTO products (codigo, nombre, descripcion, unidad_medida, activo) VALUES (?, ?, ?, ?, 0)",
+        [(f"X-{i:03d}", "Arandela", "Junta para caño", "UNI") for i in range(600)],
+    )
+    catalog_db.execute(
+        "INSERT INTO products (codigo, nombre, descripcion, unidad_medida, activo) "
+        "VALUES ('CANO-1', 'Caño galvanizado', NULL, 'UNI', 1)"
+    )
+    results = search.search(catalog_db, "products", "cano", fields=("codigo",), where="t.activo = 1", limit=5)
+    assert [r["codigo"] for r in results] == ["CANO-1"]
+    ranked = search.search(catalog_db, "products", "cano", fields=("codigo",), limit=1)
+    assert [r["codigo"] for r in ranked] == ["CANO-1"]
+
+
+def test_triggers_keep_index_in_sync(catalog_db):
+    catalog_db.execute("UPDATE clients SET nombre = 'Ferretería Central' WHERE id = 2")
+    assert search.search(catalog_db, "clients", "cementos") == []
+    assert search.search(catalog_db, "clients", "ferret", fields=("id",)) == [{"id": 2}]
+    catalog_db.execute("DELETE FROM products WHERE codigo = 'TOR-001'")
+    assert [r["codigo"] for r in search.search(catalog_db, "products", "tornillo", fields=("codigo",))] == ["TOR-002"]
+
+    # Una base existente sin índice se indexa en init_db()
+    catalog_db.execute("DROP TABLE products_fts")
+    catalog_db.commit()
+    app_db.init_db()
+    assert [r["codigo"] for r in search.search(catalog_db, "products", "tornillo")] == ["TOR-002"]
+
+
+def test_search_filter_and_endpoints(catalog_db):
+    sql, params = search.search_filter("contracts", "2025-002", "c.id", ("numero_contrato",))
+    rows = catalog_db.execute(f"SELECT c.numero_contrato FROM contracts c WHERE 1=1{sql}", params).fetchall()
+    assert [r[0] for r in rows] == ["CT-2025-002"]
+
+    from app.main import app
+    with TestClient(app) as client:
+        assert [p["codigo"] for p in client.get("/api/products", params={"q": "cem"}).json()] == ["CEM-050"]
+        assert len(client.get("/api/products").json()) == 2
+        assert client.get("/api/clients", params={"q": "constr"}).json()[0]["ruc"] == "80012345-7"
+        assert client.get("/api/contracts", params={"q": "lic 78"}).json()[0]["numero_contrato"] == "CT-2025-002"
+
+        response = client.get("/contracts", params={"cliente": "ñandu"})
+        assert response.status_code == 200
+        assert "CT-2025-001" in response.text and "CT-2025-002" not in response.text
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para el SIFEN simulado (tools.sifen_mock_server) contra SoapClient y
+check_lote_status reales sobre mTLS.
+
+Ejecutar:
+    python -m pytest tests/test_sifen_mock_server.py -v
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.sifen_client import lote_payload, soap_templates
+from app.sifen_client.config import SifenConfig
+from tools.sifen_mock_server import (
+    CRYPTOGRAPHY_AVAILABLE,
+    LatencyModel,
+    MockBehavior,
+    MockSifen,
+    MockSifenServer,
+)
+
+CDCS = ["01800123457001001000000122025010111234567891", "01800123457001001000000222025010111234567892"]
+LOTE_XML = (
+    "<rLoteDE>" + "".join(f'<rDE><DE Id="{c}"><dDVId>1</dDVId></DE></rDE>' for c in CDCS) + "</rLoteDE>"
+).encode()
+
+
+def _lote_body() -> bytes:
+    return bytes(lote_payload.build_lote_envelope(LOTE_XML, did=1))
+
+
+def test_lote_lifecycle_and_codes():
+    mock = MockSifen(MockBehavior(processing=LatencyModel("fixed", 50), de_reject_rate=0.5, seed=3))
+    _, response = mock.handle("siRecepLoteDE", _lote_body())
+    assert b"<ns2:dCodRes>0300</ns2:dCodRes>" in response
+    prot = response.split(b"<ns2:dProtConsLote>")[1].split(b"<")[0].decode()
+
+    consulta = soap_templates.consulta_lote(1, prot)
+    assert b"<ns2:dCodResLot>0361</ns2:dCodResLot>" in mock.handle("siConsLoteDE", consulta)[1]
+    time.sleep(0.06)
+    _, response = mock.handle("siConsLoteDE", consulta)
+    assert b"<ns2:dCodResLot>0362</ns2:dCodResLot>" in response
+    assert response.count(b"<ns2:gResProcLote>") == 2
+    assert mock.handle("siConsLoteDE", soap_templates.consulta_lote(1, "999"))[1].count(b"0360") == 1
+
+    mock.behavior.lote_expiry_s = 0
+    assert b"0364" in mock.handle("siConsLoteDE", consulta)[1]
+    mock.behavior.lote_reject_rate = 1.0
+    assert b"<ns2:dCodRes>0301</ns2:dCodRes>" in mock.handle("siRecepLoteDE", _lote_body())[1]
+    assert mock.stats()["siConsLoteDE"] == {"0360": 1, "0361": 1, "0362": 1, "0364": 1}
+
+
+def test_latency_models():
+    rng = random.Random(1)
+    assert LatencyModel.parse("80").sample(rng) == 80.0
+    samples = [LatencyModel.parse("lognormal:400:150").sample(rng) for _ in range(4000)]
+    assert 380 < sum(samples) / len(samples) < 420
+    assert all(30 <= LatencyModel.parse("uniform:50:20").sample(rng) <= 70 for _ in range(100))
+    with pytest.raises(ValueError):
+        LatencyModel.parse("pareto:1")
+
+
+def test_base_url_override(monkeypatch):
+    assert SifenConfig("test").get_soap_service_url("consulta") == (
+        "https://sifen-test.set.gov.py/de/ws/consultas/consulta.wsdl"
+    )
+    monkeypatch.setenv("SIFEN_TEST_BASE_URL", "https://127.0.0.1:8443")
+    config = SifenConfig("test")
+    assert soap_templates.build_endpoint_table(config) == {
+        "recibe": "https://127.0.0.1:8443/de/ws/sync/recibe",
+        "recibe_lote": "https://127.0.0.1:8443/de/ws/async/recibe-lote.wsdl",
+        "consulta_lote": "https://127.0.0.1:8443/de/ws/consultas/consulta-lote.wsdl",
+        "consulta": "https://127.0.0.1:8443/de/ws/consultas/consulta.wsdl",
+        "consulta_ruc": "https://127.0.0.1:8443/de/ws/consultas/consulta-ruc.wsdl",
+        "evento": "https://127.0.0.1:8443/de/ws/eventos/evento.wsdl",
+    }
+
+
+@pytest.mark.skipif(not CRYPTOGRAPHY_AVAILABLE, reason="cryptography no instalado")
+def test_soap_client_and_check_lote_status_over_mtls(tmp_path, monkeypatch):
+    import requests
+
+    from app.sifen_client.config import get_sifen_config
+    from app.sifen_client.exceptions import SifenClientError
+    from app.sifen_client.lote_checker import check_lote_status
+    from app.sifen_client.soap_client import SoapClient
+
+    monkeypatch.chdir(tmp_path)  # check_lote_status guarda artifacts/ en el cwd
+    behavior = MockBehavior(processing=LatencyModel("fixed", 60000))
+    with MockSifenServer(behavior, certs_dir=tmp_path / "certs") as server:
+        for key, value in server.client_env().items():
+            monkeypatch.setenv(key, value)
+
+        with SoapClient(get_sifen_config("test")) as client:
+            result = client.recepcion_lote_envelope(lote_payload.build_lote_envelope(LOTE_XML))
+            assert result["ok"] and result["codigo_respuesta"] == "0300"
+            prot = result["d_prot_cons_lote"]
+
+            assert check_lote_status("test", prot)["cod_res_lot"] == "0361"
+            server.mock._lotes[prot].ready_at = 0  # termina el "procesamiento"
+            assert check_lote_status("test", prot)["cod_res_lot"] == "0362"
+            assert client.consulta_de_por_cdc_raw(CDCS[0])["dCodRes"] == "0422"
+            assert client.consulta_ruc_raw("80012345")["dCodRes"] == "0502"
+
+            # Sin certificado de cliente el handshake falla
+            with pytest.raises(requests.exceptions.RequestException):
+                requests.post(server.base_url + "/de/ws/consultas/consulta-ruc", data=b"", verify=str(server.certs.ca_pem))
+
+            # El RST llega al cliente como conexión abortada/reseteada
+            behavior.reset_rate = 1.0
+            with pytest.raises(SifenClientError, match="reset|aborted"):
+                client.consulta_lote_raw(prot)
+
+        assert server.mock.stats()["siConsLoteDE"] == {"0361": 1, "0362": 1, "reset": 1}
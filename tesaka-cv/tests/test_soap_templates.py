@@ -0,0 +1,116 @@
+"""
+Tests para las plantillas precompiladas de envelopes SOAP (app.sifen_client.soap_templates).
+"""
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import lxml.etree as etree
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.sifen_client import soap_templates
+from app.sifen_client.config import SifenConfig
+
+SOAP_12_NS = "http://www.w3.org/2003/05/soap-envelope"
+SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
+
+
+def _lxml_consulta(root_name, children):
+    """Envelope tal como lo construía SoapClient con etree."""
+    envelope = etree.Element(f"{{{SOAP_12_NS}}}Envelope", nsmap={"soap": SOAP_12_NS})
+    etree.SubElement(envelope, f"{{{SOAP_12_NS}}}Header")
+    body = etree.SubElement(envelope, f"{{{SOAP_12_NS}}}Body")
+    request = etree.SubElement(body, root_name, nsmap={None: SIFEN_NS})
+    for name, value in children:
+        etree.SubElement(request, name).text = value
+    return etree.tostring(envelope, xml_declaration=True, encoding="UTF-8", pretty_print=False)
+
+
+def test_consultas_match_lxml_output():
+    cdc = "01045547378001001000000112025123011234567895"
+    assert soap_templates.consulta_de("202601011200001", cdc) == _lxml_consulta(
+        "rEnviConsDeRequest", [("dId", "202601011200001"), ("dCDC", cdc)]
+    )
+    assert soap_templates.consulta_lote(1, "123456789") == _lxml_consulta(
+        "rEnviConsLoteDe", [("dId", "1"), ("dProtConsLote", "123456789")]
+    )
+    assert soap_templates.consulta_ruc("202601011200001", "4554737") == _lxml_consulta(
+        "rEnviConsRUC", [("dId", "202601011200001"), ("dRUCCons", "4554737")]
+    )
+
+
+def test_recepcion_de_splices_payload_unchanged():
+    payload = (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<rEnviDe xmlns="{SIFEN_NS}">'
+        f"<dId>1</dId><xDE><rDE><DE Id=\"1\"/></rDE></xDE></rEnviDe>"
+    ).encode("utf-8")
+    soap = soap_templates.recepcion_de(payload)
+
+    envelope = etree.Element(f"{{{SOAP_12_NS}}}Envelope", nsmap={"soap-env": SOAP_12_NS})
+    body = etree.SubElement(envelope, f"{{{SOAP_12_NS}}}Body")
+    body.append(etree.fromstring(payload))
+    expected = etree.tostring(envelope, xml_declaration=True, encoding="UTF-8", pretty_print=False)
+
+    assert soap == expected
+    assert payload.split(b"?>\n", 1)[1] in soap
+
+
+def test_recepcion_lote_is_well_formed():
+    soap = soap_templates.recepcion_lote("202601011200001", b"UEsDBBQAAAAIAA==")
+    root = etree.fromstring(soap)
+    r_envio_lote = root.find(f".//{{{SIFEN_NS}}}rEnvioLote")
+    assert r_envio_lote is not None
+    assert r_envio_lote.findtext(f"{{{SIFEN_NS}}}dId") == "202601011200001"
+    assert r_envio_lote.findtext(f"{{{SIFEN_NS}}}xDE") == "UEsDBBQAAAAIAA=="
+
+
+def test_endpoint_table():
+    table = soap_templates.build_endpoint_table(SifenConfig(env="test"))
+    assert table["recibe"] == "https://sifen-test.set.gov.py/de/ws/sync/recibe"
+    assert table["recibe_lote"] == "https://sifen-test.set.gov.py/de/ws/async/recibe-lote.wsdl"
+    assert table["consulta_lote"] == "https://sifen-test.set.gov.py/de/ws/consultas/consulta-lote.wsdl"
+    assert table["consulta"] == "https://sifen-test.set.gov.py/de/ws/consultas/consulta.wsdl"
+
+    config = MagicMock(spec=SifenConfig)
+    config.env = "prod"
+    config.get_soap_service_url = MagicMock(return_value="https://x/y.wsdl?wsdl")
+    table = soap_templates.build_endpoint_table(config)
+    assert table["recibe"] == "https://x/y"
+    assert table["consulta_lote"].startswith("https://sifen.set.gov.py/")
+
+
+def test_roshka_compat_posts_to_raw_wsdl_address():
+    from app.sifen_client.soap_client import SoapClient
+
+    raw_address = "https://sifen-test.set.gov.py/de/ws/sync/recibe.wsdl"
+    client = SoapClient.__new__(SoapClient)
+    client.config = SifenConfig(env="test")
+    client.roshka_compat = True
+    client.clients, client._soap_address, client._endpoints = {}, {}, None
+    client.connect_timeout, client.read_timeout = 5, 10
+    client.transport = MagicMock()
+    client.transport.session.post.return_value = MagicMock(status_code=200, content=b"<ok/>")
+
+    with patch.object(SoapClient, "_get_client"), \
+            patch.object(SoapClient, "_extract_soap_address_from_wsdl", return_value=raw_address) as extract:
+        assert client._post_raw_soap("recibe", b"<a/>") == b"<ok/>"
+        client._post_raw_soap("recibe", b"<a/>")
+
+    # Address del WSDL tal cual (sin normalize_soap_endpoint), resuelto una sola vez
+    assert extract.call_count == 1
+    assert [c.args[0] for c in client.transport.session.post.call_args_list] == [raw_address, raw_address]
+    assert client.transport.session.post.call_args.kwargs["headers"]["Content-Type"].startswith("application/xml")
+
+
+def test_soap_client_import_does_not_load_zeep():
+    code = (
+        "import sys; import app.sifen_client.soap_client; "
+        "sys.exit(1 if 'zeep' in sys.modules else 0)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=str(Path(__file__).parent.parent)
+    )
+    assert result.returncode == 0
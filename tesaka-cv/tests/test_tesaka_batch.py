@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests para el envío masivo a Tesaka (app.tesaka_batch).
+
+Ejecutar:
+    python -m pytest tests/test_tesaka_batch.py -v
+"""
+
+import json
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import db as app_db
+from app import tesaka_batch
+from app.tesaka_client import TesakaClientError
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+INVOICE_OK = (EXAMPLES_DIR / "source_invoice_ok.json").read_text(encoding="utf-8")
+INVOICE_BAD = (EXAMPLES_DIR / "source_invoice_bad.json").read_text(encoding="utf-8")
+
+
+class FakeClient:
+    """Registra los payloads recibidos; falla los lotes que contienen fail_marker"""
+
+    def __init__(self, fail_marker=None):
+        self.payloads = []
+        self.fail_marker = fail_marker
+        self._lock = threading.Lock()
+
+    def enviar(self, kind, payload):
+        with self._lock:
+            self.payloads.append(payload)
+        if self.fail_marker and self.fail_marker in json.dumps(payload, ensure_ascii=False):
+            raise TesakaClientError("Error del servidor Tesaka (503): mantenimiento")
+        return {"status": "ok", "recibidos": len(payload)}
+
+
+@pytest.fixture
+def invoices_db(tmp_path):
+    with patch.object(app_db, "DB_PATH", tmp_path / "app.db"):
+        app_db.init_db()
+        conn = app_db.get_db()
+        data = json.loads(INVOICE_OK)
+        for i in range(1, 8):
+            data["buyer"]["nombre"] = f"Proveedor {i}"
+            conn.execute(
+                "INSERT INTO invoices (issue_date, buyer_name, data_json) VALUES (?, ?, ?)",
+                (data["issue_date"], data["buyer"]["nombre"], json.dumps(data, ensure_ascii=False)),
+            )
+        conn.execute(
+            "INSERT INTO invoices (issue_date, buyer_name, data_json) VALUES (?, ?, ?)",
+            ("2026-01-15", "Inválida", INVOICE_BAD),
+        )
+        # La factura 1 ya fue enviada con éxito; la 2 falló antes
+        conn.executemany(
+            "INSERT INTO submissions (invoice_id, kind, env, request_json, ok) VALUES (?, 'retencion', 'homo', '[]', ?)",
+            [(1, 1), (2, 0)],
+        )
+        conn.commit()
+        conn.close()
+        yield
+
+
+def test_chunk_prepared_bounds_items_and_bytes():
+    entries = [
+        {"invoice_id": i, "comprobantes": [{"n": i}], "request_json": json.dumps([{"n": "x" * 90}])}
+        for i in range(10)
+    ]
+    size = len(entries[0]["request_json"]) - 1
+
+    chunks = tesaka_batch.chunk_prepared(entries, max_items=4, max_bytes=10_000)
+    assert [len(c) for c in chunks] == [4, 4, 2]
+
+    chunks = tesaka_batch.chunk_prepared(entries, max_items=100, max_bytes=2 + size * 3)
+    assert [len(c) for c in chunks] == [3, 3, 3, 1]
+
+    # Una factura más grande que el límite va sola
+    assert [len(c) for c in tesaka_batch.chunk_prepared(entries[:2], max_bytes=10)] == [1, 1]
+
+
+def test_select_unsent_invoices(invoices_db):
+    ids = [invoice_id for invoice_id, _ in tesaka_batch.select_unsent_invoices("retencion", "homo")]
+    assert ids == [2, 3, 4, 5, 6, 7, 8]
+    assert [i for i, _ in tesaka_batch.select_unsent_invoices("factura", "homo", limit=2)] == [1, 2]
+    assert [i for i, _ in tesaka_batch.select_unsent_invoices("retencion", "homo", invoice_ids=[1, 3])] == [3]
+
+
+def test_submit_invoices_records_each_invoice(invoices_db):
+    items = tesaka_batch.select_unsent_invoices("retencion", "homo")
+    client = FakeClient(fail_marker="Proveedor 6")
+
+    summary = tesaka_batch.submit_invoices(client, "retencion", "homo", items, workers=3, max_items=2)
+
+    assert summary["invoices"] == 7
+    assert summary["invalid"] == 1 and 8 in summary["errors"]
+    # 6 válidas en lotes de 2: [2,3] [4,5] [6,7]; el lote con la 6 falla
+    assert summary["requests"] == 3
+    assert summary["sent"] == 4 and summary["failed"] == 2
+    assert sorted(len(p) for p in client.payloads) == [2, 2, 2]
+
+    conn = app_db.get_db()
+    rows = conn.execute(
+        "SELECT invoice_id, ok, error, response_json FROM submissions WHERE id > 2 ORDER BY invoice_id"
+    ).fetchall()
+    conn.close()
+    assert [(r["invoice_id"], r["ok"]) for r in rows] == [(2, 1), (3, 1), (4, 1), (5, 1), (6, 0), (7, 0)]
+    assert json.loads(rows[0]["response_json"]) == {"status": "ok", "recibidos": 2}
+    assert "503" in rows[-1]["error"]
+
+    # Un segundo envío solo toma las que fallaron o son inválidas
+    assert [i for i, _ in tesaka_batch.select_unsent_invoices("retencion", "homo")] == [6, 7, 8]
+
+
+def test_submit_invoices_dry_run(invoices_db):
+    items = tesaka_batch.select_unsent_invoices("retencion", "homo")
+    summary = tesaka_batch.submit_invoices(None, "retencion", "homo", items, dry_run=True)
+    assert summary["requests"] == 1 and summary["sent"] == 0
+
+    with pytest.raises(ValueError):
+        tesaka_batch.submit_invoices(None, "recibo", "homo", items)
+
+
+def test_prepare_invoices_in_pool():
+    items = [(i, INVOICE_OK) for i in range(tesaka_batch.MIN_PARALLEL_BATCH)] + [(999, "{")]
+    prepared = tesaka_batch.prepare_invoices(items, workers=2)
+    assert [p["invoice_id"] for p in prepared] == [i for i, _ in items]
+    assert json.loads(prepared[0]["request_json"]) == prepared[0]["comprobantes"]
+    assert "errors" in prepared[-1]
+
+
+def test_prepare_invoices_uses_shared_pool_map():
+    from app import executors
+
+    items = [(i, INVOICE_OK) for i in range(tesaka_batch.MIN_PARALLEL_BATCH)]
+    calls = []
+
+    def pool_map(fn, batch, chunksize=1):
+        calls.append(len(batch))
+        return executors.map_cpu(fn, batch, chunksize=chunksize)
+
+    with patch.object(tesaka_batch, "ProcessPoolExecutor", side_effect=AssertionError("pool propio")):
+        try:
+            prepared = tesaka_batch.prepare_invoices(items, workers=2, pool_map=pool_map)
+        finally:
+            executors.shutdown_cpu_executor()
+    assert calls == [len(items)]
+    assert [p["invoice_id"] for p in prepared] == [i for i, _ in items]
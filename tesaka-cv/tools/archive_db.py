@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Archivo histórico de tesaka.db (datos cerrados más viejos que N meses)
+
+Mueve los DEs aprobados/rechazados (con sus eventos y XML), los lotes ya
+resueltos y las facturas enviadas a Tesaka (con items y submissions) a un
+archivo SQLite de solo lectura por mes: <archive-dir>/tesaka-archive-YYYY-MM.db.
+Las búsquedas por id, CDC y número de lote siguen encontrándolos (ver
+app/archive.py). Pensado para correr por cron, p. ej. una vez por mes.
+
+Uso:
+    python -m tools.archive_db --dry-run
+    python -m tools.archive_db --months 6
+    python -m tools.archive_db --db /ruta/tesaka.db --archive-dir /backups/archive --vacuum
+
+Variables de entorno:
+    TESAKA_DB_PATH: Base viva (default: tesaka.db en la raíz del repo)
+    TESAKA_ARCHIVE_DIR: Directorio de archivos (default: archive/ junto a la base)
+    TESAKA_ARCHIVE_MONTHS: Antigüedad mínima en meses (default: 12)
+"""
+import sys
+import argparse
+import json
+import logging
+import sqlite3
+from pathlib import Path
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+try:
+    from app.archive import DEFAULT_MONTHS, archive_dir_for, archive_old_data, cutoff_for
+    from web.db import DB_PATH
+except ImportError as e:
+    logger.error(f"Error al importar módulos: {e}")
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mueve datos cerrados y viejos de tesaka.db a archivos por mes"
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=DB_PATH,
+        help=f"Base viva (default: {DB_PATH})",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        type=Path,
+        default=None,
+        help="Directorio de archivos (default: TESAKA_ARCHIVE_DIR o archive/ junto a la base)",
+    )
+    parser.add_argument(
+        "--months",
+        type=int,
+        default=DEFAULT_MONTHS,
+        help=f"Archivar lo creado antes de hace N meses (default: {DEFAULT_MONTHS})",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Solo mostrar qué se archivaría, sin mover nada",
+    )
+    parser.add_argument(
+        "--vacuum",
+        action="store_true",
+        help="Compactar la base viva al terminar (VACUUM; bloquea la base mientras corre)",
+    )
+
+    args = parser.parse_args()
+
+    if args.months < 1:
+        parser.error("--months debe ser >= 1")
+    if not args.db.exists():
+        logger.error(f"No existe la base: {args.db}")
+        return 1
+
+    archive_dir = args.archive_dir or archive_dir_for(args.db)
+    logger.info(
+        f"Archivando datos cerrados anteriores a {cutoff_for(args.months)} "
+        f"de {args.db} en {archive_dir}{' (dry-run)' if args.dry_run else ''}"
+    )
+    try:
+        summary = archive_old_data(args.db, archive_dir, months=args.months, dry_run=args.dry_run)
+    except sqlite3.Error as e:
+        logger.error(f"Error al archivar: {e}")
+        return 1
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if not summary:
+        logger.info("No hay datos para archivar")
+
+    if args.vacuum and summary and not args.dry_run:
+        logger.info("Compactando la base viva (VACUUM)...")
+        conn = sqlite3.connect(str(args.db))
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
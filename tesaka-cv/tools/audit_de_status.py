@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Auditoría masiva del estado de DEs contra SIFEN (siConsDE por CDC)
+
+Consulta en paralelo los CDCs de de_documents (filtrados por fecha y/o estado),
+con límite de consultas por segundo, y actualiza los estados en la base por tandas.
+La corrida es reanudable: si se interrumpe, volver a ejecutarla con los mismos
+filtros continúa desde el último checkpoint.
+
+Uso:
+    python -m tools.audit_de_status --env test --since 2026-01-01 --until 2026-01-31
+    python -m tools.audit_de_status --env prod --status pending_sifen --status error
+    python -m tools.audit_de_status --env prod --since 2026-01-01 --workers 8 --rate 10
+    python -m tools.audit_de_status --env test --dry-run --report artifacts/audit.jsonl
+
+Variables de entorno requeridas:
+    SIFEN_CERT_PATH: Ruta al certificado P12
+    SIFEN_CERT_PASSWORD: Contraseña del certificado P12
+    SIFEN_ENV: Ambiente (test/prod) - puede ser overrideado con --env
+"""
+import sys
+import argparse
+import json
+import os
+import logging
+from pathlib import Path
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+try:
+    from web.de_audit import audit_documents, DEFAULT_CHECKPOINT_PATH
+    from web.document_status import VALID_STATUSES
+    from app.sifen_client.config import get_sifen_config
+    from app.sifen_client.soap_client import SoapClient
+except ImportError as e:
+    logger.error(f"Error al importar módulos: {e}")
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Auditoría masiva de estados de DE contra SIFEN (consulta por CDC)"
+    )
+    parser.add_argument(
+        "--env",
+        choices=["test", "prod"],
+        default=os.getenv("SIFEN_ENV", "test"),
+        help="Ambiente SIFEN (default: test o SIFEN_ENV)",
+    )
+    parser.add_argument("--since", help="Fecha mínima de creación (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Fecha máxima de creación (YYYY-MM-DD)")
+    parser.add_argument(
+        "--status",
+        action="append",
+        choices=VALID_STATUSES,
+        dest="statuses",
+        help="Filtrar por estado local (repetible)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Consultas concurrentes (default: 4)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=5.0,
+        help="Máximo de consultas por segundo (default: 5)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=100,
+        help="Documentos por tanda de escritura/checkpoint (default: 100)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=DEFAULT_CHECKPOINT_PATH,
+        help=f"Archivo de checkpoint (default: {DEFAULT_CHECKPOINT_PATH})",
+    )
+    parser.add_argument(
+        "--no-checkpoint",
+        action="store_true",
+        help="No usar checkpoint (siempre empieza desde el principio)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Solo consultar y reportar, sin actualizar la base ni usar checkpoint",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help="Archivo JSONL donde agregar el resultado de cada consulta",
+    )
+
+    args = parser.parse_args()
+
+    def on_batch(results):
+        with args.report.open("a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        config = get_sifen_config(env=args.env)
+        with SoapClient(config) as client:
+            summary = audit_documents(
+                client,
+                since=args.since,
+                until=args.until,
+                statuses=args.statuses,
+                workers=args.workers,
+                rate=args.rate,
+                batch_size=args.batch_size,
+                checkpoint_path=None if args.no_checkpoint else args.checkpoint,
+                dry_run=args.dry_run,
+                on_batch=on_batch if args.report else None,
+            )
+    except KeyboardInterrupt:
+        logger.info("Auditoría interrumpida por el usuario (se puede reanudar desde el checkpoint)")
+        sys.exit(130)
+    except Exception as e:
+        logger.error(f"Error fatal en auditoría: {e}", exc_info=True)
+        sys.exit(1)
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    sys.exit(0 if summary["errors"] == 0 else 2)
+
+
+if __name__ == "__main__":
+    main()
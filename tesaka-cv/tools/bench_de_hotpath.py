@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Benchmark del camino caliente de un DE: construir, firmar, armar lote,
+preflight, validar XSD, envelope SOAP y parseo de resultados del lote.
+
+Corre sobre un corpus sintético (DEs de 1 a 1000 items, lotes de 1 a 50 DEs)
+con certificados de prueba generados (ver tools/sifen_mock_server.py), guarda
+los resultados en JSON y los compara contra un baseline guardado: sale con
+código 1 si alguna etapa es más lenta que el baseline más la tolerancia.
+
+Antes de cada caso se mide una carga de referencia fija (parseo/serialización
+lxml + Python puro) y la comparación usa tiempo/referencia: absorbe tanto las
+diferencias entre máquinas como las fases lentas de una VM compartida.
+Las etapas de firma se omiten (y se informa el motivo) si xmlsec no funciona;
+el corpus usa una firma de relleno con el certificado generado para que el
+tamaño y la estructura del DE (Signature dentro del DE, como en el lote) sean
+los reales aunque no haya firmador.
+
+Uso:
+    python -m tools.bench_de_hotpath
+    python -m tools.bench_de_hotpath --quick --stage build_de --stage validate
+    python -m tools.bench_de_hotpath --save-baseline
+    python -m tools.bench_de_hotpath --tolerance 0.2 --output artifacts/bench.json
+"""
+import sys
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import tempfile
+import time
+from base64 import b64encode
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+try:
+    from lxml import etree
+
+    from app.sifen_client import lote_payload
+    from app.sifen_client.de_builder import build_de_xml
+    from app.sifen_client.xsd_validator import validate_rde_and_lote
+    from tools.sifen_mock_server import LatencyModel, MockBehavior, MockSifen, generate_test_certs
+    from web.sifen_status_mapper import parse_lote_de_results
+except ImportError as e:
+    logging.basicConfig(level=logging.INFO)
+    logger.error(f"Error al importar módulos: {e}")
+    sys.exit(1)
+
+SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
+REPO_ROOT = Path(__file__).parent.parent
+
+STAGES = (
+    "build_de",
+    "sign_de",
+    "build_and_sign_lote",
+    "preflight",
+    "validate",
+    "soap_envelope",
+    "lote_payload",
+    "parse_lote_results",
+)
+ITEM_COUNTS = (1, 10, 100, 1000)
+LOTE_SIZES = (1, 10, 50)
+QUICK_ITEM_COUNTS = (1, 100)
+QUICK_LOTE_SIZES = (1, 10)
+
+DEFAULT_BASELINE = Path(__file__).parent / "bench_baselines" / "de_hotpath.json"
+DEFAULT_OUTPUT = Path("artifacts") / "bench_de_hotpath.json"
+
+_SIGNATURE_RE = re.compile(r"<ds:Signature\b.*?</ds:Signature>", re.S)
+
+
+def _placeholder_signature(de_id: str, cert_b64: str) -> str:
+    """ds:Signature con los algoritmos/URI que exige SIFEN y valores de relleno"""
+    signature_value = b64encode(os.urandom(256)).decode("ascii")
+    digest_value = b64encode(os.urandom(32)).decode("ascii")
+    return (
+        '<ds:Signature xmlns:ds="http://www.w3.org/2000/09/xmldsig#"><ds:SignedInfo>'
+        '<ds:CanonicalizationMethod Algorithm="http://www.w3.org/2001/10/xml-exc-c14n#"/>'
+        '<ds:SignatureMethod Algorithm="http://www.w3.org/2001/04/xmldsig-more#rsa-sha256"/>'
+        f'<ds:Reference URI="#{de_id}"><ds:Transforms>'
+        '<ds:Transform Algorithm="http://www.w3.org/2000/09/xmldsig#enveloped-signature"/>'
+        '<ds:Transform Algorithm="http://www.w3.org/2001/10/xml-exc-c14n#"/></ds:Transforms>'
+        '<ds:DigestMethod Algorithm="http://www.w3.org/2001/04/xmlenc#sha256"/>'
+        f"<ds:DigestValue>{digest_value}</ds:DigestValue></ds:Reference></ds:SignedInfo>"
+        f"<ds:SignatureValue>{signature_value}</ds:SignatureValue>"
+        f"<ds:KeyInfo><ds:X509Data><ds:X509Certificate>{cert_b64}</ds:X509Certificate>"
+        "</ds:X509Data></ds:KeyInfo></ds:Signature>"
+    )
+
+
+def _items(n: int) -> List[Dict[str, Any]]:
+    return [
+        {"codigo": f"{i:05d}", "descripcion": f"Producto {i}", "cantidad": 1 + i % 7,
+         "precio": 1000 + i, "tasa_iva": (0, 5, 10)[i % 3]}
+        for i in range(n)
+    ]
+
+
+class Corpus:
+    """DEs, rDEs, lotes, rEnvioLote y respuestas 0362 sintéticos"""
+
+    def __init__(self, item_counts: Iterable[int], lote_sizes: Iterable[int], certs_dir: Path):
+        self.certs = generate_test_certs(certs_dir)
+        pem = self.certs.client_pem.read_text()
+        self.cert_b64 = "".join(pem.strip().splitlines()[1:-1])
+
+        self.de_kwargs: Dict[int, Dict[str, Any]] = {}
+        self.rdes: Dict[int, bytes] = {}
+        for n in item_counts:
+            self.de_kwargs[n] = dict(ruc="80012345-7", timbrado="12345678", items=_items(n),
+                                     fecha="2026-01-01", hora="10:00:00")
+            self.rdes[n] = self._rde(build_de_xml(**self.de_kwargs[n]))
+        self.reference_doc = self._rde(build_de_xml(ruc="80012345-7", timbrado="12345678", items=_items(100),
+                                                    fecha="2026-01-01", hora="10:00:00"))
+
+        self.lotes: Dict[int, bytes] = {}
+        self.envios: Dict[int, Tuple[str, bytes]] = {}
+        self.responses: Dict[int, bytes] = {}
+        mock = MockSifen(MockBehavior(processing=LatencyModel("fixed", 0)))
+        for size in lote_sizes:
+            rdes = [
+                self._rde(build_de_xml(ruc="80012345-7", timbrado="12345678", numero_documento=str(i + 1),
+                                       items=_items(10), fecha="2026-01-01", hora="10:00:00"))
+                for i in range(size)
+            ]
+            lote = b"".join([f'<rLoteDE xmlns="{SIFEN_NS}">'.encode("ascii"), *rdes, b"</rLoteDE>"])
+            self.lotes[size] = lote
+            zip_bytes = bytes(lote_payload.zip_lote(lote))
+            payload = (
+                f'<rEnvioLote xmlns="{SIFEN_NS}"><dId>1</dId>'
+                f"<xDE>{b64encode(zip_bytes).decode('ascii')}</xDE></rEnvioLote>"
+            )
+            self.envios[size] = (payload, zip_bytes)
+            _, response = mock.handle("siRecepLoteDE", bytes(lote_payload.build_lote_envelope(lote, did=1)))
+            prot = re.search(rb"<ns2:dProtConsLote>(\d+)<", response).group(1).decode()
+            _, self.responses[size] = mock.handle(
+                "siConsLoteDE", f"<dProtConsLote>{prot}</dProtConsLote>".encode()
+            )
+
+    def _rde(self, de_xml: str) -> bytes:
+        de_id = re.search(r'Id="([^"]+)"', de_xml).group(1)
+        de_xml = _SIGNATURE_RE.sub(lambda _m: _placeholder_signature(de_id, self.cert_b64), de_xml, count=1)
+        de_xml = de_xml.replace(f' xmlns="{SIFEN_NS}"', "", 1)
+        return f'<rDE xmlns="{SIFEN_NS}"><dVerFor>150</dVerFor>{de_xml}</rDE>'.encode("utf-8")
+
+
+def measure(fn: Callable[[], Any], min_time: float = 0.3, min_reps: int = 3, max_reps: int = 1000) -> Dict[str, Any]:
+    """
+    Ejecuta fn hasta acumular min_time segundos (entre min_reps y max_reps veces),
+    con el GC desactivado como timeit
+
+    Returns:
+        Dict con reps, median_ms, p95_ms, min_ms, mean_ms y el resultado de la última llamada
+    """
+    fn()  # calentamiento (caches de esquemas, imports perezosos)
+    times: List[float] = []
+    result = None
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        while len(times) < max_reps and (len(times) < min_reps or time.perf_counter() - start < min_time):
+            t0 = time.perf_counter()
+            result = fn()
+            times.append((time.perf_counter() - t0) * 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    ordered = sorted(times)
+    return {
+        "reps": len(times),
+        "median_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "min_ms": round(ordered[0], 4),
+        "mean_ms": round(statistics.fmean(ordered), 4),
+        "_result": result,
+    }
+
+
+def reference(doc: bytes, min_time: float = 0.05) -> float:
+    """Mínimo (ms) de una carga fija (lxml + Python puro) para normalizar cada caso"""
+    def work():
+        etree.tostring(etree.fromstring(doc))
+        acc = 0
+        for i in range(20_000):
+            acc += i * i % 7
+        return acc
+    return measure(work, min_time=min_time)["min_ms"]
+
+
+@contextmanager
+def _cwd(path: Path):
+    # Varias etapas escriben artifacts/ en el cwd: se aíslan en un directorio temporal
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _probe(fn: Callable[[], Any]) -> Optional[str]:
+    try:
+        fn()
+        return None
+    except Exception as e:  # xmlsec roto/incompatible levanta errores propios, no ImportError
+        return f"{type(e).__name__}: {e}"
+
+
+def run_benchmarks(
+    item_counts: Iterable[int] = ITEM_COUNTS,
+    lote_sizes: Iterable[int] = LOTE_SIZES,
+    stages: Iterable[str] = STAGES,
+    min_time: float = 0.3,
+    xsd_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Corre las etapas pedidas sobre el corpus
+
+    Returns:
+        Reporte (ver formato en --output): results por "etapa[parámetro]" y
+        skipped con el motivo por etapa omitida
+    """
+    stages = [s for s in STAGES if s in set(stages)]
+    item_counts, lote_sizes = list(item_counts), list(lote_sizes)
+    xsd_dir = Path(xsd_dir or os.getenv("SIFEN_XSD_DIR") or REPO_ROOT / "schemas_sifen").resolve()
+    results: Dict[str, Dict[str, Any]] = {}
+    skipped: Dict[str, str] = {}
+
+    with tempfile.TemporaryDirectory(prefix="bench_de_") as tmp:
+        workdir = Path(tmp)
+        corpus = Corpus(item_counts, lote_sizes, workdir / "certs")
+        p12, password = str(corpus.certs.client_p12), corpus.certs.password
+
+        def record(name: str, fn: Callable[[], Any], ok: Callable[[Any], bool] = lambda r: True, **extra):
+            ref_ms = reference(corpus.reference_doc)
+            stats = measure(fn, min_time=min_time)
+            stats["ok"] = bool(ok(stats.pop("_result")))
+            stats["ref_ms"] = ref_ms
+            stats.update(extra)
+            results[name] = stats
+            logger.info(f"{name:<32} {stats['median_ms']:>10.3f} ms  (p95 {stats['p95_ms']:.3f}, n={stats['reps']})")
+
+        with _cwd(workdir):
+            if "build_de" in stages:
+                for n in item_counts:
+                    kwargs = corpus.de_kwargs[n]
+                    record(f"build_de[items={n}]", lambda: build_de_xml(**kwargs), bytes=len(corpus.rdes[n]))
+
+            if "sign_de" in stages:
+                reason = None
+                try:
+                    from app.sifen_client.xmlsec_signer import sign_de_with_p12
+                except Exception as e:
+                    reason = f"{type(e).__name__}: {e}"
+                first = corpus.rdes[item_counts[0]]
+                reason = reason or _probe(lambda: sign_de_with_p12(first, p12, password))
+                if reason:
+                    skipped["sign_de"] = reason
+                else:
+                    for n in item_counts:
+                        rde = corpus.rdes[n]
+                        record(f"sign_de[items={n}]", lambda: sign_de_with_p12(rde, p12, password))
+
+            if "build_and_sign_lote" in stages:
+                from app.sifen_client.lote_sender import build_and_sign_lote_from_xml
+
+                first = corpus.rdes[item_counts[0]]
+                reason = _probe(lambda: build_and_sign_lote_from_xml(first, p12, password))
+                if reason:
+                    skipped["build_and_sign_lote"] = reason
+                else:
+                    for n in item_counts:
+                        rde = corpus.rdes[n]
+                        record(f"build_and_sign_lote[items={n}]",
+                               lambda: build_and_sign_lote_from_xml(rde, p12, password))
+
+            if "preflight" in stages:
+                from app.sifen_client.lote_sender import preflight_soap_request
+
+                for size in lote_sizes:
+                    payload, zip_bytes = corpus.envios[size]
+                    record(f"preflight[des={size}]",
+                           lambda: preflight_soap_request(payload, zip_bytes, artifacts_dir=workdir),
+                           ok=lambda r: r[0])
+
+            if "validate" in stages:
+                if not xsd_dir.exists():
+                    skipped["validate"] = f"Directorio XSD no existe: {xsd_dir}"
+                else:
+                    for n in item_counts:
+                        rde = corpus.rdes[n]
+                        record(f"validate[items={n}]", lambda: validate_rde_and_lote(rde, None, xsd_dir),
+                               ok=lambda r: r["rde_ok"])
+                    for size in lote_sizes:
+                        rde, lote = corpus.rdes[item_counts[0]], corpus.lotes[size]
+                        record(f"validate[des={size}]", lambda: validate_rde_and_lote(rde, lote, xsd_dir),
+                               ok=lambda r: r["rde_ok"] and r["lote_ok"])
+
+            if "soap_envelope" in stages:
+                from app.sifen_client.config import SifenConfig
+                from app.sifen_client.soap_client import SoapClient
+
+                config = SifenConfig("test")
+                config.cert_pem_path = str(corpus.certs.client_pem)
+                config.key_pem_path = str(corpus.certs.client_key)
+                with SoapClient(config) as client:
+                    for size in lote_sizes:
+                        body = corpus.envios[size][0].encode("utf-8")
+                        record(f"soap_envelope[des={size}]", lambda: client._build_soap_envelope(body, "1.2"))
+
+            if "lote_payload" in stages:
+                for size in lote_sizes:
+                    lote = corpus.lotes[size]
+                    record(f"lote_payload[des={size}]", lambda: lote_payload.build_lote_envelope(lote, did=1))
+
+            if "parse_lote_results" in stages:
+                for size in lote_sizes:
+                    response = corpus.responses[size]
+                    record(f"parse_lote_results[des={size}]", lambda: parse_lote_de_results(response),
+                           ok=lambda r: len(r) == size)
+
+    return {
+        "version": 1,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "lxml": ".".join(str(v) for v in etree.LXML_VERSION),
+            "libxml2": ".".join(str(v) for v in etree.LIBXML_VERSION),
+        },
+        "signature": "placeholder",
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def merge_rounds(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combina varias corridas quedándose, por caso, con la de menor min_ms/ref_ms"""
+    merged = dict(reports[0], results={}, rounds=len(reports))
+    for report in reports:
+        for name, stats in report["results"].items():
+            best = merged["results"].get(name)
+            if best is None or stats["min_ms"] / stats["ref_ms"] < best["min_ms"] / best["ref_ms"]:
+                merged["results"][name] = stats
+    return merged
+
+
+def compare(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.5,
+    min_delta_ms: float = 0.05,
+    metric: str = "min_ms",
+) -> List[Dict[str, Any]]:
+    """
+    Compara tiempos normalizados por la referencia contra el baseline
+
+    Por defecto se compara el mínimo, bastante más estable que la mediana en
+    máquinas compartidas. El tiempo del baseline se escala por la relación
+    entre las referencias medidas junto a cada caso; una etapa regresiona si lo
+    supera en más de `tolerance` y en más de `min_delta_ms` (ruido de etapas
+    de microsegundos).
+
+    Returns:
+        Lista de regresiones: name, baseline_ms (escalado), current_ms, ratio
+    """
+    regressions = []
+    for name, current in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        expected = base[metric] * current["ref_ms"] / base["ref_ms"]
+        ratio = current[metric] / expected if expected else float("inf")
+        if ratio > 1 + tolerance and current[metric] - expected > min_delta_ms:
+            regressions.append({
+                "name": name,
+                "baseline_ms": round(expected, 4),
+                "current_ms": current[metric],
+                "ratio": round(ratio, 3),
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del camino caliente de DE/lote")
+    parser.add_argument("--stage", action="append", choices=STAGES, help="Etapas a correr (default: todas). Repetible")
+    parser.add_argument("--items", help=f"Cantidades de items por DE (default: {','.join(map(str, ITEM_COUNTS))})")
+    parser.add_argument("--lotes", help=f"DEs por lote (default: {','.join(map(str, LOTE_SIZES))})")
+    parser.add_argument("--quick", action="store_true", help="Corpus reducido y menos tiempo por etapa")
+    parser.add_argument("--min-time", type=float, default=None, help="Segundos mínimos por caso (default: 0.3)")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="Corridas completas; se guarda el mejor tiempo por caso (default: 3)")
+    parser.add_argument("--xsd-dir", type=Path, help="Directorio XSD (default: SIFEN_XSD_DIR o schemas_sifen/)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="JSON de resultados")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="JSON de baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar los resultados como nuevo baseline")
+    parser.add_argument("--no-compare", action="store_true", help="No comparar contra el baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Regresión tolerada (0.5 = +50%%; bajar en runners dedicados)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="Diferencia mínima para considerar regresión")
+    parser.add_argument("--metric", choices=("min_ms", "median_ms", "p95_ms"), default="min_ms",
+                        help="Métrica a comparar contra el baseline (default: min_ms)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    def counts(value: Optional[str], default, quick):
+        if value:
+            return [int(n) for n in value.split(",") if n.strip()]
+        return quick if args.quick else default
+
+    output, baseline_path = args.output.resolve(), args.baseline.resolve()
+    report = merge_rounds([
+        run_benchmarks(
+            item_counts=counts(args.items, ITEM_COUNTS, QUICK_ITEM_COUNTS),
+            lote_sizes=counts(args.lotes, LOTE_SIZES, QUICK_LOTE_SIZES),
+            stages=args.stage or STAGES,
+            min_time=args.min_time if args.min_time is not None else (0.1 if args.quick else 0.3),
+            xsd_dir=args.xsd_dir,
+        )
+        for _ in range(max(1, args.rounds))
+    ])
+    for stage, reason in report["skipped"].items():
+        logger.warning(f"Etapa omitida {stage}: {reason}")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    logger.info(f"Resultados: {output}")
+
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        logger.info(f"Baseline guardado: {baseline_path}")
+        return
+    if args.no_compare:
+        return
+    if not baseline_path.exists():
+        logger.warning(f"No hay baseline en {baseline_path}; usar --save-baseline para crearlo")
+        return
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    regressions = compare(report, baseline, args.tolerance, args.min_delta_ms, args.metric)
+    for reg in regressions:
+        logger.error(
+            f"REGRESIÓN {reg['name']}: {reg['current_ms']:.3f} ms vs {reg['baseline_ms']:.3f} ms "
+            f"(x{reg['ratio']:.2f})"
+        )
+    if regressions:
+        sys.exit(1)
+    logger.info(f"Sin regresiones contra {baseline_path} (tolerancia {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
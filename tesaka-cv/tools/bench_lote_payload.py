@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria del armado del payload siRecepLoteDE.
+
+Compara el camino anterior (ZIP -> b64encode -> rEnvioLote con lxml -> envelope
+re-serializado) con el armado sin copias de app.sifen_client.lote_payload.
+
+Reporta dos medidas por modo:
+- pico tracemalloc (solo asignaciones Python)
+- incremento de pico RSS (VmHWM / ru_maxrss), cada modo en un subproceso
+  aparte, que incluye las copias internas de libxml2
+
+Uso:
+    python -m tools.bench_lote_payload
+    python -m tools.bench_lote_payload --des 50 --de-kb 40
+    python -m tools.bench_lote_payload --des 50 --de-kb 8 --compressible
+"""
+import sys
+import argparse
+import json
+import os
+import resource
+import subprocess
+import logging
+from pathlib import Path
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+from app.sifen_client import lote_payload
+
+SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
+
+
+def make_lote_xml(des: int, de_kb: int, compressible: bool = False) -> bytes:
+    """
+    Lote sintético con `des` rDE de ~`de_kb` KB cada uno.
+
+    Con compressible=False el contenido es hex aleatorio (peor caso para el ZIP:
+    firmas y certificados en Base64 comprimen poco).
+    """
+    parts = [f'<rLoteDE xmlns="{SIFEN_NS}">'.encode("ascii")]
+    for i in range(des):
+        if compressible:
+            filler = (b"<gCamItem><dDesProSer>Item</dDesProSer></gCamItem>" * (de_kb * 1024 // 50 + 1))[: de_kb * 1024]
+        else:
+            filler = os.urandom(de_kb * 512).hex().encode("ascii")
+        parts.append(b'<rDE><DE Id="%d"><dDat>' % i + filler + b"</dDat></DE></rDE>")
+    parts.append(b"</rLoteDE>")
+    return b"".join(parts)
+
+
+def _peak_rss_kb(reset: bool = False) -> int:
+    """
+    Pico de RSS del proceso en KB.
+
+    En Linux usa VmHWM de /proc/self/status, que se puede resetear escribiendo
+    "5" en /proc/self/clear_refs (así el lote sintético no fija el pico). En
+    otros sistemas cae a ru_maxrss (sin reset).
+    """
+    try:
+        if reset:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _child(mode: str, des: int, de_kb: int, compressible: bool) -> dict:
+    """Ejecuta un modo y devuelve el incremento de pico RSS (KB)."""
+    lote_xml = make_lote_xml(des, de_kb, compressible)
+    did = lote_payload.make_did()
+    # Calentar imports/allocator antes de tomar la línea base
+    lote_payload._legacy_envelope(b"<rLoteDE/>", did)
+    lote_payload.build_lote_envelope(b"<rLoteDE/>", did)
+
+    before = _peak_rss_kb(reset=True)
+    if mode == "legacy":
+        envelope = lote_payload._legacy_envelope(lote_xml, did)
+    else:
+        envelope = lote_payload.build_lote_envelope(lote_xml, did)
+    after = _peak_rss_kb()
+    return {"mode": mode, "rss_delta_kb": after - before, "envelope_bytes": len(envelope)}
+
+
+def run_rss(mode: str, des: int, de_kb: int, compressible: bool) -> dict:
+    cmd = [
+        sys.executable, "-m", "tools.bench_lote_payload",
+        "--child", mode, "--des", str(des), "--de-kb", str(de_kb),
+    ]
+    if compressible:
+        cmd.append("--compressible")
+    out = subprocess.run(
+        cmd, cwd=str(Path(__file__).parent.parent), capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memoria del payload siRecepLoteDE")
+    parser.add_argument("--des", type=int, default=50, help="Cantidad de DE por lote (default: 50)")
+    parser.add_argument("--de-kb", type=int, default=8, help="Tamaño aproximado de cada DE en KB (default: 8)")
+    parser.add_argument("--compressible", action="store_true", help="Contenido repetitivo (ZIP chico)")
+    parser.add_argument("--child", choices=["legacy", "zero_copy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_child(args.child, args.des, args.de_kb, args.compressible)))
+        return 0
+
+    lote_xml = make_lote_xml(args.des, args.de_kb, args.compressible)
+    traced = lote_payload.measure(lote_xml)
+    del lote_xml
+
+    print(f"Lote: {args.des} DE x ~{args.de_kb} KB = {traced['lote_bytes'] / 1e6:.2f} MB")
+    print(f"Envelope: {traced['envelope_bytes'] / 1e6:.2f} MB")
+    print(f"{'modo':<12} {'pico tracemalloc':>18} {'pico RSS (+)':>14}")
+    for mode, key in (("legacy", "legacy_peak"), ("zero_copy", "zero_copy_peak")):
+        rss = run_rss(mode, args.des, args.de_kb, args.compressible)
+        print(f"{mode:<12} {traced[key] / 1e6:>15.2f} MB {rss['rss_delta_kb'] / 1024:>11.2f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
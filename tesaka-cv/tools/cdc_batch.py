@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validación y corrección masiva del DV de CDCs SIFEN.
+
+CLI sobre app.sifen_client.cdc_batch (versión vectorizada de tools.cdc_dv):
+valida los CDC de de_documents o los DE@Id de un directorio de XML y compara
+contra el cálculo escalar. Los XML firmados no se corrigen (la firma dejaría
+de ser válida), igual que los DEs ya firmados/enviados de la base.
+
+Uso:
+    python -m tools.cdc_batch db                       # Valida de_documents.cdc
+    python -m tools.cdc_batch db --fix                 # Corrige DEs aún no enviados
+    python -m tools.cdc_batch dir artifacts/           # Valida DE@Id de todos los *.xml
+    python -m tools.cdc_batch dir artifacts/ --fix     # Corrige DE@Id y dDVId en los archivos
+    python -m tools.cdc_batch bench --n 1000000        # Compara contra la versión escalar
+"""
+
+import argparse
+import re
+import sys
+import time
+import random
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.cdc_dv import calc_cdc_dv
+from app.sifen_client.cdc_batch import NUMPY_AVAILABLE, calc_cdc_dv_batch, validate_cdc_batch
+
+
+# ---------------------------------------------------------------------------
+# Reparación de XML (DE@Id y dDVId) sin re-serializar el documento
+# ---------------------------------------------------------------------------
+_DE_ID_RE = re.compile(rb'<(?:[\w.-]+:)?DE\b[^>]*?\sId\s*=\s*["\']([^"\']*)["\']')
+_DDVID_RE = re.compile(rb'(<(?:[\w.-]+:)?dDVId>)\s*\d*\s*(</(?:[\w.-]+:)?dDVId>)')
+_SIGNATURE_RE = re.compile(rb'<(?:[\w.-]+:)?Signature\b')
+
+
+def extract_de_id(xml_bytes: bytes) -> Optional[str]:
+    """Extrae DE@Id con una expresión regular (sin parsear el XML completo)."""
+    match = _DE_ID_RE.search(xml_bytes)
+    return match.group(1).decode("ascii", errors="replace") if match else None
+
+
+def replace_cdc_in_xml(xml_bytes: bytes, old_cdc: str, new_cdc: str) -> bytes:
+    """
+    Reemplaza el CDC en todo el XML (DE@Id, referencias y QR) y actualiza dDVId.
+
+    NOTA: si el XML estaba firmado, la firma deja de ser válida.
+    """
+    fixed = xml_bytes.replace(old_cdc.encode("ascii"), new_cdc.encode("ascii"))
+    return _DDVID_RE.sub(lambda m: m.group(1) + new_cdc[-1].encode("ascii") + m.group(2), fixed, count=1)
+
+
+# ---------------------------------------------------------------------------
+# Fuentes: base de datos y directorios
+# ---------------------------------------------------------------------------
+def audit_database(fix: bool = False, chunk_size: int = 100_000) -> Dict[str, Any]:
+    """
+    Valida (y opcionalmente corrige) el CDC de todos los documentos de de_documents.
+
+    Solo se corrigen documentos que todavía no se enviaron a SIFEN
+    (sin d_prot_cons_lote y sin signed_xml); el resto se reporta.
+    """
+    from web.blob_store import get_blob, put_blob
+    from web.db import get_conn
+
+    summary: Dict[str, Any] = {"total": 0, "invalid": [], "fixed": 0, "not_fixable": []}
+    conn = get_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, cdc FROM de_documents")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            summary["total"] += len(rows)
+            valid, dv_orig, dv_calc = validate_cdc_batch([row["cdc"] for row in rows])
+            for idx in [i for i, v in enumerate(valid) if not v]:
+                row = rows[idx]
+                summary["invalid"].append({
+                    "id": row["id"],
+                    "cdc": row["cdc"],
+                    "dv_original": int(dv_orig[idx]),
+                    "dv_calculado": int(dv_calc[idx]),
+                })
+
+        if fix:
+            write = conn.cursor()
+            for item in summary["invalid"]:
+                if item["dv_calculado"] < 0:
+                    summary["not_fixable"].append({**item, "reason": "CDC mal formado"})
+                    continue
+                row = write.execute(
+                    "SELECT de_xml, de_xml_sha, d_prot_cons_lote, "
+                    "signed_xml IS NOT NULL OR signed_xml_sha IS NOT NULL AS signed FROM de_documents WHERE id = ?",
+                    (item["id"],),
+                ).fetchone()
+                if row["d_prot_cons_lote"] or row["signed"]:
+                    summary["not_fixable"].append({**item, "reason": "DE ya firmado/enviado"})
+                    continue
+                new_cdc = item["cdc"][:43] + str(item["dv_calculado"])
+                de_xml = get_blob(conn, row["de_xml_sha"]) if row["de_xml_sha"] else row["de_xml"]
+                new_xml = replace_cdc_in_xml(de_xml.encode("utf-8"), item["cdc"], new_cdc).decode("utf-8")
+                try:
+                    write.execute(
+                        "UPDATE de_documents SET cdc = ?, de_xml = '', de_xml_sha = ? WHERE id = ?",
+                        (new_cdc, put_blob(conn, new_xml), item["id"]),
+                    )
+                    summary["fixed"] += 1
+                except Exception as e:
+                    summary["not_fixable"].append({**item, "reason": str(e)})
+            conn.commit()
+    finally:
+        conn.close()
+    return summary
+
+
+def audit_directory(directory: Path, fix: bool = False, pattern: str = "*.xml") -> Dict[str, Any]:
+    """
+    Valida (y opcionalmente corrige) DE@Id en todos los XML de un directorio (recursivo).
+
+    Los XML firmados (con ds:Signature) no se corrigen: se reportan en not_fixable.
+    """
+    summary: Dict[str, Any] = {"total": 0, "without_de": [], "invalid": [], "fixed": 0, "not_fixable": []}
+    paths: List[Path] = []
+    ids: List[str] = []
+    for path in sorted(Path(directory).rglob(pattern)):
+        try:
+            de_id = extract_de_id(path.read_bytes())
+        except OSError:
+            de_id = None
+        if de_id is None:
+            summary["without_de"].append(str(path))
+            continue
+        paths.append(path)
+        ids.append(de_id)
+
+    summary["total"] = len(paths)
+    valid, dv_orig, dv_calc = validate_cdc_batch(ids)
+    for idx in [i for i, v in enumerate(valid) if not v]:
+        item = {
+            "path": str(paths[idx]),
+            "cdc": ids[idx],
+            "dv_original": int(dv_orig[idx]),
+            "dv_calculado": int(dv_calc[idx]),
+        }
+        summary["invalid"].append(item)
+        if not fix:
+            continue
+        if item["dv_calculado"] < 0:
+            summary["not_fixable"].append({**item, "reason": "CDC mal formado"})
+            continue
+        xml_bytes = paths[idx].read_bytes()
+        if _SIGNATURE_RE.search(xml_bytes):
+            # Igual que en la base: cambiar el CDC invalidaría la firma
+            summary["not_fixable"].append({**item, "reason": "XML firmado (ds:Signature)"})
+            continue
+        new_cdc = ids[idx][:43] + str(item["dv_calculado"])
+        paths[idx].write_bytes(replace_cdc_in_xml(xml_bytes, ids[idx], new_cdc))
+        summary["fixed"] += 1
+    return summary
+
+
+def benchmark(n: int = 1_000_000, seed: int = 0) -> Dict[str, Any]:
+    """
+    Compara el cálculo escalar (tools.cdc_dv.calc_cdc_dv) contra el vectorizado.
+    """
+    rng = random.Random(seed)
+    bases = ["".join(rng.choices("0123456789", k=43)) for _ in range(n)]
+
+    t0 = time.perf_counter()
+    scalar = [calc_cdc_dv(base) for base in bases]
+    t_scalar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = calc_cdc_dv_batch(bases)
+    t_batch = time.perf_counter() - t0
+
+    if list(map(int, batch)) != scalar:
+        raise AssertionError("El cálculo vectorizado no coincide con el escalar")
+
+    return {
+        "n": n,
+        "numpy": NUMPY_AVAILABLE,
+        "scalar_seconds": round(t_scalar, 4),
+        "batch_seconds": round(t_batch, 4),
+        "speedup": round(t_scalar / t_batch, 1) if t_batch else None,
+    }
+
+
+def _print_invalid(items: Iterable[Dict[str, Any]], key: str, limit: int = 50) -> None:
+    items = list(items)
+    for item in items[:limit]:
+        print(f"  ❌ {item[key]}: {item['cdc']} (DV={item['dv_original']}, esperado={item['dv_calculado']})")
+    if len(items) > limit:
+        print(f"  ... y {len(items) - limit} más")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Validación/corrección masiva del DV de CDCs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_db = sub.add_parser("db", help="Validar de_documents.cdc")
+    p_db.add_argument("--fix", action="store_true", help="Corregir DEs aún no firmados/enviados")
+
+    p_dir = sub.add_parser("dir", help="Validar DE@Id de los XML de un directorio")
+    p_dir.add_argument("directory", type=Path)
+    p_dir.add_argument("--pattern", default="*.xml", help="Patrón de archivos (default: *.xml)")
+    p_dir.add_argument("--fix", action="store_true", help="Corregir DE@Id/dDVId en los archivos")
+
+    p_bench = sub.add_parser("bench", help="Benchmark escalar vs vectorizado")
+    p_bench.add_argument("--n", type=int, default=1_000_000, help="Cantidad de CDCs (default: 1.000.000)")
+
+    args = parser.parse_args()
+
+    if not NUMPY_AVAILABLE:
+        print("⚠️  NumPy no está instalado: se usa el cálculo escalar (pip install numpy)")
+
+    if args.command == "bench":
+        result = benchmark(args.n)
+        print(f"CDCs:       {result['n']:,}")
+        print(f"Escalar:    {result['scalar_seconds']}s")
+        print(f"Vectorizado:{result['batch_seconds']}s")
+        print(f"Speedup:    x{result['speedup']}")
+        return 0
+
+    t0 = time.perf_counter()
+    if args.command == "db":
+        summary = audit_database(fix=args.fix)
+        key = "id"
+    else:
+        if not args.directory.is_dir():
+            print(f"❌ Directorio no existe: {args.directory}")
+            return 1
+        summary = audit_directory(args.directory, fix=args.fix, pattern=args.pattern)
+        key = "path"
+    elapsed = time.perf_counter() - t0
+
+    print(f"Total: {summary['total']:,}  Inválidos: {len(summary['invalid']):,}  ({elapsed:.2f}s)")
+    _print_invalid(summary["invalid"], key)
+    if args.fix:
+        print(f"✅ Corregidos: {summary['fixed']}")
+        for item in summary.get("not_fixable", []):
+            print(f"  ⚠️  {key}={item[key]} no corregido: {item['reason']}")
+    return 0 if not summary["invalid"] or args.fix else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Verificación de los saldos incrementales de contratos y órdenes de compra
+
+Compara contract_item_balances y po_item_balances contra los movimientos
+(purchase_order_items, delivery_note_items) y muestra las diferencias.
+Con --fix recalcula los saldos desde cero.
+
+Uso:
+    python -m tools.check_balances
+    python -m tools.check_balances --fix
+"""
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+try:
+    from app.balances import check_balances, rebuild_balances
+    from app.db import get_db, init_db
+except ImportError as e:
+    logger.error(f"Error al importar módulos: {e}")
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificación de saldos de contratos y OCs")
+    parser.add_argument("--fix", action="store_true", help="Recalcular los saldos si hay diferencias")
+    args = parser.parse_args()
+
+    init_db()
+    conn = get_db()
+    try:
+        problems = check_balances(conn)
+        for problem in problems[:50]:
+            logger.warning(
+                f"{problem['tabla']} item {problem['item_id']}: {problem['campo']} = {problem['saldo']} "
+                f"(esperado {problem['esperado']})"
+            )
+        if len(problems) > 50:
+            logger.warning(f"... y {len(problems) - 50} diferencias más")
+
+        if not problems:
+            logger.info("Saldos consistentes")
+            return
+        if not args.fix:
+            logger.error(f"{len(problems)} diferencia(s); ejecutar con --fix para recalcular")
+            sys.exit(1)
+
+        rebuild_balances(conn)
+        remaining = check_balances(conn)
+        if remaining:
+            logger.error(f"Quedan {len(remaining)} diferencia(s) después de recalcular")
+            sys.exit(1)
+        logger.info(f"Saldos recalculados ({len(problems)} diferencia(s) corregidas)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -55,6 +55,9 @@ try:
     from app.sifen_client.config import get_sifen_config, get_mtls_cert_path_and_password
     from app.sifen_client.exceptions import SifenClientError
     from app.sifen_client.pkcs12_utils import p12_to_temp_pem_files, PKCS12Error
+    from app.sifen_client.http_metrics import TimedHTTPAdapter
+    from app.sifen_client.metrics import dump_at_exit
+    from app.profiling import add_profile_argument, profile_at_exit
 except ImportError as e:
     print(f"❌ Error: No se pudo importar módulos SIFEN: {e}", file=sys.stderr)
     print("   Asegúrate de que las dependencias estén instaladas:", file=sys.stderr)
@@ -62,7 +65,6 @@ except ImportError as e:
     sys.exit(1)
 
 from requests import Session
-from requests.adapters import HTTPAdapter
 try:
     from urllib3.util.retry import Retry
     URLLIB3_RETRY_AVAILABLE = True
@@ -868,9 +870,9 @@ def create_zeep_transport(cert_path: str, cert_password: str) -> Transport:
             allowed_methods=frozenset(["GET", "POST"]),
             raise_on_status=False
         )
-        adapter = HTTPAdapter(max_retries=retry, pool_connections=10, pool_maxsize=10)
+        adapter = TimedHTTPAdapter(max_retries=retry, pool_connections=10, pool_maxsize=10)
     else:
-        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+        adapter = TimedHTTPAdapter(pool_connections=10, pool_maxsize=10)
     
     session.mount("https://", adapter)
     # NO setear "Connection: close" - dejar Keep-Alive para reutilizar conexiones y cookies
@@ -936,10 +938,11 @@ def call_consulta_lote_raw(
     
     try:
         # Endpoint (NO ?wsdl)
-        if env == "prod":
-            endpoint = "https://sifen.set.gov.py/de/ws/consultas-lote/consulta-lote"
-        else:
-            endpoint = "https://sifen-test.set.gov.py/de/ws/consultas-lote/consulta-lote"
+        endpoint = config.rebase_url(
+            "https://sifen.set.gov.py/de/ws/consultas-lote/consulta-lote"
+            if env == "prod"
+            else "https://sifen-test.set.gov.py/de/ws/consultas-lote/consulta-lote"
+        )
         
         print(f"[SIFEN DEBUG] call_consulta_lote_raw: endpoint={endpoint} env={env} prot={prot}")
         
@@ -974,8 +977,10 @@ def call_consulta_lote_raw(
         else:
             # Crear nueva session con mTLS
             session = requests.Session()
-            session.verify = True
+            ca_bundle_path = getattr(config, "ca_bundle_path", None)
+            session.verify = str(ca_bundle_path) if ca_bundle_path else True
             session.cert = (cert_pem_path, key_pem_path)
+            session.mount("https://", TimedHTTPAdapter())
             print(f"[SIFEN DEBUG] call_consulta_lote_raw: nueva session con cert_pem={os.path.basename(cert_pem_path)} key_pem={os.path.basename(key_pem_path)}")
         
         r = session.post(endpoint, data=soap, headers=headers, timeout=timeout)
@@ -1166,8 +1171,19 @@ def main() -> int:
         type=str,
         help="Consultar RUC en lugar de lote. Proporciona el RUC (puede incluir DV como 'RUC-DV', ej: --ruc 4554737-8 o --ruc 80012345)",
     )
+    parser.add_argument(
+        "--metrics-out",
+        default=os.getenv("SIFEN_METRICS_OUT"),
+        help="Guardar métricas de latencia/códigos al terminar (.json o texto Prometheus). Default: SIFEN_METRICS_OUT",
+    )
+    add_profile_argument(parser)
     args = parser.parse_args()
     
+    if args.metrics_out:
+        dump_at_exit(args.metrics_out)
+    if args.profile:
+        profile_at_exit("consulta_ruc" if args.ruc else "consulta_lote_de", args.profile)
+    
     # Si se proporciona --ruc, ejecutar consulta de RUC
     if args.ruc:
         return consulta_ruc_cli(args)
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga end-to-end de las dos apps web contra el SIFEN simulado.
+
+Levanta (como subprocesos uvicorn, con --workers configurable) web/main.py y
+app/main.py sobre una tesaka.db descartable y el mock mTLS de
+tools/sifen_mock_server.py, y las maneja con N usuarios virtuales:
+
+- web: POST /de/new -> POST /de/{id}/send -> GET /de/{id}/status hasta estado final
+- app: POST /invoices -> GET /invoices -> GET de un reporte (rotando)
+
+Por nivel de concurrencia reporta throughput, latencias p50/p90/p95/p99 por
+ruta, tasas de error (HTTP, excepciones y errores que la app guardó en el DE),
+esperas por el lock de escritura de SQLite (sonda BEGIN IMMEDIATE periódica)
+y los "database is locked" observados. Con varios niveles (--concurrency
+1,4,16) marca el primero donde el throughput deja de crecer.
+
+Uso:
+    python -m tools.load_test_web --concurrency 1,4,16 --duration 30
+    python -m tools.load_test_web --workers 4 --sifen-latency lognormal:300:100
+    python -m tools.load_test_web --scenario web --send-mode direct --output artifacts/load.json
+    python -m tools.load_test_web --web-url http://127.0.0.1:8000 --db tesaka.db --scenario web
+"""
+import sys
+import argparse
+import json
+import logging
+import math
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+try:
+    import requests
+
+    from tools.sifen_mock_server import LatencyModel, MockBehavior, MockSifenServer, _parse_latency
+except ImportError as e:
+    logging.basicConfig(level=logging.INFO)
+    logger.error(f"Error al importar módulos: {e}")
+    sys.exit(1)
+
+REPO_ROOT = Path(__file__).parent.parent
+DEFAULT_OUTPUT = Path("artifacts") / "load_test_web.json"
+DEFAULT_REPORTS = ("/reports/sales_invoices.xlsx", "/reports/contracts.xlsx")
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not ordered:
+        return 0.0
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+class Recorder:
+    """Acumula muestras por ruta (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.outcomes: Dict[str, Counter] = {}
+        self.cycles: List[float] = []
+        self.locked_errors = 0
+
+    def add(self, route: str, elapsed_ms: float, outcome: str, locked: bool = False):
+        with self._lock:
+            self.samples.setdefault(route, []).append(elapsed_ms)
+            self.outcomes.setdefault(route, Counter())[outcome] += 1
+            if locked:
+                self.locked_errors += 1
+
+    def add_cycle(self, elapsed_ms: float):
+        with self._lock:
+            self.cycles.append(elapsed_ms)
+
+    def summary(self, duration_s: float) -> Dict[str, Any]:
+        with self._lock:
+            routes = {}
+            for route, values in sorted(self.samples.items()):
+                outcomes = self.outcomes[route]
+                failed = outcomes["http_error"] + outcomes["exception"]
+                routes[route] = {
+                    "count": len(values),
+                    "rps": round(len(values) / duration_s, 2),
+                    **dict(outcomes),
+                    "error_rate": round(failed / len(values), 4),
+                    "app_error_rate": round(outcomes["app_error"] / len(values), 4),
+                    **_latency_stats(values),
+                }
+            total = sum(r["count"] for r in routes.values())
+            failed = sum(r.get("http_error", 0) + r.get("exception", 0) for r in routes.values())
+            return {
+                "requests": total,
+                "rps": round(total / duration_s, 2),
+                "error_rate": round(failed / total, 4) if total else 0.0,
+                "cycles": len(self.cycles),
+                "cycle_latency": _latency_stats(self.cycles),
+                "locked_errors": self.locked_errors,
+                "routes": routes,
+            }
+
+
+def _latency_stats(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    stats = {f"p{p}_ms": round(percentile(ordered, p), 2) for p in PERCENTILES}
+    stats["max_ms"] = round(ordered[-1], 2) if ordered else 0.0
+    return stats
+
+
+class LockProbe(threading.Thread):
+    """
+    Mide cuánto tarda en obtenerse el lock de escritura de SQLite
+
+    Cada `interval` segundos abre una transacción BEGIN IMMEDIATE (espera al
+    escritor en curso) y hace ROLLBACK enseguida: la espera es la que sufriría
+    cualquier INSERT/UPDATE de las apps en ese momento. No se usa BEGIN
+    EXCLUSIVE: mientras espera retiene el lock PENDING y frenaría a todos los
+    lectores. El timeout es el mismo que el default de sqlite3 en las apps.
+    """
+
+    def __init__(self, db_path: Path, interval: float = 0.1, timeout: float = 5.0):
+        super().__init__(name="sqlite-lock-probe", daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.timeout = timeout
+        self.waits: List[float] = []
+        self.failures = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=self.timeout, isolation_level=None)
+        try:
+            while not self._stop_event.is_set():
+                t0 = time.perf_counter()
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    self.waits.append((time.perf_counter() - t0) * 1000)
+                    conn.execute("ROLLBACK")
+                except sqlite3.OperationalError:
+                    self.failures += 1
+                self._stop_event.wait(self.interval)
+        finally:
+            conn.close()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop_event.set()
+        self.join(timeout=self.timeout + 5)
+        return {"probes": len(self.waits), "probe_failures": self.failures, **_latency_stats(self.waits)}
+
+
+def _outcome(response: requests.Response) -> str:
+    if response.status_code >= 400:
+        return "http_error"
+    if "error=1" in response.headers.get("location", ""):
+        return "app_error"  # la app guardó el error en el DE y redirigió
+    return "ok"
+
+
+class VirtualUser(threading.Thread):
+    """Usuario virtual: repite ciclos web y/o app hasta `deadline`"""
+
+    def __init__(self, vu_id: int, options: "LoadOptions", recorder: Recorder, deadline: float):
+        super().__init__(name=f"vu-{vu_id}", daemon=True)
+        self.vu_id = vu_id
+        self.options = options
+        self.recorder = recorder
+        self.deadline = deadline
+        self.session = requests.Session()
+        # Mismo timbrado, punto de expedición propio (como cajas distintas): serie de
+        # dNumDoc independiente, CDCs sin colisiones y el DE creado se ubica por el CDC
+        self.timbrado = options.timbrado
+        self.punto = f"{options.punto_base + vu_id:03d}"
+        self._db: Optional[sqlite3.Connection] = None
+        self._iteration = 0
+
+    def request(self, route: str, method: str, url: str, **kwargs) -> Optional[requests.Response]:
+        t0 = time.perf_counter()
+        try:
+            response = self.session.request(method, url, allow_redirects=False,
+                                            timeout=self.options.request_timeout, **kwargs)
+        except requests.RequestException:
+            self.recorder.add(route, (time.perf_counter() - t0) * 1000, "exception")
+            return None
+        outcome = _outcome(response)
+        locked = outcome == "http_error" and "database is locked" in response.text
+        self.recorder.add(route, (time.perf_counter() - t0) * 1000, outcome, locked)
+        return response
+
+    def run(self):
+        try:
+            scenarios = {"web": [self.web_cycle], "app": [self.app_cycle],
+                         "both": [self.web_cycle, self.app_cycle]}[self.options.scenario]
+            while time.monotonic() < self.deadline:
+                scenarios[(self._iteration + self.vu_id) % len(scenarios)]()
+                self._iteration += 1
+        finally:
+            self.session.close()
+            if self._db is not None:
+                self._db.close()
+
+    def _last_doc_id(self) -> Optional[int]:
+        if self._db is None:
+            self._db = sqlite3.connect(f"file:{self.options.db_path}?mode=ro", uri=True, timeout=30)
+        # CDC: tipo(2) RUC(8) DV(1) establecimiento(3) punto(3) ...
+        # fetchall: una sentencia sin terminar retiene el lock SHARED y frena los COMMIT de las apps
+        rows = self._db.execute(
+            "SELECT id FROM de_documents WHERE substr(cdc, 12, 6) = ? ORDER BY id DESC LIMIT 1",
+            ("001" + self.punto,),
+        ).fetchall()
+        return rows[0][0] if rows else None
+
+    def web_cycle(self):
+        base = self.options.web_url
+        t0 = time.perf_counter()
+        form = {"timbrado": self.timbrado, "establecimiento": "001", "punto_expedicion": self.punto,
+                "numero_documento": ""}
+        for i in range(self.options.items):
+            form.update({f"item_codigo_{i}": f"{i + 1:03d}", f"item_descripcion_{i}": f"Producto {i + 1}",
+                         f"item_cantidad_{i}": "1", f"item_precio_{i}": str(1000 * (i + 1)),
+                         f"item_tasa_iva_{i}": "10"})
+        response = self.request("POST /de/new", "POST", f"{base}/de/new", data=form)
+        if response is None or response.status_code >= 400:
+            return
+        doc_id = self._last_doc_id()
+        if doc_id is None:
+            return
+
+        response = self.request("POST /de/{id}/send", "POST", f"{base}/de/{doc_id}/send",
+                                params={"mode": self.options.send_mode})
+        if response is None or response.status_code >= 400:
+            return
+        for _ in range(self.options.max_polls):
+            response = self.request("GET /de/{id}/status", "GET", f"{base}/de/{doc_id}/status")
+            # "note=" = estado final o sin protocolo: no hay nada más que consultar
+            if response is None or response.status_code >= 400 or "note=" in response.headers.get("location", ""):
+                break
+            if time.monotonic() >= self.deadline:
+                return
+            time.sleep(self.options.poll_interval)
+        self.recorder.add_cycle((time.perf_counter() - t0) * 1000)
+
+    def app_cycle(self):
+        base = self.options.app_url
+        t0 = time.perf_counter()
+        n = self.options.items
+        form = {
+            "issue_date": "2026-01-15", "buyer_situacion": "contribuyente",
+            "buyer_nombre": f"Cliente {self.vu_id}", "buyer_ruc": "80012345", "buyer_dv": "7",
+            "transaction_condicionCompra": "CONTADO", "transaction_tipoComprobante": "1",
+            "transaction_numeroComprobanteVenta": f"001-{self.punto}-{self._iteration + 1:07d}",
+            "transaction_numeroTimbrado": self.timbrado,
+            "item_cantidad": ["1"] * n, "item_tasaAplica": ["10"] * n,
+            "item_precioUnitario": [str(1000 * (i + 1)) for i in range(n)],
+            "item_descripcion": [f"Producto {i + 1}" for i in range(n)],
+            "retention_fecha": "2026-01-15", "retention_moneda": "PYG",
+            "retention_rentaPorcentaje": "0", "retention_ivaPorcentaje5": "0", "retention_ivaPorcentaje10": "30",
+            "retention_rentaCabezasBase": "0", "retention_rentaCabezasCantidad": "0",
+            "retention_rentaToneladasBase": "0", "retention_rentaToneladasCantidad": "0",
+        }
+        response = self.request("POST /invoices", "POST", f"{base}/invoices", data=form)
+        if response is None or response.status_code >= 400:
+            return
+        self.request("GET /invoices", "GET", f"{base}/invoices")
+        if self.options.reports:
+            report = self.options.reports[self._iteration % len(self.options.reports)]
+            self.request(f"GET {report}", "GET", f"{base}{report}")
+        self.recorder.add_cycle((time.perf_counter() - t0) * 1000)
+
+
+class LoadOptions:
+    """Parámetros de una corrida (URLs, escenario y ritmo de los usuarios virtuales)"""
+
+    def __init__(
+        self,
+        web_url: Optional[str],
+        app_url: Optional[str],
+        db_path: Path,
+        scenario: str = "both",
+        send_mode: str = "lote",
+        items: int = 3,
+        reports=DEFAULT_REPORTS,
+        poll_interval: float = 1.0,
+        max_polls: int = 10,
+        request_timeout: float = 60.0,
+        timbrado: str = "12345678",
+    ):
+        self.web_url = web_url
+        self.app_url = app_url
+        self.db_path = db_path
+        self.scenario = scenario
+        self.send_mode = send_mode
+        self.items = items
+        self.reports = list(reports)
+        self.poll_interval = poll_interval
+        self.max_polls = max_polls
+        self.request_timeout = request_timeout
+        self.timbrado = timbrado
+        self.punto_base = 1
+
+
+def run_level(options: LoadOptions, concurrency: int, duration: float, probe_interval: float = 0.1) -> Dict[str, Any]:
+    """Corre `concurrency` usuarios virtuales durante `duration` segundos"""
+    if options.punto_base + concurrency > 1000:
+        raise RuntimeError("Se agotaron los puntos de expedición (máx. 999 usuarios sumando todos los niveles)")
+    recorder = Recorder()
+    probe = LockProbe(options.db_path, probe_interval)
+    probe.start()
+    deadline = time.monotonic() + duration
+    users = [VirtualUser(i, options, recorder, deadline) for i in range(concurrency)]
+    started = time.perf_counter()
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    elapsed = time.perf_counter() - started
+    # Los próximos niveles usan otros puntos de expedición (DEs separados por nivel)
+    options.punto_base += concurrency
+
+    summary = {"concurrency": concurrency, "duration_s": round(elapsed, 2), **recorder.summary(elapsed)}
+    summary["sqlite"] = {"locked_errors": summary.pop("locked_errors"), **probe.stop()}
+    return summary
+
+
+def find_saturation(levels: List[Dict[str, Any]], min_gain: float = 0.1) -> Optional[int]:
+    """Primera concurrencia cuyo throughput no crece al menos `min_gain` sobre el nivel anterior"""
+    for previous, current in zip(levels, levels[1:]):
+        if current["rps"] < previous["rps"] * (1 + min_gain):
+            return current["concurrency"]
+    return None
+
+
+def de_status_counts(db_path: Path) -> Dict[str, int]:
+    """Distribución de last_status de los DEs en la base de prueba"""
+    if not db_path.exists():
+        return {}
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)
+    try:
+        rows = conn.execute("SELECT COALESCE(last_status, '(sin estado)'), COUNT(*) FROM de_documents GROUP BY 1")
+        return {status: count for status, count in rows}
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+
+
+def _free_port(host: str) -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class AppProcess:
+    """Una app FastAPI servida por uvicorn en un subproceso"""
+
+    def __init__(self, module: str, env: Dict[str, str], cwd: Path, workers: int = 1, host: str = "127.0.0.1"):
+        self.port = _free_port(host)
+        self.url = f"http://{host}:{self.port}"
+        self.log_path = cwd / f"{module.split('.')[0]}.log"
+        self._log = open(self.log_path, "wb")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", module, "--host", host, "--port", str(self.port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=str(cwd), env=env, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+
+    def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.url} terminó al iniciar; ver {self.log_path}")
+            try:
+                requests.get(self.url + "/", timeout=5)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError(f"{self.url} no respondió en {timeout:.0f}s; ver {self.log_path}")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+
+
+def run_load_test(
+    concurrency_levels: List[int],
+    duration: float,
+    scenario: str = "both",
+    send_mode: str = "lote",
+    workers: int = 1,
+    behavior: Optional[MockBehavior] = None,
+    web_url: Optional[str] = None,
+    app_url: Optional[str] = None,
+    db_path: Optional[Path] = None,
+    workdir: Optional[Path] = None,
+    probe_interval: float = 0.1,
+    **option_kwargs,
+) -> Dict[str, Any]:
+    """
+    Levanta lo que haga falta (mock SIFEN, apps, base de prueba) y corre cada nivel
+
+    Si se pasan web_url/app_url se usan esos servidores (y db_path debe ser su
+    base) en lugar de levantar subprocesos.
+    """
+    need_web = scenario in ("web", "both")
+    need_app = scenario in ("app", "both")
+    with tempfile.TemporaryDirectory(prefix="load_test_web_") as tmp:
+        workdir = Path(workdir or tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        db_path = Path(db_path or workdir / "tesaka.db").resolve()
+        mock: Optional[MockSifenServer] = None
+        processes: List[AppProcess] = []
+        try:
+            env = dict(os.environ)
+            env["TESAKA_DB_PATH"] = str(db_path)
+            env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT.resolve()), env.get("PYTHONPATH")]))
+            env.setdefault("SIFEN_EMISOR_RUC", "80012345-7")
+            if need_web and web_url is None:
+                mock = MockSifenServer(behavior, certs_dir=workdir / "certs").start()
+                env.update(mock.client_env(env.get("SIFEN_ENV", "test")))
+            # app primero: init_db crea el esquema antes de que web empiece a escribir
+            if need_app and app_url is None:
+                processes.append(AppProcess("app.main:app", env, workdir, workers))
+                processes[-1].wait_ready()
+                app_url = processes[-1].url
+            if need_web and web_url is None:
+                processes.append(AppProcess("web.main:app", env, workdir, workers))
+                processes[-1].wait_ready()
+                web_url = processes[-1].url
+
+            options = LoadOptions(web_url, app_url, db_path, scenario, send_mode, **option_kwargs)
+            levels = []
+            for concurrency in concurrency_levels:
+                logger.info(f"Nivel {concurrency} usuarios, {duration:.0f}s ...")
+                levels.append(run_level(options, concurrency, duration, probe_interval))
+                _log_level(levels[-1])
+        finally:
+            for process in reversed(processes):
+                process.stop()
+            if mock is not None:
+                mock.stop()
+
+        return {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "config": {
+                "scenario": scenario, "send_mode": send_mode, "workers": workers, "duration_s": duration,
+                "web_url": web_url, "app_url": app_url, "db_path": str(db_path),
+                "items": options.items, "reports": options.reports,
+                "poll_interval": options.poll_interval, "max_polls": options.max_polls,
+            },
+            "levels": levels,
+            "saturated_at": find_saturation(levels),
+            "sifen_mock": mock.mock.stats() if mock is not None else None,
+            "de_status": de_status_counts(db_path),
+        }
+
+
+def _log_level(level: Dict[str, Any]):
+    sqlite_stats = level["sqlite"]
+    logger.info(
+        f"c={level['concurrency']:<4} {level['rps']:>8.1f} req/s  errores {level['error_rate']:.1%}  "
+        f"ciclos {level['cycles']} (p95 {level['cycle_latency']['p95_ms']:.0f} ms)  "
+        f"lock SQLite p95 {sqlite_stats.get('p95_ms', 0):.1f} ms / max {sqlite_stats.get('max_ms', 0):.1f} ms  "
+        f"locked {sqlite_stats['locked_errors']}"
+    )
+    for route, stats in level["routes"].items():
+        logger.info(
+            f"    {route:<34} n={stats['count']:<6} p50 {stats['p50_ms']:>8.1f}  p95 {stats['p95_ms']:>8.1f}  "
+            f"p99 {stats['p99_ms']:>8.1f} ms  err {stats['error_rate']:.1%}  app_err {stats['app_error_rate']:.1%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de web/ y app/ contra el SIFEN simulado")
+    parser.add_argument("--concurrency", default="1,4,16", help="Niveles de usuarios concurrentes (ej. 1,4,16)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Segundos por nivel")
+    parser.add_argument("--scenario", choices=("web", "app", "both"), default="both")
+    parser.add_argument("--send-mode", choices=("lote", "direct"), default="lote",
+                        help="Modo de /de/{id}/send (lote requiere firma XML)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers uvicorn por app")
+    parser.add_argument("--items", type=int, default=3, help="Items por DE/factura")
+    parser.add_argument("--report", action="append", dest="reports",
+                        help=f"Reporte a pedir en el ciclo app (default: {', '.join(DEFAULT_REPORTS)}). Repetible")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Segundos entre consultas de estado")
+    parser.add_argument("--max-polls", type=int, default=10, help="Consultas de estado máximas por DE")
+    parser.add_argument("--probe-interval", type=float, default=0.1, help="Segundos entre sondas del lock SQLite")
+    parser.add_argument("--sifen-latency", action="append", default=[], metavar="[OP=]SPEC",
+                        help="Latencia del mock (ver tools/sifen_mock_server.py --latency). Repetible")
+    parser.add_argument("--sifen-processing", default="2000", help="Procesamiento de lote del mock en ms")
+    parser.add_argument("--sifen-reset", type=float, default=0.0, help="Probabilidad de reset en el mock")
+    parser.add_argument("--web-url", help="Usar una web ya levantada (requiere --db)")
+    parser.add_argument("--app-url", help="Usar una app ya levantada")
+    parser.add_argument("--db", type=Path, help="tesaka.db de los servidores externos")
+    parser.add_argument("--workdir", type=Path, help="Directorio de trabajo (default: temporal)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="JSON de resultados")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    # SIGTERM (p. ej. timeout) también baja los subprocesos uvicorn
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    if args.web_url and not args.db:
+        parser.error("--web-url requiere --db (la base de esos servidores)")
+    try:
+        behavior = MockBehavior(
+            latency=_parse_latency(args.sifen_latency),
+            processing=LatencyModel.parse(args.sifen_processing),
+            reset_rate=args.sifen_reset,
+        )
+        levels = [int(n) for n in args.concurrency.split(",") if n.strip()]
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = args.output.resolve()
+    try:
+        report = run_load_test(
+            levels, args.duration, scenario=args.scenario, send_mode=args.send_mode, workers=args.workers,
+            behavior=behavior, web_url=args.web_url, app_url=args.app_url, db_path=args.db,
+            workdir=args.workdir, probe_interval=args.probe_interval, items=args.items,
+            reports=args.reports or DEFAULT_REPORTS, poll_interval=args.poll_interval, max_polls=args.max_polls,
+        )
+    except RuntimeError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    if report["saturated_at"]:
+        logger.info(f"El throughput deja de crecer en {report['saturated_at']} usuarios concurrentes")
+    logger.info(f"Estados de DE: {report['de_status']}")
+    logger.info(f"Resultados: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,7 @@ import argparse
 import os
 import time
 import logging
+from typing import Optional
 from pathlib import Path
 
 # Agregar el directorio padre al path para imports
@@ -47,10 +48,13 @@ try:
         LOTE_STATUS_REQUIRES_CDC,
         LOTE_STATUS_ERROR,
     )
+    from web.de_trace import record_lote_result
     from app.sifen_client.lote_checker import (
         check_lote_status,
         determine_status_from_cod_res_lot,
     )
+    from app.sifen_client.metrics import dump_at_exit
+    from app.profiling import add_profile_argument, profile_at_exit
 except ImportError as e:
     logger.error(f"Error al importar módulos: {e}")
     sys.exit(1)
@@ -75,11 +79,17 @@ def process_lote(lote: dict, env: str) -> bool:
 
     try:
         # Consultar estado del lote
+        start = time.perf_counter()
         result = check_lote_status(
             env=env,
             prot=prot,
             timeout=30,
         )
+        record_lote_result(
+            prot, result.get("cod_res_lot"), result.get("de_results"),
+            duration_ms=(time.perf_counter() - start) * 1000,
+            ok=bool(result.get("success")), detail=result.get("error"),
+        )
 
         if not result.get("success"):
             error_msg = result.get("error", "Error desconocido")
@@ -235,9 +245,20 @@ def main():
         action="store_true",
         help="Ejecutar solo una vez sin loop (útil para cron)",
     )
+    parser.add_argument(
+        "--metrics-out",
+        default=os.getenv("SIFEN_METRICS_OUT"),
+        help="Guardar métricas de latencia/códigos al terminar (.json o texto Prometheus). Default: SIFEN_METRICS_OUT",
+    )
+    add_profile_argument(parser)
 
     args = parser.parse_args()
 
+    if args.metrics_out:
+        dump_at_exit(args.metrics_out)
+    if args.profile:
+        profile_at_exit("poll_sifen_lotes", args.profile)
+
     try:
         poll_lotes(
             env=args.env,
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Generación masiva de KuDE (PDF imprimible) desde de_documents
+
+Lee el XML firmado de cada documento y genera un único PDF con todos los
+KuDE, o un ZIP con un PDF por CDC. El parseo, el QR (y en modo ZIP el PDF
+completo) se reparten en un pool de procesos.
+
+Uso:
+    python -m tools.render_kude --ids 1 2 3 -o kudes.pdf
+    python -m tools.render_kude --status approved --since 2026-01-01 --zip -o kudes.zip
+    python -m tools.render_kude --xml de_firmado.xml -o kude.pdf
+    python -m tools.render_kude --bench 500
+
+Variables de entorno (solo para DEs sin dCarQR):
+    SIFEN_CSC / SIFEN_CSC_ID: CSC para el hash del QR
+    SIFEN_ENV: Ambiente (test/prod) de la URL del QR
+"""
+import sys
+import argparse
+import logging
+import time
+from pathlib import Path
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+try:
+    from app.kude_generator import render_kude_batch
+    from web import db
+except ImportError as e:
+    logger.error(f"Error al importar módulos: {e}")
+    sys.exit(1)
+
+
+def _bench(count: int, items: int, workers: int) -> None:
+    """Mide ms/KuDE con DEs sintéticos (de_builder)"""
+    from app.sifen_client.de_builder import build_de_xml
+
+    xmls = [
+        build_de_xml(
+            ruc="4554737-8",
+            timbrado="12345678",
+            numero_documento=f"{i + 1:07d}",
+            fecha="2026-01-15",
+            hora="10:30:00",
+            items=[
+                {"codigo": f"P{j}", "descripcion": f"Producto {j}", "cantidad": j + 1, "precio": 1000 * (j + 1), "tasa_iva": 10}
+                for j in range(items)
+            ],
+        )
+        for i in range(count)
+    ]
+    for output in ("pdf", "zip"):
+        start = time.perf_counter()
+        content = render_kude_batch(xmls, output=output, workers=workers, csc="0" * 32)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{output}: {count} KuDE en {elapsed:.2f}s "
+            f"({elapsed / count * 1000:.2f} ms/KuDE, {len(content) / 1024:.0f} KB)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generación masiva de KuDE (PDF) desde de_documents")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--ids", type=int, nargs="+", help="IDs de documentos")
+    source.add_argument("--status", help="Todos los documentos con este last_status (ej: approved)")
+    source.add_argument("--xml", type=Path, nargs="+", help="Archivos XML firmados (sin base de datos)")
+    source.add_argument("--bench", type=int, metavar="N", help="Benchmark con N DEs sintéticos")
+    parser.add_argument("--since", help="Con --status: fecha mínima de creación (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Con --status: fecha máxima de creación (YYYY-MM-DD)")
+    parser.add_argument("--zip", action="store_true", help="Generar un ZIP con un PDF por CDC")
+    parser.add_argument("-o", "--output", type=Path, help="Archivo de salida (default: kude.pdf / kude.zip)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: CPUs; 1 = sin pool)")
+    parser.add_argument("--items", type=int, default=5, help="Con --bench: items por DE (default: 5)")
+
+    args = parser.parse_args()
+
+    if args.bench:
+        _bench(args.bench, args.items, args.workers)
+        return
+
+    try:
+        if args.xml:
+            xmls = [path.read_bytes() for path in args.xml]
+        else:
+            if args.ids:
+                doc_ids = args.ids
+            else:
+                doc_ids = [
+                    doc["id"]
+                    for doc in db.list_documents_for_audit(
+                        since=args.since, until=args.until, statuses=[args.status]
+                    )
+                ]
+            docs = db.get_documents_xml(doc_ids)
+            missing = [doc["id"] for doc in docs if not doc["xml"]]
+            if missing:
+                logger.warning(f"Documentos sin XML (se omiten): {missing}")
+            xmls = [doc["xml"] for doc in docs if doc["xml"]]
+
+        if not xmls:
+            logger.error("No hay documentos para generar")
+            sys.exit(1)
+
+        output = "zip" if args.zip else "pdf"
+        out_path = args.output or Path(f"kude.{output}")
+        start = time.perf_counter()
+        content = render_kude_batch(xmls, output=output, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        out_path.write_bytes(content)
+    except KeyboardInterrupt:
+        logger.info("Generación interrumpida por el usuario")
+        sys.exit(130)
+    except Exception as e:
+        logger.error(f"Error al generar KuDE: {e}", exc_info=True)
+        sys.exit(1)
+
+    logger.info(
+        f"{len(xmls)} KuDE generados en {out_path} ({elapsed:.2f}s, "
+        f"{elapsed / len(xmls) * 1000:.1f} ms/documento)"
+    )
+
+
+if __name__ == "__main__":
+    main()
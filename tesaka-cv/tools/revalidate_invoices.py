@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Revalidación masiva de facturas contra el schema de importación Tesaka
+
+Convierte cada factura de la tabla invoices al formato de importación y las
+valida todas con el validator compilado una vez por proceso, repartidas en
+un pool de procesos. Útil antes de una auditoría de la SET.
+
+Uso:
+    python -m tools.revalidate_invoices --since 2025-01-01 --until 2025-12-31
+    python -m tools.revalidate_invoices --workers 4 --report errores_2025.json
+    python -m tools.revalidate_invoices --bench 10000
+"""
+import sys
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+try:
+    from app.db import get_db
+    from app.tesaka import convert_to_tesaka
+    from src.schema_registry import validate_batch
+except ImportError as e:
+    logger.error(f"Error al importar módulos: {e}")
+    sys.exit(1)
+
+
+def _load_invoices(since=None, until=None):
+    """(invoice_id, data) de las facturas en el rango de issue_date"""
+    query = "SELECT id, data_json FROM invoices WHERE 1 = 1"
+    params = []
+    if since:
+        query += " AND issue_date >= ?"
+        params.append(since)
+    if until:
+        query += " AND issue_date <= ?"
+        params.append(until)
+    query += " ORDER BY id"
+    conn = get_db()
+    try:
+        return [(row["id"], json.loads(row["data_json"])) for row in conn.execute(query, params)]
+    finally:
+        conn.close()
+
+
+def revalidate(invoices, workers=None):
+    """
+    Convierte y valida facturas
+
+    Returns:
+        Dict invoice_id -> lista de errores ({path, message, ...}); solo las inválidas
+    """
+    failures = {}
+    ids, documents = [], []
+    for invoice_id, data in invoices:
+        try:
+            documents.append(convert_to_tesaka(data))
+            ids.append(invoice_id)
+        except Exception as e:
+            failures[invoice_id] = [{"path": "", "message": f"Error durante la conversión: {e}", "validator": None}]
+    for invoice_id, result in zip(ids, validate_batch(documents, "import", workers=workers)):
+        if not result["valid"]:
+            failures[invoice_id] = result["errors"]
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Revalidación masiva de facturas contra el schema Tesaka")
+    parser.add_argument("--since", help="issue_date mínima (YYYY-MM-DD)")
+    parser.add_argument("--until", help="issue_date máxima (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: CPUs; 1 = sin pool)")
+    parser.add_argument("--report", type=Path, help="Guardar los errores por factura en este archivo JSON")
+    parser.add_argument("--bench", type=int, metavar="N", help="Benchmark con N copias de examples/source_invoice_ok.json")
+
+    args = parser.parse_args()
+
+    if args.bench:
+        example = json.loads(
+            (Path(__file__).parent.parent / "examples" / "source_invoice_ok.json").read_text(encoding="utf-8")
+        )
+        invoices = [(i, example) for i in range(args.bench)]
+    else:
+        invoices = _load_invoices(args.since, args.until)
+    if not invoices:
+        logger.info("No hay facturas para validar")
+        return
+
+    start = time.perf_counter()
+    failures = revalidate(invoices, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    for invoice_id, errors in list(failures.items())[:20]:
+        for error in errors:
+            logger.warning(f"Factura {invoice_id}: {error['path'] or 'raíz'}: {error['message']}")
+    if len(failures) > 20:
+        logger.warning(f"... y {len(failures) - 20} facturas inválidas más")
+
+    if args.report:
+        args.report.write_text(json.dumps(failures, ensure_ascii=False, indent=2), encoding="utf-8")
+        logger.info(f"Reporte guardado en {args.report}")
+
+    logger.info(
+        f"{len(invoices) - len(failures)} válidas, {len(failures)} inválidas de {len(invoices)} "
+        f"({elapsed:.2f}s, {elapsed / len(invoices) * 1000:.3f} ms/factura)"
+    )
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Envío masivo de eventos SIFEN: cancelación de DEs e inutilización de numeración
+
+Arma, firma y empaqueta hasta 15 eventos por rEnviEventoDe (siRecepEvento),
+envía los requests en paralelo y registra cada evento en sifen_eventos.
+
+Uso:
+    python -m tools.send_eventos --env test --motivo "Error en datos del receptor" --cancel CDC1 --cancel CDC2
+    python -m tools.send_eventos --env prod --motivo "Facturas del 15/01 con precio erróneo" --cancel-file cdcs.txt
+    python -m tools.send_eventos --env prod --motivo "Numeración salteada" --inutilizar 12345678:001:001:150-180
+    python -m tools.send_eventos --env test --motivo "Prueba de eventos" --cancel-file cdcs.txt --dry-run
+
+Variables de entorno requeridas:
+    SIFEN_SIGN_P12_PATH / SIFEN_SIGN_P12_PASSWORD: Certificado de firma (si no, se usa el de mTLS)
+    SIFEN_CERT_PATH / SIFEN_CERT_PASSWORD: Certificado P12 para mTLS
+    SIFEN_ENV: Ambiente (test/prod) - puede ser overrideado con --env
+"""
+import sys
+import argparse
+import json
+import os
+import logging
+from pathlib import Path
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+try:
+    from web.eventos_batch import plan_eventos, parse_rango, submit_eventos
+    from app.sifen_client.evento_builder import EventoSigner, MAX_EVENTOS_POR_ENVIO
+    from app.sifen_client.config import get_sifen_config, get_mtls_cert_path_and_password
+    from app.sifen_client.soap_client import SoapClient
+except ImportError as e:
+    logger.error(f"Error al importar módulos: {e}")
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Envío masivo de eventos SIFEN (cancelación / inutilización)"
+    )
+    parser.add_argument(
+        "--env",
+        choices=["test", "prod"],
+        default=os.getenv("SIFEN_ENV", "test"),
+        help="Ambiente SIFEN (default: test o SIFEN_ENV)",
+    )
+    parser.add_argument("--motivo", required=True, help="Motivo del evento (5 a 500 caracteres)")
+    parser.add_argument("--cancel", action="append", default=[], help="CDC a cancelar (repetible)")
+    parser.add_argument(
+        "--cancel-file",
+        type=Path,
+        help="Archivo con un CDC por línea a cancelar",
+    )
+    parser.add_argument(
+        "--inutilizar",
+        action="append",
+        default=[],
+        help="Rango a inutilizar TIMBRADO:EST:PUN:INI-FIN[:TIPO_DE] (repetible)",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Envíos concurrentes (default: 4)")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=2.0,
+        help="Máximo de requests por segundo (default: 2)",
+    )
+    parser.add_argument(
+        "--group-size",
+        type=int,
+        default=MAX_EVENTOS_POR_ENVIO,
+        help=f"Eventos por request (default y máximo: {MAX_EVENTOS_POR_ENVIO})",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Armar y firmar sin registrar ni enviar",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help="Archivo JSONL donde agregar el resultado de cada evento",
+    )
+
+    args = parser.parse_args()
+
+    cdcs = list(args.cancel)
+    if args.cancel_file:
+        cdcs.extend(
+            line.strip()
+            for line in args.cancel_file.read_text(encoding="utf-8").splitlines()
+            if line.strip() and not line.startswith("#")
+        )
+    try:
+        rangos = [parse_rango(spec) for spec in args.inutilizar]
+        eventos = plan_eventos(cdcs, rangos, args.motivo)
+    except ValueError as e:
+        parser.error(str(e))
+    if not eventos:
+        parser.error("No hay eventos para enviar (usar --cancel, --cancel-file o --inutilizar)")
+
+    def on_group(results):
+        with args.report.open("a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        sign_path = os.getenv("SIFEN_SIGN_P12_PATH")
+        sign_password = os.getenv("SIFEN_SIGN_P12_PASSWORD")
+        if not sign_path:
+            sign_path, sign_password = get_mtls_cert_path_and_password()
+        signer = EventoSigner(sign_path, sign_password or "")
+
+        config = get_sifen_config(env=args.env)
+        with SoapClient(config) as client:
+            summary = submit_eventos(
+                client,
+                signer,
+                eventos,
+                env=args.env,
+                workers=args.workers,
+                rate=args.rate,
+                group_size=args.group_size,
+                dry_run=args.dry_run,
+                on_group=on_group if args.report else None,
+            )
+    except KeyboardInterrupt:
+        logger.info("Envío de eventos interrumpido por el usuario")
+        sys.exit(130)
+    except Exception as e:
+        logger.error(f"Error fatal al enviar eventos: {e}", exc_info=True)
+        sys.exit(1)
+
+    summary.pop("results", None)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    sys.exit(0 if summary["errors"] == 0 and summary["rejected"] == 0 else 2)
+
+
+if __name__ == "__main__":
+    main()
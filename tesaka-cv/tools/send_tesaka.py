@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Envío masivo de comprobantes a Tesaka (SET)
+
+Toma las facturas sin envío exitoso del tipo indicado, las convierte y valida
+en paralelo, y las sube en lotes concurrentes por un único cliente HTTP.
+Cada factura queda registrada en submissions.
+
+Uso:
+    python -m tools.send_tesaka --kind retencion
+    python -m tools.send_tesaka --kind factura --ids 10 11 12
+    python -m tools.send_tesaka --kind retencion --limit 5000 --workers 8 --chunk-items 200
+    python -m tools.send_tesaka --kind retencion --dry-run
+
+Variables de entorno requeridas:
+    TESAKA_ENV: Ambiente (prod/homo)
+    TESAKA_USER / TESAKA_PASS: Credenciales de Marangatu
+    REQUEST_TIMEOUT: Timeout de cada request en segundos (default: 30)
+"""
+import sys
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+try:
+    from app.tesaka_batch import (
+        MAX_CHUNK_BYTES,
+        MAX_CHUNK_ITEMS,
+        close_shared_client,
+        get_shared_client,
+        get_tesaka_config,
+        select_unsent_invoices,
+        submit_invoices,
+    )
+except ImportError as e:
+    logger.error(f"Error al importar módulos: {e}")
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Envío masivo de comprobantes a Tesaka (SET)")
+    parser.add_argument(
+        "--kind",
+        choices=["factura", "retencion", "autofactura"],
+        required=True,
+        help="Tipo de comprobante",
+    )
+    parser.add_argument("--ids", type=int, nargs="+", help="IDs de facturas (default: todas las no enviadas)")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de facturas a enviar")
+    parser.add_argument("--workers", type=int, default=4, help="Requests concurrentes (default: 4)")
+    parser.add_argument("--prepare-workers", type=int, default=None, help="Procesos para convertir/validar (default: CPUs)")
+    parser.add_argument(
+        "--chunk-items",
+        type=int,
+        default=MAX_CHUNK_ITEMS,
+        help=f"Comprobantes por request (default: {MAX_CHUNK_ITEMS})",
+    )
+    parser.add_argument(
+        "--chunk-bytes",
+        type=int,
+        default=MAX_CHUNK_BYTES,
+        help=f"Tamaño máximo del JSON por request (default: {MAX_CHUNK_BYTES})",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Convertir, validar y armar lotes sin enviar")
+    parser.add_argument("--errors-out", type=Path, help="Guardar errores por factura en este archivo JSON")
+
+    args = parser.parse_args()
+
+    config = get_tesaka_config()
+    if config["env"] not in ("prod", "homo"):
+        logger.error(f"TESAKA_ENV inválido: {config['env']}. Debe ser 'prod' o 'homo'")
+        sys.exit(1)
+
+    items = select_unsent_invoices(args.kind, config["env"], invoice_ids=args.ids, limit=args.limit)
+    if not items:
+        logger.info("No hay facturas pendientes de envío")
+        return
+    logger.info(f"{len(items)} facturas pendientes ({args.kind}, {config['env']})")
+
+    def on_chunk(result):
+        status = "OK" if result["ok"] else f"ERROR: {result['error']}"
+        logger.info(f"Lote de {len(result['invoice_ids'])} facturas: {status}")
+
+    start = time.perf_counter()
+    try:
+        client = None if args.dry_run else get_shared_client(config, max_connections=args.workers)
+        summary = submit_invoices(
+            client,
+            args.kind,
+            config["env"],
+            items,
+            workers=args.workers,
+            prepare_workers=args.prepare_workers,
+            max_items=args.chunk_items,
+            max_bytes=args.chunk_bytes,
+            dry_run=args.dry_run,
+            on_chunk=on_chunk,
+        )
+    except KeyboardInterrupt:
+        logger.info("Envío interrumpido por el usuario (los lotes ya enviados quedaron registrados)")
+        sys.exit(130)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    finally:
+        close_shared_client()
+    elapsed = time.perf_counter() - start
+
+    if args.errors_out and summary["errors"]:
+        args.errors_out.write_text(json.dumps(summary["errors"], ensure_ascii=False, indent=2), encoding="utf-8")
+        logger.info(f"Errores guardados en {args.errors_out}")
+
+    if args.dry_run:
+        logger.info(
+            f"Dry-run: {summary['invoices'] - summary['invalid']} válidas, {summary['invalid']} inválidas, "
+            f"{summary['requests']} requests ({elapsed:.2f}s)"
+        )
+    else:
+        logger.info(
+            f"{summary['sent']} enviadas, {summary['failed']} con error, {summary['invalid']} inválidas "
+            f"en {summary['requests']} requests ({elapsed:.2f}s)"
+        )
+    if summary["failed"] or summary["invalid"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
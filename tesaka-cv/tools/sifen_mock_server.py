@@ -0,0 +1,733 @@
+#!/usr/bin/env python3
+"""
+Servidor SIFEN simulado para pruebas de carga y latencia
+
+Implementa siRecepDE, siRecepLoteDE, siConsLoteDE, siConsDE y siConsRUC
+(SOAP 1.2, mTLS) en las mismas rutas que sifen-test.set.gov.py, con las
+respuestas de los XSD de schemas_sifen/ (rRetEnviDe, rResEnviLoteDe,
+rResEnviConsLoteDe, rEnviConsDeResponse, rResEnviConsRUC). SoapClient y
+check_lote_status funcionan contra el mock sin cambios: basta con apuntar
+SIFEN_TEST_BASE_URL y los certificados al servidor local.
+
+Comportamiento configurable:
+- Latencia por operación: fija, uniforme o lognormal (ms)
+- Lotes: 0300 / 0301 (no encolado), 0361 mientras "procesa", 0362 al
+  concluir (con DEs aprobados/rechazados), 0360 inexistente, 0364 extemporáneo
+- Errores: HTTP 500 (SOAP Fault) y reset de conexión (RST)
+
+Los certificados de prueba (CA, servidor, cliente .p12) se generan en
+--certs-dir si no existen.
+
+Uso:
+    python -m tools.sifen_mock_server --port 8443
+    python -m tools.sifen_mock_server --latency 80 --latency siRecepLoteDE=lognormal:400:150 \\
+        --processing 5000 --lote-reject 0.05 --reset 0.01 --fault 0.01
+
+    # En otra terminal: copiar los "export" que imprime el servidor y usar
+    # las herramientas de siempre (send_sirecepde, poll_sifen_lotes, ...)
+"""
+import sys
+import argparse
+import logging
+import math
+import random
+import re
+import socket
+import ssl
+import struct
+import threading
+import time
+import zipfile
+from base64 import b64decode
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+# Agregar el directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+logger = logging.getLogger(__name__)
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives.serialization import pkcs12
+    from cryptography.x509.oid import NameOID
+    import ipaddress
+
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+    CRYPTOGRAPHY_AVAILABLE = False
+
+
+SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
+
+# Ruta (sin .wsdl ni query) -> operación
+ROUTES = {
+    "/de/ws/sync/recibe": "siRecepDE",
+    "/de/ws/async/recibe-lote": "siRecepLoteDE",
+    "/de/ws/consultas-lote/consulta-lote": "siConsLoteDE",
+    "/de/ws/consultas/consulta-lote": "siConsLoteDE",
+    "/de/ws/consultas/consulta": "siConsDE",
+    "/de/ws/consultas/consulta-ruc": "siConsRUC",
+}
+
+MESSAGES = {
+    "0160": "XML Mal Formado.",
+    "0260": "Autorización del DE satisfactoria",
+    "0300": "Lote recibido con éxito",
+    "0301": "Lote no encolado para procesamiento",
+    "0360": "Número de Lote inexistente",
+    "0361": "Lote {prot} en procesamiento",
+    "0362": "Procesamiento de lote {prot} concluido",
+    "0364": "Consulta extemporánea de Lote",
+    "0420": "Documento No Existe en SIFEN o ha sido Rechazado",
+    "0422": "CDC encontrado",
+    "0500": "RUC no existe",
+    "0502": "RUC encontrado",
+    "1000": "CDC no correspondiente con las informaciones del XML",
+}
+
+_PY_TZ = timezone(timedelta(hours=-3))
+
+_SOAP_RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<env:Envelope xmlns:env="http://www.w3.org/2003/05/soap-envelope">'
+    "<env:Header/><env:Body>{body}</env:Body></env:Envelope>"
+)
+
+_DE_ID_RE = re.compile(rb'<(?:\w+:)?DE\b[^>]*?\bId="([^"]+)"')
+_FIELD_RES = {
+    name: re.compile(rb"<(?:\w+:)?%s>\s*([^<]*?)\s*</" % name.encode())
+    for name in ("dId", "xDE", "dProtConsLote", "dCDC", "dRUCCons")
+}
+
+
+@dataclass
+class LatencyModel:
+    """Distribución de latencia en milisegundos"""
+
+    dist: str = "fixed"  # fixed | uniform | lognormal
+    mean_ms: float = 0.0
+    spread_ms: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """
+        "80" (fija), "uniform:50:20" (50±20), "lognormal:400:150" (media 400, desvío 150)
+        """
+        parts = spec.split(":")
+        if len(parts) == 1:
+            return cls("fixed", float(parts[0]))
+        dist = parts[0]
+        if dist not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Distribución de latencia inválida: {dist}")
+        mean = float(parts[1])
+        spread = float(parts[2]) if len(parts) > 2 else 0.0
+        return cls(dist, mean, spread)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.mean_ms <= 0:
+            return 0.0
+        if self.dist == "uniform":
+            return max(0.0, rng.uniform(self.mean_ms - self.spread_ms, self.mean_ms + self.spread_ms))
+        if self.dist == "lognormal" and self.spread_ms > 0:
+            # Parámetros de la normal subyacente para media/desvío pedidos
+            sigma2 = math.log(1 + (self.spread_ms / self.mean_ms) ** 2)
+            mu = math.log(self.mean_ms) - sigma2 / 2
+            return rng.lognormvariate(mu, math.sqrt(sigma2))
+        return self.mean_ms
+
+
+@dataclass
+class MockBehavior:
+    """
+    Comportamiento del mock
+
+    Las tasas son probabilidades por request (0.0 - 1.0). latency admite la
+    clave "*" (default) y una por operación ("siRecepLoteDE", ...).
+    """
+
+    latency: Dict[str, LatencyModel] = field(default_factory=dict)
+    processing: LatencyModel = field(default_factory=lambda: LatencyModel("fixed", 2000.0))
+    reset_rate: float = 0.0
+    fault_rate: float = 0.0
+    lote_reject_rate: float = 0.0
+    de_reject_rate: float = 0.0
+    lote_expiry_s: float = 48 * 3600
+    seed: Optional[int] = None
+
+    def latency_for(self, operation: str) -> LatencyModel:
+        return self.latency.get(operation) or self.latency.get("*") or LatencyModel()
+
+
+@dataclass
+class _Lote:
+    received_at: float
+    ready_at: float
+    cdcs: List[str]
+    rejected: frozenset
+    prot_aut: Dict[str, str]
+
+
+def _now_iso() -> str:
+    return datetime.now(_PY_TZ).replace(microsecond=0).isoformat()
+
+
+def _field(body: bytes, name: str) -> Optional[str]:
+    match = _FIELD_RES[name].search(body)
+    return match.group(1).decode("utf-8", errors="replace") if match else None
+
+
+def _de_ids_from_lote(xde: str) -> List[str]:
+    """CDCs de los DE contenidos en el ZIP (Base64) de un rEnvioLote"""
+    data = b64decode(xde)
+    ids: List[str] = []
+    with zipfile.ZipFile(BytesIO(data)) as zf:
+        for name in zf.namelist():
+            ids.extend(m.decode("ascii", errors="replace") for m in _DE_ID_RE.findall(zf.read(name)))
+    return ids
+
+
+def _envelope(element: str, content: str) -> bytes:
+    body = f'<ns2:{element} xmlns:ns2="{SIFEN_NS}">{content}</ns2:{element}>'
+    return _SOAP_RESPONSE.format(body=body).encode("utf-8")
+
+
+def _soap_fault(code: str, reason: str) -> bytes:
+    body = (
+        f"<env:Fault><env:Code><env:Value>{code}</env:Value></env:Code>"
+        f'<env:Reason><env:Text xml:lang="es">{escape(reason)}</env:Text></env:Reason></env:Fault>'
+    )
+    return _SOAP_RESPONSE.format(body=body).encode("utf-8")
+
+
+class MockSifen:
+    """Estado y respuestas del SIFEN simulado (independiente del transporte)"""
+
+    def __init__(self, behavior: Optional[MockBehavior] = None):
+        self.behavior = behavior or MockBehavior()
+        self.rng = random.Random(self.behavior.seed)
+        self._lock = threading.Lock()
+        self._lotes: Dict[str, _Lote] = {}
+        self._des: Dict[str, Tuple[str, Optional[str]]] = {}
+        self._next_prot = 1000000000000000
+        self._next_aut = 1000000000
+        self._stats: Dict[Tuple[str, str], int] = {}
+
+    def chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self.rng.random() < rate
+
+    def sample(self, model: LatencyModel) -> float:
+        with self._lock:
+            return model.sample(self.rng)
+
+    def count(self, operation: str, code: str):
+        with self._lock:
+            key = (operation, code)
+            self._stats[key] = self._stats.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Respuestas emitidas por operación y código (incluye "reset" y "fault")"""
+        with self._lock:
+            result: Dict[str, Dict[str, int]] = {}
+            for (operation, code), n in sorted(self._stats.items()):
+                result.setdefault(operation, {})[code] = n
+            return result
+
+    def _new_prot_aut(self) -> str:
+        self._next_aut += 1
+        return str(self._next_aut)
+
+    def handle(self, operation: str, body: bytes) -> Tuple[int, bytes]:
+        """
+        Responde una operación SOAP
+
+        Returns:
+            (status HTTP, envelope de respuesta)
+        """
+        handler = getattr(self, f"_{operation}")
+        code, response = handler(body)
+        self.count(operation, code)
+        return 200, response
+
+    # siRecepDE -------------------------------------------------------------
+    def _siRecepDE(self, body: bytes) -> Tuple[str, bytes]:
+        match = _DE_ID_RE.search(body)
+        if not match:
+            return "0160", _envelope("rRetEnviDe", self._prot_de("", "Rechazado", "0160", None))
+        cdc = match.group(1).decode("ascii", errors="replace")
+        if self.chance(self.behavior.de_reject_rate):
+            with self._lock:
+                self._des[cdc] = ("Rechazado", None)
+            return "1000", _envelope("rRetEnviDe", self._prot_de(cdc, "Rechazado", "1000", None))
+        with self._lock:
+            prot_aut = self._new_prot_aut()
+            self._des[cdc] = ("Aprobado", prot_aut)
+        return "0260", _envelope("rRetEnviDe", self._prot_de(cdc, "Aprobado", "0260", prot_aut))
+
+    @staticmethod
+    def _prot_de(cdc: str, estado: str, code: str, prot_aut: Optional[str]) -> str:
+        return (
+            f"<ns2:rProtDe><ns2:Id>{escape(cdc)}</ns2:Id><ns2:dFecProc>{_now_iso()}</ns2:dFecProc>"
+            f"<ns2:dEstRes>{estado}</ns2:dEstRes>"
+            + (f"<ns2:dProtAut>{prot_aut}</ns2:dProtAut>" if prot_aut else "")
+            + f"<ns2:gResProc><ns2:dCodRes>{code}</ns2:dCodRes>"
+            f"<ns2:dMsgRes>{MESSAGES[code]}</ns2:dMsgRes></ns2:gResProc></ns2:rProtDe>"
+        )
+
+    # siRecepLoteDE ---------------------------------------------------------
+    def _siRecepLoteDE(self, body: bytes) -> Tuple[str, bytes]:
+        xde = _field(body, "xDE")
+        try:
+            cdcs = _de_ids_from_lote(xde) if xde else []
+        except Exception:
+            cdcs = []
+        if not cdcs:
+            return "0160", self._res_envi_lote("0160")
+        if self.chance(self.behavior.lote_reject_rate):
+            return "0301", self._res_envi_lote("0301")
+
+        processing_ms = self.sample(self.behavior.processing)
+        rejected = frozenset(c for c in cdcs if self.chance(self.behavior.de_reject_rate))
+        now = time.monotonic()
+        with self._lock:
+            self._next_prot += 1
+            prot = str(self._next_prot)
+            prot_aut = {c: self._new_prot_aut() for c in cdcs if c not in rejected}
+            self._lotes[prot] = _Lote(now, now + processing_ms / 1000.0, cdcs, rejected, prot_aut)
+        return "0300", self._res_envi_lote("0300", prot, max(1, round(processing_ms / 1000.0)))
+
+    @staticmethod
+    def _res_envi_lote(code: str, prot: Optional[str] = None, tpo_proces: int = 0) -> bytes:
+        content = (
+            f"<ns2:dFecProc>{_now_iso()}</ns2:dFecProc>"
+            f"<ns2:dCodRes>{code}</ns2:dCodRes><ns2:dMsgRes>{MESSAGES[code]}</ns2:dMsgRes>"
+        )
+        if prot:
+            content += f"<ns2:dProtConsLote>{prot}</ns2:dProtConsLote><ns2:dTpoProces>{tpo_proces}</ns2:dTpoProces>"
+        return _envelope("rResEnviLoteDe", content)
+
+    # siConsLoteDE ----------------------------------------------------------
+    def _siConsLoteDE(self, body: bytes) -> Tuple[str, bytes]:
+        prot = _field(body, "dProtConsLote") or ""
+        now = time.monotonic()
+        with self._lock:
+            lote = self._lotes.get(prot)
+        if lote is None:
+            code = "0360"
+        elif now - lote.received_at > self.behavior.lote_expiry_s:
+            code = "0364"
+        elif now < lote.ready_at:
+            code = "0361"
+        else:
+            code = "0362"
+
+        content = (
+            f"<ns2:dFecProc>{_now_iso()}</ns2:dFecProc><ns2:dCodResLot>{code}</ns2:dCodResLot>"
+            f"<ns2:dMsgResLot>{MESSAGES[code].format(prot=escape(prot))}</ns2:dMsgResLot>"
+        )
+        if code == "0362":
+            parts = []
+            with self._lock:
+                for cdc in lote.cdcs:
+                    if cdc in lote.rejected:
+                        self._des[cdc] = ("Rechazado", None)
+                    else:
+                        self._des[cdc] = ("Aprobado", lote.prot_aut[cdc])
+            for cdc in lote.cdcs:
+                if cdc in lote.rejected:
+                    estado, res_code, aut = "Rechazado", "1000", ""
+                else:
+                    estado, res_code = "Aprobado", "0260"
+                    aut = f"<ns2:dProtAut>{lote.prot_aut[cdc]}</ns2:dProtAut>"
+                parts.append(
+                    f"<ns2:gResProcLote><ns2:id>{escape(cdc)}</ns2:id><ns2:dEstRes>{estado}</ns2:dEstRes>{aut}"
+                    f"<ns2:gResProc><ns2:dCodRes>{res_code}</ns2:dCodRes>"
+                    f"<ns2:dMsgRes>{MESSAGES[res_code]}</ns2:dMsgRes></ns2:gResProc></ns2:gResProcLote>"
+                )
+            content += "".join(parts)
+        return code, _envelope("rResEnviConsLoteDe", content)
+
+    # siConsDE --------------------------------------------------------------
+    def _siConsDE(self, body: bytes) -> Tuple[str, bytes]:
+        cdc = _field(body, "dCDC") or ""
+        with self._lock:
+            found = self._des.get(cdc)
+        content = f"<ns2:dFecProc>{_now_iso()}</ns2:dFecProc>"
+        if found is None or found[0] != "Aprobado":
+            code = "0420"
+            content += f"<ns2:dCodRes>{code}</ns2:dCodRes><ns2:dMsgRes>{MESSAGES[code]}</ns2:dMsgRes>"
+        else:
+            code = "0422"
+            cont = escape(
+                f'<rContDe xmlns="{SIFEN_NS}"><dProtAut>{found[1]}</dProtAut>'
+                f"<rDE><DE Id=\"{cdc}\"/></rDE></rContDe>"
+            )
+            content += (
+                f"<ns2:dCodRes>{code}</ns2:dCodRes><ns2:dMsgRes>{MESSAGES[code]}</ns2:dMsgRes>"
+                f"<ns2:dProtAut>{found[1]}</ns2:dProtAut><ns2:xContenDE>{cont}</ns2:xContenDE>"
+            )
+        return code, _envelope("rEnviConsDeResponse", content)
+
+    # siConsRUC -------------------------------------------------------------
+    def _siConsRUC(self, body: bytes) -> Tuple[str, bytes]:
+        ruc = (_field(body, "dRUCCons") or "").split("-")[0]
+        if not ruc.isdigit():
+            code = "0500"
+            return code, _envelope(
+                "rResEnviConsRUC", f"<ns2:dCodRes>{code}</ns2:dCodRes><ns2:dMsgRes>{MESSAGES[code]}</ns2:dMsgRes>"
+            )
+        code = "0502"
+        content = (
+            f"<ns2:dCodRes>{code}</ns2:dCodRes><ns2:dMsgRes>{MESSAGES[code]}</ns2:dMsgRes>"
+            f"<ns2:xContRUC><ns2:dRUCCons>{ruc}</ns2:dRUCCons>"
+            f"<ns2:dRazCons>CONTRIBUYENTE DE PRUEBA {ruc}</ns2:dRazCons>"
+            "<ns2:dCodEstCons>ACT</ns2:dCodEstCons><ns2:dDesEstCons>ACTIVO</ns2:dDesEstCons>"
+            "<ns2:dRUCFactElec>S</ns2:dRUCFactElec></ns2:xContRUC>"
+        )
+        return code, _envelope("rResEnviConsRUC", content)
+
+
+def _route(path: str) -> str:
+    path = path.split("?", 1)[0].rstrip("/")
+    return path[:-5] if path.endswith(".wsdl") else path
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "SifenMock/1.0"
+
+    def log_message(self, format: str, *args: Any):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/soap+xml; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reset(self):
+        # SO_LINGER 0: close() manda RST en lugar de FIN ("connection reset by peer")
+        self.close_connection = True
+        try:
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        except OSError:
+            pass
+        # rfile (makefile) retiene el socket: cerrarlo antes para que close() sea efectivo
+        self.rfile.close()
+        self.connection.close()
+
+    def finish(self):
+        try:
+            super().finish()
+        except (OSError, ValueError):
+            pass  # Conexión ya reseteada
+
+    def do_GET(self):
+        operation = ROUTES.get(_route(self.path))
+        if operation is None or "wsdl" not in self.path:
+            self._send(404, b"Not Found", "text/plain")
+            return
+        # WSDL mínimo: solo lo necesario para resolver el SOAP address
+        host = self.headers.get("Host", "localhost")
+        wsdl = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/" '
+            'xmlns:soap12="http://schemas.xmlsoap.org/wsdl/soap12/">'
+            f'<wsdl:service name="{operation}"><wsdl:port name="{operation}Port">'
+            f'<soap12:address location="https://{host}{_route(self.path)}"/>'
+            "</wsdl:port></wsdl:service></wsdl:definitions>"
+        )
+        self._send(200, wsdl.encode("utf-8"), "text/xml; charset=utf-8")
+
+    def do_POST(self):
+        mock: MockSifen = self.server.mock  # type: ignore[attr-defined]
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        operation = ROUTES.get(_route(self.path))
+        if operation is None:
+            self._send(404, _soap_fault("env:Sender", f"Servicio inexistente: {self.path}"))
+            return
+
+        delay_ms = mock.sample(mock.behavior.latency_for(operation))
+        if delay_ms:
+            time.sleep(delay_ms / 1000.0)
+
+        if mock.chance(mock.behavior.reset_rate):
+            mock.count(operation, "reset")
+            self._reset()
+            return
+        if mock.chance(mock.behavior.fault_rate):
+            mock.count(operation, "fault")
+            self._send(500, _soap_fault("env:Receiver", "Error interno simulado"))
+            return
+
+        status, response = mock.handle(operation, body)
+        self._send(status, response)
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, mock: MockSifen, ssl_context: Optional[ssl.SSLContext]):
+        super().__init__(address, _MockHandler)
+        self.mock = mock
+        self.ssl_context = ssl_context
+
+    def finish_request(self, request, client_address):
+        # Handshake TLS en el hilo de la conexión, no en el loop de accept
+        if self.ssl_context is not None:
+            request = self.ssl_context.wrap_socket(request, server_side=True)
+        super().finish_request(request, client_address)
+
+    def handle_error(self, request, client_address):
+        exc = sys.exc_info()[1]
+        if isinstance(exc, (ssl.SSLError, ConnectionError)):
+            logger.debug(f"Conexión {client_address} descartada: {exc}")
+            return
+        super().handle_error(request, client_address)
+
+
+@dataclass
+class MockCerts:
+    """Rutas de los certificados de prueba"""
+
+    ca_pem: Path
+    server_pem: Path
+    server_key: Path
+    client_p12: Path
+    client_pem: Path
+    client_key: Path
+    password: str
+
+
+def generate_test_certs(out_dir: Path, password: str = "mock-sifen") -> MockCerts:
+    """
+    Genera (o reutiliza) una CA de prueba, el certificado del servidor para
+    localhost/127.0.0.1 y un certificado de cliente (.p12 y PEM) para mTLS
+    """
+    out_dir = Path(out_dir)
+    certs = MockCerts(
+        ca_pem=out_dir / "ca.pem",
+        server_pem=out_dir / "server.pem",
+        server_key=out_dir / "server-key.pem",
+        client_p12=out_dir / "client.p12",
+        client_pem=out_dir / "client.pem",
+        client_key=out_dir / "client-key.pem",
+        password=password,
+    )
+    paths = [certs.ca_pem, certs.server_pem, certs.server_key, certs.client_p12, certs.client_pem, certs.client_key]
+    if all(p.exists() for p in paths):
+        return certs
+    if not CRYPTOGRAPHY_AVAILABLE:
+        raise RuntimeError("cryptography no está instalado. Instalar con: pip install cryptography")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    now = datetime.now(timezone.utc)
+
+    def issue(subject_cn: str, issuer_name, issuer_key, public_key, extensions) -> "x509.Certificate":
+        builder = (
+            x509.CertificateBuilder()
+            .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, subject_cn)]))
+            .issuer_name(issuer_name or x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, subject_cn)]))
+            .public_key(public_key)
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=825))
+        )
+        for ext, critical in extensions:
+            builder = builder.add_extension(ext, critical=critical)
+        return builder.sign(issuer_key, hashes.SHA256())
+
+    def key_pem(key) -> bytes:
+        return key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+
+    ca_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    ca_cert = issue("SIFEN Mock CA", None, ca_key, ca_key.public_key(),
+                    [(x509.BasicConstraints(ca=True, path_length=None), True)])
+
+    server_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    server_cert = issue("localhost", ca_cert.subject, ca_key, server_key.public_key(), [
+        (x509.SubjectAlternativeName([
+            x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+        ]), False),
+        (x509.ExtendedKeyUsage([x509.oid.ExtendedKeyUsageOID.SERVER_AUTH]), False),
+    ])
+
+    client_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    client_cert = issue("CONTRIBUYENTE DE PRUEBA", ca_cert.subject, ca_key, client_key.public_key(),
+                        [(x509.ExtendedKeyUsage([x509.oid.ExtendedKeyUsageOID.CLIENT_AUTH]), False)])
+
+    certs.ca_pem.write_bytes(ca_cert.public_bytes(serialization.Encoding.PEM))
+    certs.server_pem.write_bytes(server_cert.public_bytes(serialization.Encoding.PEM))
+    certs.server_key.write_bytes(key_pem(server_key))
+    certs.client_pem.write_bytes(client_cert.public_bytes(serialization.Encoding.PEM))
+    certs.client_key.write_bytes(key_pem(client_key))
+    certs.client_p12.write_bytes(pkcs12.serialize_key_and_certificates(
+        b"mock-client", client_key, client_cert, [ca_cert],
+        serialization.BestAvailableEncryption(password.encode("utf-8")),
+    ))
+    for p in (certs.server_key, certs.client_key, certs.client_p12):
+        p.chmod(0o600)
+    return certs
+
+
+def client_env(certs: MockCerts, base_url: str, env: str = "test") -> Dict[str, str]:
+    """
+    Variables de entorno para que SoapClient / check_lote_status usen el mock
+
+    REQUESTS_CA_BUNDLE / CURL_CA_BUNDLE también apuntan a la CA de prueba:
+    si están definidas, requests las usa en lugar de session.verify.
+    """
+    return {
+        "SIFEN_ENV": env,
+        f"SIFEN_{env.upper()}_BASE_URL": base_url,
+        "SIFEN_CA_BUNDLE_PATH": str(certs.ca_pem),
+        "REQUESTS_CA_BUNDLE": str(certs.ca_pem),
+        "CURL_CA_BUNDLE": str(certs.ca_pem),
+        "SIFEN_MTLS_P12_PATH": str(certs.client_p12),
+        "SIFEN_MTLS_P12_PASSWORD": certs.password,
+        "SIFEN_CERT_PATH": str(certs.client_p12),
+        "SIFEN_CERT_PASSWORD": certs.password,
+        "SIFEN_CERT_PEM_PATH": str(certs.client_pem),
+        "SIFEN_KEY_PEM_PATH": str(certs.client_key),
+    }
+
+
+class MockSifenServer:
+    """
+    Servidor HTTPS (mTLS) en un hilo de fondo
+
+    Ejemplo:
+        with MockSifenServer(MockBehavior(processing=LatencyModel("fixed", 0))) as server:
+            os.environ.update(server.client_env())
+            ...
+    """
+
+    def __init__(
+        self,
+        behavior: Optional[MockBehavior] = None,
+        certs_dir: Optional[Path] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        require_client_cert: bool = True,
+    ):
+        self.mock = MockSifen(behavior)
+        self.certs = generate_test_certs(Path(certs_dir or "artifacts/sifen_mock_certs"))
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.minimum_version = ssl.TLSVersion.TLSv1_2
+        context.load_cert_chain(str(self.certs.server_pem), str(self.certs.server_key))
+        if require_client_cert:
+            context.verify_mode = ssl.CERT_REQUIRED
+            context.load_verify_locations(str(self.certs.ca_pem))
+        self._httpd = _MockHTTPServer((host, port), self.mock, context)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"https://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}"
+
+    def client_env(self, env: str = "test") -> Dict[str, str]:
+        return client_env(self.certs, self.base_url, env)
+
+    def start(self) -> "MockSifenServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="sifen-mock", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "MockSifenServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def _parse_latency(specs: List[str]) -> Dict[str, LatencyModel]:
+    latency: Dict[str, LatencyModel] = {}
+    for spec in specs:
+        operation, _, model = spec.rpartition("=")
+        latency[operation or "*"] = LatencyModel.parse(model)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor SIFEN simulado (mTLS) para pruebas de carga")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--certs-dir", default="artifacts/sifen_mock_certs",
+                        help="Directorio de certificados de prueba (se generan si no existen)")
+    parser.add_argument("--latency", action="append", default=[], metavar="[OP=]SPEC",
+                        help="Latencia en ms: 80 | uniform:50:20 | lognormal:400:150; "
+                             "con OP= solo para esa operación (ej. siRecepLoteDE=300). Repetible")
+    parser.add_argument("--processing", default="2000",
+                        help="Tiempo de procesamiento de un lote en ms (0361 hasta entonces, luego 0362)")
+    parser.add_argument("--lote-reject", type=float, default=0.0, help="Probabilidad de 0301 (lote no encolado)")
+    parser.add_argument("--de-reject", type=float, default=0.0, help="Probabilidad de rechazo por DE")
+    parser.add_argument("--reset", type=float, default=0.0, help="Probabilidad de reset de conexión por request")
+    parser.add_argument("--fault", type=float, default=0.0, help="Probabilidad de HTTP 500 (SOAP Fault)")
+    parser.add_argument("--lote-expiry", type=float, default=48 * 3600,
+                        help="Segundos tras los cuales la consulta de lote responde 0364")
+    parser.add_argument("--seed", type=int, default=None, help="Semilla para reproducir la secuencia de errores")
+    parser.add_argument("--no-client-cert", action="store_true", help="No exigir certificado de cliente")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Loguear cada request")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        behavior = MockBehavior(
+            latency=_parse_latency(args.latency),
+            processing=LatencyModel.parse(args.processing),
+            reset_rate=args.reset,
+            fault_rate=args.fault,
+            lote_reject_rate=args.lote_reject,
+            de_reject_rate=args.de_reject,
+            lote_expiry_s=args.lote_expiry,
+            seed=args.seed,
+        )
+        server = MockSifenServer(
+            behavior, Path(args.certs_dir), args.host, args.port, require_client_cert=not args.no_client_cert
+        )
+    except (ValueError, RuntimeError, OSError) as e:
+        logger.error(f"No se pudo iniciar el mock: {e}")
+        sys.exit(1)
+
+    logger.info(f"SIFEN mock escuchando en {server.base_url}")
+    print("# Para apuntar el cliente al mock:")
+    for key, value in server.client_env().items():
+        print(f"export {key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info(f"Respuestas emitidas: {server.mock.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ Este comando:
 - Firma con xmlsec (rsa-sha256/sha256)
 - Crea ZIP con lote.xml correcto
 - Ejecuta preflight
-- Guarda artifacts: last_xde.zip, last_lote.xml
+- Guarda artifacts: last_xde.zip, last_lote.xml (con SIFEN_DEBUG_SOAP=1)
 - NO envía a SIFEN (solo valida localmente)
 """
 import sys
@@ -21,8 +21,20 @@ from pathlib import Path
 # Agregar el directorio padre al path para imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+import logging
 import os
-from tools.send_sirecepde import (
+
+# lote_sender reporta por logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+from app.sifen_client.lote_sender import (
     build_and_sign_lote_from_xml,
     preflight_soap_request,
     build_r_envio_lote_xml,
@@ -113,12 +125,13 @@ def main():
             xml_bytes=xml_bytes,
             cert_path=cert_path,
             cert_password=cert_password,
-            return_debug=True
+            return_debug=True,
+            artifacts_dir=args.artifacts_dir,
         )
         print("✅ Lote construido y firmado exitosamente\n")
     except Exception as e:
         print(f"❌ Error al construir/firmar lote: {e}")
-        print("\nArtifacts guardados en artifacts/ para debugging")
+        print("\nCon SIFEN_DEBUG_SOAP=1 se guardan artifacts en artifacts/ para debugging")
         return 1
     
     # 6. Construir payload SOAP (solo para preflight, no se envía)
@@ -141,7 +154,7 @@ def main():
     
     if not preflight_success:
         print(f"❌ Preflight falló: {preflight_error}")
-        print("\nArtifacts guardados en artifacts/preflight_*.xml y artifacts/preflight_zip.zip")
+        print("\nCon SIFEN_DEBUG_SOAP=1 se guardan artifacts/preflight_*.xml y artifacts/preflight_zip.zip")
         return 1
     
     print("✅ Preflight OK: todas las validaciones pasaron\n")
@@ -153,9 +166,10 @@ def main():
     print(f"📄 XML procesado: {xml_path}")
     print(f"📦 ZIP creado: {len(zip_bytes)} bytes")
     print(f"📝 lote.xml: {len(lote_xml_bytes)} bytes")
-    print(f"💾 Artifacts guardados:")
-    print(f"   - artifacts/last_xde.zip")
-    print(f"   - artifacts/last_lote.xml")
+    if os.getenv("SIFEN_DEBUG_SOAP", "0") in ("1", "true", "True"):
+        print(f"💾 Artifacts guardados:")
+        print(f"   - {args.artifacts_dir / 'last_xde.zip'}")
+        print(f"   - {args.artifacts_dir / 'last_lote.xml'}")
     print()
     print("✅ Firma: rsa-sha256 / sha256")
     print("✅ ZIP: estructura correcta (sin dId/xDE)")
@@ -0,0 +1,200 @@
+"""
+Almacén de XML comprimidos y direccionados por contenido (SHA-256)
+
+Los XML grandes (de_xml, signed_xml, sirecepde_xml de de_documents y
+last_response_xml de sifen_lotes) se guardan en la tabla xml_blobs, en la
+misma base SQLite, y las tablas principales solo guardan el SHA-256:
+- un mismo XML se guarda una sola vez (INSERT OR IGNORE por hash)
+- se comprime con zstd si `zstandard` está instalado, si no con zlib; el
+  codec queda en cada fila, así conviven blobs de ambos
+- las filas de de_documents / sifen_lotes quedan chicas y los SELECT *
+  no arrastran los XML; se cargan al primer acceso (LazyXmlDict)
+
+Las funciones reciben la conexión del módulo que las usa (web/db.py,
+web/lotes_db.py) para escribir el blob en la misma transacción que la fila.
+"""
+import hashlib
+import sqlite3
+import zlib
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+CODEC_RAW = "raw"
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+# Por debajo de este tamaño no vale la pena comprimir
+MIN_COMPRESS_BYTES = 256
+
+# SQLite acepta hasta 999 parámetros por consulta en versiones viejas
+_CHUNK = 500
+
+
+def ensure_blob_table(conn: sqlite3.Connection):
+    """Crea la tabla xml_blobs si no existe (no hace commit)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS xml_blobs (
+            sha256 TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def compress(raw: bytes) -> Tuple[str, bytes]:
+    """Comprime raw con el mejor codec disponible. Devuelve (codec, datos)."""
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return CODEC_RAW, raw
+    if ZSTD_AVAILABLE:
+        codec, data = CODEC_ZSTD, zstandard.ZstdCompressor(level=9).compress(raw)
+    else:
+        codec, data = CODEC_ZLIB, zlib.compress(raw, 6)
+    if len(data) >= len(raw):
+        return CODEC_RAW, raw
+    return codec, data
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    """Inversa de compress()."""
+    if codec == CODEC_RAW:
+        return bytes(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Blob comprimido con zstd pero 'zstandard' no está instalado: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Codec de blob desconocido: {codec}")
+
+
+def blob_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def put_blob(conn: sqlite3.Connection, text: Optional[str]) -> Optional[str]:
+    """
+    Guarda text (si no estaba ya) y devuelve su SHA-256. None -> None.
+    No hace commit: queda en la transacción de quien llama.
+    """
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    sha = hashlib.sha256(raw).hexdigest()
+    exists = conn.execute("SELECT 1 FROM xml_blobs WHERE sha256 = ?", (sha,)).fetchone()
+    if exists is None:
+        codec, data = compress(raw)
+        conn.execute(
+            "INSERT OR IGNORE INTO xml_blobs (sha256, codec, size, data) VALUES (?, ?, ?, ?)",
+            (sha, codec, len(raw), sqlite3.Binary(data)),
+        )
+    return sha
+
+
+def get_blobs(conn: sqlite3.Connection, shas: Iterable[Optional[str]]) -> Dict[str, str]:
+    """Carga varios blobs por hash. Los hashes inexistentes se omiten."""
+    wanted = sorted({sha for sha in shas if sha})
+    result: Dict[str, str] = {}
+    for i in range(0, len(wanted), _CHUNK):
+        chunk = wanted[i:i + _CHUNK]
+        rows = conn.execute(
+            f"SELECT sha256, codec, data FROM xml_blobs WHERE sha256 IN ({', '.join('?' for _ in chunk)})",
+            chunk,
+        ).fetchall()
+        for sha, codec, data in rows:
+            result[sha] = decompress(codec, data).decode("utf-8")
+    return result
+
+
+def get_blob(conn: sqlite3.Connection, sha: Optional[str]) -> Optional[str]:
+    """Carga un blob por hash (None si no existe)."""
+    if not sha:
+        return None
+    return get_blobs(conn, [sha]).get(sha)
+
+
+def migrate_inline_column(
+    conn: sqlite3.Connection,
+    table: str,
+    column: str,
+    sha_column: str,
+    cleared_value: Any = None,
+    batch_size: int = 200,
+) -> int:
+    """
+    Mueve a xml_blobs los XML que siguen guardados en `column` (filas viejas
+    o escritas por herramientas anteriores) y deja en su lugar cleared_value.
+    Devuelve la cantidad de filas migradas. No hace commit.
+    """
+    migrated = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT id, {column} FROM {table} WHERE id > ? AND {sha_column} IS NULL "
+            f"AND {column} IS NOT NULL AND {column} != '' ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            return migrated
+        for row_id, text in rows:
+            conn.execute(
+                f"UPDATE {table} SET {sha_column} = ?, {column} = ? WHERE id = ?",
+                (put_blob(conn, text), cleared_value, row_id),
+            )
+            last_id = row_id
+        migrated += len(rows)
+
+
+class LazyXmlDict(dict):
+    """
+    dict de una fila cuyos XML se cargan de xml_blobs al primer acceso.
+
+    blob_fields es {nombre: sha256 o None}. `row["de_xml"]`, `row.get(...)`,
+    `"de_xml" in row` y `doc.de_xml` en los templates Jinja funcionan igual
+    que con el dict plano; el valor queda cacheado en el dict. Mientras no se
+    accedan, los XML no aparecen en keys()/items().
+    """
+
+    def __init__(self, row: Dict[str, Any], blob_fields: Dict[str, Optional[str]],
+                 connect: Callable[[], sqlite3.Connection]):
+        super().__init__(row)
+        self._blob_fields = {name: sha for name, sha in blob_fields.items() if name not in row}
+        self._connect = connect
+
+    def __missing__(self, key):
+        if key not in self._blob_fields:
+            raise KeyError(key)
+        self.load()
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._blob_fields
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def load(self) -> "LazyXmlDict":
+        """Carga todos los XML pendientes con una sola consulta."""
+        pending, self._blob_fields = self._blob_fields, {}
+        if not pending:
+            return self
+        shas = [sha for sha in pending.values() if sha]
+        texts: Dict[str, str] = {}
+        if shas:
+            conn = self._connect()
+            try:
+                texts = get_blobs(conn, shas)
+            finally:
+                conn.close()
+        for name, sha in pending.items():
+            self[name] = texts.get(sha) if sha else None
+        return self
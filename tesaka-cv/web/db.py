@@ -1,13 +1,27 @@
 """
 Conexión a base de datos SQLite para TESAKA-SIFEN
 """
+import os
 import sqlite3
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+from app.archive import archive_dir_for, connect_archive, find_archived
+
+from .blob_store import LazyXmlDict, ensure_blob_table, get_blobs, migrate_inline_column, put_blob
+
 # Ruta de la base de datos (mismo que app/db.py)
-DB_PATH = Path(__file__).parent.parent / "tesaka.db"
+DB_PATH = Path(os.getenv("TESAKA_DB_PATH") or Path(__file__).parent.parent / "tesaka.db")
+
+# Columnas XML guardadas en xml_blobs (ver blob_store.py) -> columna con el SHA-256.
+# La columna original queda vacía ('' en de_xml, que es NOT NULL; NULL en las demás)
+# y solo conserva el XML en filas viejas todavía no migradas.
+XML_BLOB_COLUMNS = {
+    "de_xml": "de_xml_sha",
+    "signed_xml": "signed_xml_sha",
+    "sirecepde_xml": "sirecepde_xml_sha",
+}
 
 
 def ensure_tables(conn: sqlite3.Connection):
@@ -83,6 +97,21 @@ def get_conn():
         cursor.execute("ALTER TABLE de_documents ADD COLUMN updated_at TEXT")
         columns_added = True
     
+    ensure_blob_table(conn)
+    blob_columns_added = False
+    for sha_column in XML_BLOB_COLUMNS.values():
+        if sha_column not in existing_columns:
+            cursor.execute(f"ALTER TABLE de_documents ADD COLUMN {sha_column} TEXT")
+            blob_columns_added = True
+    
+    # Migración única: mover los XML inline existentes a xml_blobs
+    if blob_columns_added:
+        for column, sha_column in XML_BLOB_COLUMNS.items():
+            migrate_inline_column(
+                conn, "de_documents", column, sha_column,
+                cleared_value="" if column == "de_xml" else None,
+            )
+    
     # Backfill: setear updated_at para filas existentes que no lo tengan
     # Usar CURRENT_TIMESTAMP en UPDATE está permitido (no es DEFAULT en ALTER TABLE)
     if columns_added:
@@ -107,6 +136,52 @@ def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
     return dict(row)
 
 
+def _document_from_row(row: sqlite3.Row, connect=None) -> LazyXmlDict:
+    """
+    Convierte una fila de de_documents a dict. Los XML guardados en xml_blobs
+    se cargan recién al accederlos (de la base viva o, con connect, del
+    archivo histórico de donde salió la fila); las columnas *_sha no se exponen.
+    """
+    data = dict(row)
+    blob_fields = {}
+    for column, sha_column in XML_BLOB_COLUMNS.items():
+        sha = data.pop(sha_column, None)
+        if sha:
+            data.pop(column, None)
+            blob_fields[column] = sha
+    return LazyXmlDict(data, blob_fields, connect or get_conn)
+
+
+def _archived_document(where: str, params: tuple) -> Optional[LazyXmlDict]:
+    """Busca un documento en los archivos históricos (None si no está)."""
+    found = find_archived(archive_dir_for(DB_PATH), "de_documents", where, params)
+    if found is None:
+        return None
+    row, path = found
+    return _document_from_row(row, connect=lambda: connect_archive(path))
+
+
+def get_document_by_cdc(cdc: str) -> Optional[Dict[str, Any]]:
+    """
+    Obtiene un documento por CDC, de la base viva o de los archivos históricos.
+    
+    Returns:
+        Documento con todos los campos o None si no existe
+    """
+    conn = None
+    try:
+        conn = get_conn()
+        row = conn.execute("SELECT * FROM de_documents WHERE cdc = ?", (cdc,)).fetchone()
+        conn.close()
+        if row:
+            return _document_from_row(row)
+        return _archived_document("cdc = ?", (cdc,))
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        raise ConnectionError(f"Error al obtener documento de SQLite: {e}") from e
+
+
 def list_documents(limit: int = 50) -> List[Dict[str, Any]]:
     """
     Lista documentos ordenados por id DESC (últimos primero).
@@ -153,18 +228,22 @@ def insert_document(cdc: str, ruc_emisor: str, timbrado: str, de_xml: str) -> in
         updated_at = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
         
         cursor.execute("""
-            INSERT INTO de_documents (cdc, ruc_emisor, timbrado, de_xml, last_status, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (cdc, ruc_emisor, timbrado, de_xml, STATUS_SIGNED_LOCAL, updated_at))
+            INSERT INTO de_documents (cdc, ruc_emisor, timbrado, de_xml, de_xml_sha, last_status, updated_at)
+            VALUES (?, ?, ?, '', ?, ?, ?)
+        """, (cdc, ruc_emisor, timbrado, put_blob(conn, de_xml), STATUS_SIGNED_LOCAL, updated_at))
         doc_id = cursor.lastrowid
         conn.commit()
         conn.close()
         return doc_id
     except sqlite3.IntegrityError as e:
         # Unique violation (CDC duplicado)
+        # rollback explícito: el cursor queda vivo en el traceback y close()
+        # solo no libera el lock de escritura hasta que lo recolecte el GC
+        conn.rollback()
         conn.close()
         raise ConnectionError(f"CDC duplicado: {e}") from e
     except Exception as e:
+        conn.rollback()
         conn.close()
         # Re-raise con contexto
         raise ConnectionError(f"Error al insertar documento en SQLite: {e}") from e
@@ -174,6 +253,10 @@ def get_document(doc_id: int) -> Optional[Dict[str, Any]]:
     """
     Obtiene un documento por ID con todos sus campos.
     
+    de_xml, signed_xml y sirecepde_xml se leen de xml_blobs al primer acceso.
+    Si ya no está en la base viva se busca en los archivos históricos
+    (app/archive.py).
+    
     Returns:
         Documento con todos los campos o None si no existe
     """
@@ -187,7 +270,9 @@ def get_document(doc_id: int) -> Optional[Dict[str, Any]]:
         """, (doc_id,))
         row = cursor.fetchone()
         conn.close()
-        return _row_to_dict(row) if row else None
+        if row:
+            return _document_from_row(row)
+        return _archived_document("id = ?", (doc_id,))
     except Exception as e:
         conn.close()
         # Re-raise con contexto
@@ -239,12 +324,12 @@ def update_document_status(
             params.append(message)
         
         if sirecepde_xml is not None:
-            updates.append("sirecepde_xml = ?")
-            params.append(sirecepde_xml)
+            updates.append("sirecepde_xml = NULL, sirecepde_xml_sha = ?")
+            params.append(put_blob(conn, sirecepde_xml))
         
         if signed_xml is not None:
-            updates.append("signed_xml = ?")
-            params.append(signed_xml)
+            updates.append("signed_xml = NULL, signed_xml_sha = ?")
+            params.append(put_blob(conn, signed_xml))
         
         if d_prot_cons_lote is not None:
             updates.append("d_prot_cons_lote = ?")
@@ -267,5 +352,157 @@ def update_document_status(
         conn.close()
         return updated
     except Exception as e:
+        conn.rollback()
         conn.close()
         raise ConnectionError(f"Error al actualizar estado del documento: {e}") from e
+
+
+def list_documents_for_audit(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    statuses: Optional[List[str]] = None,
+    after_id: int = 0,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Lista documentos a auditar contra SIFEN (consulta por CDC), ordenados por id ASC.
+    
+    Args:
+        since: Fecha mínima de creación (YYYY-MM-DD, inclusive, opcional)
+        until: Fecha máxima de creación (YYYY-MM-DD, inclusive, opcional)
+        statuses: Filtrar por last_status (opcional)
+        after_id: Solo documentos con id > after_id (para reanudar desde checkpoint)
+        limit: Límite de resultados (opcional)
+    
+    Returns:
+        Lista de documentos con: id, cdc, created_at, last_status, last_code, approved_at
+    """
+    conn = None
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+        
+        query = """
+            SELECT id, cdc, created_at, last_status, last_code, approved_at
+            FROM de_documents
+            WHERE id > ?
+        """
+        params: List[Any] = [after_id]
+        
+        if since:
+            query += " AND date(created_at) >= date(?)"
+            params.append(since)
+        
+        if until:
+            query += " AND date(created_at) <= date(?)"
+            params.append(until)
+        
+        if statuses:
+            query += f" AND last_status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        
+        query += " ORDER BY id ASC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        return [_row_to_dict(row) for row in rows]
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        raise ConnectionError(f"Error al listar documentos para auditoría: {e}") from e
+
+
+def update_documents_status_batch(updates: List[Dict[str, Any]]) -> int:
+    """
+    Actualiza el estado de varios documentos en una sola transacción.
+    
+    Cada elemento de updates es un dict con: doc_id, status, code, message y
+    opcionalmente approved_at. approved_at solo se setea si el documento no
+    tenía uno (no se pisa la fecha de aprobación original).
+    
+    Returns:
+        Cantidad de documentos actualizados
+    """
+    if not updates:
+        return 0
+    
+    conn = None
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+        updated_at = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+        cursor.executemany("""
+            UPDATE de_documents
+            SET last_status = ?,
+                last_code = ?,
+                last_message = ?,
+                approved_at = COALESCE(approved_at, ?),
+                updated_at = ?
+            WHERE id = ?
+        """, [
+            (
+                u["status"],
+                u.get("code"),
+                u.get("message"),
+                u.get("approved_at"),
+                updated_at,
+                u["doc_id"],
+            )
+            for u in updates
+        ])
+        updated = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return updated
+    except Exception as e:
+        if conn is not None:
+            conn.rollback()
+            conn.close()
+        raise ConnectionError(f"Error al actualizar documentos en lote: {e}") from e
+
+
+def get_documents_xml(doc_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Obtiene el XML firmado de varios documentos (para generar KuDE).
+    
+    Usa signed_xml y, si no está, de_xml. Los documentos inexistentes se omiten.
+    
+    Args:
+        doc_ids: IDs de documentos
+    
+    Returns:
+        Lista de dicts con: id, cdc, last_status, xml (en el orden de doc_ids)
+    """
+    if not doc_ids:
+        return []
+    
+    conn = None
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+        rows: Dict[int, Dict[str, Any]] = {}
+        for i in range(0, len(doc_ids), 500):
+            chunk = doc_ids[i:i + 500]
+            cursor.execute(f"""
+                SELECT id, cdc, last_status,
+                       COALESCE(signed_xml_sha, CASE WHEN signed_xml IS NULL THEN de_xml_sha END) AS xml_sha,
+                       COALESCE(signed_xml, NULLIF(de_xml, '')) AS xml
+                FROM de_documents
+                WHERE id IN ({', '.join('?' for _ in chunk)})
+            """, chunk)
+            rows.update({row["id"]: _row_to_dict(row) for row in cursor.fetchall()})
+        blobs = get_blobs(conn, [row["xml_sha"] for row in rows.values()])
+        conn.close()
+        for row in rows.values():
+            sha = row.pop("xml_sha")
+            if sha:
+                row["xml"] = blobs.get(sha)
+        return [rows[doc_id] for doc_id in doc_ids if doc_id in rows]
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        raise ConnectionError(f"Error al obtener XML de documentos: {e}") from e
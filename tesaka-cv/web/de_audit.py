@@ -0,0 +1,205 @@
+"""
+Auditoría masiva de estados de DE contra SIFEN (consulta por CDC).
+
+Lee CDCs desde de_documents (filtrados por fecha de creación y/o estado),
+los consulta en paralelo con siConsDE (SoapClient.consulta_de_por_cdc_raw)
+respetando un límite de consultas por segundo, y escribe los resultados en
+la base por tandas (una transacción por tanda).
+
+Después de cada tanda se guarda un checkpoint JSON con el último id procesado;
+si la corrida se interrumpe, la siguiente ejecución con los mismos filtros
+continúa desde ahí.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from . import db
+from .document_status import STATUS_APPROVED
+from .sifen_pool import RateLimiter, ensure_pool_size
+from .sifen_status_mapper import map_consulta_de_to_status
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = Path("artifacts") / "audit_de_checkpoint.json"
+
+
+def _checkpoint_filters(since: Optional[str], until: Optional[str], statuses: Optional[List[str]]) -> Dict[str, Any]:
+    return {
+        "since": since,
+        "until": until,
+        "statuses": sorted(statuses) if statuses else None,
+    }
+
+
+def load_checkpoint(path: Path, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Carga un checkpoint reanudable.
+
+    Returns:
+        Dict del checkpoint si existe, corresponde a los mismos filtros y no
+        está terminado; None en otro caso.
+    """
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("filters") != filters or data.get("done"):
+        return None
+    return data
+
+
+def save_checkpoint(path: Path, state: Dict[str, Any]) -> None:
+    """Guarda el checkpoint de forma atómica (escribe a .tmp y renombra)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _query_document(client: Any, limiter: RateLimiter, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Consulta un DE por CDC y devuelve el resultado de auditoría (nunca lanza)."""
+    result: Dict[str, Any] = {
+        "doc_id": doc["id"],
+        "cdc": doc["cdc"],
+        "previous_status": doc.get("last_status"),
+    }
+    limiter.acquire()
+    try:
+        response = client.consulta_de_por_cdc_raw(doc["cdc"])
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+
+    result["http_status"] = response.get("http_status")
+    result["cod_res"] = response.get("dCodRes")
+    result["msg_res"] = response.get("dMsgRes")
+    result["d_prot_aut"] = response.get("dProtAut")
+    if not result["cod_res"]:
+        result["error"] = f"Respuesta sin dCodRes (HTTP {result['http_status']})"
+    return result
+
+
+def audit_documents(
+    client: Any,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    statuses: Optional[List[str]] = None,
+    workers: int = 4,
+    rate: float = 5.0,
+    batch_size: int = 100,
+    checkpoint_path: Optional[Path] = DEFAULT_CHECKPOINT_PATH,
+    dry_run: bool = False,
+    on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Audita el estado de los DE en SIFEN consultando cada CDC.
+
+    Args:
+        client: SoapClient (o cualquier objeto con consulta_de_por_cdc_raw)
+        since: Fecha mínima de creación (YYYY-MM-DD, opcional)
+        until: Fecha máxima de creación (YYYY-MM-DD, opcional)
+        statuses: Filtrar por last_status (opcional)
+        workers: Consultas concurrentes
+        rate: Máximo de consultas por segundo (todas las workers juntas)
+        batch_size: Documentos por tanda (una transacción y un checkpoint por tanda)
+        checkpoint_path: Archivo de checkpoint (None para desactivar)
+        dry_run: Si True, no escribe en la base ni usa checkpoint (solo reporta)
+        on_batch: Callback opcional con los resultados de cada tanda
+
+    Returns:
+        Resumen con: processed, updated, approved, discrepancies, errors, last_id, resumed
+    """
+    if workers < 1:
+        raise ValueError(f"workers debe ser >= 1. Valor recibido: {workers}")
+    if batch_size < 1:
+        raise ValueError(f"batch_size debe ser >= 1. Valor recibido: {batch_size}")
+
+    # En dry_run no se usa checkpoint: una corrida real posterior con los mismos
+    # filtros reanudaría después de documentos que nunca se actualizaron
+    if dry_run:
+        checkpoint_path = None
+    filters = _checkpoint_filters(since, until, statuses)
+    checkpoint = load_checkpoint(checkpoint_path, filters) if checkpoint_path else None
+
+    summary: Dict[str, Any] = {
+        "processed": 0,
+        "updated": 0,
+        "approved": 0,
+        "discrepancies": 0,
+        "errors": 0,
+        "last_id": 0,
+        "resumed": checkpoint is not None,
+        "started_at": datetime.now().isoformat(),
+    }
+    if checkpoint:
+        for key in ("processed", "updated", "approved", "discrepancies", "errors", "last_id", "started_at"):
+            summary[key] = checkpoint.get(key, summary[key])
+        logger.info(f"Reanudando auditoría desde id > {summary['last_id']}")
+
+    limiter = RateLimiter(rate, burst=workers)
+    ensure_pool_size(client, workers)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            docs = db.list_documents_for_audit(
+                since=since,
+                until=until,
+                statuses=statuses,
+                after_id=summary["last_id"],
+                limit=batch_size,
+            )
+            if not docs:
+                break
+
+            results = list(executor.map(lambda d: _query_document(client, limiter, d), docs))
+
+            updates = []
+            for result in results:
+                if result.get("error"):
+                    summary["errors"] += 1
+                    logger.warning(f"DE {result['doc_id']} ({result['cdc']}): {result['error']}")
+                    continue
+                status, code, message, approved_at = map_consulta_de_to_status(
+                    result["cod_res"], result["msg_res"], result["previous_status"]
+                )
+                result["new_status"] = status
+                if status is None or status == result["previous_status"]:
+                    continue
+                if status == STATUS_APPROVED:
+                    summary["approved"] += 1
+                else:
+                    summary["discrepancies"] += 1
+                updates.append({
+                    "doc_id": result["doc_id"],
+                    "status": status,
+                    "code": code,
+                    "message": message,
+                    "approved_at": approved_at,
+                })
+
+            if updates and not dry_run:
+                summary["updated"] += db.update_documents_status_batch(updates)
+
+            summary["processed"] += len(docs)
+            summary["last_id"] = docs[-1]["id"]
+
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, {"filters": filters, "done": False, **summary})
+            if on_batch:
+                on_batch(results)
+
+            logger.info(
+                f"Auditoría: {summary['processed']} procesados, {summary['updated']} actualizados, "
+                f"{summary['errors']} errores (último id={summary['last_id']})"
+            )
+
+    summary["finished_at"] = datetime.now().isoformat()
+    if checkpoint_path:
+        save_checkpoint(checkpoint_path, {"filters": filters, "done": True, **summary})
+    return summary
@@ -0,0 +1,313 @@
+"""
+Trazas por DE: etapas desde la creación hasta la aprobación en SIFEN
+
+Cada paso del recorrido de un DE (creación, firma, preflight, envío, consultas
+de lote, aprobación/rechazo) deja una fila en de_events con su timestamp,
+duración y las claves que lo conectan con SIFEN: CDC, dId y dProtConsLote.
+Con eso se arma la línea de tiempo de un DE (get_timeline) y los percentiles
+de tiempo hasta la aprobación (time_to_approval_stats).
+
+Registrar un evento nunca rompe el flujo que lo llama: un error de SQLite se
+loguea y se sigue.
+"""
+import logging
+import math
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.archive import archive_dir_for, find_all_archived
+
+# Ruta de la base de datos (mismo que web/db.py)
+DB_PATH = Path(os.getenv("TESAKA_DB_PATH") or Path(__file__).parent.parent / "tesaka.db")
+
+logger = logging.getLogger(__name__)
+
+# Etapas
+STAGE_CREATED = "created"
+STAGE_SIGN = "sign"
+STAGE_PREFLIGHT = "preflight"
+STAGE_RUC_GATE = "ruc_gate"
+STAGE_SEND = "send"
+STAGE_LOTE_CHECK = "lote_check"
+STAGE_APPROVED = "approved"
+STAGE_REJECTED = "rejected"
+
+# dCodRes de un DE aprobado (siRecepDE directo o gResProc de un lote)
+DE_APPROVED_CODES = ("0260", "0261")
+
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+def get_conn():
+    """
+    Obtiene una conexión a SQLite.
+    Crea la tabla de_events si no existe.
+    """
+    conn = sqlite3.connect(str(DB_PATH))
+    conn.row_factory = sqlite3.Row
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS de_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cdc TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            ts REAL NOT NULL,
+            duration_ms REAL,
+            ok INTEGER NOT NULL DEFAULT 1,
+            code TEXT,
+            detail TEXT,
+            d_id TEXT,
+            d_prot_cons_lote TEXT,
+            de_document_id INTEGER,
+            FOREIGN KEY (de_document_id) REFERENCES de_documents(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_de_events_cdc_ts
+        ON de_events(cdc, ts)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_de_events_prot
+        ON de_events(d_prot_cons_lote)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_de_events_stage_ts
+        ON de_events(stage, ts)
+    """)
+    conn.commit()
+
+    return conn
+
+
+def record_event(
+    cdc: Optional[str],
+    stage: str,
+    *,
+    ts: Optional[float] = None,
+    duration_ms: Optional[float] = None,
+    ok: bool = True,
+    code: Optional[str] = None,
+    detail: Optional[str] = None,
+    d_id: Optional[str] = None,
+    d_prot_cons_lote: Optional[str] = None,
+    de_document_id: Optional[int] = None,
+) -> None:
+    """
+    Registra una etapa de un DE. ts es epoch en segundos (default: ahora).
+    Sin CDC no hay a qué asociar el evento y se ignora.
+    """
+    if not cdc:
+        return
+    _insert_events([(
+        cdc, stage, ts if ts is not None else time.time(), duration_ms, int(ok),
+        code, detail[:500] if detail else None,
+        str(d_id) if d_id is not None else None,
+        str(d_prot_cons_lote).strip() if d_prot_cons_lote else None,
+        de_document_id,
+    )])
+
+
+def _insert_events(rows: List[tuple]) -> None:
+    """Inserta eventos en una sola transacción; un error se loguea y no se propaga."""
+    conn = None
+    try:
+        conn = get_conn()
+        conn.executemany("""
+            INSERT INTO de_events
+                (cdc, stage, ts, duration_ms, ok, code, detail, d_id, d_prot_cons_lote, de_document_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.warning(f"No se pudieron registrar {len(rows)} eventos de DE ({rows[0][1]}): {e}")
+        if conn is not None:
+            conn.rollback()
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+@contextmanager
+def span(cdc: Optional[str], stage: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Mide el bloque y lo registra como etapa del DE al salir.
+
+    El dict que devuelve permite completar campos conocidos recién al final
+    (code, d_prot_cons_lote, ok, detail...). Si el bloque lanza una excepción,
+    el evento queda con ok=0 y el mensaje en detail.
+
+        with de_trace.span(cdc, de_trace.STAGE_SEND, d_id=did) as ev:
+            response = client.recepcion_lote_envelope(envelope)
+            ev["code"] = response.get("codigo_respuesta")
+    """
+    start_ts = time.time()
+    start = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        fields["ok"] = False
+        fields.setdefault("detail", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        record_event(cdc, stage, ts=start_ts, duration_ms=(time.perf_counter() - start) * 1000, **fields)
+
+
+def cdcs_for_lote(d_prot_cons_lote: str) -> List[str]:
+    """CDCs que se enviaron en el lote (según sus eventos de envío)."""
+    try:
+        conn = get_conn()
+        try:
+            rows = conn.execute(
+                "SELECT DISTINCT cdc FROM de_events WHERE d_prot_cons_lote = ?",
+                (str(d_prot_cons_lote).strip(),),
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"No se pudieron leer los DEs del lote {d_prot_cons_lote}: {e}")
+        return []
+    return [row["cdc"] for row in rows]
+
+
+def record_lote_result(
+    d_prot_cons_lote: str,
+    cod_res_lot: Optional[str],
+    de_results: Optional[Iterable[Dict[str, Any]]] = None,
+    cdcs: Iterable[str] = (),
+    duration_ms: Optional[float] = None,
+    ok: bool = True,
+    detail: Optional[str] = None,
+) -> None:
+    """
+    Registra una consulta de lote (siConsLoteDE) en la traza de cada DE del lote.
+
+    Los DEs se toman de cdcs, de los eventos de envío con ese dProtConsLote y de
+    de_results (gResProcLote de un 0362, ver lote_checker.check_lote_status).
+    Para cada DE con resultado se registra además su aprobación o rechazo.
+    """
+    ts = time.time()
+    prot = str(d_prot_cons_lote).strip()
+    de_results = [r for r in (de_results or []) if r.get("cdc")]
+    targets = set(cdcs) | set(cdcs_for_lote(prot)) | {r["cdc"] for r in de_results}
+
+    # Un lote trae hasta 50 DEs: todo en una transacción
+    rows = [
+        (cdc, STAGE_LOTE_CHECK, ts, duration_ms, int(ok), cod_res_lot,
+         detail[:500] if detail else None, None, prot, None)
+        for cdc in sorted(targets)
+    ]
+    for result in de_results:
+        codes = [r["codigo"] for r in result.get("resultados", []) if r.get("codigo")]
+        estado = result.get("estado") or ""
+        approved = estado.startswith("Aprobado") or any(c in DE_APPROVED_CODES for c in codes)
+        rows.append((
+            result["cdc"], STAGE_APPROVED if approved else STAGE_REJECTED, ts, None, 1,
+            codes[0] if codes else None, estado or None, None, prot, None,
+        ))
+    if rows:
+        _insert_events(rows)
+
+
+def get_timeline(cdc: str) -> List[Dict[str, Any]]:
+    """
+    Eventos del DE en orden, con elapsed_ms (desde el primero) y delta_ms
+    (desde el anterior).
+    """
+    conn = get_conn()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM de_events WHERE cdc = ? ORDER BY ts, id", (cdc,)
+        ).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        # DE ya archivado: sus eventos se movieron con él (app/archive.py)
+        rows = [row for row, _ in find_all_archived(
+            archive_dir_for(DB_PATH), "de_events", "cdc = ? ORDER BY ts, id", (cdc,)
+        )]
+
+    events = []
+    first_ts = prev_ts = None
+    for row in rows:
+        event = dict(row)
+        event["ok"] = bool(event["ok"])
+        if first_ts is None:
+            first_ts = prev_ts = event["ts"]
+        event["elapsed_ms"] = round((event["ts"] - first_ts) * 1000, 3)
+        event["delta_ms"] = round((event["ts"] - prev_ts) * 1000, 3)
+        event["at"] = datetime.fromtimestamp(event["ts"]).isoformat(timespec="milliseconds")
+        prev_ts = event["ts"]
+        events.append(event)
+    return events
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def time_to_approval_stats(
+    since: Optional[float] = None,
+    percentiles: Iterable[int] = DEFAULT_PERCENTILES,
+) -> Dict[str, Any]:
+    """
+    Percentiles de tiempo hasta la aprobación (segundos), sobre los DEs cuyo
+    primer evento es posterior a since (epoch).
+
+    El inicio es el primer evento del DE (normalmente "created"; los DEs que no
+    se crearon desde la web arrancan en su primer envío) y el fin, el primer
+    evento "approved". También devuelve el tramo envío -> aprobación, que es la
+    parte que depende de SIFEN, y cuántos DEs siguen sin resultado.
+    """
+    conn = get_conn()
+    try:
+        rows = conn.execute("""
+            SELECT
+                cdc,
+                MIN(ts) AS start_ts,
+                MIN(CASE WHEN stage = ? THEN ts END) AS sent_ts,
+                MIN(CASE WHEN stage = ? THEN ts END) AS approved_ts,
+                MAX(CASE WHEN stage = ? THEN 1 ELSE 0 END) AS rejected
+            FROM de_events
+            GROUP BY cdc
+            HAVING MIN(ts) >= ?
+        """, (STAGE_SEND, STAGE_APPROVED, STAGE_REJECTED, since or 0)).fetchall()
+    finally:
+        conn.close()
+
+    total, send_to_approval = [], []
+    rejected = pending = 0
+    for row in rows:
+        if row["approved_ts"] is not None:
+            total.append(row["approved_ts"] - row["start_ts"])
+            if row["sent_ts"] is not None and row["sent_ts"] <= row["approved_ts"]:
+                send_to_approval.append(row["approved_ts"] - row["sent_ts"])
+        elif row["rejected"]:
+            rejected += 1
+        else:
+            pending += 1
+
+    def summarize(values: List[float]) -> Dict[str, Any]:
+        values = sorted(values)
+        summary: Dict[str, Any] = {"count": len(values)}
+        if values:
+            for pct in percentiles:
+                summary[f"p{pct}_s"] = round(_percentile(values, pct), 3)
+            summary["max_s"] = round(values[-1], 3)
+        return summary
+
+    return {
+        "documents": len(rows),
+        "approved": len(total),
+        "rejected": rejected,
+        "pending": pending,
+        "time_to_approval": summarize(total),
+        "send_to_approval": summarize(send_to_approval),
+    }
@@ -0,0 +1,203 @@
+"""
+Envío masivo de eventos del emisor a SIFEN (siRecepEvento).
+
+Toma una lista de CDCs a cancelar y/o rangos de numeración a inutilizar por
+(timbrado, establecimiento, punto de expedición), los registra en
+sifen_eventos (el id de la fila es el Id del evento), los firma con un único
+certificado cargado y los empaqueta de a 15 por rEnviEventoDe (máximo del
+XSD). Los envíos se hacen en paralelo con límite de requests por segundo y
+los resultados se guardan en la base en una transacción por envío.
+"""
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.sifen_client import evento_builder
+from app.sifen_client.evento_builder import (
+    MAX_EVENTOS_POR_ENVIO,
+    TIPO_CANCELACION,
+    TIPO_INUTILIZACION,
+)
+
+from . import eventos_db
+from .sifen_pool import RateLimiter, ensure_pool_size
+
+logger = logging.getLogger(__name__)
+
+# Código de respuesta de evento registrado correctamente
+EVENTO_OK_CODES = ["0600"]
+
+_RANGO_RE = re.compile(
+    r"^(?P<timbrado>\d{8}):(?P<est>\d{1,3}):(?P<pun>\d{1,3}):(?P<ini>\d+)(?:-(?P<fin>\d+))?(?::(?P<tipo>\d))?$"
+)
+
+
+def parse_rango(spec: str) -> Dict[str, Any]:
+    """
+    Parsea un rango a inutilizar: TIMBRADO:EST:PUN:INI-FIN[:TIPO_DE].
+
+    Ejemplo: "12345678:001:001:150-180" o "12345678:1:1:42:5" (un solo número,
+    nota de crédito).
+    """
+    m = _RANGO_RE.match(spec.strip())
+    if not m:
+        raise ValueError(f"Rango inválido (esperado TIMBRADO:EST:PUN:INI-FIN[:TIPO]): {spec!r}")
+    ini = int(m.group("ini"))
+    fin = int(m.group("fin") or ini)
+    if ini > fin:
+        raise ValueError(f"Rango inválido: {ini} > {fin}")
+    return {
+        "timbrado": m.group("timbrado"),
+        "establecimiento": m.group("est").zfill(3),
+        "punto_expedicion": m.group("pun").zfill(3),
+        "numero_inicio": ini,
+        "numero_fin": fin,
+        "tipo_documento": int(m.group("tipo") or 1),
+    }
+
+
+def plan_eventos(
+    cancel_cdcs: Iterable[str] = (),
+    rangos: Iterable[Dict[str, Any]] = (),
+    motivo: str = "",
+) -> List[Dict[str, Any]]:
+    """
+    Arma la lista de eventos (sin id) a partir de CDCs y rangos.
+
+    Los CDCs repetidos se envían una sola vez.
+    """
+    eventos: List[Dict[str, Any]] = []
+    seen = set()
+    for cdc in cancel_cdcs:
+        cdc = cdc.strip()
+        if not cdc or cdc in seen:
+            continue
+        seen.add(cdc)
+        eventos.append({"tipo": TIPO_CANCELACION, "cdc": cdc, "motivo": motivo})
+    for rango in rangos:
+        eventos.append({"tipo": TIPO_INUTILIZACION, "motivo": motivo, **rango})
+    return eventos
+
+
+def _send_group(client: Any, limiter: RateLimiter, group: List[Dict[str, Any]], signed: List[bytes]) -> List[Dict[str, Any]]:
+    """Envía un rEnviEventoDe y devuelve un resultado por evento (nunca lanza)."""
+    did = evento_builder.make_did()
+    limiter.acquire()
+    try:
+        response = client.recepcion_evento(evento_builder.build_r_envi_evento(did, signed))
+    except Exception as e:
+        return [
+            {"id": ev["id"], "status": eventos_db.EVENTO_STATUS_ERROR, "d_id": did, "msg_res": str(e)[:500]}
+            for ev in group
+        ]
+
+    by_id = {str(r.get("id")): r for r in response.get("resultados") or []}
+    results = []
+    for ev in group:
+        r = by_id.get(str(ev["id"]))
+        if r is None:
+            results.append({
+                "id": ev["id"],
+                "status": eventos_db.EVENTO_STATUS_ERROR,
+                "d_id": did,
+                "cod_res": response.get("codigo"),
+                "msg_res": response.get("mensaje") or "Evento sin gResProcEVe en la respuesta",
+            })
+            continue
+        approved = (r.get("codigo") in EVENTO_OK_CODES) or (r.get("estado") or "").lower().startswith("aprob")
+        results.append({
+            "id": ev["id"],
+            "status": eventos_db.EVENTO_STATUS_APPROVED if approved else eventos_db.EVENTO_STATUS_REJECTED,
+            "d_id": did,
+            "prot_aut": r.get("prot_aut"),
+            "cod_res": r.get("codigo"),
+            "msg_res": r.get("mensaje"),
+        })
+    return results
+
+
+def submit_eventos(
+    client: Any,
+    signer: Callable[[Any], None],
+    eventos: List[Dict[str, Any]],
+    env: str = "test",
+    workers: int = 4,
+    rate: float = 2.0,
+    group_size: int = MAX_EVENTOS_POR_ENVIO,
+    dry_run: bool = False,
+    on_group: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Registra, firma, empaqueta y envía eventos a SIFEN.
+
+    Args:
+        client: SoapClient (o cualquier objeto con recepcion_evento)
+        signer: Callable que firma in-place un rGesEve (evento_builder.EventoSigner)
+        eventos: Lista de plan_eventos()
+        env: Ambiente ('test' o 'prod')
+        workers: Envíos concurrentes
+        rate: Máximo de requests por segundo (todas las workers juntas)
+        group_size: Eventos por rEnviEventoDe (1..15)
+        dry_run: Si True, arma y firma pero no registra ni envía
+        on_group: Callback opcional con los resultados de cada envío
+
+    Returns:
+        Resumen con: eventos, requests, approved, rejected, errors, results
+    """
+    if workers < 1:
+        raise ValueError(f"workers debe ser >= 1. Valor recibido: {workers}")
+
+    summary: Dict[str, Any] = {
+        "eventos": len(eventos),
+        "requests": 0,
+        "approved": 0,
+        "rejected": 0,
+        "errors": 0,
+        "results": [],
+    }
+    if not eventos:
+        return summary
+
+    # Validar y construir todo antes de registrar nada en la base
+    for ev in eventos:
+        evento_builder.build_evento({**ev, "id": 1})
+
+    if dry_run:
+        ids = list(range(1, len(eventos) + 1))
+    else:
+        ids = eventos_db.create_eventos(env, eventos)
+    eventos = [{**ev, "id": ev_id} for ev, ev_id in zip(eventos, ids)]
+
+    signed = [evento_builder.sign_evento(evento_builder.build_evento(ev), signer) for ev in eventos]
+    groups = evento_builder.chunk_eventos(list(zip(eventos, signed)), group_size)
+    summary["requests"] = len(groups)
+
+    if dry_run:
+        logger.info(f"Dry-run: {len(eventos)} eventos firmados en {len(groups)} envíos")
+        return summary
+
+    limiter = RateLimiter(rate, burst=workers)
+    ensure_pool_size(client, workers)
+
+    def run(group):
+        return _send_group(client, limiter, [ev for ev, _ in group], [s for _, s in group])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(run, groups):
+            eventos_db.update_eventos_results(results)
+            for r in results:
+                key = {
+                    eventos_db.EVENTO_STATUS_APPROVED: "approved",
+                    eventos_db.EVENTO_STATUS_REJECTED: "rejected",
+                }.get(r["status"], "errors")
+                summary[key] += 1
+            summary["results"].extend(results)
+            if on_group:
+                on_group(results)
+
+    logger.info(
+        f"Eventos: {summary['approved']} aprobados, {summary['rejected']} rechazados, "
+        f"{summary['errors']} errores en {summary['requests']} envíos"
+    )
+    return summary
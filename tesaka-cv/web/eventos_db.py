@@ -0,0 +1,241 @@
+"""
+Gestión de base de datos para eventos SIFEN (cancelación / inutilización)
+"""
+import os
+import sqlite3
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+
+from app.archive import archive_dir_for, find_all_archived
+
+# Ruta de la base de datos (mismo que web/db.py)
+DB_PATH = Path(os.getenv("TESAKA_DB_PATH") or Path(__file__).parent.parent / "tesaka.db")
+
+# Estados válidos para eventos
+EVENTO_STATUS_PENDING = "pending"
+EVENTO_STATUS_APPROVED = "approved"
+EVENTO_STATUS_REJECTED = "rejected"
+EVENTO_STATUS_ERROR = "error"
+
+VALID_STATUSES = [
+    EVENTO_STATUS_PENDING,
+    EVENTO_STATUS_APPROVED,
+    EVENTO_STATUS_REJECTED,
+    EVENTO_STATUS_ERROR,
+]
+
+
+def get_conn():
+    """
+    Obtiene una conexión a SQLite.
+    Crea la tabla sifen_eventos si no existe.
+
+    El id de cada fila se usa como Id del evento (rEve/@Id), así que es único
+    por base sin coordinar con otros procesos.
+    """
+    conn = sqlite3.connect(str(DB_PATH))
+    conn.row_factory = sqlite3.Row
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sifen_eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            env TEXT NOT NULL CHECK(env IN ('test', 'prod')),
+            tipo TEXT NOT NULL CHECK(tipo IN ('cancelacion', 'inutilizacion')),
+            cdc TEXT,
+            timbrado TEXT,
+            establecimiento TEXT,
+            punto_expedicion TEXT,
+            numero_inicio INTEGER,
+            numero_fin INTEGER,
+            tipo_documento INTEGER,
+            motivo TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'approved', 'rejected', 'error')),
+            d_id TEXT,
+            prot_aut TEXT,
+            cod_res TEXT,
+            msg_res TEXT,
+            de_document_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TEXT,
+            FOREIGN KEY (de_document_id) REFERENCES de_documents(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sifen_eventos_status
+        ON sifen_eventos(status)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sifen_eventos_cdc
+        ON sifen_eventos(cdc)
+    """)
+    conn.commit()
+
+    return conn
+
+
+def _row_to_dict(row: sqlite3.Row) -> Optional[Dict[str, Any]]:
+    """Convierte un Row de SQLite a dict"""
+    if row is None:
+        return None
+    return dict(row)
+
+
+def create_eventos(env: str, eventos: List[Dict[str, Any]]) -> List[int]:
+    """
+    Registra eventos en estado 'pending' en una sola transacción.
+
+    Si un evento de cancelación corresponde a un CDC de de_documents, se guarda
+    de_document_id.
+
+    Args:
+        env: Ambiente ('test' o 'prod')
+        eventos: Dicts con tipo, motivo y los campos del tipo (cdc, o
+            timbrado/establecimiento/punto_expedicion/numero_inicio/numero_fin/tipo_documento)
+
+    Returns:
+        IDs creados (en el mismo orden que eventos)
+    """
+    conn = None
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+        doc_ids: Dict[str, int] = {}
+        cdcs = [e["cdc"] for e in eventos if e.get("cdc")]
+        has_documents = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'de_documents'"
+        ).fetchone()
+        if cdcs and has_documents:
+            for i in range(0, len(cdcs), 500):
+                chunk = cdcs[i:i + 500]
+                cursor.execute(
+                    f"SELECT id, cdc FROM de_documents WHERE cdc IN ({', '.join('?' for _ in chunk)})",
+                    chunk,
+                )
+                doc_ids.update({row["cdc"]: row["id"] for row in cursor.fetchall()})
+        # Cancelaciones de DEs viejos: el documento puede estar en un archivo histórico
+        missing = [cdc for cdc in cdcs if cdc not in doc_ids]
+        for i in range(0, len(missing), 500):
+            chunk = missing[i:i + 500]
+            for row, _ in find_all_archived(
+                archive_dir_for(DB_PATH), "de_documents",
+                f"cdc IN ({', '.join('?' for _ in chunk)})", chunk, columns="id, cdc",
+            ):
+                doc_ids.setdefault(row["cdc"], row["id"])
+
+        ids = []
+        for e in eventos:
+            cursor.execute("""
+                INSERT INTO sifen_eventos (
+                    env, tipo, cdc, timbrado, establecimiento, punto_expedicion,
+                    numero_inicio, numero_fin, tipo_documento, motivo, de_document_id
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                env,
+                e["tipo"],
+                e.get("cdc"),
+                e.get("timbrado"),
+                e.get("establecimiento"),
+                e.get("punto_expedicion"),
+                e.get("numero_inicio"),
+                e.get("numero_fin"),
+                e.get("tipo_documento"),
+                e["motivo"],
+                doc_ids.get(e.get("cdc")),
+            ))
+            ids.append(cursor.lastrowid)
+        conn.commit()
+        conn.close()
+        return ids
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        raise ConnectionError(f"Error al registrar eventos: {e}") from e
+
+
+def update_eventos_results(results: List[Dict[str, Any]]) -> int:
+    """
+    Guarda el resultado de envío de varios eventos en una sola transacción.
+
+    Cada elemento es un dict con: id, status y opcionalmente d_id, prot_aut,
+    cod_res, msg_res.
+
+    Returns:
+        Cantidad de eventos actualizados
+    """
+    if not results:
+        return 0
+
+    conn = None
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+        sent_at = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+        cursor.executemany("""
+            UPDATE sifen_eventos
+            SET status = ?,
+                d_id = ?,
+                prot_aut = ?,
+                cod_res = ?,
+                msg_res = ?,
+                sent_at = ?
+            WHERE id = ?
+        """, [
+            (
+                r["status"],
+                r.get("d_id"),
+                r.get("prot_aut"),
+                r.get("cod_res"),
+                r.get("msg_res"),
+                sent_at,
+                r["id"],
+            )
+            for r in results
+        ])
+        updated = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return updated
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        raise ConnectionError(f"Error al actualizar eventos: {e}") from e
+
+
+def list_eventos(
+    status: Optional[str] = None,
+    tipo: Optional[str] = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Lista eventos ordenados por id DESC.
+
+    Args:
+        status: Filtrar por estado (opcional)
+        tipo: Filtrar por tipo (opcional)
+        limit: Límite de resultados
+    """
+    conn = None
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+        query = "SELECT * FROM sifen_eventos WHERE 1 = 1"
+        params: List[Any] = []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if tipo:
+            query += " AND tipo = ?"
+            params.append(tipo)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        return [_row_to_dict(row) for row in rows]
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        raise ConnectionError(f"Error al listar eventos: {e}") from e
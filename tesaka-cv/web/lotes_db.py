@@ -1,13 +1,18 @@
 """
 Gestión de base de datos para lotes SIFEN
 """
+import os
 import sqlite3
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+from app.archive import archive_dir_for, connect_archive, find_archived
+
+from .blob_store import LazyXmlDict, ensure_blob_table, migrate_inline_column, put_blob
+
 # Ruta de la base de datos (mismo que web/db.py)
-DB_PATH = Path(__file__).parent.parent / "tesaka.db"
+DB_PATH = Path(os.getenv("TESAKA_DB_PATH") or Path(__file__).parent.parent / "tesaka.db")
 
 # Estados válidos para lotes
 LOTE_STATUS_PENDING = "pending"
@@ -66,16 +71,43 @@ def get_conn():
         CREATE INDEX IF NOT EXISTS idx_sifen_lotes_de_document_id 
         ON sifen_lotes(de_document_id)
     """)
+
+    # Migración: la respuesta se guarda en xml_blobs (ver blob_store.py) y
+    # last_response_xml queda NULL; al agregar la columna se mueven las existentes
+    ensure_blob_table(conn)
+    cursor.execute("PRAGMA table_info(sifen_lotes)")
+    if "last_response_sha" not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE sifen_lotes ADD COLUMN last_response_sha TEXT")
+        migrate_inline_column(conn, "sifen_lotes", "last_response_xml", "last_response_sha")
     conn.commit()
 
     return conn
 
 
-def _row_to_dict(row: sqlite3.Row) -> Optional[Dict[str, Any]]:
-    """Convierte un Row de SQLite a dict"""
+def _row_to_dict(row: sqlite3.Row, connect=None) -> Optional[Dict[str, Any]]:
+    """
+    Convierte un Row de SQLite a dict. last_response_xml se carga de
+    xml_blobs (de la base viva o del archivo indicado con connect) recién al
+    accederlo.
+    """
     if row is None:
         return None
-    return dict(row)
+    data = dict(row)
+    sha = data.pop("last_response_sha", None)
+    blob_fields = {}
+    if sha:
+        data.pop("last_response_xml", None)
+        blob_fields["last_response_xml"] = sha
+    return LazyXmlDict(data, blob_fields, connect or get_conn)
+
+
+def _archived_lote(where: str, params: tuple) -> Optional[Dict[str, Any]]:
+    """Busca un lote en los archivos históricos (app/archive.py)."""
+    found = find_archived(archive_dir_for(DB_PATH), "sifen_lotes", where, params)
+    if found is None:
+        return None
+    row, path = found
+    return _row_to_dict(row, connect=lambda: connect_archive(path))
 
 
 def create_lote(
@@ -162,8 +194,8 @@ def update_lote_status(
             params.append(msg_res_lot)
 
         if response_xml is not None:
-            updates.append("last_response_xml = ?")
-            params.append(response_xml)
+            updates.append("last_response_xml = NULL, last_response_sha = ?")
+            params.append(put_blob(conn, response_xml))
 
         params.append(lote_id)
 
@@ -187,7 +219,8 @@ def update_lote_status(
 
 def get_lote(lote_id: int) -> Optional[Dict[str, Any]]:
     """
-    Obtiene un lote por ID con todos sus campos.
+    Obtiene un lote por ID con todos sus campos. Si ya no está en la base
+    viva se busca en los archivos históricos.
 
     Returns:
         Lote con todos los campos o None si no existe
@@ -202,7 +235,7 @@ def get_lote(lote_id: int) -> Optional[Dict[str, Any]]:
         """, (lote_id,))
         row = cursor.fetchone()
         conn.close()
-        return _row_to_dict(row) if row else None
+        return _row_to_dict(row) if row else _archived_lote("id = ?", (lote_id,))
     except Exception as e:
         conn.close()
         raise ConnectionError(f"Error al obtener lote: {e}") from e
@@ -210,7 +243,8 @@ def get_lote(lote_id: int) -> Optional[Dict[str, Any]]:
 
 def get_lote_by_prot(env: str, d_prot_cons_lote: str) -> Optional[Dict[str, Any]]:
     """
-    Obtiene un lote por ambiente y número de lote.
+    Obtiene un lote por ambiente y número de lote (también en los archivos
+    históricos).
 
     Returns:
         Lote con todos los campos o None si no existe
@@ -225,7 +259,9 @@ def get_lote_by_prot(env: str, d_prot_cons_lote: str) -> Optional[Dict[str, Any]
         """, (env, d_prot_cons_lote))
         row = cursor.fetchone()
         conn.close()
-        return _row_to_dict(row) if row else None
+        if row:
+            return _row_to_dict(row)
+        return _archived_lote("env = ? AND d_prot_cons_lote = ?", (env, d_prot_cons_lote))
     except Exception as e:
         conn.close()
         raise ConnectionError(f"Error al obtener lote: {e}") from e
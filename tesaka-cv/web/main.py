@@ -23,10 +23,11 @@ OPCIÓN 2 (Manual):
 NOTA: Asegúrate de que el venv esté activado (deberías ver (.venv) en el prompt).
 """
 import os
+import time
 from pathlib import Path as FSPath
 from typing import Optional
 from fastapi import FastAPI, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
@@ -47,11 +48,25 @@ except ImportError:
     # python-dotenv no está instalado, continuar sin cargar .env
     pass
 
+from app.executors import install_loop_lag_monitor, run_io
+from app.profiling import install_profiling
+from app.sifen_client.metrics import install_metrics
+
 from . import db
+from . import de_trace
 from . import lotes_db
 
 app = FastAPI(title="TESAKA-SIFEN", version="1.0.0")
 
+# Monitor de lag del event loop (GET /_internal/loop-lag)
+install_loop_lag_monitor(app)
+
+# Latencia por ruta y métricas SIFEN en formato Prometheus (GET /metrics)
+install_metrics(app, "web")
+
+# Profiling de una fracción de los requests (PROFILE_SAMPLE_RATE, ver app/profiling.py)
+install_profiling(app)
+
 # Obtener ruta base del proyecto (directorio padre de web/)
 WEB_DIR = FSPath(__file__).parent
 
@@ -130,7 +145,7 @@ def _extract_cdc_from_xml(de_xml: str) -> str:
 
 
 @app.get("/", response_class=HTMLResponse)
-async def index(request: Request):
+def index(request: Request):
     """Lista los últimos 50 documentos"""
     try:
         documents = db.list_documents(limit=50)
@@ -168,7 +183,7 @@ async def index(request: Request):
 
 
 @app.get("/de/new", response_class=HTMLResponse)
-async def de_new_form(request: Request):
+def de_new_form(request: Request):
     """Muestra el formulario para crear un nuevo DE"""
     _check_emisor_ruc()  # Verificar que esté configurado
     return templates.TemplateResponse(
@@ -190,230 +205,29 @@ def _build_de_xml_with_items(
     """
     Construye el XML DE con items dinámicos.
     
+    Delegado en app.sifen_client.de_builder (fragmentos estáticos precompilados,
+    totales e items en una sola pasada).
+    
     Args:
         items: Lista de dicts con keys: codigo, descripcion, cantidad, precio, tasa_iva
     """
-    from datetime import datetime
-    import importlib.util
+    from app.sifen_client.de_builder import build_de_xml
     
-    # Importar xml_generator_v150 directamente sin pasar por __init__.py
-    # para evitar cargar dependencias pesadas (cryptography, etc.)
-    xml_gen_path = FSPath(__file__).parent.parent / "app" / "sifen_client" / "xml_generator_v150.py"
-    spec = importlib.util.spec_from_file_location("xml_generator_v150", xml_gen_path)
-    xml_gen = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(xml_gen)
-    generate_cdc = xml_gen.generate_cdc
-    calculate_digit_verifier = xml_gen.calculate_digit_verifier
-    
-    if fecha is None:
-        fecha = datetime.now().strftime("%Y-%m-%d")
-    if hora is None:
-        hora = datetime.now().strftime("%H:%M:%S")
-    
-    # Parsear RUC
     ruc_str = str(ruc or "").strip()
     if not ruc_str or '-' not in ruc_str:
         raise ValueError("RUC debe venir como RUC-DV (ej: 4554737-8)")
-    ruc_parts = ruc_str.split('-', 1)
-    ruc_num = ruc_parts[0].strip()
-    dv_ruc = ruc_parts[1].strip()
-    ruc_for_cdc = ruc_num[:8].zfill(8) if len(ruc_num) < 8 else ruc_num[:8]
-    
-    fecha_firma = f"{fecha}T{hora}"
-    tipo_documento = "1"
-    
-    # Calcular totales de items
-    total_general = 0
-    subtotal_exe = 0
-    subtotal_5 = 0
-    subtotal_10 = 0
-    iva_5 = 0
-    iva_10 = 0
-    base_grav_5 = 0
-    base_grav_10 = 0
-    
-    items_xml = []
-    for idx, item in enumerate(items, 1):
-        codigo = item.get('codigo', f"{idx:03d}")
-        descripcion = item.get('descripcion', 'Producto')
-        cantidad = float(item.get('cantidad', 1))
-        precio = float(item.get('precio', 0))
-        tasa_iva = int(item.get('tasa_iva', 0))
-        
-        subtotal_item = cantidad * precio
-        iva_item = subtotal_item * (tasa_iva / 100) if tasa_iva > 0 else 0
-        total_item = subtotal_item + iva_item
-        
-        total_general += total_item
-        
-        if tasa_iva == 0:
-            subtotal_exe += subtotal_item
-        elif tasa_iva == 5:
-            subtotal_5 += subtotal_item
-            iva_5 += iva_item
-            base_grav_5 += subtotal_item
-        elif tasa_iva == 10:
-            subtotal_10 += subtotal_item
-            iva_10 += iva_item
-            base_grav_10 += subtotal_item
-        
-        items_xml.append(f"""        <gCamItem>
-            <dCodInt>{codigo}</dCodInt>
-            <dDesProSer>{descripcion}</dDesProSer>
-            <cUniMed>77</cUniMed>
-            <dDesUniMed>UNI</dDesUniMed>
-            <dCantProSer>{cantidad:.2f}</dCantProSer>
-            <gValorItem>
-                <dPUniProSer>{precio:.0f}</dPUniProSer>
-                <dTotBruOpeItem>{subtotal_item:.0f}</dTotBruOpeItem>
-                <gValorRestaItem>
-                    <dTotOpeItem>{total_item:.0f}</dTotOpeItem>
-                </gValorRestaItem>
-            </gValorItem>
-        </gCamItem>""")
-    
-    # Monto para CDC (total general sin IVA, redondeado)
-    monto_cdc = str(int(total_general - iva_5 - iva_10))
-    
-    # Generar CDC
-    cdc = generate_cdc(ruc_for_cdc, timbrado, establecimiento, punto_expedicion, 
-                      numero_documento, tipo_documento, fecha.replace("-", ""), monto_cdc)
-    
-    # Extraer solo dígitos del CDC
-    cdc_base = ''.join(c for c in cdc if c.isdigit())
-    cdc_base = cdc_base.strip()
-    
-    # Si viene con 44 dígitos, es porque ya trae el DV pegado; sacarlo
-    if len(cdc_base) == 44:
-        cdc_base = cdc_base[:-1]
-    
-    if len(cdc_base) != 43:
-        raise ValueError(f"Base CDC inválida para DV (len={len(cdc_base)}): {cdc_base}")
     
-    dv_id = calculate_digit_verifier(cdc_base)
-    cdc = cdc_base + str(dv_id)
-    
-    cod_seg = "123456789"
-    
-    # Construir XML
-    items_xml_str = "\n".join(items_xml)
-    
-    xml = f"""<DE xmlns="http://ekuatia.set.gov.py/sifen/xsd" Id="{cdc}">
-    <dDVId>{dv_id}</dDVId>
-    <dFecFirma>{fecha_firma}</dFecFirma>
-    <dSisFact>1</dSisFact>
-    <gOpeDE>
-        <iTipEmi>1</iTipEmi>
-        <dDesTipEmi>Normal</dDesTipEmi>
-        <dCodSeg>{cod_seg}</dCodSeg>
-    </gOpeDE>
-    <gTimb>
-        <iTiDE>{tipo_documento}</iTiDE>
-        <dNumTim>{timbrado}</dNumTim>
-        <dEst>{establecimiento}</dEst>
-        <dPunExp>{punto_expedicion}</dPunExp>
-        <dNumDoc>{numero_documento}</dNumDoc>
-        <dSerieNum>001</dSerieNum>
-    </gTimb>
-    <gDatGralOpe>
-        <iTipEmi>1</iTipEmi>
-        <dDesTipEmi>Normal</dDesTipEmi>
-        <dFeEmiDE>{fecha}</dFeEmiDE>
-        <dHoEmiDE>{hora}</dHoEmiDE>
-        <iCondOpe>1</iCondOpe>
-        <dDesCondOpe>Contado</dDesCondOpe>
-        <iTipoCont>1</iTipoCont>
-        <dDesTipoCont>Efectivo</dDesTipoCont>
-        <iCondCred>1</iCondCred>
-        <dPlazoCre>0</dPlazoCre>
-        <dCuotas>0</dCuotas>
-        <gEmis>
-            <dRucEm>{ruc_num}</dRucEm>
-            <dDVEmi>{dv_ruc}</dDVEmi>
-            <dNomEmi>Marcio Ruben Feris Aguilera</dNomEmi>
-            <dDirEmi>Asunción</dDirEmi>
-            <dNumCasEmi>1234</dNumCasEmi>
-            <cDepEmi>1</cDepEmi>
-            <dDesDepEmi>CAPITAL</dDesDepEmi>
-            <cCiuEmi>1</cCiuEmi>
-            <dDesCiuEmi>Asunción</dDesCiuEmi>
-            <dTelEmi>021123456</dTelEmi>
-            <dEmailEmi>test@example.com</dEmailEmi>
-            <gActEco>
-                <cActEco>471100</cActEco>
-                <dDesActEco>Venta al por menor en comercios no especializados</dDesActEco>
-            </gActEco>
-        </gEmis>
-        <gDatRec>
-            <iNatRec>1</iNatRec>
-            <iTiOpe>1</iTiOpe>
-            <cPaisRec>PRY</cPaisRec>
-            <dDesPaisRec>Paraguay</dDesPaisRec>
-            <dRucRec>80012345</dRucRec>
-            <dDVRec>7</dDVRec>
-            <dNomRec>Cliente de Prueba</dNomRec>
-            <dDirRec>Asunción</dDirRec>
-            <dNumCasRec>5678</dNumCasRec>
-            <cDepRec>1</cDepRec>
-            <dDesDepRec>CAPITAL</dDesDepRec>
-            <cCiuRec>1</cCiuRec>
-            <dDesCiuRec>Asunción</dDesCiuRec>
-        </gDatRec>
-    </gDatGralOpe>
-    <gDtipDE>
-{items_xml_str}
-    </gDtipDE>
-    <gTotSub>
-        <dSubExe>{subtotal_exe:.0f}</dSubExe>
-        <dSubExo>0</dSubExo>
-        <dSub5>{subtotal_5:.0f}</dSub5>
-        <dSub10>{subtotal_10:.0f}</dSub10>
-        <dTotOpe>{total_general - iva_5 - iva_10:.0f}</dTotOpe>
-        <dTotDesc>0</dTotDesc>
-        <dTotDescGlotem>0</dTotDescGlotem>
-        <dTotAntItem>0</dTotAntItem>
-        <dTotAnt>0</dTotAnt>
-        <dPorcDescTotal>0</dPorcDescTotal>
-        <dDescTotal>0</dDescTotal>
-        <dAnticipo>0</dAnticipo>
-        <dRedon>0</dRedon>
-        <dTotGralOpe>{total_general - iva_5 - iva_10:.0f}</dTotGralOpe>
-        <dIVA5>{iva_5:.0f}</dIVA5>
-        <dIVA10>{iva_10:.0f}</dIVA10>
-        <dLiqTotIVA5>{iva_5:.0f}</dLiqTotIVA5>
-        <dLiqTotIVA10>{iva_10:.0f}</dLiqTotIVA10>
-        <dIVAComi>0</dIVAComi>
-        <dTotIVA>{iva_5 + iva_10:.0f}</dTotIVA>
-        <dBaseGrav5>{base_grav_5:.0f}</dBaseGrav5>
-        <dBaseGrav10>{base_grav_10:.0f}</dBaseGrav10>
-        <dTBasGraIVA>{base_grav_5 + base_grav_10:.0f}</dTBasGraIVA>
-        <dTotalGs>{total_general:.0f}</dTotalGs>
-    </gTotSub>
-    <ds:Signature xmlns:ds="http://www.w3.org/2000/09/xmldsig#">
-        <ds:SignedInfo>
-            <ds:CanonicalizationMethod Algorithm="http://www.w3.org/TR/2001/REC-xml-c14n-20010315"/>
-            <ds:SignatureMethod Algorithm="http://www.w3.org/2000/09/xmldsig#rsa-sha1"/>
-            <ds:Reference URI="">
-                <ds:Transforms>
-                    <ds:Transform Algorithm="http://www.w3.org/2000/09/xmldsig#enveloped-signature"/>
-                </ds:Transforms>
-                <ds:DigestMethod Algorithm="http://www.w3.org/2000/09/xmldsig#sha1"/>
-                <ds:DigestValue>dGhpcyBpcyBhIHRlc3QgZGlnZXN0IHZhbHVl</ds:DigestValue>
-            </ds:Reference>
-        </ds:SignedInfo>
-        <ds:SignatureValue>dGhpcyBpcyBhIHRlc3Qgc2lnbmF0dXJlIHZhbHVlIGZvciBwcnVlYmFzIG9ubHk=</ds:SignatureValue>
-        <ds:KeyInfo>
-            <ds:X509Data>
-                <ds:X509Certificate>LS0tLS1CRUdJTiBDRVJUSUZJQ0FURS0tLS0tCk1JSUVKakNDQWpLZ0F3SUJBZ0lEQW5CZ2txaGtpRzl3MEJBUXNGQUFEV1lqRU1NQW9HQTFVRUNoTURVbVZzWVcKd2dnRWlNQTBHQ1NxR1NJYjM=</ds:X509Certificate>
-            </ds:X509Data>
-        </ds:KeyInfo>
-    </ds:Signature>
-    <gCamFuFD>
-        <dCarQR>TESTQRCODE12345678901234567890123456789012345678901234567890123456789012345678901234567890123456789012345678901234567890</dCarQR>
-    </gCamFuFD>
-</DE>"""
-    
-    return xml
+    return build_de_xml(
+        ruc=ruc_str,
+        timbrado=timbrado,
+        establecimiento=establecimiento,
+        punto_expedicion=punto_expedicion,
+        numero_documento=numero_documento,
+        items=items,
+        fecha=fecha,
+        hora=hora,
+        env=os.getenv("SIFEN_ENV", "test"),
+    )
 
 
 @app.post("/de/new", response_class=HTMLResponse)
@@ -425,6 +239,16 @@ async def de_new_submit(
     numero_documento: str = Form("0000001")
 ):
     """Procesa el formulario y crea un nuevo DE"""
+    # Los items son campos dinámicos: se leen acá y el resto (contador,
+    # armado del XML, INSERT) corre en el threadpool
+    form_data = await request.form()
+    return await run_io(
+        _de_new_submit, form_data, timbrado, establecimiento, punto_expedicion, numero_documento
+    )
+
+
+def _de_new_submit(form_data, timbrado: str, establecimiento: str, punto_expedicion: str, numero_documento: str):
+    """Crea el DE a partir del formulario ya leído (blocking)"""
     # Validar SIFEN_EMISOR_RUC
     emisor_ruc = _check_emisor_ruc()
     
@@ -473,7 +297,6 @@ async def de_new_submit(
         conn.close()
     
     # Extraer items del formulario
-    form_data = await request.form()
     items = []
     item_indices = set()
     
@@ -549,12 +372,13 @@ async def de_new_submit(
     max_retries = 2
     for attempt in range(max_retries):
         try:
-            db.insert_document(
+            doc_id = db.insert_document(
                 cdc=cdc,
                 ruc_emisor=emisor_ruc,
                 timbrado=timbrado,
                 de_xml=de_xml
             )
+            de_trace.record_event(cdc, de_trace.STAGE_CREATED, de_document_id=doc_id)
             return RedirectResponse(url="/", status_code=303)
         except ConnectionError as e:
             # Verificar si es error de unique violation (CDC duplicado)
@@ -565,14 +389,14 @@ async def de_new_submit(
                     try:
                         num_doc_int = int(numero_documento)
                         numero_documento = str(num_doc_int + 1).zfill(len(numero_documento))
-                        # Regenerar DE con nuevo número (build_de_xml ya importado arriba)
-                        from tools.build_de import build_de_xml
-                        de_xml = build_de_xml(
+                        # Regenerar DE con nuevo número (conservando los items)
+                        de_xml = _build_de_xml_with_items(
                             ruc=emisor_ruc,
                             timbrado=timbrado,
                             establecimiento=establecimiento,
                             punto_expedicion=punto_expedicion,
-                            numero_documento=numero_documento
+                            numero_documento=numero_documento,
+                            items=items
                         )
                         cdc = _extract_cdc_from_xml(de_xml)
                         continue
@@ -586,7 +410,7 @@ async def de_new_submit(
 
 
 @app.get("/de/{doc_id}", response_class=HTMLResponse)
-async def de_detail(request: Request, doc_id: int):
+def de_detail(request: Request, doc_id: int):
     """Muestra el detalle de un documento"""
     try:
         document = db.get_document(doc_id)
@@ -603,8 +427,108 @@ async def de_detail(request: Request, doc_id: int):
         raise HTTPException(status_code=500, detail=f"Error al cargar documento: {str(e)}")
 
 
+@app.get("/de/{doc_id}/timeline", response_class=HTMLResponse)
+def de_timeline(request: Request, doc_id: int, format: str = "html"):
+    """
+    Línea de tiempo del DE (de_events): etapas con timestamp, duración y
+    claves SIFEN (dId, dProtConsLote, códigos). format=json devuelve los eventos.
+    """
+    document = db.get_document(doc_id)
+    if not document:
+        raise HTTPException(status_code=404, detail=f"Documento {doc_id} no encontrado")
+
+    events = de_trace.get_timeline(document["cdc"])
+    if format == "json":
+        return JSONResponse({"doc_id": doc_id, "cdc": document["cdc"], "events": events})
+
+    # Render directo con Jinja: no depende de la firma de TemplateResponse,
+    # que cambió entre versiones de Starlette
+    html = templates.get_template("de_timeline.html").render(
+        request=request, doc=document, events=events
+    )
+    return HTMLResponse(html)
+
+
+@app.get("/admin/sifen/time-to-approval")
+def admin_time_to_approval(days: Optional[float] = None):
+    """
+    Percentiles de tiempo hasta la aprobación (creación -> aprobado y envío ->
+    aprobado) de los DEs trazados en los últimos `days` días (default: todos).
+    """
+    since = time.time() - days * 86400 if days else None
+    return de_trace.time_to_approval_stats(since=since)
+
+
+# Las rutas de KuDE son def (no async): FastAPI las corre en su threadpool y el
+# render no bloquea el event loop.
+@app.get("/de/{doc_id}/kude.pdf")
+def de_kude(doc_id: int):
+    """Descarga el KuDE (PDF) de un documento"""
+    from app.kude_generator import KudeError, render_kude
+
+    try:
+        docs = db.get_documents_xml([doc_id])
+        if not docs:
+            raise HTTPException(status_code=404, detail=f"Documento {doc_id} no encontrado")
+        doc = docs[0]
+        if not doc["xml"]:
+            raise HTTPException(status_code=409, detail=f"Documento {doc_id} sin XML firmado")
+        pdf = render_kude(doc["xml"])
+    except HTTPException:
+        raise
+    except KudeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al generar KuDE: {str(e)}")
+
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'inline; filename="KuDE_{doc["cdc"] or doc_id}.pdf"'},
+    )
+
+
+@app.get("/de/kude/batch")
+def de_kude_batch(ids: str, format: str = "pdf"):
+    """
+    Descarga los KuDE de varios documentos.
+    
+    Query params:
+    - ids: IDs separados por coma (ej: 1,2,3)
+    - format: "pdf" (un único PDF) o "zip" (un PDF por CDC)
+    """
+    from app.kude_generator import KudeError, render_kude_batch
+
+    if format not in ("pdf", "zip"):
+        raise HTTPException(status_code=400, detail="format debe ser 'pdf' o 'zip'")
+    try:
+        doc_ids = [int(x) for x in ids.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids debe ser una lista de números separados por coma")
+    if not doc_ids:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un id")
+
+    try:
+        docs = [doc for doc in db.get_documents_xml(doc_ids) if doc["xml"]]
+        if not docs:
+            raise HTTPException(status_code=404, detail="Ningún documento con XML firmado")
+        content = render_kude_batch([doc["xml"] for doc in docs], output=format)
+    except HTTPException:
+        raise
+    except KudeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al generar KuDE: {str(e)}")
+
+    return Response(
+        content=content,
+        media_type="application/pdf" if format == "pdf" else "application/zip",
+        headers={"Content-Disposition": f'attachment; filename="KuDE_{len(docs)}.{format}"'},
+    )
+
+
 @app.post("/de/{doc_id}/send", response_class=HTMLResponse)
-async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
+def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
     """
     Envía un documento a SIFEN y actualiza su estado.
     
@@ -659,10 +583,11 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
             
             # Obtener DE XML
             de_xml = document['de_xml']
+            cdc = document.get('cdc')
             
             if mode == "lote":
                 # Flujo por lote (siRecepLoteDE)
-                from tools.send_sirecepde import build_r_envio_lote_xml, build_and_sign_lote_from_xml
+                from app.sifen_client.lote_sender import build_r_envio_lote_xml, build_and_sign_lote_from_xml
                 from app.sifen_client.config import get_mtls_cert_path_and_password
                 
                 de_xml_bytes = de_xml.encode("utf-8")
@@ -672,7 +597,7 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
                 
                 # GUARD-RAIL: Verificar dependencias críticas ANTES de construir/firmar
                 try:
-                    from tools.send_sirecepde import _check_signing_dependencies
+                    from app.sifen_client.lote_sender import _check_signing_dependencies
                     _check_signing_dependencies()
                 except RuntimeError as e:
                     error_msg = f"BLOQUEADO: {str(e)}. Ver artifacts/sign_blocked_reason.txt"
@@ -681,12 +606,13 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
                 
                 # Construir y firmar lote usando el pipeline correcto
                 try:
-                    zip_base64, lote_xml_bytes, zip_bytes, _ = build_and_sign_lote_from_xml(
-                        xml_bytes=de_xml_bytes,
-                        cert_path=sign_cert_path,
-                        cert_password=sign_cert_password,
-                        return_debug=True
-                    )
+                    with de_trace.span(cdc, de_trace.STAGE_SIGN, de_document_id=doc_id):
+                        zip_base64, lote_xml_bytes, zip_bytes, _ = build_and_sign_lote_from_xml(
+                            xml_bytes=de_xml_bytes,
+                            cert_path=sign_cert_path,
+                            cert_password=sign_cert_password,
+                            return_debug=True
+                        )
                 except Exception as e:
                     error_msg = f"BLOQUEADO: Error al construir/firmar lote: {str(e)}"
                     db.update_document_status(doc_id, status="error", message=error_msg)
@@ -695,13 +621,15 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
                 payload_xml = build_r_envio_lote_xml(did=1, xml_bytes=de_xml_bytes, zip_base64=zip_base64)
                 
                 # PREFLIGHT: Validar antes de enviar
-                from tools.send_sirecepde import preflight_soap_request
-                preflight_success, preflight_error = preflight_soap_request(
-                    payload_xml=payload_xml,
-                    zip_bytes=zip_bytes,
-                    lote_xml_bytes=lote_xml_bytes,
-                    artifacts_dir=FSPath("artifacts")
-                )
+                from app.sifen_client.lote_sender import preflight_soap_request
+                with de_trace.span(cdc, de_trace.STAGE_PREFLIGHT, de_document_id=doc_id) as trace_event:
+                    preflight_success, preflight_error = preflight_soap_request(
+                        payload_xml=payload_xml,
+                        zip_bytes=zip_bytes,
+                        lote_xml_bytes=lote_xml_bytes,
+                        artifacts_dir=FSPath("artifacts")
+                    )
+                    trace_event.update(ok=preflight_success, detail=preflight_error)
                 
                 if not preflight_success:
                     error_msg = f"BLOQUEADO: Preflight falló - {preflight_error}. Ver artifacts/preflight_*.xml y artifacts/preflight_zip.zip"
@@ -714,7 +642,7 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
                 
                 try:
                     from lxml import etree
-                    from tools.send_sirecepde import _extract_ruc_from_cert
+                    from app.sifen_client.lote_sender import _extract_ruc_from_cert
                     # Constante de namespace SIFEN
                     SIFEN_NS_URI = "http://ekuatia.set.gov.py/sifen/xsd"
                     
@@ -840,7 +768,9 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
                     # Consultar habilitación FE del RUC
                     logger.info(f"Verificando habilitación FE del RUC: {ruc_gate}")
                     dump_http = os.getenv("SIFEN_DUMP_HTTP", "0") in ("1", "true", "True")
-                    ruc_check = client.consulta_ruc_raw(ruc=ruc_gate, dump_http=dump_http)
+                    with de_trace.span(cdc, de_trace.STAGE_RUC_GATE, de_document_id=doc_id) as trace_event:
+                        ruc_check = client.consulta_ruc_raw(ruc=ruc_gate, dump_http=dump_http)
+                        trace_event.update(code=ruc_check.get("dCodRes"), ok=ruc_check.get("dCodRes") == "0502")
                     cod = (ruc_check.get("dCodRes") or "").strip()
                     msg = (ruc_check.get("dMsgRes") or "").strip()
                     
@@ -884,7 +814,22 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
                 # --- FIN GATE ---
                 
                 # Enviar lote a SIFEN (solo si preflight y gate pasaron)
-                response = client.recepcion_lote(payload_xml)
+                # Envelope armado sin copias (ZIP -> Base64 en un bytearray preasignado),
+                # con el mismo dId del rEnvioLote que pasó el preflight
+                from app.sifen_client import lote_payload
+                did = lote_payload.payload_did(payload_xml) or lote_payload.make_did()
+                del zip_base64, payload_xml
+                envelope = lote_payload.assemble_lote_envelope(did, zip_bytes)
+                with de_trace.span(cdc, de_trace.STAGE_SEND, de_document_id=doc_id, d_id=did) as trace_event:
+                    response = client.recepcion_lote_envelope(envelope)
+                    trace_event.update(
+                        code=response.get('codigo_respuesta'),
+                        ok=response.get('codigo_respuesta') == "0300",
+                        d_prot_cons_lote=response.get('d_prot_cons_lote'),
+                    )
+                # rEnvioLote efectivamente enviado (se guarda como sirecepde_xml)
+                payload_xml = lote_payload.r_envio_lote_xml(envelope)
+                del envelope
                 
                 # Extraer campos de la respuesta (SIEMPRE parsear aunque dProtConsLote sea 0)
                 d_prot_cons_lote = response.get('d_prot_cons_lote')
@@ -923,19 +868,9 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
                         
                         # Importar función de diagnóstico
                         sys.path.insert(0, str(FSPath(__file__).parent.parent))
-                        from tools.send_sirecepde import _save_0301_diagnostic_package
-                        
-                        # Extraer dId del payload
-                        from lxml import etree
-                        SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
-                        payload_root = etree.fromstring(payload_xml.encode("utf-8"))
-                        did = "1"  # Default
-                        d_id_elem = payload_root.find(f".//{{{SIFEN_NS}}}dId")
-                        if d_id_elem is None:
-                            d_id_elem = payload_root.find(".//dId")
-                        if d_id_elem is not None and d_id_elem.text:
-                            did = d_id_elem.text.strip()
+                        from app.sifen_client.lote_sender import _save_0301_diagnostic_package
                         
+                        # dId: el mismo del envelope enviado (did)
                         # Llamar función de diagnóstico (zip_bytes y lote_xml_bytes ya están disponibles)
                         # Nota: zip_bytes y lote_xml_bytes están disponibles desde build_and_sign_lote_from_xml
                         if lote_xml_bytes:
@@ -1022,7 +957,7 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
                             )
                             
                             # Consultar automáticamente el estado del lote
-                            await _check_lote_status_async(lote_id, env, d_prot_cons_lote.strip())
+                            _check_lote_status(lote_id, env, d_prot_cons_lote.strip())
                             
                         except ValueError as e:
                             # Lote ya existe o error de validación
@@ -1044,10 +979,19 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
                     de_xml_content=de_xml,
                     d_id="1"
                 )
+                # dId del rEnviDe que efectivamente se envía (clave de correlación en de_events)
+                from app.sifen_client.lote_payload import payload_did
+                d_id = payload_did(payload_xml)
                 
                 # Enviar directamente a SIFEN
                 try:
-                    response = client.recepcion_de(payload_xml)
+                    with de_trace.span(cdc, de_trace.STAGE_SEND, de_document_id=doc_id, d_id=d_id) as trace_event:
+                        response = client.recepcion_de(payload_xml)
+                        d_cod_res = response.get('codigo_respuesta') if isinstance(response, dict) else None
+                        trace_event.update(code=d_cod_res, ok=d_cod_res in de_trace.DE_APPROVED_CODES)
+                    # siRecepDE responde con el resultado del DE: 0260/0261 ya es la aprobación
+                    if d_cod_res in de_trace.DE_APPROVED_CODES:
+                        de_trace.record_event(cdc, de_trace.STAGE_APPROVED, code=d_cod_res, d_id=d_id, de_document_id=doc_id)
                 except SifenClientError as e:
                     # Error de SIFEN (mTLS, configuración, etc.) - guardar y redirigir
                     error_msg = str(e)
@@ -1097,29 +1041,30 @@ async def de_send_to_sifen(request: Request, doc_id: int, mode: str = "lote"):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
-async def _check_lote_status_async(lote_id: int, env: str, prot: str):
+def _check_lote_status(lote_id: int, env: str, prot: str):
     """
-    Helper async para consultar el estado de un lote y actualizar DEs asociados.
-    Se ejecuta en background después de recibir dProtConsLote.
+    Consulta el estado de un lote y actualiza los DEs asociados.
+    Se llama desde handlers sync (threadpool) después de recibir dProtConsLote.
     """
-    import asyncio
     from app.sifen_client.lote_checker import (
         check_lote_status,
         determine_status_from_cod_res_lot,
     )
     from .sifen_status_mapper import map_lote_consulta_to_de_status
     
-    # Ejecutar en thread pool para no bloquear
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(
-        None,
-        check_lote_status,
+    start = time.perf_counter()
+    result = check_lote_status(
         env,
         prot,
         None,  # p12_path (usa env vars)
         None,  # p12_password (usa env vars)
         30,    # timeout
     )
+    de_trace.record_lote_result(
+        prot, result.get("cod_res_lot"), result.get("de_results"),
+        duration_ms=(time.perf_counter() - start) * 1000,
+        ok=bool(result.get("success")), detail=result.get("error"),
+    )
     
     if result.get("success"):
         cod_res_lot = result.get("cod_res_lot")
@@ -1187,7 +1132,7 @@ async def _check_lote_status_async(lote_id: int, env: str, prot: str):
 
 
 @app.get("/admin/sifen/lotes", response_class=HTMLResponse)
-async def admin_lotes_list(request: Request, env: Optional[str] = None, status: Optional[str] = None):
+def admin_lotes_list(request: Request, env: Optional[str] = None, status: Optional[str] = None):
     """
     Lista lotes SIFEN con filtros opcionales.
     
@@ -1206,7 +1151,7 @@ async def admin_lotes_list(request: Request, env: Optional[str] = None, status:
 
 
 @app.get("/admin/sifen/lotes/{lote_id}", response_class=HTMLResponse)
-async def admin_lote_detail(request: Request, lote_id: int):
+def admin_lote_detail(request: Request, lote_id: int):
     """Muestra el detalle de un lote con su XML de respuesta"""
     try:
         lote = lotes_db.get_lote(lote_id)
@@ -1224,7 +1169,7 @@ async def admin_lote_detail(request: Request, lote_id: int):
 
 
 @app.post("/admin/sifen/lotes/{lote_id}/check", response_class=HTMLResponse)
-async def admin_lote_check(request: Request, lote_id: int):
+def admin_lote_check(request: Request, lote_id: int):
     """
     Consulta manualmente el estado de un lote (una sola vez).
     """
@@ -1237,7 +1182,7 @@ async def admin_lote_check(request: Request, lote_id: int):
         prot = lote["d_prot_cons_lote"]
         
         # Consultar estado
-        await _check_lote_status_async(lote_id, env, prot)
+        _check_lote_status(lote_id, env, prot)
         
         return RedirectResponse(url=f"/admin/sifen/lotes/{lote_id}?checked=1", status_code=303)
         
@@ -1248,7 +1193,7 @@ async def admin_lote_check(request: Request, lote_id: int):
 
 
 @app.get("/de/{doc_id}/status", response_class=HTMLResponse)
-async def de_check_status(request: Request, doc_id: int):
+def de_check_status(request: Request, doc_id: int):
     """
     Consulta el estado de un DE en SIFEN y actualiza la base de datos.
     
@@ -1294,11 +1239,18 @@ async def de_check_status(request: Request, doc_id: int):
                 from app.sifen_client.lote_checker import check_lote_status
                 
                 try:
+                    start = time.perf_counter()
                     result = check_lote_status(
                         env=env,
                         prot=d_prot_cons_lote,
                         timeout=30
                     )
+                    de_trace.record_lote_result(
+                        d_prot_cons_lote, result.get("cod_res_lot"), result.get("de_results"),
+                        cdcs=[cdc] if cdc else [],
+                        duration_ms=(time.perf_counter() - start) * 1000,
+                        ok=bool(result.get("success")), detail=result.get("error"),
+                    )
                     
                     if result.get("success"):
                         cod_res_lot = result.get("cod_res_lot")
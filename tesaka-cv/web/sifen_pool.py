@@ -0,0 +1,57 @@
+"""
+Concurrencia compartida de los procesos masivos contra SIFEN
+
+Auditoría de DEs (de_audit) y envío de eventos (eventos_batch) consultan con
+varios threads sobre la misma sesión mTLS: RateLimiter limita las consultas
+por segundo y ensure_pool_size agranda el pool de conexiones de la sesión.
+"""
+import threading
+import time
+from typing import Any, Optional
+
+
+class RateLimiter:
+    """
+    Limitador de tasa (token bucket) seguro para uso desde varios threads.
+
+    Permite hasta `rate` adquisiciones por segundo con ráfagas de hasta `burst`.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError(f"rate debe ser > 0. Valor recibido: {rate}")
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloquea hasta que haya un token disponible."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def ensure_pool_size(client: Any, workers: int) -> None:
+    """
+    Agranda el pool de conexiones HTTP de la sesión mTLS para `workers` threads.
+
+    Se redimensiona el adapter ya montado en vez de reemplazarlo: SoapClient
+    monta un TimedHTTPAdapter (métricas http_connect/http_tls/http_wait).
+    """
+    session = getattr(getattr(client, "transport", None), "session", None)
+    if session is None:
+        return
+    adapter = session.get_adapter("https://")
+    if getattr(adapter, "_pool_maxsize", 0) >= workers:
+        return
+    adapter.poolmanager.clear()
+    adapter.init_poolmanager(workers, workers, block=getattr(adapter, "_pool_block", False))
@@ -20,6 +20,9 @@ except ImportError:
         etree = None
         HAS_LXML = False
 
+if HAS_LXML:
+    from app.sifen_client.response_parser import iter_lote_de_results
+
 from .document_status import (
     STATUS_SIGNED_LOCAL,
     STATUS_SENT_TO_SIFEN,
@@ -27,6 +30,8 @@ from .document_status import (
     STATUS_APPROVED,
     STATUS_REJECTED,
     STATUS_ERROR,
+    CONSULTA_DE_APPROVED,
+    CONSULTA_DE_NOT_FOUND,
 )
 
 
@@ -92,8 +97,8 @@ def parse_lote_de_results(xml_response: str) -> List[Dict[str, Any]]:
     """
     Parsea la respuesta de consulta de lote y extrae resultados de DE individuales.
     
-    Cuando el código es 0362 (procesamiento concluido), la respuesta contiene:
-    - gResProc: Lista de resultados de procesamiento, cada uno con:
+    Cuando el código es 0362 (procesamiento concluido), la respuesta contiene
+    un gResProcLote por DE (o, en el formato plano, un gResProc con id) con:
       - id: CDC del DE
       - dEstRes: Estado del resultado ("Aceptado", "Rechazado", etc.)
       - dProtAut: Número de transacción (si está aprobado)
@@ -116,110 +121,19 @@ def parse_lote_de_results(xml_response: str) -> List[Dict[str, Any]]:
     results = []
     
     try:
-        if isinstance(xml_response, str):
-            xml_bytes = xml_response.encode("utf-8")
-        else:
-            xml_bytes = xml_response
-        
-        root = etree.fromstring(xml_bytes)
-        
-        # Buscar todos los elementos gResProc (resultados de procesamiento)
-        # Usar XPath solo si es lxml, sino usar iter
-        if HAS_LXML:
-            gresproc_list = root.xpath(".//*[local-name()='gResProc']")
-        else:
-            # Fallback para xml.etree.ElementTree: buscar por iteración
-            gresproc_list = []
-            for elem in root.iter():
-                # Extraer localname
-                tag = elem.tag
-                if '}' in tag:
-                    localname = tag.split('}', 1)[1]
-                else:
-                    localname = tag
-                if localname == 'gResProc':
-                    gresproc_list.append(elem)
-        
-        def find_by_localname(elem, localname):
-            """Busca elemento por localname (compatible con lxml y ElementTree)"""
-            if HAS_LXML:
-                nodes = elem.xpath(f".//*[local-name()='{localname}']")
-                return nodes[0] if nodes else None
-            else:
-                # Fallback para ElementTree
-                for child in elem.iter():
-                    tag = child.tag
-                    if '}' in tag:
-                        child_localname = tag.split('}', 1)[1]
-                    else:
-                        child_localname = tag
-                    if child_localname == localname:
-                        return child
-                return None
-        
-        def find_all_by_localname(elem, localname):
-            """Busca todos los elementos por localname"""
-            if HAS_LXML:
-                return elem.xpath(f".//*[local-name()='{localname}']")
-            else:
-                # Fallback para ElementTree
-                results = []
-                for child in elem.iter():
-                    tag = child.tag
-                    if '}' in tag:
-                        child_localname = tag.split('}', 1)[1]
-                    else:
-                        child_localname = tag
-                    if child_localname == localname:
-                        results.append(child)
-                return results
+        if not HAS_LXML:
+            return [r for r in _lote_de_results_etree(xml_response) if r['cdc']]
         
-        for gresproc in gresproc_list:
-            # Buscar id (CDC) - buscar directamente en hijos
-            id_elem = find_by_localname(gresproc, 'id')
-            cdc = id_elem.text.strip() if id_elem is not None and id_elem.text else None
-            
-            # Buscar dEstRes (estado del resultado)
-            destres_elem = find_by_localname(gresproc, 'dEstRes')
-            estado = destres_elem.text.strip() if destres_elem is not None and destres_elem.text else None
-            
-            # Buscar dProtAut (número de transacción)
-            dprotaut_elem = find_by_localname(gresproc, 'dProtAut')
-            d_prot_aut = dprotaut_elem.text.strip() if dprotaut_elem is not None and dprotaut_elem.text else None
-            
-            # Buscar dFecProc (fecha de procesamiento)
-            dfecproc_elem = find_by_localname(gresproc, 'dFecProc')
-            d_fec_proc = dfecproc_elem.text.strip() if dfecproc_elem is not None and dfecproc_elem.text else None
-            
-            # Buscar gResProc anidados (códigos y mensajes de resultado)
-            # NOTA: gResProc puede estar anidado dentro de otro gResProc
-            codigos = []
-            mensajes = []
-            # Buscar todos los gResProc hijos (no recursivo, solo hijos directos)
-            for child in gresproc:
-                tag = child.tag
-                if '}' in tag:
-                    child_localname = tag.split('}', 1)[1]
-                else:
-                    child_localname = tag
-                if child_localname == 'gResProc':
-                    # Buscar dCodRes y dMsgRes dentro de este gResProc hijo
-                    cod_elem = find_by_localname(child, 'dCodRes')
-                    if cod_elem is not None and cod_elem.text:
-                        codigos.append(cod_elem.text.strip())
-                    
-                    msg_elem = find_by_localname(child, 'dMsgRes')
-                    if msg_elem is not None and msg_elem.text:
-                        mensajes.append(msg_elem.text.strip())
-            
-            if cdc:
+        # XPath precompilados; streaming para respuestas grandes
+        for entry in iter_lote_de_results(xml_response):
+            if entry.cdc:
                 results.append({
-                    'cdc': cdc,
-                    'estado': estado,
-                    'd_prot_aut': d_prot_aut,
-                    'd_fec_proc': d_fec_proc,
-                    'codigos': codigos,
-                    'mensajes': mensajes,
+                    'cdc': entry.cdc,
+                    'estado': entry.estado,
+                    'd_prot_aut': entry.prot_aut,
+                    'd_fec_proc': entry.fec_proc,
+                    'codigos': entry.codigos,
+                    'mensajes': entry.mensajes,
                 })
     
     except Exception as e:
@@ -231,6 +145,46 @@ def parse_lote_de_results(xml_response: str) -> List[Dict[str, Any]]:
     return results
 
 
+def _lote_de_results_etree(xml_response: str) -> List[Dict[str, Any]]:
+    """Fallback sin lxml (xml.etree.ElementTree), con el mismo formato que parse_lote_de_results."""
+    xml_bytes = xml_response.encode("utf-8") if isinstance(xml_response, str) else xml_response
+    root = etree.fromstring(xml_bytes)
+    
+    def localname(tag):
+        return tag.split('}', 1)[1] if '}' in tag else tag
+    
+    def text(elem):
+        return elem.text.strip() or None if elem is not None and elem.text else None
+    
+    results = []
+    for elem in root.iter():
+        children = {}
+        for child in elem:
+            children.setdefault(localname(child.tag), child)
+        name = localname(elem.tag)
+        if name != 'gResProcLote' and not (name == 'gResProc' and 'id' in children):
+            continue
+        
+        codigos, mensajes = [], []
+        for child in elem:
+            if localname(child.tag) == 'gResProc':
+                for item in child:
+                    value = text(item)
+                    if value and localname(item.tag) == 'dCodRes':
+                        codigos.append(value)
+                    elif value and localname(item.tag) == 'dMsgRes':
+                        mensajes.append(value)
+        results.append({
+            'cdc': text(children.get('id')),
+            'estado': text(children.get('dEstRes')),
+            'd_prot_aut': text(children.get('dProtAut')),
+            'd_fec_proc': text(children.get('dFecProc')),
+            'codigos': codigos,
+            'mensajes': mensajes,
+        })
+    return results
+
+
 def map_lote_consulta_to_de_status(
     cod_res_lot: Optional[str],
     xml_response: Optional[str],
@@ -321,3 +275,37 @@ def map_lote_consulta_to_de_status(
     # Otros códigos: error
     return STATUS_ERROR, cod_res_lot, f"Código de respuesta desconocido: {cod_res_lot}", None
 
+
+
+def map_consulta_de_to_status(
+    cod_res: Optional[str],
+    msg_res: Optional[str],
+    current_status: Optional[str],
+) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+    """
+    Mapea la respuesta de consulta de DE por CDC (siConsDE) al estado del documento.
+    
+    - dCodRes=0422 (CDC encontrado) => APPROVED
+    - dCodRes=0420 (DE no existe o no aprobado):
+        * si localmente figuraba APPROVED => ERROR (discrepancia con SIFEN)
+        * en otro caso no se cambia el estado (status=None)
+    - Otros códigos => sin cambio de estado (status=None)
+    
+    Args:
+        cod_res: dCodRes de la respuesta
+        msg_res: dMsgRes de la respuesta
+        current_status: Estado actual del documento en la base
+        
+    Returns:
+        Tupla (status, code, message, approved_at). status es None si no corresponde actualizar.
+    """
+    code = cod_res.strip() if cod_res else None
+    
+    if code in CONSULTA_DE_APPROVED:
+        return STATUS_APPROVED, code, msg_res or "CDC encontrado en SIFEN", datetime.now().isoformat()
+    
+    if code in CONSULTA_DE_NOT_FOUND and current_status == STATUS_APPROVED:
+        message = msg_res or "DE no existe o no está aprobado"
+        return STATUS_ERROR, code, f"Discrepancia con SIFEN: {message}", None
+    
+    return None, code, msg_res, None